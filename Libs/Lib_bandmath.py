@@ -0,0 +1,850 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+#############################################################################
+# Copyright (©) CEREMA/DTerOCC/DT/OSECC  All rights reserved.               #
+#############################################################################
+
+#############################################################################
+#                                                                           #
+# CALCULATRICE RASTER : EXPRESSIONS PARESSEUSES EVALUEES PAR BLOCS          #
+#                                                                           #
+#############################################################################
+"""
+ Ce module contient une calculatrice raster qui remplace les appels chainés à otbcli_BandMath.
+ Une expression (RasterExpression) est un graphe d'opérations sur des bandes d'images GDAL construit sans aucun calcul :
+ les opérations enchainées sont fusionnées dans un seul graphe (avec simplification des masques binaires et des constantes)
+ qui n'est évalué qu'à l'écriture du résultat final, par bandes de lignes alignées sur les blocs GDAL lues et calculées en parallele
+ avec numpy (ou numexpr s'il est installé). Aucune image intermediaire n'est écrite.
+ L'évaluation est itérative (sans limite de profondeur des expressions) et libère chaque résultat intermediaire après sa derniere utilisation,
+ la hauteur des bandes de lignes est calculée à partir de la mémoire maximale autorisée.
+ Les calculs sont faits en double précision comme otbcli_BandMath, le résultat est converti (borné puis tronqué) au codage de sortie.
+ La fonction parseBandMathExpression() traduit une expression otbcli_BandMath (im1b1, ?:, and, or, fonctions usuelles) en RasterExpression.
+"""
+
+# IMPORTS DIVERS
+from __future__ import print_function
+import os, re, numpy
+from osgeo import gdal
+from osgeo.gdalconst import *
+from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+from Lib_operator import getNumberCPU
+
+# numexpr est optionnel, a defaut les expressions sont évaluées avec numpy
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+# debug = 0 : affichage minimum de commentaires lors de l'execution du script
+# debug = 3 : affichage maximum de commentaires lors de l'execution du script. Intermédiaire : affichage intermédiaire
+debug = 1
+
+# Codages de sortie (noms des codages OTB) : type GDAL et type numpy
+CODAGE_DICO = {
+    "uint8" : (GDT_Byte, numpy.uint8),
+    "uint16" : (GDT_UInt16, numpy.uint16),
+    "int16" : (GDT_Int16, numpy.int16),
+    "uint32" : (GDT_UInt32, numpy.uint32),
+    "int32" : (GDT_Int32, numpy.int32),
+    "float" : (GDT_Float32, numpy.float32),
+    "double" : (GDT_Float64, numpy.float64)}
+
+# Mémoire maximale utilisée par défaut par writeRasterExpressions() pour l'ensemble des threads (en Mo)
+RAM_MAX_DEFAULT = 1024
+
+# Limites des expressions traduites pour numexpr (au dela, l'évaluation se fait noeud par noeud avec numpy)
+NUMEXPR_MAX_DEPTH = 32
+NUMEXPR_MAX_LENGTH = 20000
+
+# Opérateurs : fonction numpy, et syntaxe numexpr
+ARITHMETIC_DICO = {'+' : numpy.add, '-' : numpy.subtract, '*' : numpy.multiply, '/' : numpy.true_divide, '^' : numpy.power}
+COMPARISON_DICO = {'<' : numpy.less, '<=' : numpy.less_equal, '>' : numpy.greater, '>=' : numpy.greater_equal, '==' : numpy.equal, '!=' : numpy.not_equal}
+LOGICAL_DICO = {'and' : numpy.logical_and, 'or' : numpy.logical_or}
+NUMEXPR_OPERATOR_DICO = {'+' : '+', '-' : '-', '*' : '*', '/' : '/', '^' : '**', '<' : '<', '<=' : '<=', '>' : '>', '>=' : '>=', '==' : '==', '!=' : '!=', 'and' : '&', 'or' : '|'}
+
+# Fonctions (noms otbcli_BandMath / muParser) : fonction numpy, nom numexpr (None si non disponible dans numexpr)
+FUNCTION_DICO = {
+    'abs' : (numpy.abs, 'abs'),
+    'sqrt' : (numpy.sqrt, 'sqrt'),
+    'exp' : (numpy.exp, 'exp'),
+    'ln' : (numpy.log, 'log'),
+    'log' : (numpy.log, 'log'),
+    'log10' : (numpy.log10, 'log10'),
+    'log2' : (numpy.log2, None),
+    'sin' : (numpy.sin, 'sin'),
+    'cos' : (numpy.cos, 'cos'),
+    'tan' : (numpy.tan, 'tan'),
+    'asin' : (numpy.arcsin, 'arcsin'),
+    'acos' : (numpy.arccos, 'arccos'),
+    'atan' : (numpy.arctan, 'arctan'),
+    'sinh' : (numpy.sinh, 'sinh'),
+    'cosh' : (numpy.cosh, 'cosh'),
+    'tanh' : (numpy.tanh, 'tanh'),
+    'sign' : (numpy.sign, None),
+    'rint' : (numpy.rint, None),
+    'floor' : (numpy.floor, None),
+    'ceil' : (numpy.ceil, None)}
+
+#########################################################################
+# CLASSE RasterExpression()                                             #
+#########################################################################
+class RasterExpression:
+    """
+    #   Rôle : Noeud du graphe d'une expression raster. Les opérateurs python (+ - * / ** < <= > >= == != & | ~ et - unaire)
+    #          construisent de nouveaux noeuds sans calcul, les expressions communes sont évaluées une seule fois par bande de lignes
+    #   Attributs :
+    #       operator : 'band', 'constant', un opérateur arithmétique, de comparaison ou logique, 'not', 'where', 'min', 'max', 'lookup' ou un nom de fonction
+    #       operands_list : liste des noeuds opérandes
+    #       value : (image, numéro de bande) pour une bande, la valeur pour une constante, (clés, valeurs) triées par clé pour une table de correspondance
+    #       boolean : vrai si le noeud ne prend que les valeurs 0 et 1 (comparaison, opération logique, masque binaire)
+    """
+
+    def __init__(self, operator, operands_list=None, value=None, boolean=False):
+        self.operator = operator
+        self.operands_list = operands_list if operands_list is not None else []
+        self.value = value
+        self.boolean = boolean
+
+    # Les opérateurs de comparaison sont redéfinis, le hash reste celui de l'objet
+    __hash__ = object.__hash__
+
+    def isConstant(self):
+        return self.operator == 'constant'
+
+    def __add__(self, other): return arithmeticExpression('+', self, other)
+    def __radd__(self, other): return arithmeticExpression('+', other, self)
+    def __sub__(self, other): return arithmeticExpression('-', self, other)
+    def __rsub__(self, other): return arithmeticExpression('-', other, self)
+    def __mul__(self, other): return arithmeticExpression('*', self, other)
+    def __rmul__(self, other): return arithmeticExpression('*', other, self)
+    def __truediv__(self, other): return arithmeticExpression('/', self, other)
+    def __rtruediv__(self, other): return arithmeticExpression('/', other, self)
+    def __pow__(self, other): return arithmeticExpression('^', self, other)
+    def __rpow__(self, other): return arithmeticExpression('^', other, self)
+    def __neg__(self): return arithmeticExpression('-', 0, self)
+    def __lt__(self, other): return comparisonExpression('<', self, other)
+    def __le__(self, other): return comparisonExpression('<=', self, other)
+    def __gt__(self, other): return comparisonExpression('>', self, other)
+    def __ge__(self, other): return comparisonExpression('>=', self, other)
+    def __eq__(self, other): return comparisonExpression('==', self, other)
+    def __ne__(self, other): return comparisonExpression('!=', self, other)
+    def __and__(self, other): return logicalExpression('and', self, other)
+    def __rand__(self, other): return logicalExpression('and', other, self)
+    def __or__(self, other): return logicalExpression('or', self, other)
+    def __ror__(self, other): return logicalExpression('or', other, self)
+    def __invert__(self): return notExpression(self)
+
+    def getBands(self):
+        """
+        #   Rôle : Retourne la liste ordonnée (sans doublon) des bandes (image, numéro de bande) lues par l'expression
+        """
+
+        bands_list = []
+        visited_set = set()
+        stack_list = [self]
+        while stack_list:
+            node = stack_list.pop()
+            if id(node) in visited_set:
+                continue
+            visited_set.add(id(node))
+            if node.operator == 'band':
+                if node.value not in bands_list:
+                    bands_list.append(node.value)
+            stack_list.extend(reversed(node.operands_list))
+        return bands_list
+
+    def write(self, image_output, codage="float", format_raster="", no_data_value=None, nb_threads=0, max_pixels_strip=4194304, ram_max=0, image_reference=""):
+        """
+        #   Rôle : Evalue l'expression et écrit le résultat dans une image une bande (voir writeRasterExpressions())
+        """
+
+        writeRasterExpressions([self], image_output, codage, format_raster, no_data_value, nb_threads, max_pixels_strip, ram_max, image_reference)
+        return
+
+#########################################################################
+# FONCTIONS DE CONSTRUCTION DES EXPRESSIONS                             #
+#########################################################################
+def toNumber(data):
+    # Un masque booléen est utilisé comme 0 / 1
+    if isinstance(data, numpy.ndarray) and data.dtype == numpy.bool_:
+        return data.astype(numpy.float64)
+    return data
+
+def toBoolean(data):
+    # Une valeur est vraie si elle est non nulle
+    if isinstance(data, numpy.ndarray) and data.dtype == numpy.bool_:
+        return data
+    return numpy.not_equal(data, 0)
+
+def constantExpression(value):
+    """
+    #   Rôle : Retourne l'expression d'une valeur constante
+    """
+
+    if isinstance(value, RasterExpression):
+        return value
+    return RasterExpression('constant', value=float(value), boolean=(float(value) in [0.0, 1.0]))
+
+def bandExpression(image_input, num_band=1):
+    """
+    #   Rôle : Retourne l'expression d'une bande d'une image (l'image n'est pas lue)
+    #   Paramètres en entrée :
+    #       image_input : fichier image, ou expression (retournée telle quelle)
+    #       num_band : numéro de la bande, par defaut 1
+    #   Paramétres de retour :
+    #       l'expression RasterExpression
+    """
+
+    if isinstance(image_input, RasterExpression):
+        return image_input
+    return RasterExpression('band', value=(image_input, num_band))
+
+def arithmeticExpression(operator, operand1, operand2):
+    """
+    #   Rôle : Retourne l'expression d'une opération arithmétique ('+', '-', '*', '/', '^'), les constantes sont calculées directement
+    """
+
+    operand1 = constantExpression(operand1)
+    operand2 = constantExpression(operand2)
+    if operand1.isConstant() and operand2.isConstant():
+        with numpy.errstate(all='ignore'):
+            return constantExpression(ARITHMETIC_DICO[operator](numpy.float64(operand1.value), numpy.float64(operand2.value)))
+    return RasterExpression(operator, [operand1, operand2])
+
+def comparisonExpression(operator, operand1, operand2):
+    """
+    #   Rôle : Retourne l'expression d'une comparaison ('<', '<=', '>', '>=', '==', '!=')
+    #          La comparaison d'un masque binaire (0 / 1) à une constante est simplifiée en masque, masque inversé ou constante
+    """
+
+    operand1 = constantExpression(operand1)
+    operand2 = constantExpression(operand2)
+    if operand1.isConstant() and operand2.isConstant():
+        return constantExpression(float(COMPARISON_DICO[operator](operand1.value, operand2.value)))
+    for mask, constant, order in [(operand1, operand2, 1), (operand2, operand1, -1)]:
+        if mask.boolean and not mask.isConstant() and constant.isConstant():
+            values_list = [COMPARISON_DICO[operator](*([value, constant.value][::order])) for value in [0.0, 1.0]]
+            if values_list == [False, True]:
+                return mask
+            if values_list == [True, False]:
+                return notExpression(mask)
+            return constantExpression(float(values_list[0]))
+    return RasterExpression(operator, [operand1, operand2], boolean=True)
+
+def logicalExpression(operator, operand1, operand2):
+    """
+    #   Rôle : Retourne l'expression d'une opération logique ('and', 'or'), une valeur non nulle est vraie
+    """
+
+    operand1 = constantExpression(operand1)
+    operand2 = constantExpression(operand2)
+    for constant, other in [(operand1, operand2), (operand2, operand1)]:
+        if constant.isConstant():
+            is_true = constant.value != 0
+            if (operator == 'and' and not is_true) or (operator == 'or' and is_true):
+                return constantExpression(float(is_true))
+            return other if other.boolean else comparisonExpression('!=', other, 0)
+    return RasterExpression(operator, [operand1, operand2], boolean=True)
+
+def notExpression(operand):
+    """
+    #   Rôle : Retourne l'expression de la négation logique, la double négation est supprimée
+    """
+
+    operand = constantExpression(operand)
+    if operand.isConstant():
+        return constantExpression(float(operand.value == 0))
+    if operand.operator == 'not':
+        return operand.operands_list[0]
+    return RasterExpression('not', [operand], boolean=True)
+
+def whereExpression(condition, value_true, value_false):
+    """
+    #   Rôle : Retourne l'expression conditionnelle (condition ? value_true : value_false)
+    #          Les conditions constantes et les masques (condition ? 1 : 0) sont simplifiés
+    """
+
+    condition = constantExpression(condition)
+    value_true = constantExpression(value_true)
+    value_false = constantExpression(value_false)
+    if condition.isConstant():
+        return value_true if condition.value != 0 else value_false
+    if value_true is value_false:
+        return value_true
+    if value_true.isConstant() and value_false.isConstant():
+        if (value_true.value, value_false.value) == (1.0, 0.0):
+            return condition if condition.boolean else comparisonExpression('!=', condition, 0)
+        if (value_true.value, value_false.value) == (0.0, 1.0):
+            return notExpression(condition)
+    return RasterExpression('where', [condition, value_true, value_false], boolean=(value_true.boolean and value_false.boolean))
+
+def functionExpression(function_name, *operands):
+    """
+    #   Rôle : Retourne l'expression d'une fonction : min et max (nombre quelconque d'opérandes), sum, avg ou une fonction de FUNCTION_DICO (un opérande)
+    """
+
+    operands_list = [constantExpression(operand) for operand in operands]
+    if function_name in ['min', 'max', 'sum', 'avg']:
+        if operands_list == []:
+            raise NameError(bold + red + "functionExpression() : la fonction %s attend au moins un opérande" %(function_name) + endC)
+        result = operands_list[0]
+        for operand in operands_list[1:]:
+            if function_name in ['sum', 'avg']:
+                result = arithmeticExpression('+', result, operand)
+            else :
+                result = RasterExpression(function_name, [result, operand], boolean=(result.boolean and operand.boolean))
+        if function_name == 'avg':
+            result = arithmeticExpression('/', result, len(operands_list))
+        return result
+    if function_name not in FUNCTION_DICO or len(operands_list) != 1:
+        raise NameError(bold + red + "functionExpression() : fonction %s non supportée" %(function_name) + endC)
+    return RasterExpression(function_name, operands_list)
+
+def lookupExpression(operand, values_dico):
+    """
+    #   Rôle : Retourne l'expression de réaffectation de valeurs par table de correspondance : les pixels égaux à une clé de values_dico
+    #          prennent la valeur associée, les autres gardent leur valeur. Equivalent à (x==v1?n1:(x==v2?n2:...x)) calculé en un seul passage
+    #          (recherche dichotomique) quel que soit le nombre de valeurs
+    #   Paramètres en entrée :
+    #       operand : expression (ou fichier image) dont les valeurs sont réaffectées
+    #       values_dico : dictionnaire valeur à réaffecter -> nouvelle valeur
+    #   Paramétres de retour :
+    #       l'expression RasterExpression
+    """
+
+    operand = bandExpression(operand) if not isinstance(operand, (int, float)) else constantExpression(operand)
+    if values_dico == {}:
+        return operand
+    if operand.isConstant():
+        return constantExpression(values_dico.get(operand.value, operand.value))
+    keys_list = sorted(values_dico.keys())
+    keys_array = numpy.array(keys_list, dtype=numpy.float64)
+    values_array = numpy.array([values_dico[key] for key in keys_list], dtype=numpy.float64)
+    return RasterExpression('lookup', [operand], value=(keys_array, values_array))
+
+#########################################################################
+# FONCTIONS D'EVALUATION DES EXPRESSIONS                                #
+#########################################################################
+def getNodeKey(node):
+    # Les noeuds d'une même bande d'image sont confondus (la bande n'est lue qu'une fois), les autres sont identifiés par objet
+    if node.operator == 'band':
+        return ('band',) + tuple(node.value)
+    return id(node)
+
+def getResultSize(node):
+    # Taille en octets par pixel du résultat d'un noeud : rien pour une constante, tableau booléen ou tableau float64
+    if node.operator == 'constant':
+        return 0
+    if node.operator in COMPARISON_DICO or node.operator in LOGICAL_DICO or node.operator == 'not':
+        return 1
+    return 8
+
+def compileRasterExpressions(expressions_list, output_size=8):
+    """
+    #   Rôle : Ordonne les noeuds d'une liste d'expressions pour une évaluation itérative (sans récursion) à mémoire bornée :
+    #          tri topologique dans lequel l'opérande qui demande le plus de mémoire est évalué en premier,
+    #          et nombre de consommateurs de chaque noeud pour libérer un résultat dès que son dernier consommateur est évalué
+    #   Paramètres en entrée :
+    #       expressions_list : liste des expressions RasterExpression (une par sortie)
+    #       output_size : taille en octets d'un pixel de sortie
+    #   Paramétres de retour :
+    #       nodes_list : liste des noeuds dans l'ordre d'évaluation
+    #       operands_list : pour chaque noeud, la liste des index de ses opérandes dans nodes_list
+    #       references_list : pour chaque noeud, le nombre de ses consommateurs (noeuds et sorties)
+    #       outputs_list : pour chaque noeud, la liste des index des sorties dont il est le résultat
+    #       bytes_pixel : mémoire maximale par pixel (en octets) utilisée pendant l'évaluation d'une bande de lignes
+    """
+
+    # Mémoire nécessaire au calcul de chaque noeud (parcours en profondeur itératif)
+    need_dico = {}
+    stack_list = [(expression, False) for expression in expressions_list]
+    while stack_list:
+        node, expanded = stack_list.pop()
+        key = getNodeKey(node)
+        if key in need_dico:
+            continue
+        if not expanded:
+            stack_list.append((node, True))
+            stack_list.extend([(operand, False) for operand in node.operands_list if getNodeKey(operand) not in need_dico])
+            continue
+        need = 0
+        held = 0
+        for operand in sorted(node.operands_list, key=lambda operand: need_dico[getNodeKey(operand)], reverse=True):
+            need = max(need, held + need_dico[getNodeKey(operand)])
+            held += getResultSize(operand)
+        need_dico[key] = max(need, held + getResultSize(node))
+
+    # Ordre d'évaluation : opérandes les plus gourmands d'abord
+    nodes_list = []
+    index_dico = {}
+    stack_list = [(expression, False) for expression in reversed(expressions_list)]
+    while stack_list:
+        node, expanded = stack_list.pop()
+        key = getNodeKey(node)
+        if key in index_dico:
+            continue
+        if not expanded:
+            stack_list.append((node, True))
+            operands_sorted_list = sorted(node.operands_list, key=lambda operand: need_dico[getNodeKey(operand)], reverse=True)
+            stack_list.extend([(operand, False) for operand in reversed(operands_sorted_list) if getNodeKey(operand) not in index_dico])
+            continue
+        index_dico[key] = len(nodes_list)
+        nodes_list.append(node)
+
+    # Consommateurs de chaque noeud
+    operands_list = [[index_dico[getNodeKey(operand)] for operand in node.operands_list] for node in nodes_list]
+    references_list = [0] * len(nodes_list)
+    for indexes_list in operands_list:
+        for index in indexes_list:
+            references_list[index] += 1
+    outputs_list = [[] for node in nodes_list]
+    for index_output, expression in enumerate(expressions_list):
+        index = index_dico[getNodeKey(expression)]
+        outputs_list[index].append(index_output)
+        references_list[index] += 1
+
+    # Simulation de l'évaluation : mémoire maximale par pixel (résultats vivants, résultat en cours et tableaux temporaires)
+    remaining_list = list(references_list)
+    live = 0
+    bytes_pixel = output_size
+    for index, node in enumerate(nodes_list):
+        size = getResultSize(node)
+        temporary = 0 if node.operator == 'constant' else (24 if node.operator == 'lookup' else 8)
+        bytes_pixel = max(bytes_pixel, live + size + temporary)
+        live += size + output_size * len(outputs_list[index])
+        for operand_index in operands_list[index] + [index] * len(outputs_list[index]):
+            remaining_list[operand_index] -= 1
+            if remaining_list[operand_index] == 0:
+                live -= getResultSize(nodes_list[operand_index])
+        bytes_pixel = max(bytes_pixel, live)
+
+    return nodes_list, operands_list, references_list, outputs_list, bytes_pixel
+
+def evaluateNode(node, values_list):
+    """
+    #   Rôle : Calcule avec numpy le résultat d'un noeud (autre qu'une bande) à partir des résultats de ses opérandes
+    #   Paramètres en entrée :
+    #       node : le noeud RasterExpression
+    #       values_list : liste des résultats des opérandes (tableaux numpy ou scalaires)
+    #   Paramétres de retour :
+    #       le tableau numpy résultat (booléen pour une comparaison ou une opération logique) ou un scalaire pour une constante
+    """
+
+    operator = node.operator
+    if operator == 'constant':
+        return node.value
+    if operator in ARITHMETIC_DICO:
+        return ARITHMETIC_DICO[operator](toNumber(values_list[0]), toNumber(values_list[1]))
+    if operator in COMPARISON_DICO:
+        return COMPARISON_DICO[operator](toNumber(values_list[0]), toNumber(values_list[1]))
+    if operator in LOGICAL_DICO:
+        return LOGICAL_DICO[operator](toBoolean(values_list[0]), toBoolean(values_list[1]))
+    if operator == 'not':
+        return numpy.logical_not(toBoolean(values_list[0]))
+    if operator == 'where':
+        if node.boolean:
+            return numpy.where(toBoolean(values_list[0]), values_list[1], values_list[2])
+        return numpy.where(toBoolean(values_list[0]), toNumber(values_list[1]), toNumber(values_list[2]))
+    if operator == 'min':
+        return numpy.minimum(toNumber(values_list[0]), toNumber(values_list[1]))
+    if operator == 'max':
+        return numpy.maximum(toNumber(values_list[0]), toNumber(values_list[1]))
+    if operator == 'lookup':
+        data = toNumber(values_list[0])
+        keys_array, values_array = node.value
+        index_array = numpy.minimum(numpy.searchsorted(keys_array, data), len(keys_array) - 1)
+        return numpy.where(keys_array[index_array] == data, values_array[index_array], data)
+    return FUNCTION_DICO[operator][0](toNumber(values_list[0]))
+
+def getNumexprStrings(nodes_list, operands_list, names_dico):
+    """
+    #   Rôle : Traduit les noeuds, dans l'ordre d'évaluation, en chaines numexpr (sans récursion)
+    #   Paramètres en entrée :
+    #       nodes_list, operands_list : noeuds et opérandes retournés par compileRasterExpressions()
+    #       names_dico : dictionnaire (image, numéro de bande) -> nom de la variable numexpr
+    #   Paramétres de retour :
+    #       la liste des chaines numexpr (forme numérique) des noeuds, None si un noeud n'est pas traduisible : fonction absente de numexpr,
+    #       table de correspondance, constante non finie, expression trop longue ou trop imbriquée pour numexpr
+    """
+
+    numbers_list = []
+    booleans_list = []
+    depths_list = []
+    for node, indexes_list in zip(nodes_list, operands_list):
+        operator = node.operator
+        numbers = [numbers_list[index] for index in indexes_list]
+        booleans = [booleans_list[index] for index in indexes_list]
+        depth = 1 + max([depths_list[index] for index in indexes_list] + [0])
+        number = None
+        boolean = None
+        if operator == 'constant':
+            if not numpy.isfinite(node.value):
+                return None
+            number = repr(float(node.value))
+            boolean = 'True' if node.value != 0 else 'False'
+        elif operator == 'band':
+            number = names_dico[tuple(node.value)]
+        elif operator in LOGICAL_DICO:
+            boolean = '(%s %s %s)' %(booleans[0], NUMEXPR_OPERATOR_DICO[operator], booleans[1])
+        elif operator == 'not':
+            boolean = '(~%s)' %(booleans[0])
+        elif operator in COMPARISON_DICO:
+            boolean = '(%s %s %s)' %(numbers[0], NUMEXPR_OPERATOR_DICO[operator], numbers[1])
+        elif operator in ARITHMETIC_DICO:
+            number = '(%s %s %s)' %(numbers[0], NUMEXPR_OPERATOR_DICO[operator], numbers[1])
+        elif operator == 'where':
+            number = 'where(%s, %s, %s)' %(booleans[0], numbers[1], numbers[2])
+            if node.boolean:
+                boolean = 'where(%s, %s, %s)' %(booleans[0], booleans[1], booleans[2])
+        elif operator == 'min':
+            number = 'where(%s < %s, %s, %s)' %(numbers[0], numbers[1], numbers[0], numbers[1])
+        elif operator == 'max':
+            number = 'where(%s > %s, %s, %s)' %(numbers[0], numbers[1], numbers[0], numbers[1])
+        elif operator in FUNCTION_DICO and FUNCTION_DICO[operator][1] is not None:
+            number = '%s(%s)' %(FUNCTION_DICO[operator][1], numbers[0])
+        else :
+            return None
+
+        # Conversion booléen <-> nombre selon l'utilisation
+        if number is None:
+            number = 'where(%s, 1.0, 0.0)' %(boolean)
+        if boolean is None:
+            boolean = '(%s != 0)' %(number)
+        if depth > NUMEXPR_MAX_DEPTH or len(number) > NUMEXPR_MAX_LENGTH or len(boolean) > NUMEXPR_MAX_LENGTH:
+            return None
+        numbers_list.append(number)
+        booleans_list.append(boolean)
+        depths_list.append(depth)
+
+    return numbers_list
+
+#########################################################################
+# FONCTION parseBandMathExpression()                                    #
+#########################################################################
+# Opérateurs binaires de muParser (tel que configuré par otbcli_BandMath) : opérateur de l'expression raster, priorité
+# (les opérateurs "and" et "or" de l'OTB ont la même priorité et sont évalués de gauche à droite, "^" est associatif à droite)
+PARSER_OPERATORS_DICO = {
+    '||' : ('or', 1),
+    '&&' : ('and', 2),
+    'or' : ('or', 3),
+    'and' : ('and', 3),
+    '==' : ('==', 4),
+    '!=' : ('!=', 4),
+    '<=' : ('<=', 4),
+    '>=' : ('>=', 4),
+    '<' : ('<', 4),
+    '>' : ('>', 4),
+    '+' : ('+', 5),
+    '-' : ('-', 5),
+    '*' : ('*', 6),
+    '/' : ('/', 6),
+    '^' : ('^', 7)}
+
+TOKEN_REGEX = re.compile(r'\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|im(?P<image>\d+)b(?P<band>\d+)(?![\w])|(?P<name>[A-Za-z_]\w*)|(?P<operator>&&|\|\||==|!=|<=|>=|[-+*/^()<>?:,!]))')
+
+def parseBandMathExpression(expression, raster_input_list):
+    """
+    #   Rôle : Traduit une expression otbcli_BandMath en expression raster
+    #          Syntaxe supportée : imXbY, constantes, + - * / ^, comparaisons, and or && || !, condition ? a : b,
+    #          fonctions min, max, sum, avg et celles de FUNCTION_DICO
+    #   Paramètres en entrée :
+    #       expression : expression otbcli_BandMath (les guillemets qui l'entourent sont ignorés)
+    #       raster_input_list : liste des images (im1 est la premiere image de la liste)
+    #   Paramétres de retour :
+    #       l'expression RasterExpression
+    #       une exception NameError est levée si l'expression n'est pas supportée
+    """
+
+    expression = expression.strip().strip('"\'').strip()
+
+    # Découpage en lexèmes
+    tokens_list = []
+    position = 0
+    while position < len(expression):
+        match = TOKEN_REGEX.match(expression, position)
+        if match is None or match.end() == position:
+            if expression[position:].strip() == "":
+                break
+            raise NameError(bold + red + "parseBandMathExpression() : syntaxe non supportée à la position %d de l'expression : %s" %(position, expression) + endC)
+        position = match.end()
+        if match.group('number') is not None:
+            tokens_list.append(('number', float(match.group('number'))))
+        elif match.group('image') is not None:
+            num_image = int(match.group('image'))
+            if num_image < 1 or num_image > len(raster_input_list):
+                raise NameError(bold + red + "parseBandMathExpression() : image im%d absente de la liste des images en entrée" %(num_image) + endC)
+            tokens_list.append(('band', (raster_input_list[num_image - 1], int(match.group('band')))))
+        elif match.group('name') is not None:
+            name = match.group('name')
+            tokens_list.append(('operator', name) if name in ['and', 'or'] else ('name', name))
+        else :
+            tokens_list.append(('operator', match.group('operator')))
+    tokens_list.append(('end', None))
+
+    # Analyse par priorité des opérateurs (priorités muParser de PARSER_OPERATORS_DICO, ?: la plus faible, - unaire et ! moins prioritaires que ^)
+    index_list = [0]
+
+    def peek():
+        return tokens_list[index_list[0]]
+
+    def next_token():
+        token = tokens_list[index_list[0]]
+        index_list[0] += 1
+        return token
+
+    def expect(operator):
+        token = next_token()
+        if token != ('operator', operator):
+            raise NameError(bold + red + "parseBandMathExpression() : '%s' attendu dans l'expression : %s" %(operator, expression) + endC)
+
+    def parseTernary():
+        # Les conditions enchainées (c1 ? v1 : c2 ? v2 : ... v) sont lues itérativement
+        conditions_list = []
+        result = parseBinary(1)
+        while peek() == ('operator', '?'):
+            next_token()
+            value_true = parseTernary()
+            expect(':')
+            conditions_list.append((result, value_true))
+            result = parseBinary(1)
+        for condition, value_true in reversed(conditions_list):
+            result = whereExpression(condition, value_true, result)
+        return result
+
+    def parseBinary(min_precedence):
+        result = parseUnary()
+        while peek()[0] == 'operator' and peek()[1] in PARSER_OPERATORS_DICO and PARSER_OPERATORS_DICO[peek()[1]][1] >= min_precedence:
+            operator, precedence = PARSER_OPERATORS_DICO[next_token()[1]]
+            operand = parseBinary(precedence if operator == '^' else precedence + 1)
+            if operator in LOGICAL_DICO:
+                result = logicalExpression(operator, result, operand)
+            elif operator in COMPARISON_DICO:
+                result = comparisonExpression(operator, result, operand)
+            else :
+                result = arithmeticExpression(operator, result, operand)
+        return result
+
+    def parseUnary():
+        token = peek()
+        if token == ('operator', '-'):
+            next_token()
+            # -a^2 = -(a^2)
+            return arithmeticExpression('-', 0, parseBinary(PARSER_OPERATORS_DICO['^'][1]))
+        if token == ('operator', '+'):
+            next_token()
+            return parseUnary()
+        if token == ('operator', '!'):
+            next_token()
+            return notExpression(parseBinary(PARSER_OPERATORS_DICO['^'][1]))
+        return parseAtom()
+
+    def parseAtom():
+        token = next_token()
+        if token[0] == 'number':
+            return constantExpression(token[1])
+        if token[0] == 'band':
+            return bandExpression(token[1][0], token[1][1])
+        if token == ('operator', '('):
+            result = parseTernary()
+            expect(')')
+            return result
+        if token[0] == 'name':
+            expect('(')
+            operands_list = [parseTernary()]
+            while peek() == ('operator', ','):
+                next_token()
+                operands_list.append(parseTernary())
+            expect(')')
+            return functionExpression(token[1], *operands_list)
+        raise NameError(bold + red + "parseBandMathExpression() : lexème inattendu %s dans l'expression : %s" %(str(token[1]), expression) + endC)
+
+    result = parseTernary()
+    if peek()[0] != 'end':
+        raise NameError(bold + red + "parseBandMathExpression() : fin d'expression attendue, lexème %s dans l'expression : %s" %(str(peek()[1]), expression) + endC)
+
+    return result
+
+#########################################################################
+# FONCTION writeRasterExpressions()                                     #
+#########################################################################
+def writeRasterExpressions(expressions_list, image_output, codage="float", format_raster="", no_data_value=None, nb_threads=0, max_pixels_strip=4194304, ram_max=0, image_reference=""):
+    """
+    #   Rôle : Evalue une liste d'expressions raster et écrit le résultat dans une image (une bande par expression) ou dans une image par expression
+    #          Les images lues sont parcourues une seule fois par bandes de lignes alignées sur les blocs GDAL, calculées en parallele
+    #          et écrites dans l'ordre ; la géométrie et la projection sont celles de l'image de référence
+    #          L'évaluation est itérative : chaque bande d'entrée est lue juste avant sa premiere utilisation et chaque résultat intermediaire
+    #          est libéré après sa derniere utilisation, la hauteur des bandes de lignes est calculée pour que la mémoire utilisée
+    #          par l'ensemble des threads ne dépasse pas ram_max
+    #   Paramètres en entrée :
+    #       expressions_list : liste des expressions RasterExpression (ou valeurs constantes)
+    #       image_output : fichier image de sortie, ou liste de fichiers images de sortie à une bande (un par expression)
+    #       codage : type de codage du fichier de sortie (uint8, uint16, int16, uint32, int32, float, double), par defaut float
+    #       format_raster : format de l'image de sortie, par defaut "" (format déduit de l'extension du fichier de sortie)
+    #       no_data_value : valeur nodata de l'image de sortie, par defaut None (pas de valeur nodata)
+    #       nb_threads : nombre de threads de calcul, par defaut 0 (nombre de CPU)
+    #       max_pixels_strip : nombre maximum de pixels d'une bande de lignes, par defaut 4194304
+    #       ram_max : mémoire maximale utilisée par le calcul en Mo, par defaut 0 (RAM_MAX_DEFAULT)
+    #       image_reference : image de référence de la géométrie et de la projection de l'image de sortie (premiere image de la liste -il de otbcli_BandMath),
+    #                         par defaut "" (premiere image lue par les expressions) ; une expression désigne la premiere image qu'elle lit
+    #   Paramétres de retour :
+    #       N.A.
+    """
+
+    # Import local : Lib_raster importe Lib_bandmath
+    from Lib_raster import getStripsImage, processStripsImage, getFormatRasterFromExtension
+
+    if codage not in CODAGE_DICO:
+        raise NameError(bold + red + "writeRasterExpressions() : codage %s non supporté %s" %(codage, str(list(CODAGE_DICO.keys()))) + endC)
+    gdal_type, numpy_type = CODAGE_DICO[codage]
+
+    expressions_list = [constantExpression(expression) for expression in expressions_list]
+    if isinstance(image_output, (list, tuple)):
+        images_output_list = list(image_output)
+        if len(images_output_list) != len(expressions_list):
+            raise NameError(bold + red + "writeRasterExpressions() : %d images de sortie pour %d expressions" %(len(images_output_list), len(expressions_list)) + endC)
+    else :
+        images_output_list = [image_output]
+    bands_list = []
+    for expression in expressions_list:
+        for band in expression.getBands():
+            if band not in bands_list:
+                bands_list.append(band)
+    if bands_list == []:
+        raise NameError(bold + red + "writeRasterExpressions() : aucune image en entrée pour l'image " + str(image_output) + endC)
+
+    # Géometrie de l'image de reference et controle des images lues
+    if isinstance(image_reference, RasterExpression):
+        image_reference = image_reference.getBands()[0][0] if image_reference.getBands() != [] else ""
+    if image_reference == "":
+        image_reference = bands_list[0][0]
+    dataset = gdal.Open(image_reference, GA_ReadOnly)
+    if dataset is None:
+        raise NameError(bold + red + "writeRasterExpressions() : impossible d'ouvrir l'image " + image_reference + endC)
+    cols = dataset.RasterXSize
+    rows = dataset.RasterYSize
+    geotransform = dataset.GetGeoTransform()
+    projection = dataset.GetProjection()
+    dataset = None
+    for image_input in set([band[0] for band in bands_list]):
+        dataset = gdal.Open(image_input, GA_ReadOnly)
+        if dataset is None:
+            raise NameError(bold + red + "writeRasterExpressions() : impossible d'ouvrir l'image " + image_input + endC)
+        if (dataset.RasterXSize, dataset.RasterYSize) != (cols, rows):
+            raise NameError(bold + red + "writeRasterExpressions() : l'image %s (%dx%d) n'a pas la taille de l'image %s (%dx%d)" %(image_input, dataset.RasterXSize, dataset.RasterYSize, image_reference, cols, rows) + endC)
+        if image_input == bands_list[0][0]:
+            block_y = dataset.GetRasterBand(bands_list[0][1]).GetBlockSize()[1]
+        dataset = None
+
+    # Programme d'évaluation : noeuds ordonnés, opérandes, nombre de consommateurs et mémoire par pixel
+    output_size = numpy.dtype(numpy_type).itemsize
+    nodes_list, operands_list, references_list, outputs_list, bytes_pixel = compileRasterExpressions(expressions_list, output_size)
+
+    # Expressions numexpr (si numexpr est installé et que toutes les expressions y sont traduisibles), toutes les bandes sont alors lues
+    numexpr_list = None
+    if numexpr is not None:
+        names_dico = {}
+        for index_band, band in enumerate(bands_list):
+            names_dico[band] = 'b%d' %(index_band)
+        numbers_list = getNumexprStrings(nodes_list, operands_list, names_dico)
+        if numbers_list is not None:
+            numexpr_list = [None] * len(expressions_list)
+            for index, indexes_output_list in enumerate(outputs_list):
+                for index_output in indexes_output_list:
+                    numexpr_list[index_output] = numbers_list[index]
+            bytes_pixel = 8 * len(bands_list) + 8 + output_size * len(expressions_list)
+
+    # Hauteur des bandes de lignes bornée par la mémoire disponible pour chaque thread
+    if nb_threads <= 0:
+        nb_threads = getNumberCPU()
+    if ram_max <= 0:
+        ram_max = RAM_MAX_DEFAULT
+    max_pixels_strip = max(1, min(max_pixels_strip, int(ram_max) * 1024 * 1024 // (bytes_pixel * nb_threads)))
+    strips_list = getStripsImage(cols, rows, block_y, max_pixels_strip)
+
+    # Création des images de sortie : (dataset, numéro de bande) de chaque expression
+    datasets_output_list = []
+    nb_bands_output = len(expressions_list) if len(images_output_list) == 1 else 1
+    for image in images_output_list:
+        if os.path.exists(image):
+            os.remove(image)
+        driver = gdal.GetDriverByName(format_raster if format_raster != "" else getFormatRasterFromExtension(image))
+        dataset_output = driver.Create(image, cols, rows, nb_bands_output, gdal_type)
+        if dataset_output is None:
+            raise NameError(bold + red + "writeRasterExpressions() : impossible de créer l'image " + image + endC)
+        dataset_output.SetGeoTransform(geotransform)
+        dataset_output.SetProjection(projection)
+        if no_data_value is not None:
+            for num_band in range(1, nb_bands_output + 1):
+                dataset_output.GetRasterBand(num_band).SetNoDataValue(no_data_value)
+        datasets_output_list.append(dataset_output)
+    if len(datasets_output_list) == 1:
+        bands_output_list = [(datasets_output_list[0], index_expression + 1) for index_expression in range(len(expressions_list))]
+    else :
+        bands_output_list = [(dataset_output, 1) for dataset_output in datasets_output_list]
+
+    if numpy.issubdtype(numpy_type, numpy.integer):
+        type_info = numpy.iinfo(numpy_type)
+
+    def convertResult(result, nb_rows):
+        # Conversion au codage de sortie (bornage puis troncature comme otbcli_BandMath)
+        result = numpy.broadcast_to(toNumber(result), (nb_rows, cols))
+        if numpy.issubdtype(numpy_type, numpy.integer):
+            result = numpy.clip(numpy.nan_to_num(result), type_info.min, type_info.max)
+        return result.astype(numpy_type)
+
+    def computeStrip(strip):
+        # Chaque thread ouvre ses propres datasets (les datasets GDAL ne sont pas partageables entre threads)
+        yoff, nb_rows = strip
+        datasets_dico = {}
+        for image_input in set([band[0] for band in bands_list]):
+            datasets_dico[image_input] = gdal.Open(image_input, GA_ReadOnly)
+
+        results_list = [None] * len(expressions_list)
+        with numpy.errstate(all='ignore'):
+            if numexpr_list is not None:
+                local_dico = {}
+                for band in bands_list:
+                    local_dico[names_dico[band]] = datasets_dico[band[0]].GetRasterBand(band[1]).ReadAsArray(0, yoff, cols, nb_rows).astype(numpy.float64)
+                for index_output, numexpr_string in enumerate(numexpr_list):
+                    results_list[index_output] = convertResult(numexpr.evaluate(numexpr_string, local_dict=local_dico), nb_rows)
+                local_dico = None
+            else :
+                # Evaluation dans l'ordre du programme, un résultat est libéré quand son dernier consommateur est évalué
+                values_list = [None] * len(nodes_list)
+                remaining_list = list(references_list)
+                for index, node in enumerate(nodes_list):
+                    if node.operator == 'band':
+                        image_input, num_band = node.value
+                        values_list[index] = datasets_dico[image_input].GetRasterBand(num_band).ReadAsArray(0, yoff, cols, nb_rows).astype(numpy.float64)
+                    else :
+                        values_list[index] = evaluateNode(node, [values_list[operand_index] for operand_index in operands_list[index]])
+                    for index_output in outputs_list[index]:
+                        results_list[index_output] = convertResult(values_list[index], nb_rows)
+                    for operand_index in operands_list[index] + [index] * len(outputs_list[index]):
+                        remaining_list[operand_index] -= 1
+                        if remaining_list[operand_index] == 0:
+                            values_list[operand_index] = None
+                values_list = None
+        datasets_dico = None
+        return yoff, results_list
+
+    def writeStrip(result):
+        yoff, results_list = result
+        for (dataset_output, num_band), data in zip(bands_output_list, results_list):
+            dataset_output.GetRasterBand(num_band).WriteArray(data, 0, yoff)
+        return
+
+    # Calcul des bandes de lignes en parallele, écriture dans l'ordre des lignes
+    nb_threads = processStripsImage(strips_list, computeStrip, writeStrip, nb_threads)
+
+    for dataset_output in datasets_output_list:
+        dataset_output.FlushCache()
+    dataset_output = None
+    datasets_output_list = None
+    bands_output_list = None
+
+    if debug >= 3:
+        print(cyan + "writeRasterExpressions() : " + endC + str(image_output) + " : " + str(len(expressions_list)) + " bande(s) calculée(s) a partir de " + str(len(bands_list)) + " bande(s) en entrée, " + str(len(nodes_list)) + " noeud(s), " + str(len(strips_list)) + " bandes de lignes sur " + str(nb_threads) + " threads" + (" (numexpr)" if numexpr_list is not None else "") + endC)
+
+    return
@@ -17,7 +17,9 @@
 
 # IMPORTS  DIVERS
 import os,sys,glob,shutil,time
+from osgeo import gdal
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+from Lib_bandmath import CODAGE_DICO, parseBandMathExpression, writeRasterExpressions
 from Lib_grass import convertRGBtoHIS
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
@@ -76,17 +78,15 @@ def createMNS(image_input, image_mnt_input, image_elevation, image_mns_output, c
     return
 
 #########################################################################
-# FONCTION createNDVI()                                                 #
+# FONCTION getExpressionNDVI()                                          #
 #########################################################################
-def createNDVI(image_input, image_NDVI_output, channel_order, codage="float"):
+def getExpressionNDVI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier NDVI (végétation) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NDVI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NDVI_output : fichier NDVI de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortie
-    # Source : source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -101,10 +101,29 @@ def createNDVI(image_input, image_NDVI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or NIR == ""):
-        raise NameError(cyan + "createNDVI() : " + bold + red + "NDVI needs Red and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNDVI() : " + bold + red + "NDVI needs Red and NIR channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "(" + NIR + "==" + Red + ")?(" + Red + "== 0)?0:" + str(PRECISION) + ":" + "(" + NIR + "-" + Red + ")/(" + NIR + "+" + Red + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNDVI()                                                 #
+#########################################################################
+def createNDVI(image_input, image_NDVI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier NDVI (végétation) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NDVI_output : fichier NDVI de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortie
+    # Source : source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    """
 
     # Creer l'expression
-    expression = "\"(" + NIR + "==" + Red + ")?(" + Red + "== 0)?0:" + str(PRECISION) + ":" + "(" + NIR + "-" + Red + ")/(" + NIR + "+" + Red + "+" + str(PRECISION) + ")\""
+    expression = "\"" + getExpressionNDVI(channel_order) + "\""
 
     # Bandmath pour creer l'indice NDVI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NDVI_output,codage,expression)
@@ -120,16 +139,15 @@ def createNDVI(image_input, image_NDVI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createNDVIMod                                                #
+# FONCTION getExpressionNDVIMod()                                       #
 #########################################################################
-def createNDVIMod(image_input, image_NDVIMod_output, channel_order, codage="float"):
+def getExpressionNDVIMod(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer l'indice NDVIMod (végétation) sur une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NDVIMod
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NDVIMod_output : fichier NDVIMod de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -148,10 +166,28 @@ def createNDVIMod(image_input, image_NDVIMod_output, channel_order, codage="floa
         num_channel = channel_order.index("RE")+1
         RedEdge = "im1b"+str(num_channel)
     if (Red == "" or NIR == "" or RedEdge == ""):
-        raise NameError(cyan + "createNDVIMod() : " + bold + red + "NDVIMod needs Red, NIR and RE channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNDVIMod() : " + bold + red + "NDVIMod needs Red, NIR and RE channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"(" + NIR + "== 0) and (" + Red + "== 0) and (" + RedEdge  + "== 0)?0:(" + NIR + "-" + Red + "+" + RedEdge + ") == 0 and (" + NIR + "!= 0 or " + Red + "!= 0 or "+ RedEdge + "!= 0 )?" + str(PRECISION) + ":" + "(" + NIR + "-" + Red + "+" + RedEdge + ")/(" + NIR + "+" + Red + "+" + RedEdge + "+" + str(PRECISION) + ")\""
+    expression = "(" + NIR + "== 0) and (" + Red + "== 0) and (" + RedEdge  + "== 0)?0:(" + NIR + "-" + Red + "+" + RedEdge + ") == 0 and (" + NIR + "!= 0 or " + Red + "!= 0 or "+ RedEdge + "!= 0 )?" + str(PRECISION) + ":" + "(" + NIR + "-" + Red + "+" + RedEdge + ")/(" + NIR + "+" + Red + "+" + RedEdge + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNDVIMod                                                #
+#########################################################################
+def createNDVIMod(image_input, image_NDVIMod_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer l'indice NDVIMod (végétation) sur une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NDVIMod_output : fichier NDVIMod de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionNDVIMod(channel_order) + "\""
 
     # Bandmath pour creer l'indice NDVIMod
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NDVIMod_output,codage,expression)
@@ -167,16 +203,15 @@ def createNDVIMod(image_input, image_NDVIMod_output, channel_order, codage="floa
     return
 
 #########################################################################
-# FONCTION createTNDVI()                                                #
+# FONCTION getExpressionTNDVI()                                         #
 #########################################################################
-def createTNDVI(image_input, image_TNDVI_output, channel_order, codage="float"):
+def getExpressionTNDVI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier TNDVI (végétation) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice TNDVI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_TNDVI_output : fichier TNDVI de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortie
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -191,10 +226,28 @@ def createTNDVI(image_input, image_TNDVI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or NIR == ""):
-        raise NameError(cyan + "createTNDVI() : " + bold + red + "TNDVI needs Red and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionTNDVI() : " + bold + red + "TNDVI needs Red and NIR channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "(" +  NIR + " == 0) and (" + Red + " == 0) ? 0 : " + "sqrt((" + NIR + "-" + Red + ")/(" + NIR + "+" + Red + "+" + str(PRECISION) + ")+0.5)"
+
+    return expression
+
+#########################################################################
+# FONCTION createTNDVI()                                                #
+#########################################################################
+def createTNDVI(image_input, image_TNDVI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier TNDVI (végétation) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_TNDVI_output : fichier TNDVI de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortie
+    """
 
     # Creer l'expression
-    expression = "\"(" +  NIR + " == 0) and (" + Red + " == 0) ? 0 : " + "sqrt((" + NIR + "-" + Red + ")/(" + NIR + "+" + Red + "+" + str(PRECISION) + ")+0.5)\""
+    expression = "\"" + getExpressionTNDVI(channel_order) + "\""
 
     # Bandmath pour creer l'indice TNDVI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_TNDVI_output,codage,expression)
@@ -210,16 +263,15 @@ def createTNDVI(image_input, image_TNDVI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createPNDVI()                                                #
+# FONCTION getExpressionPNDVI()                                         #
 #########################################################################
-def createPNDVI(image_input, image_PNDVI_output, channel_order, codage="float"):
+def getExpressionPNDVI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier PNDVI (végétation) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice PNDVI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_PNDVI_output : fichier PNDVI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -242,10 +294,28 @@ def createPNDVI(image_input, image_PNDVI_output, channel_order, codage="float"):
         num_channel = channel_order.index("Blue")+1
         Blue = "im1b"+str(num_channel)
     if (NIR == "" or Red == "" or Green == "" or Blue == ""):
-        raise NameError(cyan + "createPNDVI() : " + bold + red + "PNDVI needs NIR, Red, Green and Blue channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionPNDVI() : " + bold + red + "PNDVI needs NIR, Red, Green and Blue channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"(" + NIR + "== 0) and (" + Green + "== 0) and (" + Red + "== 0) and (" + Blue  + "== 0)?0:(" + NIR + "-" + Green + "-" + Red + "-" + Blue + ") == 0 and (" + NIR + "!= 0 or " + Green + "!= 0 or "+ Red + "!= 0 or " + Blue + "!= 0 )?" + str(PRECISION) + ":" + "(" + NIR + "-" + Green + "-" + Red + "-" + Blue + ")/(" + NIR + "+" + Green + "+" + Red + "+" + Blue + "+" + str(PRECISION) + ")\""
+    expression = "(" + NIR + "== 0) and (" + Green + "== 0) and (" + Red + "== 0) and (" + Blue  + "== 0)?0:(" + NIR + "-" + Green + "-" + Red + "-" + Blue + ") == 0 and (" + NIR + "!= 0 or " + Green + "!= 0 or "+ Red + "!= 0 or " + Blue + "!= 0 )?" + str(PRECISION) + ":" + "(" + NIR + "-" + Green + "-" + Red + "-" + Blue + ")/(" + NIR + "+" + Green + "+" + Red + "+" + Blue + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createPNDVI()                                                #
+#########################################################################
+def createPNDVI(image_input, image_PNDVI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier PNDVI (végétation) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_PNDVI_output : fichier PNDVI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionPNDVI(channel_order) + "\""
 
     # Bandmath pour creer l'indice PNDVI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_PNDVI_output,codage,expression)
@@ -261,17 +331,15 @@ def createPNDVI(image_input, image_PNDVI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createNDWI()                                                 #
+# FONCTION getExpressionNDWI()                                          #
 #########################################################################
-def createNDWI(image_input, image_NDWI_output, channel_order, codage="float"):
+def getExpressionNDWI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier NDWI (eau) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NDWI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NDWI_output : fichier NDWI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
-    # Source : https://hal.archives-ouvertes.fr/halshs-01070803/document
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -286,10 +354,29 @@ def createNDWI(image_input, image_NDWI_output, channel_order, codage="float"):
         num_channel = channel_order.index("MIR")+1
         MIR = "im1b"+str(num_channel)
     if (NIR == "" or MIR == ""):
-        raise NameError(cyan + "createNDWI() : " + bold + red + "NDWI needs NIR and MIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNDWI() : " + bold + red + "NDWI needs NIR and MIR channels to be computed"+ endC)
 
     # Creer l'expression
-    expression =  "\"(" + NIR + "==" + MIR + ")?(" + NIR + "== 0)?0:" + str(PRECISION) + ":" + "(" + NIR + "-" + MIR + ")/(" + NIR + "+" + MIR + "+" + str(PRECISION) + ")\""
+    expression =  "(" + NIR + "==" + MIR + ")?(" + NIR + "== 0)?0:" + str(PRECISION) + ":" + "(" + NIR + "-" + MIR + ")/(" + NIR + "+" + MIR + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNDWI()                                                 #
+#########################################################################
+def createNDWI(image_input, image_NDWI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier NDWI (eau) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NDWI_output : fichier NDWI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    # Source : https://hal.archives-ouvertes.fr/halshs-01070803/document
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionNDWI(channel_order) + "\""
 
     # Bandmath pour creer l'indice NDWI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NDWI_output,codage,expression)
@@ -305,17 +392,15 @@ def createNDWI(image_input, image_NDWI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createNDWI2()                                                #
+# FONCTION getExpressionNDWI2()                                         #
 #########################################################################
-def createNDWI2(image_input, image_NDWI2_output, channel_order, codage="float"):
+def getExpressionNDWI2(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier NDWI2 (eau) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NDWI2
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NDWI2_output : fichier NDWI2 de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
-    # Source : https://hal.archives-ouvertes.fr/halshs-01070803/document
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -330,10 +415,29 @@ def createNDWI2(image_input, image_NDWI2_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Green == "" or NIR == ""):
-        raise NameError(cyan + "createNDWI2() : " + bold + red + "NDWI2 needs Green and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNDWI2() : " + bold + red + "NDWI2 needs Green and NIR channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"(" + NIR + "==" + Green + ")?(" + NIR + "== 0)?0:" + str(PRECISION) + ":" + "(" + Green + "-" + NIR + ")/(" + Green + "+" + NIR + "+" + str(PRECISION) + ")\""
+    expression = "(" + NIR + "==" + Green + ")?(" + NIR + "== 0)?0:" + str(PRECISION) + ":" + "(" + Green + "-" + NIR + ")/(" + Green + "+" + NIR + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNDWI2()                                                #
+#########################################################################
+def createNDWI2(image_input, image_NDWI2_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier NDWI2 (eau) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NDWI2_output : fichier NDWI2 de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    # Source : https://hal.archives-ouvertes.fr/halshs-01070803/document
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionNDWI2(channel_order) + "\""
 
     # Bandmath pour creer l'indice NDWI2
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NDWI2_output,codage,expression)
@@ -349,16 +453,15 @@ def createNDWI2(image_input, image_NDWI2_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createNDWI2Mod()                                             #
+# FONCTION getExpressionNDWI2Mod()                                      #
 #########################################################################
-def createNDWI2Mod(image_input, image_NDWI2Mod_output, channel_order, codage="float"):
+def getExpressionNDWI2Mod(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier NDWI2Mod (eau) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NDWI2Mod
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NDWI2Mod_output : fichier NDWI2Mod de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -377,10 +480,28 @@ def createNDWI2Mod(image_input, image_NDWI2Mod_output, channel_order, codage="fl
         num_channel = channel_order.index("RE")+1
         RedEdge = "im1b"+str(num_channel)
     if (Green == "" or NIR == "" or RedEdge == ""):
-        raise NameError(cyan + "createNDWI2Mod() : " + bold + red + "NDWI2Mod needs Green, NIR and RE channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNDWI2Mod() : " + bold + red + "NDWI2Mod needs Green, NIR and RE channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"(" + NIR + "== 0) and (" + Green + "== 0) and (" + RedEdge + "== 0)?0:(" + Green + "-" + NIR + "+" + RedEdge + ") == 0 and (" + Green + "!= 0 or " + NIR + "!= 0 or "+ RedEdge + "!= 0)?" + str(PRECISION) + ":" + "(" + Green + "-" + NIR + "+" + RedEdge + ")/(" + Green + "+" + NIR +  "+" + RedEdge + "+" + str(PRECISION) + ")\""
+    expression = "(" + NIR + "== 0) and (" + Green + "== 0) and (" + RedEdge + "== 0)?0:(" + Green + "-" + NIR + "+" + RedEdge + ") == 0 and (" + Green + "!= 0 or " + NIR + "!= 0 or "+ RedEdge + "!= 0)?" + str(PRECISION) + ":" + "(" + Green + "-" + NIR + "+" + RedEdge + ")/(" + Green + "+" + NIR +  "+" + RedEdge + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNDWI2Mod()                                             #
+#########################################################################
+def createNDWI2Mod(image_input, image_NDWI2Mod_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier NDWI2Mod (eau) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NDWI2Mod_output : fichier NDWI2Mod de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionNDWI2Mod(channel_order) + "\""
 
     # Bandmath pour creer l'indice NDWI2Mod
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NDWI2Mod_output,codage,expression)
@@ -396,17 +517,15 @@ def createNDWI2Mod(image_input, image_NDWI2Mod_output, channel_order, codage="fl
     return
 
 #########################################################################
-# FONCTION createMNDWI()                                                #
+# FONCTION getExpressionMNDWI()                                         #
 #########################################################################
-def createMNDWI(image_input, image_MNDWI_output, channel_order, codage="float"):
+def getExpressionMNDWI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier MNDWI (eau) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice MNDWI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_MNDWI_output : fichier MNDWI de sortie (une bande)
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","MIR"])
-    #       codage : type de codage du fichier de sortie
-    #   Source : https://www.sciencedirect.com/science/article/pii/S0303243419307573?ref=pdf_download&fr=RR-2&rr=7bef09124b03034c
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -424,10 +543,29 @@ def createMNDWI(image_input, image_MNDWI_output, channel_order, codage="float"):
         num_channel = channel_order.index("SWIR1")+1
         MIR_SWIR1 = "im1b"+str(num_channel)
     if (Green == "" or MIR_SWIR1 == ""):
-        raise NameError(cyan + "createMNDWI() : " + bold + red + "MNDWI needs Green and MIR or (SWIR1 from Sentinel2) channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionMNDWI() : " + bold + red + "MNDWI needs Green and MIR or (SWIR1 from Sentinel2) channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "(" + MIR_SWIR1 + "==" + Green + ")?(" + MIR_SWIR1 + "== 0)?0:" + str(PRECISION) + ":" + "(" + Green + "-" + MIR_SWIR1 + ")/(" + Green + "+" + MIR_SWIR1 + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createMNDWI()                                                #
+#########################################################################
+def createMNDWI(image_input, image_MNDWI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier MNDWI (eau) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_MNDWI_output : fichier MNDWI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","MIR"])
+    #       codage : type de codage du fichier de sortie
+    #   Source : https://www.sciencedirect.com/science/article/pii/S0303243419307573?ref=pdf_download&fr=RR-2&rr=7bef09124b03034c
+    """
 
     # Creer l'expression
-    expression = "\"(" + MIR_SWIR1 + "==" + Green + ")?(" + MIR_SWIR1 + "== 0)?0:" + str(PRECISION) + ":" + "(" + Green + "-" + MIR_SWIR1 + ")/(" + Green + "+" + MIR_SWIR1 + "+" + str(PRECISION) + ")\""
+    expression = "\"" + getExpressionMNDWI(channel_order) + "\""
 
     # Bandmath pour creer l'indice MNDWI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_MNDWI_output,codage,expression)
@@ -443,18 +581,15 @@ def createMNDWI(image_input, image_MNDWI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createNDMI()                                                 #
+# FONCTION getExpressionNDMI()                                          #
 #########################################################################
-def createNDMI(image_input, image_NDMI_output, channel_order, codage="float"):
+def getExpressionNDMI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier NDMI à partir d'une image ortho multi bande
-    #          L'indice d'humidité par différence normalisé (NDMI) est sensible aux niveaux d'humidité dans la végétation.
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NDMI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NDMI_output : fichier NDMI de sortie (une bande)
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR","SWIR1"])
-    #       codage : type de codage du fichier de sortie
-    # Source : https://pro.arcgis.com/fr/pro-app/latest/help/data/imagery/indices-gallery.htm#:~:text=NDMI,les%20zones%20sujettes%20aux%20incendies.
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -469,10 +604,30 @@ def createNDMI(image_input, image_NDMI_output, channel_order, codage="float"):
         num_channel = channel_order.index("SWIR1")+1
         SWIR1 = "im1b"+str(num_channel)
     if (NIR == "" or SWIR1 == ""):
-        raise NameError(cyan + "createNDMI() : " + bold + red + "NDMI needs NIR and SWIR1 channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNDMI() : " + bold + red + "NDMI needs NIR and SWIR1 channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"(" + SWIR1 + "==" + NIR + ")?(" + SWIR1 + "== 0)?0:" + str(PRECISION) + ":" + "(" + NIR + "-" + SWIR1 + ")/(" + NIR + "+" + SWIR1 + "+" + str(PRECISION) + ")\""
+    expression = "(" + SWIR1 + "==" + NIR + ")?(" + SWIR1 + "== 0)?0:" + str(PRECISION) + ":" + "(" + NIR + "-" + SWIR1 + ")/(" + NIR + "+" + SWIR1 + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNDMI()                                                 #
+#########################################################################
+def createNDMI(image_input, image_NDMI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier NDMI à partir d'une image ortho multi bande
+    #          L'indice d'humidité par différence normalisé (NDMI) est sensible aux niveaux d'humidité dans la végétation.
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NDMI_output : fichier NDMI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR","SWIR1"])
+    #       codage : type de codage du fichier de sortie
+    # Source : https://pro.arcgis.com/fr/pro-app/latest/help/data/imagery/indices-gallery.htm#:~:text=NDMI,les%20zones%20sujettes%20aux%20incendies.
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionNDMI(channel_order) + "\""
 
     # Bandmath pour creer l'indice NDMI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NDMI_output,codage,expression)
@@ -488,16 +643,15 @@ def createNDMI(image_input, image_NDMI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createISU()                                                  #
+# FONCTION getExpressionISU()                                           #
 #########################################################################
-def createISU(image_input, image_ISU_output, channel_order, codage="float"):
+def getExpressionISU(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier ISU (bâti) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice ISU
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_ISU_output : fichier ISU de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortieMIR
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -512,10 +666,28 @@ def createISU(image_input, image_ISU_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or NIR == ""):
-        raise NameError(cyan + "createISU() : " + bold + red + "ISU needs Red and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionISU() : " + bold + red + "ISU needs Red and NIR channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"" + Red + " == 0 ? 0 : " + "75*(" + Red + "/" + NIR + "+" + str(PRECISION) + ")\""
+    expression = Red + " == 0 ? 0 : " + "75*(" + Red + "/" + NIR + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createISU()                                                  #
+#########################################################################
+def createISU(image_input, image_ISU_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier ISU (bâti) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_ISU_output : fichier ISU de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortieMIR
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionISU(channel_order) + "\""
 
     # Bandmath pour creer l'indice ISU
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_ISU_output,codage,expression)
@@ -531,17 +703,15 @@ def createISU(image_input, image_ISU_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createGEMI()                                                 #
+# FONCTION getExpressionGEMI()                                          #
 #########################################################################
-def createGEMI(image_input, image_GEMI_output, channel_order, codage="float"):
+def getExpressionGEMI(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer le fichier GEMI (Végétation) sur une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice GEMI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_GEMI_output : fichier GEMI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
-    # Source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -556,12 +726,31 @@ def createGEMI(image_input, image_GEMI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or NIR == ""):
-        raise NameError(cyan + "createGEMI() : " + bold + red + "GEMI needs Red and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionGEMI() : " + bold + red + "GEMI needs Red and NIR channels to be computed"+ endC)
 
     # Creer l'expression
     # source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
     eta = "(2*((" + NIR + "*" + NIR + ")-(" + Red + "*" + Red + ")) + 1.5 *" + NIR + " + 0.5 *" + Red + ")/(" + NIR + "+" + Red + " + 0.5)"
-    expression = "\"(" + NIR + " == 0) and (" + Red + " == 0) ? 0 : " + eta + "*(1-  0.25 *" + eta + ")-((" + Red + " - 0.125)/(1-" + Red + "))\""
+    expression = "(" + NIR + " == 0) and (" + Red + " == 0) ? 0 : " + eta + "*(1-  0.25 *" + eta + ")-((" + Red + " - 0.125)/(1-" + Red + "))"
+
+    return expression
+
+#########################################################################
+# FONCTION createGEMI()                                                 #
+#########################################################################
+def createGEMI(image_input, image_GEMI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer le fichier GEMI (Végétation) sur une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_GEMI_output : fichier GEMI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    # Source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionGEMI(channel_order) + "\""
 
     # Bandmath pour creer l'indice GEMI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_GEMI_output,codage,expression)
@@ -577,16 +766,15 @@ def createGEMI(image_input, image_GEMI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createBSI()                                                  #
+# FONCTION getExpressionBSI()                                           #
 #########################################################################
-def createBSI(image_input, image_BSI_output, channel_order, codage="float"):
+def getExpressionBSI(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer le fichier BSI (Végétation) sur une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice BSI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_BSI_output : fichier BSI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -609,10 +797,28 @@ def createBSI(image_input, image_BSI_output, channel_order, codage="float"):
         num_channel = channel_order.index("SWIR1")+1
         SWIR1 = "im1b"+str(num_channel)
     if (Blue == "" or Red == "" or NIR == "" or SWIR1 == ""):
-        raise NameError(cyan + "createBSI() : " + bold + red + "BSI needs Blue, Red NIR and SWIR1 channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionBSI() : " + bold + red + "BSI needs Blue, Red NIR and SWIR1 channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "(" + Red + " == 0) and (" + Blue + " == 0) and (" + NIR + " == 0) and (" + SWIR1 + " == 0) ? 0 : " + "((" + SWIR1 + " + " + Red + ") - (" + NIR + " + " + Blue + "))/((" + SWIR1 + " + " + Red + ") + (" + NIR + " + " + Blue + ") +" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createBSI()                                                  #
+#########################################################################
+def createBSI(image_input, image_BSI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer le fichier BSI (Végétation) sur une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_BSI_output : fichier BSI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
 
     # Creer l'expression
-    expression = "\"(" + Red + " == 0) and (" + Blue + " == 0) and (" + NIR + " == 0) and (" + SWIR1 + " == 0) ? 0 : " + "((" + SWIR1 + " + " + Red + ") - (" + NIR + " + " + Blue + "))/((" + SWIR1 + " + " + Red + ") + (" + NIR + " + " + Blue + ") +" + str(PRECISION) + ")\""
+    expression = "\"" + getExpressionBSI(channel_order) + "\""
 
     # Bandmath pour creer l'indice BSI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_BSI_output,codage,expression)
@@ -628,16 +834,15 @@ def createBSI(image_input, image_BSI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createNDBI()                                                 #
+# FONCTION getExpressionNDBI()                                          #
 #########################################################################
-def createNDBI(image_input, image_NDBI_output, channel_order, codage="float"):
+def getExpressionNDBI(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer le fichier NDBI (Bâti) sur une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NDBI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NDBI_output : fichier NDBI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -652,10 +857,28 @@ def createNDBI(image_input, image_NDBI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (MIR == "" or NIR == ""):
-        raise NameError(cyan + "createNDBI() : " + bold + red + "NDBI needs MIR and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNDBI() : " + bold + red + "NDBI needs MIR and NIR channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "(" + MIR + "==" + NIR + ")?(" + MIR + "== 0)?0:" + str(PRECISION) + ":" + "(" + MIR + "-" + NIR + ")/(" + MIR + "+" + NIR + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNDBI()                                                 #
+#########################################################################
+def createNDBI(image_input, image_NDBI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer le fichier NDBI (Bâti) sur une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NDBI_output : fichier NDBI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
 
     # Creer l'expression
-    expression = "\"(" + MIR + "==" + NIR + ")?(" + MIR + "== 0)?0:" + str(PRECISION) + ":" + "(" + MIR + "-" + NIR + ")/(" + MIR + "+" + NIR + "+" + str(PRECISION) + ")\""
+    expression = "\"" + getExpressionNDBI(channel_order) + "\""
 
     # Bandmath pour creer l'indice NDBI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NDBI_output,codage,expression)
@@ -671,16 +894,15 @@ def createNDBI(image_input, image_NDBI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createNBI()                                                  #
+# FONCTION getExpressionNBI()                                           #
 #########################################################################
-def createNBI(image_input, image_NBI_output, channel_order, codage="float"):
+def getExpressionNBI(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer le fichier NBI (Bâti) sur une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice NBI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_NBI_output : fichier NBI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -699,10 +921,28 @@ def createNBI(image_input, image_NBI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red =="" or MIR == "" or NIR == ""):
-        raise NameError(cyan + "createNBI() : " + bold + red + "NBI needs Red, MIR and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionNBI() : " + bold + red + "NBI needs Red, MIR and NIR channels to be computed"+ endC)
 
     # Creer l'expression
-    expression =  "\"(" + MIR + "== 0) and (" + NIR + "== 0) and (" + Red + "== 0)?0:(" + Red + "!=" + MIR + " and (" + Red + "== 0 or " + MIR + "== 0))?" + str(PRECISION) + ":" + "(" + Red + "*" + MIR + ")/(" + NIR + "+" + str(PRECISION) + ")\""
+    expression =  "(" + MIR + "== 0) and (" + NIR + "== 0) and (" + Red + "== 0)?0:(" + Red + "!=" + MIR + " and (" + Red + "== 0 or " + MIR + "== 0))?" + str(PRECISION) + ":" + "(" + Red + "*" + MIR + ")/(" + NIR + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createNBI()                                                  #
+#########################################################################
+def createNBI(image_input, image_NBI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer le fichier NBI (Bâti) sur une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_NBI_output : fichier NBI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionNBI(channel_order) + "\""
 
     # Bandmath pour creer l'indice NBI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_NBI_output,codage,expression)
@@ -718,16 +958,15 @@ def createNBI(image_input, image_NBI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createIR()                                                   #
+# FONCTION getExpressionIR()                                            #
 #########################################################################
-def createIR(image_input, image_IR_output, channel_order, codage="float"):
+def getExpressionIR(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier IR (sol) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice IR
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_IR_output : fichier IR de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -746,10 +985,28 @@ def createIR(image_input, image_IR_output, channel_order, codage="float"):
         num_channel = channel_order.index("Blue")+1
         Blue = "im1b"+str(num_channel)
     if (Red == "" or Green == "" or Blue == ""):
-        raise NameError(cyan + "createIR() : " + bold + red + "IR needs Red, Green and Blue channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionIR() : " + bold + red + "IR needs Red, Green and Blue channels to be computed"+ endC)
 
     # Creer l'expression
-    expression =  "\"(" + Green + "== 0) and (" + Blue + "== 0) and (" + Red + "== 0)?0:(" + Red + " == 0)?" + str(PRECISION) + ":" + "(" + Red + "*" + Red + ")/(" + str(PRECISION) + " + (" + Blue + "+" + Green + "*" + Green + "*" + Green + "))\""
+    expression =  "(" + Green + "== 0) and (" + Blue + "== 0) and (" + Red + "== 0)?0:(" + Red + " == 0)?" + str(PRECISION) + ":" + "(" + Red + "*" + Red + ")/(" + str(PRECISION) + " + (" + Blue + "+" + Green + "*" + Green + "*" + Green + "))"
+
+    return expression
+
+#########################################################################
+# FONCTION createIR()                                                   #
+#########################################################################
+def createIR(image_input, image_IR_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier IR (sol) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_IR_output : fichier IR de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionIR(channel_order) + "\""
 
     # Bandmath pour creer l'indice IR
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_IR_output,codage,expression)
@@ -765,16 +1022,15 @@ def createIR(image_input, image_IR_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createCI()                                                   #
+# FONCTION getExpressionCI()                                            #
 #########################################################################
-def createCI(image_input, image_CI_output, channel_order, codage="float"):
+def getExpressionCI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier CI (sol) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice CI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_CI_output : fichier CI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -789,10 +1045,28 @@ def createCI(image_input, image_CI_output, channel_order, codage="float"):
         num_channel = channel_order.index("Green")+1
         Green = "im1b"+str(num_channel)
     if (Red == "" or Green == ""):
-        raise NameError(cyan + "createCI() : " + bold + red + "CI needs Red and Green channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionCI() : " + bold + red + "CI needs Red and Green channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"(" + Red + "==" + Green + ")?(" + Red + "== 0)?0:" + str(PRECISION) + ":" + "(" + Red + "-" + Green + ")/(" + Red + "+" + Green + "+" + str(PRECISION) + ")\""
+    expression = "(" + Red + "==" + Green + ")?(" + Red + "== 0)?0:" + str(PRECISION) + ":" + "(" + Red + "-" + Green + ")/(" + Red + "+" + Green + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createCI()                                                   #
+#########################################################################
+def createCI(image_input, image_CI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier CI (sol) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_CI_output : fichier CI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionCI(channel_order) + "\""
 
     # Bandmath pour creer l'indice CI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_CI_output,codage,expression)
@@ -808,18 +1082,15 @@ def createCI(image_input, image_CI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createBI()                                                   #
+# FONCTION getExpressionBI()                                            #
 #########################################################################
-def createBI(image_input, image_BI_output, channel_order, codage="float"):
+def getExpressionBI(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer l'indice de brillance (BI) sur une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice BI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_BI_output : fichier BI de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
-    # Source : univ-montp3.fr/ateliermercator/wp-content/uploads/2010/03/TRANSFO_IMAGES.pdf (page 2)
-    #          https://georezo.net/forum/viewtopic.php?id=59936
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -834,10 +1105,30 @@ def createBI(image_input, image_BI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or NIR == ""):
-        raise NameError(cyan + "createBI() : " + bold + red + "BI needs Red and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionBI() : " + bold + red + "BI needs Red and NIR channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"" + "sqrt(("+NIR+"*"+NIR+")+("+Red+"*"+Red+"))\""
+    expression = "sqrt(("+NIR+"*"+NIR+")+("+Red+"*"+Red+"))"
+
+    return expression
+
+#########################################################################
+# FONCTION createBI()                                                   #
+#########################################################################
+def createBI(image_input, image_BI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer l'indice de brillance (BI) sur une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_BI_output : fichier BI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    # Source : univ-montp3.fr/ateliermercator/wp-content/uploads/2010/03/TRANSFO_IMAGES.pdf (page 2)
+    #          https://georezo.net/forum/viewtopic.php?id=59936
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionBI(channel_order) + "\""
 
     # Bandmath pour creer l'indice BI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_BI_output,codage,expression)
@@ -853,17 +1144,15 @@ def createBI(image_input, image_BI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createBI2()                                                  #
+# FONCTION getExpressionBI2()                                           #
 #########################################################################
-def createBI2(image_input, image_BI2_output, channel_order, codage="float"):
+def getExpressionBI2(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer l'indice de brillance (BI2) sur une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice BI2
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_BI2_output : fichier BI2 de sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
-    # Source : https://hal.inrae.fr/hal-02602061/document (page 14)
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -882,10 +1171,29 @@ def createBI2(image_input, image_BI2_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or Green == "" or NIR == ""):
-        raise NameError(cyan + "createBI2() : " + bold + red + "BI2 needs Red, Green and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionBI2() : " + bold + red + "BI2 needs Red, Green and NIR channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "sqrt((("+NIR+"*"+NIR+")+("+Red+"*"+Red+")+("+Green+"*"+Green+"))/3)"
+
+    return expression
+
+#########################################################################
+# FONCTION createBI2()                                                  #
+#########################################################################
+def createBI2(image_input, image_BI2_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer l'indice de brillance (BI2) sur une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_BI2_output : fichier BI2 de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    # Source : https://hal.inrae.fr/hal-02602061/document (page 14)
+    """
 
     # Creer l'expression
-    expression = "\"" + "sqrt((("+NIR+"*"+NIR+")+("+Red+"*"+Red+")+("+Green+"*"+Green+"))/3)\""
+    expression = "\"" + getExpressionBI2(channel_order) + "\""
 
     # Bandmath pour creer l'indice BI2
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_BI2_output,codage,expression)
@@ -901,18 +1209,15 @@ def createBI2(image_input, image_BI2_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createC3()                                                   #
+# FONCTION getExpressionC3()                                            #
 #########################################################################
-def createC3(image_input, image_c3_output, channel_order, codage="float"):
+def getExpressionC3(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier d'indice c3 (detection des ombres) à partir d'une image ortho RVB
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice C3
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_c3_output : fichier C3 (Ombre) de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortie
-    # Source : source : https://tel.archives-ouvertes.fr/tel-01332681
-    #       Shadow/Vegetation and building detection from single optical remote sensing image "Tran Thanh Ngo"
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -931,10 +1236,30 @@ def createC3(image_input, image_c3_output, channel_order, codage="float"):
         num_channel = channel_order.index("Blue")+1
         Blue = "im1b"+str(num_channel)
     if (Red == "" or Green == "" or Blue == ""):
-        raise NameError(cyan + "createC3() : " + bold + red + "c3 needs Red Green and Blue channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionC3() : " + bold + red + "c3 needs Red Green and Blue channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "(" + Blue + "== 0)?0:" + "atan(" + Blue + "/(max(" + Red + "," + Green + ")+" + str(PRECISION) + "))"
+
+    return expression
+
+#########################################################################
+# FONCTION createC3()                                                   #
+#########################################################################
+def createC3(image_input, image_c3_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier d'indice c3 (detection des ombres) à partir d'une image ortho RVB
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_c3_output : fichier C3 (Ombre) de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortie
+    # Source : source : https://tel.archives-ouvertes.fr/tel-01332681
+    #       Shadow/Vegetation and building detection from single optical remote sensing image "Tran Thanh Ngo"
+    """
 
     # Creer l'expression
-    expression = "\"(" + Blue + "== 0)?0:" + "atan(" + Blue + "/(max(" + Red + "," + Green + ")+" + str(PRECISION) + "))\""
+    expression = "\"" + getExpressionC3(channel_order) + "\""
 
     # Bandmath pour creer l'indice C3
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_c3_output,codage,expression)
@@ -950,18 +1275,15 @@ def createC3(image_input, image_c3_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createExG()                                                  #
+# FONCTION getExpressionExG()                                           #
 #########################################################################
-def createExG(image_input, image_ExG_output, channel_order, codage="float"):
+def getExpressionExG(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier d'indice ExG (detection de la végétation) à partir d'une image ortho RVB
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice ExG
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_ExG_output : fichier ExG (vegetation) de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortie
-    # Source : source : https://tel.archives-ouvertes.fr/tel-01332681
-    #       Shadow/Vegetation and building detection from single optical remote sensing image "Tran Thanh Ngo"
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -980,10 +1302,30 @@ def createExG(image_input, image_ExG_output, channel_order, codage="float"):
         num_channel = channel_order.index("Blue")+1
         Blue = "im1b"+str(num_channel)
     if (Red == "" or Green == "" or Blue == ""):
-        raise NameError(cyan + "createExG() : " + bold + red + "ExG needs Red Green and Blue channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionExG() : " + bold + red + "ExG needs Red Green and Blue channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "((" + Green + "-" + Red + "-" + Blue + ")==0)?0:" + "(2*(" + Green + "-" + Red + "-" + Blue + ")/(" + Red + "+" + Green + "+" + Blue + "+" + str(PRECISION) + "))"
+
+    return expression
+
+#########################################################################
+# FONCTION createExG()                                                  #
+#########################################################################
+def createExG(image_input, image_ExG_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier d'indice ExG (detection de la végétation) à partir d'une image ortho RVB
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_ExG_output : fichier ExG (vegetation) de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortie
+    # Source : source : https://tel.archives-ouvertes.fr/tel-01332681
+    #       Shadow/Vegetation and building detection from single optical remote sensing image "Tran Thanh Ngo"
+    """
 
     # Creer l'expression
-    expression = "\"((" + Green + "-" + Red + "-" + Blue + ")==0)?0:" + "(2*(" + Green + "-" + Red + "-" + Blue + ")/(" + Red + "+" + Green + "+" + Blue + "+" + str(PRECISION) + "))\""
+    expression = "\"" + getExpressionExG(channel_order) + "\""
 
     # Bandmath pour creer l'indice ExG
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_ExG_output,codage,expression)
@@ -999,18 +1341,15 @@ def createExG(image_input, image_ExG_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createL()                                                    #
+# FONCTION getExpressionL()                                             #
 #########################################################################
-def createL(image_input, image_L_output, channel_order, codage="float"):
+def getExpressionL(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier d'indice L (detection de la luminance) à partir d'une image ortho RVB
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice L
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_L_output : fichier L (Luminance) de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortie
-    # Source : source : https://tel.archives-ouvertes.fr/tel-01332681
-    #       Shadow/Vegetation and building detection from single optical remote sensing image "Tran Thanh Ngo"
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -1029,10 +1368,30 @@ def createL(image_input, image_L_output, channel_order, codage="float"):
         num_channel = channel_order.index("Blue")+1
         Blue = "im1b"+str(num_channel)
     if (Red == "" or Green == "" or Blue == ""):
-        raise NameError(cyan + "createL() : " + bold + red + "L needs Red Green and Blue channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionL() : " + bold + red + "L needs Red Green and Blue channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression =  "((" + Red + "== 0) and (" + Green + "== 0) and (" + Blue + "== 0))?0:(" + Red + "+" + Green + "+" + Blue + ")/3"
+
+    return expression
+
+#########################################################################
+# FONCTION createL()                                                    #
+#########################################################################
+def createL(image_input, image_L_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier d'indice L (detection de la luminance) à partir d'une image ortho RVB
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_L_output : fichier L (Luminance) de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortie
+    # Source : source : https://tel.archives-ouvertes.fr/tel-01332681
+    #       Shadow/Vegetation and building detection from single optical remote sensing image "Tran Thanh Ngo"
+    """
 
     # Creer l'expression
-    expression =  "\"((" + Red + "== 0) and (" + Green + "== 0) and (" + Blue + "== 0))?0:(" + Red + "+" + Green + "+" + Blue + ")/3\""
+    expression = "\"" + getExpressionL(channel_order) + "\""
 
     # Bandmath pour creer l'indice L
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_L_output,codage,expression)
@@ -1048,17 +1407,15 @@ def createL(image_input, image_L_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createMSAVI2()                                               #
+# FONCTION getExpressionMSAVI2()                                        #
 #########################################################################
-def createMSAVI2(image_input, image_MSAVI2_output, channel_order, codage="float"):
+def getExpressionMSAVI2(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier MSAVI2 (végétation) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice MSAVI2
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_MSAVI2_output : fichier MSAVI de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortie
-    # Source : source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -1073,11 +1430,29 @@ def createMSAVI2(image_input, image_MSAVI2_output, channel_order, codage="float"
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or NIR == ""):
-        raise NameError(cyan + "createMSAVI2() : " + bold + red + "MSAVI2 needs Red and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionMSAVI2() : " + bold + red + "MSAVI2 needs Red and NIR channels to be computed"+ endC)
 
     # Creer l'expression
-    expression = "\"("+ NIR + " == " + Red + ")and(" + NIR + " == 0)?" + str(PRECISION) +" : (2 * " + NIR + " + 1 - sqrt(( 2 * " + NIR + " + 1 )^2 - 8 *(" + NIR + " - " + Red +"))+" +  str(PRECISION)+")/2 \""
+    expression = "("+ NIR + " == " + Red + ")and(" + NIR + " == 0)?" + str(PRECISION) +" : (2 * " + NIR + " + 1 - sqrt(( 2 * " + NIR + " + 1 )^2 - 8 *(" + NIR + " - " + Red +"))+" +  str(PRECISION)+")/2 "
+
+    return expression
+
+#########################################################################
+# FONCTION createMSAVI2()                                               #
+#########################################################################
+def createMSAVI2(image_input, image_MSAVI2_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier MSAVI2 (végétation) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_MSAVI2_output : fichier MSAVI de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortie
+    # Source : source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    """
 
+    # Creer l'expression
+    expression = "\"" + getExpressionMSAVI2(channel_order) + "\""
 
     # Bandmath pour creer l'indice MSAVI2
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_MSAVI2_output,codage,expression)
@@ -1093,17 +1468,15 @@ def createMSAVI2(image_input, image_MSAVI2_output, channel_order, codage="float"
     return
 
 #########################################################################
-# FONCTION createSIPI()                                                 #
+# FONCTION getExpressionSIPI()                                          #
 #########################################################################
-def createSIPI(image_input, image_SIPI_output, channel_order, codage="float"):
+def getExpressionSIPI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier SIPI (végétation) à partir d'une image ortho multi bande
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice SIPI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_SIPI_output : fichier SIPI de sortie une bande
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
-    # Source : source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -1122,10 +1495,29 @@ def createSIPI(image_input, image_SIPI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or NIR == ""):
-        raise NameError(cyan + "createSIPI() : " + bold + red + "SIPI needs Red, Blue and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionSIPI() : " + bold + red + "SIPI needs Red, Blue and NIR channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "("+ NIR + " == " + Red + ") or ("+ NIR + " == " + Blue + ")and(" + NIR + " == 0)?" + str(PRECISION) +":" + "(" + NIR + "-" + Blue + ")/(" + NIR + "-" + Red + "+" + str(PRECISION) + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createSIPI()                                                 #
+#########################################################################
+def createSIPI(image_input, image_SIPI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier SIPI (végétation) à partir d'une image ortho multi bande
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_SIPI_output : fichier SIPI de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    # Source : source : http://resources.arcgis.com/en/help/main/10.1/index.html#/Band_Arithmetic_function/009t000001z4000000/
+    """
 
     # Creer l'expression
-    expression = "\"("+ NIR + " == " + Red + ") or ("+ NIR + " == " + Blue + ")and(" + NIR + " == 0)?" + str(PRECISION) +":" + "(" + NIR + "-" + Blue + ")/(" + NIR + "-" + Red + "+" + str(PRECISION) + ")\""
+    expression = "\"" + getExpressionSIPI(channel_order) + "\""
 
     # Bandmath pour creer l'indice SIPI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_SIPI_output,codage,expression)
@@ -1299,18 +1691,15 @@ def createHIS(image_input, image_HIS_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createVSSI()                                                 #
+# FONCTION getExpressionVSSI()                                          #
 #########################################################################
-def createVSSI(image_input, image_VSSI_output, channel_order, codage="float"):
+def getExpressionVSSI(channel_order):
     """
-    #   Rôle : Cette fonction permet de calculer l'indice de salinité (VSSI) sur une image ortho multi bande
-    #          Évaluation de la salinité du sol à l'aide du canal proche infrarouge et de la végétation du sol
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice VSSI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_VSSI_output : fichier VSSIde sortie (une bande)
     #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
-    #       codage : type de codage du fichier de sortie
-    # Source : https://progearthplanetsci.springeropen.com/counter/pdf/10.1186/s40645-019-0311-0.pdf?pdf=button%20sticky  (page 8)
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -1329,10 +1718,30 @@ def createVSSI(image_input, image_VSSI_output, channel_order, codage="float"):
         num_channel = channel_order.index("NIR")+1
         NIR = "im1b"+str(num_channel)
     if (Red == "" or Green == "" or NIR == ""):
-        raise NameError(cyan + "createVSSI() : " + bold + red + "VSSI needs Red, Green and NIR channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionVSSI() : " + bold + red + "VSSI needs Red, Green and NIR channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "((2 * "+Green+") - 5 * ("+Red+" + "+NIR+"))"
+
+    return expression
+
+#########################################################################
+# FONCTION createVSSI()                                                 #
+#########################################################################
+def createVSSI(image_input, image_VSSI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de calculer l'indice de salinité (VSSI) sur une image ortho multi bande
+    #          Évaluation de la salinité du sol à l'aide du canal proche infrarouge et de la végétation du sol
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_VSSI_output : fichier VSSIde sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       codage : type de codage du fichier de sortie
+    # Source : https://progearthplanetsci.springeropen.com/counter/pdf/10.1186/s40645-019-0311-0.pdf?pdf=button%20sticky  (page 8)
+    """
 
     # Creer l'expression
-    expression = "\"" + "((2 * "+Green+") - 5 * ("+Red+" + "+NIR+"))\""
+    expression = "\"" + getExpressionVSSI(channel_order) + "\""
 
     # Bandmath pour creer l'indice VSSI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_VSSI_output,codage,expression)
@@ -1348,18 +1757,15 @@ def createVSSI(image_input, image_VSSI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createBlueI()                                                #
+# FONCTION getExpressionBlueI()                                         #
 #########################################################################
-def createBlueI(image_input, image_BI_output, channel_order, codage="float"):
+def getExpressionBlueI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier d'indice de bleu (detection des nuages) à partir d'une image ortho RVB
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice BlueI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_BI_output : fichier BI de sortie une bande
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
-    #       codage : type de codage du fichier de sortie
-    # Source : https://www.researchgate.net/publication/342073075_Cloud_detection_method_for_Pleiades_images_using_spectral_indices
-    #
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -1378,10 +1784,30 @@ def createBlueI(image_input, image_BI_output, channel_order, codage="float"):
         num_channel = channel_order.index("Blue")+1
         Blue = "im1b"+str(num_channel)
     if (Red == "" or Green == "" or Blue == ""):
-        raise NameError(cyan + "createBlueI() : " + bold + red + "c3 needs Red Green and Blue channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionBlueI() : " + bold + red + "c3 needs Red Green and Blue channels to be computed"+ endC)
+
+    # Creer l'expression
+    expression = "(" + Blue + "== 0)?0:" + Blue + "/(" + Red + "+" + Green + "+" + Blue + ")+" + str(PRECISION)
+
+    return expression
+
+#########################################################################
+# FONCTION createBlueI()                                                #
+#########################################################################
+def createBlueI(image_input, image_BI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier d'indice de bleu (detection des nuages) à partir d'une image ortho RVB
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_BI_output : fichier BI de sortie une bande
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"]
+    #       codage : type de codage du fichier de sortie
+    # Source : https://www.researchgate.net/publication/342073075_Cloud_detection_method_for_Pleiades_images_using_spectral_indices
+    #
+    """
 
     # Creer l'expression
-    expression = "\"(" + Blue + "== 0)?0:" + "" + Blue + "/(" + Red + "+" + Green + "+" + Blue + ")+" + str(PRECISION) + "\""
+    expression = "\"" + getExpressionBlueI(channel_order) + "\""
 
     # Bandmath pour creer l'indice Blue
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_BI_output,codage,expression)
@@ -1397,20 +1823,15 @@ def createBlueI(image_input, image_BI_output, channel_order, codage="float"):
     return
 
 #########################################################################
-# FONCTION createSCoWI()                                                #
+# FONCTION getExpressionSCoWI()                                         #
 #########################################################################
-def createSCoWI(image_input, image_SCoWI_output, channel_order, codage="float"):
+def getExpressionSCoWI(channel_order):
     """
-    #   Rôle : Cette fonction permet de créer un fichier SCoWI (eau / trait de côte) à partir d'une image ortho multi bande
-    #          La création de cet indice entre dans le cadre plus large de développement de l’outil Shoreliner par le CNES,
-    #          qui a pour but d’automatiser la détection des traits de côtes. Cet outil repose sur des données Sentinel-2.
-    #          L’objectif du stage de Laurine MEUNIER a été d’adapter l’outil Shoreliner à une source de données Pléiades
+    #   Rôle : Cette fonction retourne l'expression BandMath de l'indice SCoWI
     #   paramètres :
-    #       image_input : fichier image d'entrée multi bandes
-    #       image_SCoWI_output : fichier SCoWI de sortie (une bande)
-    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Green","Blue","NIR","SWIR1","SWIR2"])
-    #       codage : type de codage du fichier de sortie
-    #   Source : 30_Stages_Encours/2025/2025_Teledec_Hugo/03_TRAIT_DE_COTE/Intership_report-2023-CNES-MEUNIERLaurine.pdf
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #   Paramétres de retour :
+    #       l'expression (syntaxe muParser de otbcli_BandMath, sans guillemets)
     """
 
     # Variables
@@ -1437,13 +1858,35 @@ def createSCoWI(image_input, image_SCoWI_output, channel_order, codage="float"):
         num_channel = channel_order.index("SWIR2")+1
         SWIR2 = "im1b"+str(num_channel)
     if (Green == "" or Blue == "" or NIR == ""):
-        raise NameError(cyan + "createSCoWI() : " + bold + red + "SCoWI needs Green, Blue and NIR and (SWIR1 and SWIR2 from Sentinel2) channels to be computed"+ endC)
+        raise NameError(cyan + "getExpressionSCoWI() : " + bold + red + "SCoWI needs Green, Blue and NIR and (SWIR1 and SWIR2 from Sentinel2) channels to be computed"+ endC)
 
     # Creer l'expression
     if (SWIR1 == "" or SWIR2 == ""):
-        expression = "\"(" + Blue + ") + 2 * (" + Green + ") - 2.4 * (" + NIR  + ")\""
+        expression = "(" + Blue + ") + 2 * (" + Green + ") - 2.4 * (" + NIR  + ")"
     else :
-        expression = "\"(" + Blue + ") + 2 * (" + Green + " - " + NIR  + ") - 0.75 * (" + SWIR1  + ") - 0.5 * (" + SWIR2  + ")\""
+        expression = "(" + Blue + ") + 2 * (" + Green + " - " + NIR  + ") - 0.75 * (" + SWIR1  + ") - 0.5 * (" + SWIR2  + ")"
+
+    return expression
+
+#########################################################################
+# FONCTION createSCoWI()                                                #
+#########################################################################
+def createSCoWI(image_input, image_SCoWI_output, channel_order, codage="float"):
+    """
+    #   Rôle : Cette fonction permet de créer un fichier SCoWI (eau / trait de côte) à partir d'une image ortho multi bande
+    #          La création de cet indice entre dans le cadre plus large de développement de l’outil Shoreliner par le CNES,
+    #          qui a pour but d’automatiser la détection des traits de côtes. Cet outil repose sur des données Sentinel-2.
+    #          L’objectif du stage de Laurine MEUNIER a été d’adapter l’outil Shoreliner à une source de données Pléiades
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       image_SCoWI_output : fichier SCoWI de sortie (une bande)
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Green","Blue","NIR","SWIR1","SWIR2"])
+    #       codage : type de codage du fichier de sortie
+    #   Source : 30_Stages_Encours/2025/2025_Teledec_Hugo/03_TRAIT_DE_COTE/Intership_report-2023-CNES-MEUNIERLaurine.pdf
+    """
+
+    # Creer l'expression
+    expression = "\"" + getExpressionSCoWI(channel_order) + "\""
 
     # Bandmath pour creer l'indice MNDWI
     command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_SCoWI_output,codage,expression)
@@ -1457,3 +1900,64 @@ def createSCoWI(image_input, image_SCoWI_output, channel_order, codage="float"):
     print(cyan + "createSCoWI() : " + bold + green + "Create SCoWI file %s complete!" %(image_SCoWI_output) + endC)
 
     return
+
+#########################################################################
+# MOTEUR D'INDICES EN UNE SEULE LECTURE DE L'IMAGE                      #
+#########################################################################
+
+# Fonctions d'expression BandMath des indices calculables par le moteur (noms utilisés par NeoChannelsComputation)
+INDEX_EXPRESSION_DICO = {"NDVI":getExpressionNDVI, "NDVIMod":getExpressionNDVIMod, "TNDVI":getExpressionTNDVI, "PNDVI":getExpressionPNDVI, "NDWI":getExpressionNDWI, "NDWI2":getExpressionNDWI2, "NDWI2Mod":getExpressionNDWI2Mod, "MNDWI":getExpressionMNDWI, "NDMI":getExpressionNDMI, "ISU":getExpressionISU, "GEMI":getExpressionGEMI, "BSI":getExpressionBSI, "NDBI":getExpressionNDBI, "NBI":getExpressionNBI, "IR":getExpressionIR, "CI":getExpressionCI, "BI":getExpressionBI, "BI2":getExpressionBI2, "C3":getExpressionC3, "ExG":getExpressionExG, "L":getExpressionL, "MSAVI2":getExpressionMSAVI2, "SIPI":getExpressionSIPI, "VSSI":getExpressionVSSI, "BLUEI":getExpressionBlueI, "SCoWI":getExpressionSCoWI}
+
+# Nombre maximum de pixels d'une bande de lignes lue par le moteur d'indices
+MAX_PIXELS_STRIP = 4194304
+
+#########################################################################
+# FONCTION createIndicesImage()                                         #
+#########################################################################
+def createIndicesImage(image_input, indices_list, channel_order, images_output_list=[], image_stack_output="", codage="float", format_raster="GTiff", max_pixels_strip=MAX_PIXELS_STRIP):
+    """
+    #   Rôle : Cette fonction calcule plusieurs indices radiométriques en une seule lecture de l'image ortho multi bande, sans otbcli_BandMath
+    #          Les expressions des fonctions createXXX() (fonctions getExpressionXXX(), garde PRECISION comprise) sont traduites par
+    #          parseBandMathExpression() et calculées ensemble par la calculatrice raster Lib_bandmath : chaque bande de lignes de l'image
+    #          est lue une seule fois (uniquement les bandes utilisées), calcul en double et conversion au codage de sortie comme BandMath
+    #   paramètres :
+    #       image_input : fichier image d'entrée multi bandes
+    #       indices_list : liste des noms d'indices à calculer (clés de INDEX_EXPRESSION_DICO, exemple ["NDVI","NDWI2","BSI","MSAVI2","SCoWI"])
+    #       channel_order : liste d'ordre des bandes de l'image (exemple ["Red","Green","Blue","NIR"])
+    #       images_output_list : liste des fichiers de sortie (une bande), un par indice dans l'ordre de indices_list
+    #       image_stack_output : fichier de sortie multi bandes contenant un indice par bande dans l'ordre de indices_list (remplace images_output_list), par defaut ""
+    #       codage : type de codage des fichiers de sortie, par defaut "float"
+    #       format_raster : format des fichiers de sortie, par defaut "GTiff"
+    #       max_pixels_strip : nombre maximum de pixels d'une bande de lignes lue, par defaut MAX_PIXELS_STRIP
+    """
+
+    if image_stack_output == "" and len(images_output_list) != len(indices_list):
+        raise NameError(cyan + "createIndicesImage() : " + bold + red + "One output file per index is needed : %s for %s" %(images_output_list, indices_list) + endC)
+    if codage not in CODAGE_DICO:
+        raise NameError(cyan + "createIndicesImage() : " + bold + red + "Unknown codage %s, available : %s" %(codage, list(CODAGE_DICO.keys())) + endC)
+
+    # Traduction des expressions BandMath des indices
+    expressions_list = []
+    for index_name in indices_list:
+        if index_name not in INDEX_EXPRESSION_DICO:
+            raise NameError(cyan + "createIndicesImage() : " + bold + red + "Index %s is not available, available : %s" %(index_name, list(INDEX_EXPRESSION_DICO.keys())) + endC)
+        expression = INDEX_EXPRESSION_DICO[index_name](channel_order)
+        if debug >= 2:
+            print(cyan + "createIndicesImage() : " + endC + index_name + " : " + expression)
+        expressions_list.append(parseBandMathExpression(expression, [image_input]))
+
+    # Calcul de tous les indices en une seule lecture de l'image
+    image_output = image_stack_output if image_stack_output != "" else images_output_list
+    writeRasterExpressions(expressions_list, image_output, codage, format_raster, max_pixels_strip=max_pixels_strip, image_reference=image_input)
+
+    # Nom des indices dans les descriptions des bandes du fichier multi bandes
+    if image_stack_output != "":
+        dataset_output = gdal.Open(image_stack_output, gdal.GA_Update)
+        for index in range(len(indices_list)):
+            dataset_output.GetRasterBand(index + 1).SetDescription(indices_list[index])
+        dataset_output.FlushCache()
+        dataset_output = None
+
+    print(cyan + "createIndicesImage() : " + bold + green + "Create indices %s of image %s complete!" %(indices_list, image_input) + endC)
+
+    return
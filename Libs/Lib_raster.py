@@ -16,9 +16,10 @@
 
 # IMPORTS DIVERS
 from __future__ import print_function
-import os,glob,sys,shutil,time, numpy
+import os,glob,sys,shutil,time,math, numpy
+from concurrent.futures import ThreadPoolExecutor
 
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from osgeo import gdal, osr, gdalnumeric, gdalconst
 from osgeo.gdalnumeric import *
 from osgeo.gdalconst import *
@@ -33,6 +34,7 @@ from Lib_vector import getEmpriseVector
 from Lib_text import writeTextFile, appendTextFileCR
 from Lib_file import renameFile, removeFile
 from Lib_xml import parseDom, getListNodeDataDom, getListValueAttributeDom
+from Lib_bandmath import RasterExpression, CODAGE_DICO, bandExpression, constantExpression, whereExpression, lookupExpression, parseBandMathExpression, writeRasterExpressions
 #import otbApplication
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
@@ -56,6 +58,212 @@ if int(otb_info.split(".")[0]) >= 7 :
 else :
     IS_VERSION_UPPER_OTB_7_0 = False
 
+# Formats GDAL des extensions raster usuelles (les autres extensions sont recherchées dans les drivers GDAL)
+EXTENSION_FORMAT_RASTER_DICO = {".tif" : "GTiff", ".tiff" : "GTiff", ".img" : "HFA", ".vrt" : "VRT"}
+
+#########################################################################
+# FONCTION getFormatRasterFromExtension()                               #
+#########################################################################
+def getFormatRasterFromExtension(image_file, format_default="GTiff"):
+    """
+    #   Rôle : Cette fonction retourne le format GDAL (nom du driver) correspondant à l'extension d'un fichier raster, comme le font les applications OTB
+    #   Paramètres en entrée :
+    #       image_file : fichier image (ou extension seule, exemple ".tif")
+    #       format_default : format retourné si l'extension n'est pas reconnue, par defaut GTiff
+    #   Paramétres de retour :
+    #       le nom du driver GDAL
+    """
+
+    extension = os.path.splitext(image_file)[1] if os.path.splitext(image_file)[1] != "" else image_file
+    extension = extension.lower()
+    if extension in EXTENSION_FORMAT_RASTER_DICO:
+        return EXTENSION_FORMAT_RASTER_DICO[extension]
+
+    # Recherche d'un driver raster capable de créer des fichiers de cette extension
+    for index_driver in range(gdal.GetDriverCount()):
+        driver = gdal.GetDriver(index_driver)
+        extensions_list = (driver.GetMetadataItem(gdal.DMD_EXTENSIONS) or "").lower().split()
+        if driver.GetMetadataItem(gdal.DCAP_RASTER) == "YES" and driver.GetMetadataItem(gdal.DCAP_CREATE) == "YES" and extension.lstrip(".") in extensions_list:
+            return driver.ShortName
+
+    return format_default
+
+#########################################################################
+# FONCTION getStripsImage()                                             #
+#########################################################################
+def getStripsImage(cols, rows, block_y, max_pixels_strip=4194304):
+    """
+    #   Rôle : Cette fonction découpe une image en bandes de lignes dont la hauteur est un multiple de la hauteur de bloc GDAL
+    #   Paramètres en entrée :
+    #       cols, rows : taille de l'image en pixels
+    #       block_y : hauteur de bloc GDAL de l'image lue (ou plus petit commun multiple des hauteurs de bloc lues et écrites)
+    #       max_pixels_strip : nombre maximum de pixels d'une bande de lignes, par defaut 4194304 (au moins une hauteur de bloc)
+    #   Paramétres de retour :
+    #       la liste des bandes de lignes (yoff, nb_rows)
+    """
+
+    nb_block_rows_strip = max(1, (max_pixels_strip // max(1, cols)) // block_y)
+    strip_rows = block_y * nb_block_rows_strip
+    return [(yoff, min(strip_rows, rows - yoff)) for yoff in range(0, rows, strip_rows)]
+
+#########################################################################
+# FONCTION processStripsImage()                                         #
+#########################################################################
+def processStripsImage(strips_list, computeStrip, mergeStrip, nb_threads=0):
+    """
+    #   Rôle : Cette fonction calcule les bandes de lignes d'une image en parallele et fusionne (ou écrit) les résultats dans l'ordre des lignes
+    #          Pas plus de nb_threads bandes de lignes calculées sont en memoire à la fois
+    #   Paramètres en entrée :
+    #       strips_list : liste des bandes de lignes (yoff, nb_rows), voir getStripsImage()
+    #       computeStrip : fonction de calcul d'une bande de lignes, appelée dans un thread
+    #                      (elle doit ouvrir ses propres datasets, les datasets GDAL ne sont pas partageables entre threads)
+    #       mergeStrip : fonction de fusion ou d'écriture du résultat d'une bande de lignes, appelée dans le thread principal
+    #       nb_threads : nombre de threads de calcul, par defaut 0 (nombre de CPU)
+    #   Paramétres de retour :
+    #       le nombre de threads utilisés
+    """
+
+    if nb_threads <= 0:
+        nb_threads = getNumberCPU()
+    nb_threads = max(1, min(nb_threads, len(strips_list)))
+    if nb_threads == 1:
+        for strip in strips_list:
+            mergeStrip(computeStrip(strip))
+    else:
+        with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+            futures_list = []
+            for strip in strips_list:
+                futures_list.append(executor.submit(computeStrip, strip))
+                if len(futures_list) >= nb_threads:
+                    mergeStrip(futures_list.pop(0).result())
+            for future in futures_list:
+                mergeStrip(future.result())
+
+    return nb_threads
+
+#########################################################################
+# FONCTION computeBlocksStatisticsImage()                               #
+#########################################################################
+def computeBlocksStatisticsImage(image_raster, num_bands_list=None, count_values=False, histogram_range=None, nb_threads=0, max_pixels_strip=4194304):
+    """
+    #   Rôle : Cette fonction parcourt l'image une seule fois par bandes de lignes alignées sur les blocs GDAL (lues en parallele)
+    #          et calcule pour toutes les bandes demandées : min, max, moyenne, ecart type, comptage exact par valeur et histogramme
+    #          La mémoire utilisée est bornée par la taille d'une bande de lignes par thread, quelle que soit la taille de l'image
+    #   Paramètres en entrée :
+    #       image_raster : fichier image d'entrée
+    #       num_bands_list : liste des numéros de bandes à traiter, par defaut toutes les bandes
+    #       count_values : calcul du nombre de pixels par valeur (tous les pixels, nodata compris), par defaut False
+    #       histogram_range : histogramme au format [min, max, nb_classes] (classes de même largeur entre min et max, valeurs hors plage ignorées), par defaut None
+    #       nb_threads : nombre de threads de lecture, par defaut 0 (nombre de CPU)
+    #       max_pixels_strip : nombre maximum de pixels d'une bande de lignes lue, par defaut 4194304
+    #   Paramétres de retour :
+    #       statistics_dico : dictionnaire par numéro de bande contenant :
+    #           'count' : nombre de pixels valides (hors nodata et NaN)
+    #           'min', 'max', 'mean', 'std' : statistiques des pixels valides (None si aucun pixel valide)
+    #           'values_counts' : dictionnaire valeur -> nombre de pixels (si count_values)
+    #           'histogram' : liste des effectifs par classe (si histogram_range), pixels valides uniquement
+    #       None si l'image ne peut pas être ouverte
+    """
+
+    dataset = gdal.Open(image_raster, GA_ReadOnly)
+    if dataset is None:
+        return None
+    cols = dataset.RasterXSize
+    rows = dataset.RasterYSize
+    if num_bands_list is None:
+        num_bands_list = list(range(1, dataset.RasterCount + 1))
+    no_data_dico = {}
+    for num_band in num_bands_list:
+        no_data_dico[num_band] = dataset.GetRasterBand(num_band).GetNoDataValue()
+    block_y = dataset.GetRasterBand(num_bands_list[0]).GetBlockSize()[1]
+    dataset = None
+
+    strips_list = getStripsImage(cols, rows, block_y, max_pixels_strip)
+
+    if histogram_range is not None:
+        hist_min, hist_max, hist_buckets = float(histogram_range[0]), float(histogram_range[1]), int(histogram_range[2])
+        hist_scale = hist_buckets / (hist_max - hist_min)
+
+    def computeStrip(strip):
+        # Chaque thread ouvre son propre dataset (les datasets GDAL ne sont pas partageables entre threads)
+        yoff, nb_rows = strip
+        dataset_strip = gdal.Open(image_raster, GA_ReadOnly)
+        strip_dico = {}
+        for num_band in num_bands_list:
+            data = dataset_strip.GetRasterBand(num_band).ReadAsArray(0, yoff, cols, nb_rows).ravel()
+            result_dico = {'count' : 0, 'min' : None, 'max' : None, 'mean' : 0.0, 'm2' : 0.0}
+            if count_values:
+                unique, counts = numpy.unique(data, return_counts=True)
+                result_dico['values_counts'] = (unique, counts)
+
+            valid = data
+            if no_data_dico[num_band] is not None:
+                valid = valid[valid != no_data_dico[num_band]]
+            if valid.dtype.kind == 'f':
+                valid = valid[~numpy.isnan(valid)]
+            if valid.size > 0:
+                valid_float = valid.astype(numpy.float64)
+                mean = valid_float.mean()
+                result_dico['count'] = valid.size
+                result_dico['min'] = valid.min()
+                result_dico['max'] = valid.max()
+                result_dico['mean'] = mean
+                result_dico['m2'] = float(((valid_float - mean) ** 2).sum())
+                if histogram_range is not None:
+                    index_array = numpy.floor((valid_float - hist_min) * hist_scale)
+                    index_array = index_array[(index_array >= 0) & (index_array < hist_buckets)].astype(numpy.int64)
+                    result_dico['histogram'] = numpy.bincount(index_array, minlength=hist_buckets)
+                valid_float = None
+            strip_dico[num_band] = result_dico
+            data = None
+        dataset_strip = None
+        return strip_dico
+
+    # Initialisation des accumulateurs
+    total_dico = {}
+    for num_band in num_bands_list:
+        total_dico[num_band] = {'count' : 0, 'min' : None, 'max' : None, 'mean' : 0.0, 'm2' : 0.0, 'values_counts' : {}, 'histogram' : numpy.zeros(hist_buckets, dtype=numpy.int64) if histogram_range is not None else None}
+
+    # Fusion des resultats des bandes de lignes (moyenne et variance combinées par la méthode de Chan)
+    def mergeStrip(strip_dico):
+        for num_band in num_bands_list:
+            result_dico = strip_dico[num_band]
+            total = total_dico[num_band]
+            if count_values:
+                for value, count in zip(result_dico['values_counts'][0].tolist(), result_dico['values_counts'][1].tolist()):
+                    total['values_counts'][value] = total['values_counts'].get(value, 0) + count
+            if result_dico['count'] == 0:
+                continue
+            if histogram_range is not None:
+                total['histogram'] += result_dico['histogram']
+            count_a, count_b = total['count'], result_dico['count']
+            delta = result_dico['mean'] - total['mean']
+            total['count'] = count_a + count_b
+            total['mean'] += delta * count_b / total['count']
+            total['m2'] += result_dico['m2'] + delta * delta * count_a * count_b / total['count']
+            total['min'] = result_dico['min'] if total['min'] is None else min(total['min'], result_dico['min'])
+            total['max'] = result_dico['max'] if total['max'] is None else max(total['max'], result_dico['max'])
+        return
+
+    nb_threads = processStripsImage(strips_list, computeStrip, mergeStrip, nb_threads)
+
+    statistics_dico = {}
+    for num_band in num_bands_list:
+        total = total_dico[num_band]
+        statistics_dico[num_band] = {'count' : total['count'], 'min' : total['min'], 'max' : total['max'], 'mean' : None, 'std' : None}
+        if total['count'] > 0:
+            statistics_dico[num_band]['mean'] = total['mean']
+            statistics_dico[num_band]['std'] = math.sqrt(total['m2'] / total['count'])
+        if count_values:
+            statistics_dico[num_band]['values_counts'] = total['values_counts']
+        if histogram_range is not None:
+            statistics_dico[num_band]['histogram'] = total['histogram'].tolist()
+
+    if debug >= 3:
+        print(cyan + "computeBlocksStatisticsImage() : " + endC + image_raster + " : " + str(len(strips_list)) + " bandes de lignes de " + str(strips_list[0][1] if strips_list else 0) + " lignes traitées sur " + str(nb_threads) + " threads" + endC)
+
+    return statistics_dico
+
 #########################################################################
 # FONCTION computeHistogram ()                                          #
 #########################################################################
@@ -115,13 +323,16 @@ def computeHistogram(image_raster, hist_file, plot_title="Histogramme raster", x
     plt.xlabel(x_title)
     plt.ylabel(y_title)
 
+    # Calcul des histogrammes de toutes les bandes en une seule lecture de l'image
+    dataset = None
+    statistics_dico = computeBlocksStatisticsImage(image_raster, histogram_range=[x_min, x_max, buckets])
+
     # Génération du graph bande par bande
     histogram_dico = {}
     for number_band in range(1,nb_bands+1):
-        band = dataset.GetRasterBand(number_band)
         legend = "Bande " + str(number_band)
         color = colors_bands_list[number_band-1]
-        histogram = band.GetHistogram(min=x_min, max=x_max, buckets=buckets, approx_ok=0)
+        histogram = statistics_dico[number_band]['histogram']
         plt.plot(x_list, histogram, "-", linewidth=2, label=legend, c=color)
         histogram_dico[number_band] = histogram
 
@@ -155,24 +366,16 @@ def computeStatisticsImage(image_raster, statistic_file=""):
     if debug >= 3:
          print(cyan + "computeHistogram() : Calcul des statistiques de l'image" +  image_raster + endC)
 
+    # Calcul de la moyenne et ecart type de toutes les bandes en une seule lecture de l'image par blocs
     bands = 0
-    dataset = gdal.Open(image_raster, GA_ReadOnly) # Ouverture de l'image en lecture
-    if dataset is not None:
-        bands = dataset.RasterCount
-
-    # Calcul de  la moyenne et ecart type avec numpy
     statistics_dico = {}
-    for i in range (1, bands+1) :
-        image = dataset.GetRasterBand(i)
-        no_data_value = image.GetNoDataValue()
-        image_array = image.ReadAsArray()
-        image_array_float = np.array(image_array).astype(float)
-        image_array_float[image_array_float == no_data_value] = np.nan
-        image_min = numpy.nanmin(image_array_float)
-        image_max = numpy.nanmax(image_array_float)
-        image_mean = numpy.nanmean(image_array_float)
-        image_std = numpy.nanstd(image_array_float)
-        statistics_dico[i] = [image_min, image_max, image_mean, image_std]
+    blocks_statistics_dico = computeBlocksStatisticsImage(image_raster)
+    if blocks_statistics_dico is not None:
+        bands = len(blocks_statistics_dico)
+        for i in range (1, bands+1) :
+            band_statistics_dico = blocks_statistics_dico[i]
+            # Bande entierement nodata : statistiques à nan (comme numpy.nanmin / nanmax)
+            statistics_dico[i] = [float('nan') if band_statistics_dico[key] is None else float(band_statistics_dico[key]) for key in ('min', 'max', 'mean', 'std')]
 
     # Ecriture des resultats dans un fichier xml
     if statistic_file != "" :
@@ -221,13 +424,9 @@ def identifyPixelValues(image_raster):
         print(cyan + "identifyPixelValues() : Début de l'identification des pixels de l'image" + endC)
 
     image_values_list = []
-    image_open = gdal.Open(image_raster)                  # Ouverture de l'image
-    if image_open != None :
-        image = image_open.GetRasterBand(1)                   # Extraction de la premiere bande
-        image_array = image.ReadAsArray()                     # Transformation de la bande en tableau
-        image_values_nparray = numpy.unique(image_array)      # Extraction des valeurs uniques dans un tableau numpy
-        image_values_list = image_values_nparray.tolist()     # Transformation du tableau en liste
-        image_open = None
+    statistics_dico = computeBlocksStatisticsImage(image_raster, num_bands_list=[1], count_values=True)   # Lecture par blocs de la premiere bande
+    if statistics_dico is not None :
+        image_values_list = sorted(statistics_dico[1]['values_counts'].keys())                           # Liste triée des valeurs présentes
 
     if debug >= 3:
         print(cyan + "identifyPixelValues() : Fin de l'identification des pixels de l'image" + endC)
@@ -298,29 +497,13 @@ def countPixelsOfValue(image_raster, value, num_band=1):
     if debug >= 3:
         print(cyan + "countPixelsOfValue() : " + bold + green + "Image input to count pixel : "  + endC + image_raster)
 
-    # Ouverture de l'image
-
-    dataset = gdal.Open(image_raster, GA_ReadOnly)
-
     # Intialisation
     pixelCount = 0
 
-    if dataset is not None:
-        cols = dataset.RasterXSize
-        rows = dataset.RasterYSize
-        # Get band
-        band = dataset.GetRasterBand(num_band)
-        # Read the data into arrays
-        data = gdalnumeric.BandReadAsArray(band)
-
-        unique, counts = numpy.unique(data, return_counts=True)
-        unique_list = unique.tolist()
-        if value in unique_list :
-            counts_list = counts.tolist()
-            index = unique_list.index(value)
-            pixelCount = counts_list[index]
-
-    dataset = None
+    # Comptage par valeur en une lecture par blocs de la bande
+    statistics_dico = computeBlocksStatisticsImage(image_raster, num_bands_list=[num_band], count_values=True)
+    if statistics_dico is not None:
+        pixelCount = statistics_dico[num_band]['values_counts'].get(value, 0)
 
     if debug >= 3:
         print(cyan + "countPixelsOfValue() : " + bold + green + "Number of pixel with value1 " + str(value) + " : " + str(pixelCount) + endC)
@@ -389,14 +572,19 @@ def getPixelValueImageGeographical(image_raster, coor_x, coor_y, num_band=1):
     #       value_pixel : la valeur un pixel dont les coordonnees sont defini en x et en y
     """
 
-    cols, rows, bands = getGeometryImage(image_raster)
-    xmin, xmax, ymin, ymax = getEmpriseImage(image_raster)
-    pixel_width, pixel_height = getPixelWidthXYImage(image_raster)
-
-    pos_x = int(round((coor_x - xmin) / abs(pixel_width)))
-    pos_y = int(round((coor_y - ymin) / abs(pixel_height)))
+    value_pixel = None
+    dataset = gdal.Open(image_raster, GA_ReadOnly)
+    if dataset is not None:
+        # Position du pixel à partir du geotransform (un seul accès au fichier)
+        geotransform = dataset.GetGeoTransform()
+        pos_x = int(floor((coor_x - geotransform[0]) / abs(geotransform[1])))
+        pos_y = int(floor((geotransform[3] - coor_y) / abs(geotransform[5])))
+        if 0 <= pos_x < dataset.RasterXSize and 0 <= pos_y < dataset.RasterYSize :
+            # Lecture du seul pixel demandé
+            value_pixel = dataset.GetRasterBand(num_band).ReadAsArray(pos_x, pos_y, 1, 1)[0, 0]
+    dataset = None
 
-    return getPixelValueImage(image_raster, pos_x, pos_y, num_band)
+    return value_pixel
 
 #########################################################################
 # FONCTION getPixelValueImage()                                         #
@@ -417,10 +605,12 @@ def getPixelValueImage(image_raster, pos_x, pos_y, num_band=1):
     dataset = gdal.Open(image_raster, GA_ReadOnly)
     if dataset is not None:
         # Get band
+        if pos_x < 0 or pos_x >= dataset.RasterXSize or pos_y < 0 or pos_y >= dataset.RasterYSize:
+            dataset = None
+            raise NameError(cyan + "getPixelValueImage() : " + bold + red + "La position (%s, %s) est hors de l'image %s" %(str(pos_x), str(pos_y), image_raster) + endC)
         band = dataset.GetRasterBand(num_band)
-        # Read the data into arrays
-        data = gdalnumeric.BandReadAsArray(band)
-        value_pixel = data[pos_y, pos_x]
+        # Lecture du seul pixel demandé (fenetre 1x1)
+        value_pixel = band.ReadAsArray(pos_x, pos_y, 1, 1)[0, 0]
     dataset = None
 
     return value_pixel
@@ -530,19 +720,115 @@ def getPixelsValueListImage(image_raster, points_coordonnees_list, num_band=1):
     """
 
     value_pixel_list = []
+    if len(points_coordonnees_list) == 0 :
+        return value_pixel_list
+
+    # Lecture par blocs des seuls blocs contenant des points
+    points_coordonnees_array = numpy.asarray(points_coordonnees_list, dtype=numpy.int64).reshape(-1, 2)
+    values_array = getPixelsValueArrayImage(image_raster, points_coordonnees_array[:, 0], points_coordonnees_array[:, 1], num_band)
+    if values_array is not None:
+        value_pixel_list = list(values_array)
+
+    return value_pixel_list
+
+#########################################################################
+# FONCTION getPixelsValueArrayImage()                                   #
+#########################################################################
+def getPixelsValueArrayImage(image_raster, pos_x_array, pos_y_array, num_band=1, fill_value=None):
+    """
+    #   Rôle : Cette fonction permet de retourner les valeurs d'un ensemble de pixels de l'image définis par leurs positions X et Y dans la matrice image
+    #          Les points sont regroupés par bloc du raster et seuls les blocs contenant des points sont lus : la mémoire utilisée ne dépend pas de la taille de l'image
+    #   Paramètres en entrée :
+    #       image_raster : fichier image d'entrée
+    #       pos_x_array  : tableau (ou liste) des positions des pixels en X (colonnes)
+    #       pos_y_array  : tableau (ou liste) des positions des pixels en Y (lignes)
+    #       num_band     : la valeur de la bande choisi par defaut bande 1
+    #       fill_value   : valeur retournée pour les points hors de l'image, par defaut la valeur de nodata de la bande (ou 0 si non définie)
+    #   Paramétres de retour :
+    #       values_array : tableau numpy des valeurs des pixels (dans l'ordre des points), None si l'image ne peut pas être ouverte
+    """
+
+    pos_x_array = numpy.asarray(pos_x_array, dtype=numpy.int64).ravel()
+    pos_y_array = numpy.asarray(pos_y_array, dtype=numpy.int64).ravel()
 
+    values_array = None
     dataset = gdal.Open(image_raster, GA_ReadOnly)
     if dataset is not None:
-        # Get band
+        cols = dataset.RasterXSize
+        rows = dataset.RasterYSize
         band = dataset.GetRasterBand(num_band)
-        # Read the data into arrays
-        data = gdalnumeric.BandReadAsArray(band)
-        # Pour tout les points recuperer leur valeur
-        for coordonnees in points_coordonnees_list:
-            value_pixel_list.append(data[coordonnees[1], coordonnees[0]])
+        block_x, block_y = band.GetBlockSize()
+        nb_blocks_x = (cols + block_x - 1) // block_x
+
+        if fill_value is None:
+            fill_value = band.GetNoDataValue()
+            if fill_value is None:
+                fill_value = 0
+        # Valeur de remplissage non représentable dans le type de la bande (exemple : -9999 sur une bande UInt16) : tableau en double
+        data_type = gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType)
+        if numpy.issubdtype(data_type, numpy.integer):
+            type_info = numpy.iinfo(data_type)
+            if not (float(fill_value).is_integer() and type_info.min <= fill_value <= type_info.max):
+                data_type = numpy.float64
+        elif numpy.issubdtype(data_type, numpy.floating):
+            if numpy.isfinite(fill_value) and abs(float(fill_value)) > float(numpy.finfo(data_type).max):
+                data_type = numpy.float64
+        values_array = numpy.full(len(pos_x_array), fill_value, dtype=data_type)
+
+        # Points hors de l'image
+        inside_array = (pos_x_array >= 0) & (pos_x_array < cols) & (pos_y_array >= 0) & (pos_y_array < rows)
+        if debug >= 1 and not inside_array.all():
+            print(cyan + "getPixelsValueArrayImage() : " + bold + yellow + str(int((~inside_array).sum())) + " point(s) hors de l'image " + image_raster + ", valeur affectée : " + str(fill_value) + endC)
+        index_array = numpy.nonzero(inside_array)[0]
+
+        # Regroupement des points par bloc puis lecture bloc par bloc
+        block_id_array = (pos_y_array[index_array] // block_y) * nb_blocks_x + (pos_x_array[index_array] // block_x)
+        order_array = numpy.argsort(block_id_array, kind='stable')
+        index_array = index_array[order_array]
+        block_id_array = block_id_array[order_array]
+        block_id_list, start_list = numpy.unique(block_id_array, return_index=True)
+        end_list = list(start_list[1:]) + [len(block_id_array)]
+
+        for block_id, start, end in zip(block_id_list, start_list, end_list):
+            block_index_array = index_array[start:end]
+            xoff = int(block_id % nb_blocks_x) * block_x
+            yoff = int(block_id // nb_blocks_x) * block_y
+            data = band.ReadAsArray(xoff, yoff, min(block_x, cols - xoff), min(block_y, rows - yoff))
+            values_array[block_index_array] = data[pos_y_array[block_index_array] - yoff, pos_x_array[block_index_array] - xoff]
+            data = None
+
+        band = None
     dataset = None
 
-    return value_pixel_list
+    return values_array
+
+#########################################################################
+# FONCTION getPixelsValueArrayImageGeographical()                       #
+#########################################################################
+def getPixelsValueArrayImageGeographical(image_raster, coor_x_array, coor_y_array, num_band=1, fill_value=None):
+    """
+    #   Rôle : Cette fonction permet de retourner les valeurs d'un ensemble de pixels de l'image définis par leurs coordonnées X et Y geographiques
+    #          (lecture par blocs, voir getPixelsValueArrayImage())
+    #   Paramètres en entrée :
+    #       image_raster : fichier image d'entrée
+    #       coor_x_array : tableau (ou liste) des coordonnées géographiques des points en X
+    #       coor_y_array : tableau (ou liste) des coordonnées géographiques des points en Y
+    #       num_band     : la valeur de la bande choisi par defaut bande 1
+    #       fill_value   : valeur retournée pour les points hors de l'image, par defaut la valeur de nodata de la bande (ou 0 si non définie)
+    #   Paramétres de retour :
+    #       values_array : tableau numpy des valeurs des pixels (dans l'ordre des points), None si l'image ne peut pas être ouverte
+    """
+
+    dataset = gdal.Open(image_raster, GA_ReadOnly)
+    if dataset is None:
+        return None
+    geotransform = dataset.GetGeoTransform()
+    dataset = None
+
+    pos_x_array = numpy.floor((numpy.asarray(coor_x_array, dtype=numpy.float64) - geotransform[0]) / abs(geotransform[1])).astype(numpy.int64)
+    pos_y_array = numpy.floor((geotransform[3] - numpy.asarray(coor_y_array, dtype=numpy.float64)) / abs(geotransform[5])).astype(numpy.int64)
+
+    return getPixelsValueArrayImage(image_raster, pos_x_array, pos_y_array, num_band, fill_value)
 
 #########################################################################
 # FONCTION getRawDataImage()                                            #
@@ -883,49 +1169,35 @@ def changeDataValueToOtherValue(image_input, image_output, value_to_change,  new
 def changeDataValueToOtherValueBis(image_input, image_output, value_to_change,  new_value, codage="uint16", ram_otb=0):
     """
     #   Rôle : Cette fonction permet de changer les pixels d'une image à une valeur donnée par une autre valeur résultat en fichier de sortie
-    #   Codage : Utilisation de l'outil "OTB"
+    #          Les pixels dont toutes les bandes sont à la valeur value_to_change prennent la valeur new_value sur toutes les bandes
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
     #       image_input : fichier image d'entrée
-    #       image_output : fichier de sortie avec les pixels changés
+    #       image_output : fichier de sortie avec les pixels changés, si None la liste des expressions (une par bande) est retournée sans calcul
     #       value_to_change : valeur des pixels à changer
     #       new_value : nouvel valeur des pixels
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
     #   Paramétres de retour :
-    #       le fichier de sortie avec les pixels changés
+    #       le fichier de sortie avec les pixels changés (ou la liste des expressions si image_output est None)
     """
 
     # Définir le nombre de bande de l'image d'entréé
     cols, rows, bands = getGeometryImage(image_input)
 
-    # Création de l'expression
-    # Exemple : "\"(im1=={0,0,0,0,0}?{1,1,1,1,1}:im1)\""
-
-    expression = "\"(im1=={%s" %(str(value_to_change))
-    for num_band in range(bands-1) :
-        expression = expression + ",%s" %(str(value_to_change))
+    # Création des expressions : (im1=={v,..,v}?{n,..,n}:im1)
+    bands_list = [bandExpression(image_input, num_band) for num_band in range(1, bands+1)]
+    condition = bands_list[0] == value_to_change
+    for band in bands_list[1:]:
+        condition = condition & (band == value_to_change)
+    expressions_list = [whereExpression(condition, new_value, band) for band in bands_list]
 
-    expression = expression + "}?{%s" %(str(new_value))
-
-    for num_band in range(bands) :
-        expression = expression + ",%s" %(str(new_value))
-
-    expression = expression + "}:im1)\""
-
-    # BandmathX pour application de l'expression
-    command = "otbcli_BandMathX -il %s -out %s %s -exp %s" %(image_input,image_output,codage,expression)
-    if ram_otb > 0 :
-        command += " -ram %d " %(ram_otb)
+    if image_output is None:
+        return expressions_list
+    writeRasterExpressions(expressions_list, image_output, codage, ram_max=ram_otb, image_reference=image_input)
 
     if debug >= 3:
-        print(command)
-    exitCode = os.system(command)
-    if exitCode != 0:
-        print(command)
-        raise NameError(bold + red + "changeDataValueToOtherValueBis() : An error occured during otbcli_BandMathX command. See error message above." + endC)
-
-    if debug >= 3:
-        print(cyan + "changeDataValueToOtherValueBis() : " + bold + green + "Create file %s clean to % pixels complete!" %(image_output, str(value_to_change)) + endC)
+        print(cyan + "changeDataValueToOtherValueBis() : " + bold + green + "Create file %s clean to %s pixels complete!" %(image_output, str(value_to_change)) + endC)
 
     return
 
@@ -1089,7 +1361,50 @@ def cutImageByGrid(cut_shape_file ,input_image, output_image, grid_size_x, grid_
 
     if debug >= 3:
         print(cyan + "cutImageByGrid() : Vecteur de découpe des l'image : " + cut_shape_file + endC)
-        print(cyan + "cutImageByGrid() : L'image à découper : " + input_image + endC)
+
+    # Identification de l'emprise de vecteur de découpe
+    empr_xmin, empr_xmax, empr_ymin, empr_ymax = getEmpriseVector(cut_shape_file, format_vector)
+
+    if debug >= 5:
+        print("Emprise vector : ")
+        print("empr_xmin = " + str(empr_xmin))
+        print("empr_xmax = " + str(empr_xmax))
+        print("empr_ymin = " + str(empr_ymin))
+        print("empr_ymax = " + str(empr_ymax))
+        print("\n")
+
+    return cutImageByTile((empr_xmin, empr_xmax, empr_ymin, empr_ymax), input_image, output_image, grid_size_x, grid_size_y, debord, pixel_size_x, pixel_size_y, no_data_value, epsg, format_raster)
+
+#########################################################################
+# FONCTION cutImageByTile()                                             #
+#########################################################################
+def cutImageByTile(tile_emprise, input_image, output_image, grid_size_x, grid_size_y, debord, pixel_size_x=None, pixel_size_y=None, no_data_value=0, epsg=0, format_raster="GTiff"):
+    """
+    # Rôle:
+    #    Cette fonction découpe une image (.tif) par l'emprise d'un carre de grille et un debord, sans fichier vecteur de découpe
+    #    (l'emprise est par exemple celle d'une tuile retournée par Lib_vector.iterTilesVector())
+    #
+    # Paramètres en entrée :
+    #    tile_emprise (tuple) : l'emprise de la tuile (xmin, xmax, ymin, ymax)
+    #    input_image (string) : le nom de l'image à traiter (exmple : "/users/images/image_raw.tif")
+    #    output_image (string) : le nom de l'image resultat découpée (exmple : "/users/images/image_cut.tif")
+    #    grid_size_x (int) : dimension de la grille en x
+    #    grid_size_y (int) : dimension de la grille en y
+    #    debord (int) : utilisé pour éviter les effets de bord. Agrandit artificiellement les imagettes
+    #    pixel_size_x (float) : taille du pixel de sortie en x
+    #    pixel_size_y (float) : taille du pixel de sortie en y
+    #    no_data_value (int) : valeur de l'image d'entrée à transformer en NoData dans l'image de sortie
+    #    epsg (int) : Valeur de la projection par défaut 0, si à 0 c'est la valeur de projection du fichier raster d'entrée qui est utilisé automatiquement
+    #    format_raster (string) : le format du fichier de sortie, par defaut : 'GTiff'
+    #
+    #   Paramétres de retour :
+    #    True si le découpage s'est bien passé, False sinon
+    #
+    """
+
+    if debug >= 3:
+        print(cyan + "cutImageByTile() : Emprise de découpe des l'image : " + str(tile_emprise) + endC)
+        print(cyan + "cutImageByTile() : L'image à découper : " + input_image + endC)
 
     # Constante
     EPSG_DEFAULT = 2154
@@ -1129,18 +1444,9 @@ def cutImageByGrid(cut_shape_file ,input_image, output_image, grid_size_x, grid_
         epsg_proj = EPSG_DEFAULT
 
     if debug >= 3:
-        print(cyan + "cutImageByGrid() : EPSG : " + str(epsg_proj) + endC)
+        print(cyan + "cutImageByTile() : EPSG : " + str(epsg_proj) + endC)
 
-    # Identification de l'emprise de vecteur de découpe
-    empr_xmin, empr_xmax, empr_ymin, empr_ymax = getEmpriseVector(cut_shape_file, format_vector)
-
-    if debug >= 5:
-        print("Emprise vector : ")
-        print("empr_xmin = " + str(empr_xmin))
-        print("empr_xmax = " + str(empr_xmax))
-        print("empr_ymin = " + str(empr_ymin))
-        print("empr_ymax = " + str(empr_ymax))
-        print("\n")
+    empr_xmin, empr_xmax, empr_ymin, empr_ymax = tile_emprise
 
     # Calculer l'emprise arrondi
     xmin, xmax, ymin, ymax = roundPixelEmpriseSize(pixel_size_x, pixel_size_y, empr_xmin, empr_xmax, empr_ymin, empr_ymax)
@@ -1178,12 +1484,12 @@ def cutImageByGrid(cut_shape_file ,input_image, output_image, grid_size_x, grid_
     exit_code = os.system(command)
     if exit_code != 0:
         print(command)
-        print(cyan + "cutImageByGrid() : " + bold + red + "!!! Une erreur c'est produite au cours du decoupage de l'image : " + input_image + ". Voir message d'erreur." + endC, file=sys.stderr)
+        print(cyan + "cutImageByTile() : " + bold + red + "!!! Une erreur c'est produite au cours du decoupage de l'image : " + input_image + ". Voir message d'erreur." + endC, file=sys.stderr)
         ret = False
 
     else :
         if debug >= 4:
-            print(cyan + "cutImageByGrid() : L'image résultat découpée : " + output_image + endC)
+            print(cyan + "cutImageByTile() : L'image résultat découpée : " + output_image + endC)
 
     return ret
 
@@ -1193,13 +1499,14 @@ def cutImageByGrid(cut_shape_file ,input_image, output_image, grid_size_x, grid_
 def reallocateClassRaster(input_image, output_image, reaff_value_list, change_reaff_value_list, codage="uint16", ram_otb=0):
     """
     #   Rôle : Cette fonction permet de réaffecter des valeurs de pixels par d'autre valeurs
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
     #       input_image : fichier image à réaffecter
     #       output_image : fichier image de sortie
     #       reaff_value_list : liste des valeurs à réaffecter
     #       change_reaff_value_list : liste des valeurs de réaffectation
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
     """
 
     if not reaff_value_list == []:
@@ -1212,40 +1519,20 @@ def reallocateClassRaster(input_image, output_image, reaff_value_list, change_re
         else :
             image_output_tmp = output_image
 
-        # Creation de l'expression
-        expression = "\""
-
-        # Pour toute les classes à reallouer
-        for idx_class in range(len(reaff_value_list)):
-            class_to_realloc = reaff_value_list[idx_class]
-            new_realloc_class = change_reaff_value_list[idx_class]
-            expression = expression + "(im1b1==%d?%d:" %(class_to_realloc,new_realloc_class)
-
-        # Fermeture des parenthèse de l'expression
-        expression = expression + "im1b1"
+        # Creation de l'expression par table de correspondance, équivalente à (im1b1==v1?n1:(im1b1==v2?n2:...im1b1)) : la premiere occurrence d'une valeur est prioritaire
+        values_dico = {}
         for idx_class in range(len(reaff_value_list)):
-            expression = expression + ")"
-        final_expression = expression + "\""
+            values_dico.setdefault(float(reaff_value_list[idx_class]), float(change_reaff_value_list[idx_class]))
+        expression = lookupExpression(input_image, values_dico)
 
         if debug >= 3:
             print(cyan + "reallocateClassRaster() : " + endC + "input_image = " + input_image)
             print(cyan + "reallocateClassRaster() : " + endC + "image_output = " + image_output_tmp)
-            print(cyan + "reallocateClassRaster() : " + endC + "final_expression = " + final_expression)
-
-        command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(input_image,image_output_tmp,codage,final_expression)
-        if ram_otb > 0 :
-            command += " -ram %d " %(ram_otb)
-
-        # Application du BandMath
-        if debug >= 3:
-            print(cyan + "reallocateClassRaster() : " + endC + "command : " +  str(command))
+            print(cyan + "reallocateClassRaster() : " + endC + "reaff_value_list = " + str(reaff_value_list) + ", change_reaff_value_list = " + str(change_reaff_value_list))
 
         print(cyan + "reallocateClassRaster() : " + bold + green + "Reallocation of %s : START" %(input_image) + endC)
 
-        exitCode = os.system(command)
-        if exitCode != 0:
-            print(command)
-            raise NameError(bold + red + "reallocateClassRaster() : An error occured during otbcli_BandMath command. See error message above." + endC)
+        writeRasterExpressions([expression], image_output_tmp, codage, ram_max=ram_otb, image_reference=input_image)
 
         # Renommage du fichier d'entrée avec le fichier modifié temporaire dans le cas où aucun fichier de sortie n'est donné
         if output_image is None:
@@ -1266,11 +1553,14 @@ def mergeListRaster(input_images_list, output_merge_image, codage="uint16", ram_
     """
     #   Rôle : Cette fonction permet de merger plusieurs fichier raster en un seul fichier raster
     #          La priorité des pixels est l'ordre de position dans la liste (le premier est le plus prioritaire sur les autres et ainsi de suite))
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
-    #       input_images_list :liste des fichiers images à merger
-    #       output_merge_image : fichier image de sortie fusionné
+    #       input_images_list :liste des fichiers images (ou expressions raster) à merger
+    #       output_merge_image : fichier image de sortie fusionné, si None l'expression de la fusion est retournée sans calcul
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
+    #   Paramétres de retour :
+    #       l'expression de la fusion si output_merge_image est None
     """
 
     if debug >= 3:
@@ -1281,52 +1571,30 @@ def mergeListRaster(input_images_list, output_merge_image, codage="uint16", ram_
 
     MIN_NB_IMAGES = 1
 
-    # Début de la fonction BandMath
-    command = "otbcli_BandMath -il "
-
-    # Début et milieu de l'expression BandMath
-    expression = "\"("
-
     length_input = len(input_images_list)
 
+    # Expression : (im1b1!=0?im1b1:im2b1!=0?im2b1:...0)
+    expression = None
     if length_input > MIN_NB_IMAGES:
+        expression = constantExpression(0)
+        for image_info in reversed(input_images_list):
+            band = bandExpression(image_info)
+            expression = whereExpression(band != 0, band, expression)
+    elif length_input == 1 and (output_merge_image is None or isinstance(input_images_list[0], RasterExpression)):
+        expression = bandExpression(input_images_list[0])
 
-        # Récupération des images d'entrées
-        for image_info in input_images_list :
-            command = command + "%s " %(image_info)
-
-        # Le ficher de sortie
-        command = command + "-out %s %s " %(output_merge_image, codage)
-
-        # Pour toutes les images
-        num_image = 1
-        while num_image <=  length_input :
-            expression = expression + "im%db1!=0?im%db1:" %(num_image,num_image)
-            num_image = num_image + 1
-
-        # Assemblage de l'expression
-        final_expression = expression + "0)\""
-
-        if debug >= 3:
-            print("Expression = " + final_expression)
-
-        # Fin de la fonction BandMath
-        command = command + " -exp %s " %(final_expression)
-        if ram_otb > 0 :
-            command += " -ram %d " %(ram_otb)
-
-        if debug >= 2:
-            print(command)
-
-        exitCode = os.system(command)
-        if exitCode != 0:
-            print(command)
-            raise NameError(bold + red + "mergeListRaster() : An error occured during otbcli_BandMath command. See error message above." + endC)
+    if output_merge_image is None:
+        return expression
 
+    if length_input > MIN_NB_IMAGES:
+        writeRasterExpressions([expression], output_merge_image, codage, ram_max=ram_otb, image_reference=input_images_list[0])
         print(cyan + "mergeListRaster() : " + endC + "Les images d'entrées ont ete mergées")
     else :
         if length_input == 1:
-            shutil.copy2(input_images_list[0], output_merge_image)
+            if expression is not None:
+                writeRasterExpressions([expression], output_merge_image, codage, ram_max=ram_otb, image_reference=input_images_list[0])
+            else :
+                shutil.copy2(input_images_list[0], output_merge_image)
         print(cyan + "mergeListRaster() : " + bold + yellow + "Pas d'images à merger" + endC)
 
     return
@@ -1486,33 +1754,26 @@ def createEdgeExtractionImage(image_input, image_output, filtre, channel=1, xrad
 def createBinaryMask(image_input, image_output, threshold, positif, codage="uint8", ram_otb=0):
     """
     #   Rôle : Cette fonction permet de créer un masque binaire par seuillage d'une image raster à une seul bande
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
-    #       image_input : fichier image d'entrée une bande
-    #       image_output : fichier binaire seuillé en sortie
+    #       image_input : fichier image d'entrée une bande (ou expression raster)
+    #       image_output : fichier binaire seuillé en sortie, si None l'expression du masque est retournée sans calcul
     #       threshold : valeur du seuillage
     #       positif : codage de l'information 1 sur 0 (positif) si vrai sinon 0 sur 1 (negatif)
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
+    #   Paramétres de retour :
+    #       l'expression du masque si image_output est None
     """
 
-    # Création de l'expression
-    if positif:
-        expression = "\"(im1b1 > %f?1:0)\""%(threshold)
-    else :
-        expression = "\"(im1b1 > %f?0:1)\""%(threshold)
+    # Création de l'expression : (im1b1 > threshold?1:0) ou (im1b1 > threshold?0:1)
+    mask = bandExpression(image_input) > threshold
+    if not positif:
+        mask = ~mask
 
-    # bandmath pour seuiller l'image d'entrée et creer une image binaire
-    command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input,image_output,codage,expression)
-    if ram_otb > 0 :
-        command += " -ram %d " %(ram_otb)
-
-    if debug >= 3:
-        print(command)
-
-    exitCode = os.system(command)
-    if exitCode != 0:
-        print(command)
-        raise NameError(bold + red + "createBinaryMask() : An error occured during otbcli_BandMath command. See error message above." + endC)
+    if image_output is None:
+        return mask
+    writeRasterExpressions([mask], image_output, codage, ram_max=ram_otb, image_reference=image_input)
 
     if debug >= 3:
         print(cyan + "createBinaryMask() : " + bold + green + "Create binary file %s complete!" %(image_output) + endC)
@@ -1525,30 +1786,25 @@ def createBinaryMask(image_input, image_output, threshold, positif, codage="uint
 def createBinaryMaskThreshold(image_input, image_output, threshold_min, threshold_max, codage="uint8", ram_otb=0):
     """
     #   Rôle : Cette fonction permet de créer un masque binaire par seuillage min et max d'une image raster à une seul bande
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
-    #       image_input : fichier image d'entrée une bande
-    #       image_output : fichier binaire seuillé en sortie
+    #       image_input : fichier image d'entrée une bande (ou expression raster)
+    #       image_output : fichier binaire seuillé en sortie, si None l'expression du masque est retournée sans calcul
     #       threshold_min : valeur du seuillage min
     #       threshold_max : valeur du seuillage max
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
+    #   Paramétres de retour :
+    #       l'expression du masque si image_output est None
     """
 
-    # Creer l'expression
-    expression = "\"(im1b1 >= %f and im1b1 <= %f ?1:0)\""%(threshold_min, threshold_max)
+    # Creer l'expression : (im1b1 >= threshold_min and im1b1 <= threshold_max ?1:0)
+    band = bandExpression(image_input)
+    mask = (band >= threshold_min) & (band <= threshold_max)
 
-    # bandmath pour seuiller l'image d'entrée est creer une image binaire
-    command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input,image_output,codage,expression)
-    if ram_otb > 0 :
-        command += " -ram %d " %(ram_otb)
-
-    if debug >= 3:
-        print(command)
-
-    exitCode = os.system(command)
-    if exitCode != 0:
-        print(command)
-        raise NameError(bold + red + "createBinaryMaskThreshold() : An error occured during otbcli_BandMath command. See error message above." + endC)
+    if image_output is None:
+        return mask
+    writeRasterExpressions([mask], image_output, codage, ram_max=ram_otb, image_reference=image_input)
 
     if debug >= 3:
         print(cyan + "createBinaryMaskThreshold() : " + bold + green + "Create binary file %s complete!" %(image_output) + endC)
@@ -1561,36 +1817,28 @@ def createBinaryMaskThreshold(image_input, image_output, threshold_min, threshol
 def createBinaryMaskMultiBand(image_input, image_output, no_data_value=0, codage="uint8", ram_otb=0):
     """
     #   Rôle : Cette fonction permet de créer un masque binaire d'une image raster à plusieurs bandes les pixels nodata ou à zéro -> 0, sinon -> 1
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
     #       image_input : fichier image d'entrée multi bandes
-    #       image_output : fichier binaire en sortie
+    #       image_output : fichier binaire en sortie, si None l'expression du masque est retournée sans calcul
     #       no_data_value : valeur du no data à zéro par défaut
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
+    #   Paramétres de retour :
+    #       l'expression du masque si image_output est None
     """
 
     # Recuperer le nombre de bande du fichier
     cols, rows, nb_bands = getGeometryImage(image_input)
 
-    # Creer l'expression en fonction du nombre de bande
-    expression = "\"("
-    for id_bande in range(nb_bands):
-       expression += "im1b%s != %s && "%(str(id_bande + 1), str(no_data_value))
-    expression = expression[0:len(expression)-3]
-    expression += "?1:0)\""
-
-    # Bandmath pour creer une image binaire pixels avec valeur different de nodata ou valeurs à zéro
-    command = "otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input,image_output,codage,expression)
-    if ram_otb > 0 :
-        command += " -ram %d " %(ram_otb)
+    # Creer l'expression en fonction du nombre de bande : (im1b1 != nodata && im1b2 != nodata ... ?1:0)
+    mask = bandExpression(image_input, 1) != no_data_value
+    for id_bande in range(1, nb_bands):
+        mask = mask & (bandExpression(image_input, id_bande + 1) != no_data_value)
 
-    if debug >= 3:
-        print(command)
-
-    exitCode = os.system(command)
-    if exitCode != 0:
-        print(command)
-        raise NameError(bold + red + "createBinaryMaskMultiBand() : An error occured during otbcli_BandMath command. See error message above." + endC)
+    if image_output is None:
+        return mask
+    writeRasterExpressions([mask], image_output, codage, ram_max=ram_otb, image_reference=image_input)
 
     if debug >= 3:
         print(cyan + "createBinaryMaskMultiBand() : " + bold + green + "Create binary file %s complete!" %(image_output) + endC)
@@ -1603,29 +1851,23 @@ def createBinaryMaskMultiBand(image_input, image_output, no_data_value=0, codage
 def applyMaskAnd(image_input, image_mask_input, image_output, codage="float", ram_otb=0) :
     """
     #   Rôle : Cette fonction permet d'appliquer un masque binaire logique "and" à un fichier d'entrée résultat en fichier de sortie
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
-    #       image_input : fichier image d'entrée une bande
-    #       image_mask_input : fichier masque binaire
-    #       image_output : fichier de sortie masqué
+    #       image_input : fichier image d'entrée une bande (ou expression raster)
+    #       image_mask_input : fichier masque binaire (ou expression raster)
+    #       image_output : fichier de sortie masqué, si None l'expression est retournée sans calcul
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
+    #   Paramétres de retour :
+    #       l'expression si image_output est None
     """
 
-    # Creer l'expression
-    expression = "\"(im2b1==1?im1b1:0)\""
+    # Creer l'expression : (im2b1==1?im1b1:0)
+    expression = whereExpression(bandExpression(image_mask_input) == 1, bandExpression(image_input), 0)
 
-    # bandmath pour application du masque binaire
-    command = "otbcli_BandMath -il %s %s -out %s %s -exp %s" %(image_input,image_mask_input,image_output,codage,expression)
-    if ram_otb > 0 :
-        command += " -ram %d " %(ram_otb)
-
-    if debug >= 3:
-        print(command)
-
-    exitCode = os.system(command)
-    if exitCode != 0:
-        print(command)
-        raise NameError(bold + red + "applyMaskAnd() : An error occured during otbcli_BandMath command. See error message above." + endC)
+    if image_output is None:
+        return expression
+    writeRasterExpressions([expression], image_output, codage, ram_max=ram_otb, image_reference=image_input)
 
     if debug >= 3:
         print(cyan + "applyMaskAnd() : " + bold + green + "Apply mask to file %s with operator 'and' complete!" %(image_output) + endC)
@@ -1638,29 +1880,23 @@ def applyMaskAnd(image_input, image_mask_input, image_output, codage="float", ra
 def applyMaskOr(image_input, image_mask_input, image_output, codage="float", ram_otb=0):
     """
     #   Rôle : Cette fonction permet d'appliquer un masque binaire logique "or" à un fichier d'entrée résultat en fichier de sortie
+    #   Codage : Utilisation de la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB)
     #   Paramètres en entrée :
-    #       image_input : fichier image d'entrée une bande
-    #       image_mask_input : fichier masque binaire
-    #       image_output : fichier de sortie masqué
+    #       image_input : fichier image d'entrée une bande (ou expression raster)
+    #       image_mask_input : fichier masque binaire (ou expression raster)
+    #       image_output : fichier de sortie masqué, si None l'expression est retournée sans calcul
     #       codage : type de codage du fichier de sortie
-    #       ram_otb : memoire RAM disponible pour les applications OTB
+    #       ram_otb : memoire RAM maximale utilisée par le calcul en Mo (0 : valeur par défaut de Lib_bandmath)
+    #   Paramétres de retour :
+    #       l'expression si image_output est None
     """
 
-    # Creer l'expression
-    expression = "\"(im2b1==1||im1b1==1?1:0)\""
-
-    # bandmath pour application du masque binaire
-    command = "otbcli_BandMath -il %s %s -out %s %s -exp %s" %(image_input,image_mask_input,image_output,codage,expression)
-    if ram_otb > 0 :
-        command += " -ram %d " %(ram_otb)
+    # Creer l'expression : (im2b1==1||im1b1==1?1:0)
+    expression = (bandExpression(image_mask_input) == 1) | (bandExpression(image_input) == 1)
 
-    if debug >= 3:
-        print(command)
-    exitCode = os.system(command)
-
-    if exitCode != 0:
-        print(command)
-        raise NameError(bold + red + "applyMaskOr() : An error occured during otbcli_BandMath command. See error message above." + endC)
+    if image_output is None:
+        return expression
+    writeRasterExpressions([expression], image_output, codage, ram_max=ram_otb, image_reference=image_input)
 
     if debug >= 3:
         print(cyan + "applyMaskOr() : " + bold + green + "Apply mask to file %s with operator 'or' complete!" %(image_output) + endC)
@@ -2196,7 +2432,9 @@ def rasterizeBinaryVectorWithoutReference(vector_input, raster_output, xmin, ymi
 #########################################################################
 def rasterCalculator(raster_input_list, raster_output, expression, codage='float', ram_otb=0):
     """
-    #   Rôle : Calculatrice raster OTB BandMath
+    #   Rôle : Calculatrice raster (syntaxe OTB BandMath)
+    #          L'expression est évaluée par la calculatrice raster "Lib_bandmath" (calcul par bandes de lignes, sans processus OTB),
+    #          les expressions ou codages non supportés par Lib_bandmath sont calculés avec otbcli_BandMath
     #   Paramètres en entrée :
     #       raster_input_list : liste de fichiers raster en entrée
     #       raster_output : fichier raster en sortie
@@ -2208,6 +2446,21 @@ def rasterCalculator(raster_input_list, raster_output, expression, codage='float
     #       - tous les rasters en entrée doivent être parfaitement superposable (même emprise et même résolution spatiale)
     """
 
+    # Traduction de l'expression pour la calculatrice raster (les noms de fichiers étendus OTB "?&..." sont laissés à OTB)
+    expression_raster = None
+    if codage in CODAGE_DICO and "?" not in raster_output:
+        try:
+            expression_raster = parseBandMathExpression(expression, raster_input_list)
+        except NameError as error:
+            if debug >= 2:
+                print(cyan + "rasterCalculator() : " + bold + yellow + "Expression non supportée par Lib_bandmath, calcul avec otbcli_BandMath : " + str(error) + endC)
+
+    if expression_raster is not None:
+        if debug >= 3:
+            print(cyan + "rasterCalculator() : " + endC + "%s = %s %s" %(raster_output, expression, str(raster_input_list)))
+        writeRasterExpressions([expression_raster], raster_output, codage, ram_max=ram_otb, image_reference=raster_input_list[0])
+        return
+
     # Gestion de la liste des raster en entrée
     raster_input_list_str = ""
     for raster_input in raster_input_list:
@@ -2230,9 +2483,13 @@ def rasterCalculator(raster_input_list, raster_output, expression, codage='float
 #########################################################################
 # FONCTION classificationKmeans()                                       #
 #########################################################################
-def classificationKmeans(image_input, image_mask_input, image_output, nb_class, max_iteration, random_kmeans=None, no_data_value=0, format_raster="GTiff"):
+def classificationKmeans(image_input, image_mask_input, image_output, nb_class, max_iteration, random_kmeans=None, no_data_value=0, format_raster="GTiff", nb_samples_max=1000000, batch_size=0, max_pixels_strip=4194304):
     """
     #   Rôle : Cette fonction permet d'appliquer une classification non superviser de type Kmeans sur une images multi bande
+    #          L'image est parcourue par bandes de lignes alignées sur les blocs GDAL (la mémoire est bornée quelle que soit la taille de l'image) :
+    #          une premiere lecture tire un échantillon aléatoire uniforme (réservoir) des pixels valides sur lequel le Kmeans est appris,
+    #          une seconde lecture affecte chaque pixel au centre le plus proche et écrit directement l'image de sortie
+    #          Les pixels hors masque et ceux dont toutes les bandes sont à la valeur nodata de l'image d'entrée ne sont ni appris ni classés
     #   Codage : Utilisation de les lib "sklearn", ""Gdal"  et numpy"
     #   Paramètres en entrée :
     #       image_input : fichier image d'entrée
@@ -2240,109 +2497,123 @@ def classificationKmeans(image_input, image_mask_input, image_output, nb_class,
     #       image_output : fichier de sortie image classifié
     #       nb_class : nombre de class (custer) pour l image de sortie
     #       max_iteration : Nombre maximal d'itérations de l'algorithme des k-moyennes pour une seule exécution
-    #       random_kmeans : valeur de la graine random pour l execution kmeans par defaut à None
+    #       random_kmeans : valeur de la graine random pour l'échantillonnage et l execution kmeans par defaut à None
     #       no_data_value : la valeur des pixels nodata peut etre 0 si pas de valeur défini
     #       format_raster : Format de l'image de sortie par défaut GTiff (GTiff, HFA...)
+    #       nb_samples_max : nombre maximum de pixels de l'échantillon d'apprentissage, par defaut 1000000
+    #       batch_size : taille des mini-lots, si > 0 l'apprentissage utilise MiniBatchKMeans, par defaut 0 (KMeans sur l'échantillon)
+    #       max_pixels_strip : nombre maximum de pixels d'une bande de lignes lue, par defaut 4194304
     #   Paramétres de retour :
-    #       le fichier de sortie avec les pixels classifiés
+    #       le fichier de sortie avec les pixels classifiés : labels 0 à nb_class-1 pour les pixels valides,
+    #       no_data_value pour les autres (ou nb_class si no_data_value est un des labels des classes)
     """
 
     # Si le fichier de sortie existe deja on le supprime
     if os.path.exists(image_output):
         os.remove(image_output)
 
-    if (image_mask_input != "" and image_mask_input != None) :
-
-        # Creer un fichier temporaire de l imahge masqué
-        name_file = os.path.splitext(image_output)[0]
-        extension_file = os.path.splitext(image_output)[1]
-        image_masked_output = name_file + "_mask" + extension_file
-
-        # Ajuster l'encodage de Gdal à celui de l OTB
-        codage_gdal = getDataTypeImage(image_input)
-        codage = None
-        while switch(str(codage_gdal)):
-            if case("Byte"):
-                codage = "uint8"
-                break
-            if case("UInt16"):
-                codage = "uint16"
-                break
-            if case("Int16"):
-                codage = "int16"
-                break
-            if case("UInt32"):
-                codage = "uint32"
-                break
-            if case("Int32"):
-                codage = "int32"
-                break
-            if case("Float32"):
-                codage = "float"
-                break
-            if case("Float64"):
-                codage = "double"
-                break
-            if case("CInt16"):
-                codage = "cint16"
-                break
-            if case("CInt32"):
-                codage = "cint32"
-                break
-            if case("CFloat32"):
-                codage = "cfloat"
-                break
-            if case("CFloat64"):
-                codage = "cdouble"
-                break
-            break
-
-        applyMaskAnd(image_input, image_mask_input, image_masked_output, codage)
-
-    else :
-        image_masked_output = image_input
+    is_mask = image_mask_input != "" and image_mask_input != None
 
     # Open the dataset
-    dataset = gdal.Open(image_masked_output, GA_ReadOnly)
+    dataset = gdal.Open(image_input, GA_ReadOnly)
+    if dataset is None:
+        raise NameError(bold + red + "classificationKmeans() : Impossible to open file %s" %(image_input) + endC)
     cols = dataset.RasterXSize
     rows = dataset.RasterYSize
     nb_bands = dataset.RasterCount
-    band = dataset.GetRasterBand(1)
-    data_type = band.DataType
-
-    # Initialisation de toute l image avec des zeros
-    img = numpy.zeros((rows, cols, nb_bands), gdal_array.GDALTypeCodeToNumericTypeCode(data_type))
-
-    # For all bands
-    for num_band in range(nb_bands) :
-
-        # Read data array
-        img[:, :, num_band] = dataset.GetRasterBand(num_band + 1).ReadAsArray()
+    no_data_input_list = [dataset.GetRasterBand(num_band + 1).GetNoDataValue() for num_band in range(nb_bands)]
+    block_y = dataset.GetRasterBand(1).GetBlockSize()[1]
+
+    dataset_mask = None
+    if is_mask:
+        dataset_mask = gdal.Open(image_mask_input, GA_ReadOnly)
+        if dataset_mask is None:
+            raise NameError(bold + red + "classificationKmeans() : Impossible to open file %s" %(image_mask_input) + endC)
+        if dataset_mask.RasterXSize != cols or dataset_mask.RasterYSize != rows:
+            raise NameError(bold + red + "classificationKmeans() : The mask %s and the image %s have not the same size" %(image_mask_input, image_input) + endC)
+
+    # Decoupage en bandes de lignes multiples de la hauteur de bloc (toutes les bandes de l'image sont lues ensemble)
+    strips_list = getStripsImage(cols, rows, block_y, max_pixels_strip // nb_bands)
+
+    def readStrip(strip):
+        # Lecture d'une bande de lignes : pixels (nb_pixels x nb_bands) et masque des pixels valides
+        yoff, nb_rows = strip
+        pixels_array = numpy.empty((nb_rows * cols, nb_bands), dtype=numpy.float64)
+        all_no_data = numpy.ones(nb_rows * cols, dtype=bool)
+        for num_band in range(nb_bands):
+            pixels_array[:, num_band] = dataset.GetRasterBand(num_band + 1).ReadAsArray(0, yoff, cols, nb_rows).ravel()
+            if no_data_input_list[num_band] is None:
+                all_no_data[:] = False
+            else:
+                all_no_data &= pixels_array[:, num_band] == no_data_input_list[num_band]
+        valid_array = ~all_no_data
+        if is_mask:
+            valid_array &= dataset_mask.GetRasterBand(1).ReadAsArray(0, yoff, cols, nb_rows).ravel() != 0
+        return pixels_array, valid_array
+
+    # Lecture 1 : échantillon aléatoire uniforme des pixels valides (on garde les nb_samples_max pixels de plus petite clé aléatoire)
+    random_generator = numpy.random.default_rng(random_kmeans)
+    samples_array = numpy.empty((0, nb_bands), dtype=numpy.float64)
+    keys_array = numpy.empty(0, dtype=numpy.float64)
+    nb_valid = 0
+    for strip in strips_list:
+        pixels_array, valid_array = readStrip(strip)
+        pixels_array = pixels_array[valid_array]
+        nb_valid += len(pixels_array)
+        if len(pixels_array) == 0:
+            continue
+        samples_array = numpy.concatenate((samples_array, pixels_array))
+        keys_array = numpy.concatenate((keys_array, random_generator.random(len(pixels_array))))
+        if len(keys_array) > nb_samples_max:
+            index_keep = numpy.argpartition(keys_array, nb_samples_max - 1)[:nb_samples_max]
+            samples_array = samples_array[index_keep]
+            keys_array = keys_array[index_keep]
+        pixels_array = None
+
+    if len(samples_array) < nb_class:
+        raise NameError(bold + red + "classificationKmeans() : Not enough valid pixels (%s) in %s for %s classes" %(str(nb_valid), image_input, str(nb_class)) + endC)
+
+    # Apprentissage du Kmeans sur l'échantillon (dans l'ordre des clés pour ne pas dépendre du découpage en bandes de lignes)
+    samples_array = samples_array[numpy.argsort(keys_array, kind='stable')]
+    nb_samples = len(samples_array)
+    if batch_size > 0:
+        k_means = MiniBatchKMeans(n_clusters=nb_class, n_init='auto', max_iter=max_iteration, batch_size=batch_size, random_state=random_kmeans).fit(samples_array)
+    else:
+        k_means = KMeans(n_clusters=nb_class, n_init='auto', max_iter=max_iteration, random_state=random_kmeans).fit(samples_array)
+    samples_array = None
+    keys_array = None
 
-    # Remodeler le tableau
-    new_shape = (img.shape[0] * img.shape[1], img.shape[2])
-    X = img[:, :, :nb_bands].reshape(new_shape)
+    if debug >= 3:
+        print(cyan + "classificationKmeans() : " + endC + "Kmeans appris sur %s pixels échantillonnés parmi %s pixels valides" %(str(nb_samples), str(nb_valid)) + endC)
 
-    # Application du Kmeans
-    k_means = KMeans(n_clusters=nb_class + 1, n_init='auto', max_iter=max_iteration, random_state=random_kmeans).fit(X)
-    X_cluster = k_means.labels_
-    X_cluster = X_cluster.reshape(img[:, :, 0].shape)
+    # Label des pixels non classés
+    label_no_data = no_data_value
+    if 0 <= no_data_value < nb_class:
+        label_no_data = nb_class
 
-    # Sauvegarde de l'image de sortie
+    # Lecture 2 : classification bande de lignes par bande de lignes directement dans l'image de sortie
+    data_type_out = gdal.GDT_Byte if max(nb_class, label_no_data) <= 255 and label_no_data >= 0 else gdal.GDT_Int32
     driver = gdal.GetDriverByName(format_raster)
-    dataset_out = driver.Create(image_output, cols, rows, 1, gdal.GDT_Byte)
+    dataset_out = driver.Create(image_output, cols, rows, 1, data_type_out)
     dataset_out.SetGeoTransform(dataset.GetGeoTransform()) # sets same geotransform as input
     dataset_out.SetProjection(dataset.GetProjection())     # sets same projection as input
-    dataset_out.GetRasterBand(1).WriteArray(X_cluster)
-    dataset_out.GetRasterBand(1).SetNoDataValue(no_data_value)
+    band_out = dataset_out.GetRasterBand(1)
+    band_out.SetNoDataValue(label_no_data)
+    for strip in strips_list:
+        yoff, nb_rows = strip
+        pixels_array, valid_array = readStrip(strip)
+        labels_array = numpy.full(nb_rows * cols, label_no_data, dtype=numpy.int32)
+        if valid_array.any():
+            labels_array[valid_array] = k_means.predict(pixels_array[valid_array])
+        band_out.WriteArray(labels_array.reshape(nb_rows, cols), 0, yoff)
+        pixels_array = None
     dataset_out.FlushCache()                               # remove from memory
 
     # Close the datasets
-    del dataset_out                                        # delete the data (not the actual geotiff)
-
-
-    if (image_mask_input != "" and image_mask_input != None) :
-        removeFile(image_masked_output)
+    band_out = None
+    dataset_out = None                                     # delete the data (not the actual geotiff)
+    dataset_mask = None
+    dataset = None
 
     if debug >= 3:
         print(cyan + "classificationKmeans() : " + bold + green + "Create file %s classification complete!" %(image_output) + endC)
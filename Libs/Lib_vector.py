@@ -16,9 +16,12 @@
 
 # IMPORTS DIVERS
 from __future__ import print_function
-import sys,os,glob
+import sys,os,glob,math
+from concurrent.futures import ProcessPoolExecutor
 from osgeo import ogr ,osr
 import sqlite3
+import numpy as np
+import shapely
 from rasterstats2 import raster_stats
 from Lib_operator import *
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
@@ -29,6 +32,9 @@ from Lib_text import writeTextFile, appendTextFileCR
 # debug = 3 : affichage maximum de commentaires lors de l'execution du script. Intermédiaire : affichage intermédiaire
 debug = 1
 
+# Nombre d'éléments d'entrée traités par lot dans les opérations de superposition (cutVector, intersectVector, differenceVector)
+NB_FEATURES_OVERLAY_CHUNK = 10000
+
 ########################################################################
 # FONCTION forceProjection()                                           #
 ########################################################################
@@ -3792,7 +3798,7 @@ def cutVectorAll(vector_cut, vector_input, vector_output, overwrite=True, format
     """
     #   Rôle : Découper un fichier shape par l'emprise d'un autre fichier shape de tout type de geometrie
     #   Paramètres en entrée :
-    #       vector_cut : fichier shape de découpage
+    #       vector_cut : fichier shape de découpage ou emprise de découpage sous la forme "xmin ymin xmax ymax" (option -clipsrc d'ogr2ogr)
     #       vector_input : le fichier shape à découper
     #       vector_output:  le fichiers shape résultat découpé
     #       overwrite: si le fichier existe il est ecrasé (cas par défaut)
@@ -3822,10 +3828,205 @@ def cutVectorAll(vector_cut, vector_input, vector_output, overwrite=True, format
         print(cyan + "cutVectorAll() : " + endC + "Le fichier vecteur " + vector_input  + " a ete decoupe resultat : " + vector_output + " type geom = " +geom_type)
     return
 
+#########################################################################
+# FONCTION overlayGeometriesChunk()                                     #
+#########################################################################
+def overlayGeometriesChunk(operation, input_wkb_list, candidates_list, overlay_wkb_dico, geom_name_input=""):
+    """
+    #   Rôle : Calcule avec OGR les géométries de sortie d'un lot d'éléments d'entrée pour une opération de superposition (fonction exécutable dans un processus)
+    #   Paramètres en entrée :
+    #       operation : 'cut' (intersection avec chaque géométrie de découpage), 'intersect' (élément entier conservé pour chaque géométrie intersectée)
+    #                   ou 'difference' (différence successive avec les géométries intersectées)
+    #       input_wkb_list : liste des géométries (WKB) des éléments d'entrée du lot
+    #       candidates_list : pour chaque élément d'entrée, liste triée des index des géométries de superposition qui l'intersectent
+    #       overlay_wkb_dico : dictionnaire index -> géométrie (WKB) des géométries de superposition utilisées par le lot
+    #       geom_name_input : nom du type de géométrie des éléments conservés (opération 'intersect')
+    #   Paramétre de retour :
+    #       pour chaque élément d'entrée, la liste des géométries (WKB) des éléments de sortie à créer
+    """
+
+    overlay_geometries_dico = {}
+    for index_overlay in overlay_wkb_dico:
+        overlay_geometries_dico[index_overlay] = ogr.CreateGeometryFromWkb(overlay_wkb_dico[index_overlay])
+
+    output_wkb_list = []
+    for input_wkb, candidates in zip(input_wkb_list, candidates_list):
+        geometries_wkb_list = []
+
+        if operation == 'difference' :
+            # Différencier la géométrie d'entrée des géométries qui la croisent, dans l'ordre de la couche
+            if candidates == [] or input_wkb is None:
+                geometries_wkb_list.append(input_wkb)
+            else :
+                geometry_output = ogr.CreateGeometryFromWkb(input_wkb)
+                for index_overlay in candidates:
+                    geometry_output = geometry_output.Difference(overlay_geometries_dico[index_overlay])
+                geometries_wkb_list.append(bytes(geometry_output.ExportToWkb()))
+
+        elif candidates != [] :
+            geometry_input = ogr.CreateGeometryFromWkb(input_wkb)
+
+            if operation == 'intersect' :
+                # On garde l'élément entier pour chaque géométrie d'emprise intersectée, il n'est pas découpé
+                if geometry_input.GetGeometryName() == geom_name_input :
+                    geometries_wkb_list = [input_wkb] * len(candidates)
+
+            else :
+                # Découper geometry_input par chaque géométrie de découpage qui le croise
+                for index_overlay in candidates:
+                    try: # si geometry invalide!!!
+                        geom_output = geometry_input.Intersection(overlay_geometries_dico[index_overlay])
+
+                        if geom_output.GetGeometryName() == 'POLYGON' or geom_output.GetGeometryName() == 'MULTIPOLYGON' or geom_output.GetGeometryName() == 'GEOMETRYCOLLECTION':
+
+                            # Si c'est une GEOMETRYCOLLECTION
+                            if debug>=2:
+                                print(geom_output.GetGeometryName())
+                            if geom_output.GetGeometryName() == 'GEOMETRYCOLLECTION' :
+                                # Nettoyage de la géometrie
+                                geom_wkt = geom_output.ExportToWkt()
+                                poly_wkt_out = geom_wkt[geom_wkt.find('POLYGON'):-1]
+                                geom_output = ogr.CreateGeometryFromWkt(poly_wkt_out)
+
+                            geometries_wkb_list.append(None if geom_output is None else bytes(geom_output.ExportToWkb()))
+
+                    except:
+                        print(cyan + "cutVector() : " + endC + bold + yellow + "Géometry error : " + str(geometry_input) + " => " + str(geometry_input) + endC, file=sys.stderr)
+
+        output_wkb_list.append(geometries_wkb_list)
+
+    return output_wkb_list
+
+#########################################################################
+# FONCTION overlayLayers()                                              #
+#########################################################################
+def overlayLayers(operation, layer_input, layer_overlay, layer_output, geom_name_input="", nb_workers=1):
+    """
+    #   Rôle : Superposition d'une couche d'entrée avec une couche de découpage, d'emprise ou de différenciation (cutVector, intersectVector, differenceVector)
+    #          Les géométries de superposition sont lues une fois et indexées (STRtree), la couche d'entrée est filtrée sur leur emprise (sauf différence)
+    #          et lue par lots, les couples qui se croisent sont obtenus en une requête par lot, les géométries de sortie sont calculées avec OGR
+    #          (éventuellement par un pool de processus) et les éléments sont écrits dans l'ordre de la couche d'entrée, dans une seule transaction
+    #   Paramètres en entrée :
+    #       operation : 'cut', 'intersect' ou 'difference' (voir overlayGeometriesChunk())
+    #       layer_input : la couche d'entrée
+    #       layer_overlay : la couche de superposition
+    #       layer_output : la couche de sortie, créée avec les champs de la couche d'entrée
+    #       geom_name_input : nom du type de géométrie des éléments conservés (opération 'intersect')
+    #       nb_workers : nombre de processus de calcul des géométries, 0 pour le nombre de CPU, par défaut 1 (pas de pool de processus)
+    #   Paramétre de retour :
+    #       True si au moins un élément d'entrée croise une géométrie de superposition, False sinon
+    """
+
+    # Lecture et index spatial des géométries de superposition
+    overlay_wkb_list = []
+    layer_overlay.ResetReading()
+    for feature_overlay in layer_overlay:
+        geometry_overlay = feature_overlay.GetGeometryRef()
+        overlay_wkb_list.append(None if geometry_overlay is None else bytes(geometry_overlay.ExportToWkb()))
+    overlay_geometries_array = shapely.from_wkb(overlay_wkb_list) if overlay_wkb_list != [] else np.empty(0, dtype=object)
+    tree = shapely.STRtree(overlay_geometries_array)
+
+    # Filtre spatial de la couche d'entrée : seuls les éléments dans l'emprise des géométries de superposition peuvent être découpés ou intersectés
+    if operation != 'difference' :
+        if shapely.count_coordinates(overlay_geometries_array) == 0:
+            return False
+        overlay_xmin, overlay_ymin, overlay_xmax, overlay_ymax = shapely.total_bounds(overlay_geometries_array).tolist()
+        layer_input.SetSpatialFilterRect(overlay_xmin, overlay_ymin, overlay_xmax, overlay_ymax)
+
+    if nb_workers == 0:
+        nb_workers = getNumberCPU()
+
+    defn_layer_output = layer_output.GetLayerDefn()
+    nb_fields = layer_input.GetLayerDefn().GetFieldCount()
+    use_transaction = layer_output.TestCapability(ogr.OLCTransactions)
+    if use_transaction:
+        layer_output.StartTransaction()
+
+    ret = False
+    feature_id = 0
+    executor = ProcessPoolExecutor(max_workers=nb_workers) if nb_workers > 1 else None
+    pending_list = []
+    try:
+        layer_input.ResetReading()
+        feature_input = layer_input.GetNextFeature()
+        while feature_input or pending_list != []:
+
+            # Lecture d'un lot d'éléments d'entrée
+            fields_chunk_list = []
+            input_wkb_list = []
+            while feature_input and len(input_wkb_list) < NB_FEATURES_OVERLAY_CHUNK:
+                geometry_input = feature_input.GetGeometryRef()
+                input_wkb_list.append(None if geometry_input is None else bytes(geometry_input.ExportToWkb()))
+                fields_chunk_list.append([feature_input.GetFieldAsString(j) for j in range(0, nb_fields)])
+                feature_input.Destroy()
+                feature_input = layer_input.GetNextFeature()
+
+            if input_wkb_list != []:
+                # Couples (élément d'entrée, géométrie de superposition) qui se croisent, dans l'ordre de la couche de superposition
+                input_index_array, overlay_index_array = tree.query(shapely.from_wkb(input_wkb_list), predicate='intersects')
+                order_array = np.lexsort((overlay_index_array, input_index_array))
+                input_index_array = input_index_array[order_array]
+                overlay_index_array = overlay_index_array[order_array]
+                bounds_array = np.searchsorted(input_index_array, np.arange(len(input_wkb_list) + 1))
+                overlay_index_list = overlay_index_array.tolist()
+                candidates_list = [overlay_index_list[bounds_array[index]:bounds_array[index + 1]] for index in range(len(input_wkb_list))]
+                if overlay_index_list != []:
+                    ret = True
+                overlay_wkb_dico = {index_overlay : overlay_wkb_list[index_overlay] for index_overlay in set(overlay_index_list)}
+
+                if executor is None:
+                    pending_list.append((fields_chunk_list, overlayGeometriesChunk(operation, input_wkb_list, candidates_list, overlay_wkb_dico, geom_name_input)))
+                else :
+                    pending_list.append((fields_chunk_list, executor.submit(overlayGeometriesChunk, operation, input_wkb_list, candidates_list, overlay_wkb_dico, geom_name_input)))
+
+            # Ecriture des lots terminés dans l'ordre de lecture (au plus 2 lots en attente par processus)
+            while pending_list != [] and (not feature_input or executor is None or len(pending_list) >= 2 * nb_workers):
+                fields_chunk_list, output_chunk = pending_list.pop(0)
+                if executor is not None:
+                    output_chunk = output_chunk.result()
+                for fields_list, geometries_wkb_list in zip(fields_chunk_list, output_chunk):
+                    for geometry_wkb in geometries_wkb_list:
+                        # Création de l'élément de sortie selon le modèle
+                        feature_output = ogr.Feature(defn_layer_output)
+
+                        # Assignation d'un numéro de FID à ce nouvel élément
+                        feature_output.SetFID(feature_id)
+                        feature_id += 1
+
+                        # Pour tous les Champs
+                        for j in range(0, nb_fields):
+                            feature_output.SetField(j, fields_list[j])
+
+                        # Assignation de la géométrie à l'élément de sortie
+                        if geometry_wkb is not None:
+                            feature_output.SetGeometry(ogr.CreateGeometryFromWkb(geometry_wkb))
+
+                        # Création de ce nouvel élément
+                        layer_output.CreateFeature(feature_output)
+                        feature_output.Destroy()
+
+    except Exception:
+        for fields_chunk_list, output_chunk in pending_list:
+            if executor is not None:
+                output_chunk.cancel()
+        if use_transaction:
+            layer_output.RollbackTransaction()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        layer_input.SetSpatialFilter(None)
+
+    if use_transaction:
+        layer_output.CommitTransaction()
+    layer_output.SyncToDisk()
+
+    return ret
+
 #########################################################################
 # FONCTION cutVector()                                                  #
 #########################################################################
-def cutVector(vector_cut, vector_input, vector_output, overwrite=True, format_vector='ESRI Shapefile'):
+def cutVector(vector_cut, vector_input, vector_output, overwrite=True, format_vector='ESRI Shapefile', nb_workers=1):
     """
     #   Rôle : Découper un fichier shape par l'emprise d'un autre fichier shape (polygone)
     #   Paramètres en entrée :
@@ -3834,6 +4035,7 @@ def cutVector(vector_cut, vector_input, vector_output, overwrite=True, format_ve
     #       vector_output:  le fichier shape résultat découpé
     #       overwrite: si le fichier existe il est ecrasé (cas par défaut)
     #       format_vector : format du fichier vecteur
+    #       nb_workers : nombre de processus de calcul des géométries, 0 pour le nombre de CPU, par défaut 1
     #   Paramétre de retour :
     #       Return True si au moins un polygon du fichier vector_output à intersecter avec le fichier vector_cut, False sinon
     """
@@ -3863,7 +4065,6 @@ def cutVector(vector_cut, vector_input, vector_output, overwrite=True, format_ve
             sys.exit(1)
         layer_input = data_source_input.GetLayer()
         name_layer_input = layer_input.GetName()
-        feature_input = layer_input.GetNextFeature()
 
         # Ouverture en mode lecture du fichier différencié (vector_cut, 0)
         data_source_cut = driver.Open(vector_cut, 0)
@@ -3884,78 +4085,14 @@ def cutVector(vector_cut, vector_input, vector_output, overwrite=True, format_ve
         defn_layer_output = layer_output.GetLayerDefn()                                                      # Creation du modèle d'"éléments" à partir des caractéristiques de la couche (type de géométrie : polygone...)
 
         # Ajout des champs du fichier d'entrée au fichier de sortie
-        featureID = 0
         defn_layer_input = layer_input.GetLayerDefn()
         nb_fields = defn_layer_input.GetFieldCount()
         for i in range(0, nb_fields):
             field_defn = defn_layer_input.GetFieldDefn(i)
             layer_output.CreateField(field_defn)
 
-        # Parcours des éléments du fichier d'entrée
-        while feature_input:
-
-            layer_cut.ResetReading()
-            # Récupération de la géométrie de l'élément du fichier d'entrée
-            geometry_input = feature_input.GetGeometryRef()
-            feature_cut = layer_cut.GetNextFeature()
-
-            # Parcours des éléments du fichier de découpage
-            while feature_cut:
-                # Récupération de la géométrie de l'élément du fichier de découpage
-                geometry_cut = feature_cut.GetGeometryRef()
-
-                # Si les géométries sont valides
-                if geometry_input != 0 and geometry_input is not None and geometry_cut != 0 and geometry_cut is not None :
-                    # Si les géométries des éléments des fichiers d'entrée et de découpage se croisent (=1)
-                    if geometry_input.Intersects(geometry_cut) == 1: # Variante possible avec Overlaps
-                        # Il y a au moins un polygone qui intersects
-                        ret = True
-
-                        try: # si geometry invalide!!!
-
-                            # Découper geometry_input par geometry_cut
-                            geom_output = geometry_input.Intersection(geometry_cut)
-
-                            if geom_output.GetGeometryName() == 'POLYGON' or geom_output.GetGeometryName() == 'MULTIPOLYGON' or geom_output.GetGeometryName() == 'GEOMETRYCOLLECTION':
-
-                                # Si c'est une GEOMETRYCOLLECTION
-                                if debug>=2:
-                                    print(geom_output.GetGeometryName())
-                                if geom_output.GetGeometryName() == 'GEOMETRYCOLLECTION' :
-                                    # Nettoyage de la géometrie
-                                    geom_wkt = geom_output.ExportToWkt()
-                                    poly_wkt_out = geom_wkt[geom_wkt.find('POLYGON'):-1]
-                                    geom_output = ogr.CreateGeometryFromWkt(poly_wkt_out)
-
-                                # Création de l'élément (du polygone) de sortie selon le modèle
-                                feature_output = ogr.Feature(defn_layer_output)
-
-                                # Assignation d'un numéro de FID à ce nouvel élément
-                                feature_output.SetFID(featureID)
-                                featureID += 1
-
-                                # Pour tous les Champs
-                                for j in range(0, nb_fields):
-                                    field_label = feature_input.GetFieldAsString(j)
-                                    feature_output.SetField(j, field_label)
-
-                                # Assignation de la géométrie de découpage à l'élément de sortie
-                                feature_output.SetGeometry(geom_output)
-
-                                # Création de ce nouvel élément
-                                layer_output.CreateFeature(feature_output)
-                                layer_output.SyncToDisk()
-                                feature_output.Destroy()
-
-                        except:
-                            print(cyan + "cutVector() : " + endC + bold + yellow + "Géometry error : " + str(geometry_input) + " => " + str(geometry_input) + endC, file=sys.stderr)
-
-                feature_cut.Destroy()
-                feature_cut = layer_cut.GetNextFeature()
-
-            # Passer à l'élément d'entrée suivant
-            feature_input.Destroy()
-            feature_input = layer_input.GetNextFeature()
+        # Découpage des éléments d'entrée par les éléments de découpage qui les croisent
+        ret = overlayLayers('cut', layer_input, layer_cut, layer_output, nb_workers=nb_workers)
 
         # Fermeture des fichiers shape
         data_source_input.Destroy()
@@ -3969,7 +4106,7 @@ def cutVector(vector_cut, vector_input, vector_output, overwrite=True, format_ve
 #########################################################################
 # FONCTION intersectVector()                                            #
 #########################################################################
-def intersectVector(vector_emprise, vector_input, vector_output, overwrite=True, format_vector='ESRI Shapefile'):
+def intersectVector(vector_emprise, vector_input, vector_output, overwrite=True, format_vector='ESRI Shapefile', nb_workers=1):
     """
     #   Rôle : Récupère les entités d'un fichier shape dans l'emprise d'un autre fichier shape (polygone)
     #   Paramètres en entrée :
@@ -3978,6 +4115,7 @@ def intersectVector(vector_emprise, vector_input, vector_output, overwrite=True,
     #       vector_output:  le fichiers shape résultat intersecté
     #       overwrite: si le fichier existe il est ecrasé (cas par défaut)
     #       format_vector : format du fichier vecteur
+    #       nb_workers : nombre de processus de calcul des géométries, 0 pour le nombre de CPU, par défaut 1
     """
 
     if debug >=2:
@@ -4035,60 +4173,14 @@ def intersectVector(vector_emprise, vector_input, vector_output, overwrite=True,
         defn_layer_output = layer_output.GetLayerDefn()
 
         # Ajout des champs du fichier d'entrée au fichier de sortie
-        featureID = 0
         defn_layer_input = layer_input.GetLayerDefn()
         nb_fields = defn_layer_input.GetFieldCount()
         for i in range(0, nb_fields):
             field_defn = defn_layer_input.GetFieldDefn(i)
             layer_output.CreateField(field_defn)
 
-        # Parcours des éléments du fichier d'entrée
-        while feature_input:
-
-            layer_intersect.ResetReading()
-            # Récupération de la géométrie de l'élément du fichier d'entrée
-            geometry_input = feature_input.GetGeometryRef()
-            feature_intersect = layer_intersect.GetNextFeature()
-
-            # Parcours des éléments du fichier d'intersect
-            while feature_intersect:
-                # Récupération de la géométrie de l'élément du fichier d'intersect
-                geometry_intersect = feature_intersect.GetGeometryRef()
-
-                # Si les géométries des éléments des fichiers d'entrée et d'intersect se croisent (=1)
-                if geometry_input.Intersects(geometry_intersect) == 1: # Variante possible avec Overlaps
-                    # Différence avec la fonction cutVector : on garde le polygone sélectionné entier, on ne le découpe pas à l'emprise !
-                    geom_output = geometry_input
-                    test_geom_output = geom_output.GetGeometryName()
-
-                    if test_geom_input == test_geom_output:
-
-                        # Création de l'élément de sortie selon le modèle
-                        feature_output = ogr.Feature(defn_layer_output)
-
-                        # Assignation d'un numéro de FID à ce nouvel élément
-                        feature_output.SetFID(featureID)
-                        featureID += 1
-
-                        # Pour tous les Champs
-                        for j in range(0, nb_fields):
-                            field_label = feature_input.GetFieldAsString(j)
-                            feature_output.SetField(j, field_label)
-
-                        # Assignation de la géométrie de découpage à l'élément de sortie
-                        feature_output.SetGeometry(geom_output)
-
-                        # Création de ce nouvel élément
-                        layer_output.CreateFeature(feature_output)
-                        layer_output.SyncToDisk()
-                        feature_output.Destroy()
-
-                feature_intersect.Destroy()
-                feature_intersect = layer_intersect.GetNextFeature()
-
-            # Passer à l'élément d'entrée suivant
-            feature_input.Destroy()
-            feature_input = layer_input.GetNextFeature()
+        # Sélection des éléments d'entrée qui croisent les éléments d'emprise
+        overlayLayers('intersect', layer_input, layer_intersect, layer_output, test_geom_input, nb_workers)
 
         # Fermeture des fichiers shape
         data_source_input.Destroy()
@@ -4102,7 +4194,7 @@ def intersectVector(vector_emprise, vector_input, vector_output, overwrite=True,
 #########################################################################
 # FONCTION differenceVector()                                           #
 #########################################################################
-def differenceVector(vector_diff, vector_input, vector_output, overwrite=True, format_vector='ESRI Shapefile'):
+def differenceVector(vector_diff, vector_input, vector_output, overwrite=True, format_vector='ESRI Shapefile', nb_workers=1):
     """
     #   Rôle : Différencier un fichier shape par un autre fichier shape (polygone)
     #   Paramètres en entrée :
@@ -4111,6 +4203,7 @@ def differenceVector(vector_diff, vector_input, vector_output, overwrite=True, f
     #       vector_output:  le fichiers shape résultat découpé
     #       overwrite: si le fichier existe il est ecrasé (cas par défaut)
     #       format_vector : format du fichier vecteur
+    #       nb_workers : nombre de processus de calcul des géométries, 0 pour le nombre de CPU, par défaut 1
     """
 
     if debug >=2:
@@ -4169,67 +4262,101 @@ def differenceVector(vector_diff, vector_input, vector_output, overwrite=True, f
         defn_layer_output = layer_output.GetLayerDefn()
 
         # Ajout des champs du fichier d'entrée au fichier de sortie
-        featureID = 0
         defn_layer_input = layer_input.GetLayerDefn()
         nb_fields = defn_layer_input.GetFieldCount()
         for i in range(0, nb_fields):
             field_defn = defn_layer_input.GetFieldDefn(i)
             layer_output.CreateField(field_defn)
 
-        # Parcours des éléments du fichier d'entrée
-        while feature_input:
-
-            layer_diff.ResetReading()
-            # Récupération de la géométrie de l'élément du fichier d'entrée
-            geometry_input = feature_input.GetGeometryRef()
-            geometry_output = geometry_input.Clone()
-            feature_diff = layer_diff.GetNextFeature()
-
-            # Parcours des éléments du fichier différencié
-            while feature_diff:
-                # Récupération de la géométrie de l'élément du fichier différencié
-                geometry_diff = feature_diff.GetGeometryRef()
-
-                # Si les géométries des éléments des fichiers d'entrée et différencié se croisent (=1)
-                if geometry_input.Intersects(geometry_diff) == 1: # Variante possible avec Overlaps
-
-                    # Différencier geometry_input de geometry_diff
-                    geometry_output = geometry_output.Difference(geometry_diff)
+        # Différenciation des éléments d'entrée par les éléments qui les croisent
+        overlayLayers('difference', layer_input, layer_diff, layer_output, nb_workers=nb_workers)
 
-                feature_diff.Destroy()
-                feature_diff = layer_diff.GetNextFeature()
+        # Fermeture des fichiers shape
+        data_source_input.Destroy()
+        data_source_diff.Destroy()
+        data_source_output.Destroy()
 
-            # Création de l'élément (du polygone) de sortie selon le modèle
-            feature_output = ogr.Feature(defn_layer_output)
+    if debug >=2:
+        print(cyan + "differenceVector() : " + endC + "Le fichier vecteur " + vector_input  + " a ete différencie resultat : " + vector_output)
+    return
 
-            # Assignation d'un numéro de FID à ce nouvel élément
-            feature_output.SetFID(featureID)
-            featureID += 1
+#########################################################################
+# FONCTION formatTileName()                                             #
+#########################################################################
+def formatTileName(entite):
+    """
+    #   Rôle : Formate l'identifiant d'une tuile (valeur de champ ou index) pour l'utiliser dans un nom de fichier
+    #   Paramètres en entrée :
+    #       entite : la valeur identifiant la tuile
+    #   En sortie :
+    #       l'identifiant formaté (sans tiret ni caractère accentué)
+    """
 
-            # Pour tous les Champs
-            for j in range(0, nb_fields):
-                field_label = feature_input.GetFieldAsString(j)
-                feature_output.SetField(j, field_label)
+    return str(entite).replace("-", "_").replace("â", "a").replace("î", "i").replace("ê", "e").replace("è", "e").replace("é", "e").replace("ç", "c")
 
-            # Assignation de la géométrie différenciée à l'élément de sortie
-            feature_output.SetGeometry(geometry_output)
+#########################################################################
+# FONCTION iterTilesVector()                                            #
+#########################################################################
+def iterTilesVector(vector_input, field="", buffer_dist=0.0, geotransform=None, raster_size=None, format_vector='ESRI Shapefile') :
+    """
+    #   Rôle : Parcourt les tuiles d'un vecteur grille (un élément par tuile) sans créer de fichier vecteur par tuile (remplace splitVector
+    #          lorsque les fichiers par tuile ne servent qu'à récupérer la géométrie ou l'emprise de la tuile)
+    #   Paramètres en entrée :
+    #       vector_input : vecteur grille
+    #       field : optionnel : nom du champ dont la valeur identifie la tuile, si non renseigné l'identifiant est l'index de l'élément (0, 1, 2, ...)
+    #               l'identifiant est formaté comme dans les noms des fichiers créés par splitVector
+    #       buffer_dist : optionnel : distance dont est agrandie l'emprise de la tuile (débord), par defaut : 0.0
+    #       geotransform : optionnel : géotransformation gdal du raster dans lequel calculer la fenêtre pixel de la tuile, par defaut : None (pas de fenêtre)
+    #       raster_size : optionnel : dimensions (colonnes, lignes) du raster, la fenêtre pixel est alors limitée au raster, par defaut : None
+    #       format_vector : format du fichier vecteur. Optionnel, par default : 'ESRI Shapefile'
+    #   En sortie :
+    #       générateur de tuples (identifiant, géométrie ogr de la tuile, emprise agrandie (xmin, xmax, ymin, ymax), fenêtre pixel (xoff, yoff, xsize, ysize) ou None)
+    """
 
-            # Création de ce nouvel élément
-            layer_output.CreateFeature(feature_output)
-            layer_output.SyncToDisk()
-            feature_output.Destroy()
+    if debug >=2:
+        print(cyan + "iterTilesVector() : " + endC + "Parcours des tuiles du vecteur : " + vector_input)
 
-            feature_input.Destroy()
-            feature_input = layer_input.GetNextFeature()
+    driver = ogr.GetDriverByName(format_vector)
+    data_source_input = driver.Open(vector_input, 0)
+    if data_source_input is None:
+        raise NameError(cyan + "iterTilesVector() : " + bold + red + "Could not open file " + str(vector_input) + endC)
+    input_layer = data_source_input.GetLayer()
+    if field != "" and input_layer.GetLayerDefn().GetFieldIndex(field) < 0:
+        data_source_input.Destroy()
+        raise NameError(cyan + "iterTilesVector() : " + bold + red + "Pas de champ portant ce nom : " + str(field) + endC)
 
-        # Fermeture des fichiers shape
+    try:
+        index = 0
+        for feature_input in input_layer:
+            entite = index if field == "" else feature_input.GetField(field)
+            index += 1
+            geometry = feature_input.GetGeometryRef()
+            if geometry is None:
+                continue
+            geometry = geometry.Clone()
+
+            # Emprise agrandie de la tuile
+            xmin, xmax, ymin, ymax = geometry.GetEnvelope()
+            bounds = (xmin - buffer_dist, xmax + buffer_dist, ymin - buffer_dist, ymax + buffer_dist)
+
+            # Fenêtre pixel de l'emprise agrandie dans le raster
+            window = None
+            if geotransform is not None:
+                col_start = int(math.floor((bounds[0] - geotransform[0]) / geotransform[1] + 1e-6))
+                col_end = int(math.ceil((bounds[1] - geotransform[0]) / geotransform[1] - 1e-6))
+                row_start = int(math.floor((bounds[3] - geotransform[3]) / geotransform[5] + 1e-6))
+                row_end = int(math.ceil((bounds[2] - geotransform[3]) / geotransform[5] - 1e-6))
+                if raster_size is not None:
+                    col_start, col_end = max(0, col_start), min(raster_size[0], col_end)
+                    row_start, row_end = max(0, row_start), min(raster_size[1], row_end)
+                window = (col_start, row_start, max(0, col_end - col_start), max(0, row_end - row_start))
+
+            yield formatTileName(entite), geometry, bounds, window
+    finally:
         data_source_input.Destroy()
-        data_source_diff.Destroy()
-        data_source_output.Destroy()
 
     if debug >=2:
-        print(cyan + "differenceVector() : " + endC + "Le fichier vecteur " + vector_input  + " a ete différencie resultat : " + vector_output)
-    return
+        print(cyan + "iterTilesVector() : " + endC + str(index) + " tuiles parcourues dans le vecteur : " + vector_input)
 
 #########################################################################
 # FONCTION splitVector()                                                #
@@ -4237,6 +4364,7 @@ def differenceVector(vector_diff, vector_input, vector_output, overwrite=True, f
 def splitVector(vector_input, dir_output, field="", projection=2154, format_vector='ESRI Shapefile', extension_vector='.shp') :
     """
     #   Rôle : créer un nouveau vecteur pour chaque objet du vecteur en entrée
+    #          (pour traiter les tuiles d'une grille sans fichier intermédiaire voir iterTilesVector())
     #   Paramètres en entrée :
     #       vector_input : vecteur à diviser
     #       dir_output : repertoire dans lequel mettre les nouveaux vecteurs
@@ -4289,7 +4417,7 @@ def splitVector(vector_input, dir_output, field="", projection=2154, format_vect
         geometry = feature_input.GetGeometryRef()
 
         # Création d'un shape par entité de input_layer
-        entite = str(entite).replace("-", "_").replace("â", "a").replace("î", "i").replace("ê", "e").replace("è", "e").replace("é", "e").replace("ç", "c")
+        entite = formatTileName(entite)
         new_shape = dir_output + os.sep + os.path.splitext(os.path.basename(vector_input))[0] + "_" + str(entite) + extension_vector
         path_list.append(str(new_shape))
 
@@ -4714,6 +4842,85 @@ def createPointsFromCoordList(attribute_dico, points_attr_coord_dico, vector_out
 
     return
 
+#########################################################################
+# FONCTION createPointsFromCoordArrays()                                #
+#########################################################################
+def createPointsFromCoordArrays(attribute_dico, coord_x_array, coord_y_array, values_attr_dico, vector_output, projection=2154, format_vector='ESRI Shapefile', nb_points_transaction=100000):
+    """
+    #   Rôle : Cette fonction permet de créer une couche vecteur de points à partir de tableaux de coordonnées et de valeurs d'attributs
+    #          (version en masse de createPointsFromCoordList : pas de dictionnaire par point, écriture par lots de points dans des transactions)
+    #   paramètres :
+    #       attribute_dico : dictionaire contenent la liste des noms des attributs et leur type sous forme ogr.OFTString, ogr.OFTInteger, ogr.OFTReal...
+    #       coord_x_array : tableau (numpy ou liste) des coordonnées x des points
+    #       coord_y_array : tableau (numpy ou liste) des coordonnées y des points
+    #       values_attr_dico : dictionaire contenent pour chaque attribut le tableau des valeurs des points {"ValClass":[val1, val2, val3...]}
+    #       vector_output : fichier vecteur de sortie contenant les points
+    #       projection : Optionnel : par défaut 2154
+    #       format_vector : format du fichier vecteur. Optionnel, par default : 'ESRI Shapefile'
+    #       nb_points_transaction : nombre de points écrits par transaction (si le format le permet). Optionnel, par default : 100000
+    #
+    """
+
+    if debug >=2:
+        print(cyan + "createPointsFromCoordArrays() : " + endC + "Creation d'une couche de %d points à partir de tableaux de coordonnées" %(len(coord_x_array)))
+
+    # Create driver ogr
+    driver = ogr.GetDriverByName(format_vector)
+
+    # Création du dossier de sortie s'il n'existe pas
+    if not os.path.exists(os.path.split(vector_output)[0]):
+        os.makedirs(os.path.split(vector_output)[0])
+
+    # Suppression du fichier s'il existe déjà
+    if os.path.exists(vector_output):
+        driver.DeleteDataSource(vector_output)
+
+    # Initialisations pour la création du fichier de sortie
+    data_source_output = driver.CreateDataSource(vector_output)
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(projection)
+    layer_output = data_source_output.CreateLayer(vector_output, srs, ogr.wkbPoint)
+
+    # Création des champs du fichier de sortie
+    for name_attribute in attribute_dico:
+        field = ogr.FieldDefn(name_attribute, attribute_dico[name_attribute])
+        layer_output.CreateField(field)
+
+    # Conversion des tableaux en listes python et index des champs
+    layer_definition = layer_output.GetLayerDefn()
+    coord_x_list = coord_x_array.tolist() if hasattr(coord_x_array, "tolist") else list(coord_x_array)
+    coord_y_list = coord_y_array.tolist() if hasattr(coord_y_array, "tolist") else list(coord_y_array)
+    fields_values_list = []
+    for name_attribute in values_attr_dico:
+        values = values_attr_dico[name_attribute]
+        fields_values_list.append((layer_definition.GetFieldIndex(name_attribute), values.tolist() if hasattr(values, "tolist") else list(values)))
+    use_transaction = layer_output.TestCapability(ogr.OLCTransactions)
+
+    # Création des points par lots
+    nb_points = len(coord_x_list)
+    for start_point in range(0, nb_points, nb_points_transaction):
+        if use_transaction:
+            layer_output.StartTransaction()
+        for index_point in range(start_point, min(nb_points, start_point + nb_points_transaction)):
+            geom_output = ogr.Geometry(ogr.wkbPoint)
+            geom_output.AddPoint_2D(coord_x_list[index_point], coord_y_list[index_point])
+            feature_output = ogr.Feature(layer_definition)
+            feature_output.SetGeometry(geom_output)
+            for index_field, values_list in fields_values_list:
+                feature_output.SetField(index_field, values_list[index_point])
+            layer_output.CreateFeature(feature_output)
+        if use_transaction:
+            layer_output.CommitTransaction()
+
+    # Fermeture du fichier shape
+    layer_output.SyncToDisk()
+    data_source_output.Destroy()
+
+    if debug >=2:
+        print(cyan + "createPointsFromCoordArrays() : " + endC + "Le fichier vecteur resultat : " +  str(vector_output))
+
+    return
+
 #########################################################################
 # FONCTION createContourVector()                                        #
 #########################################################################
@@ -1,6 +1,7 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 from .main import gen_zonal_stats, raster_stats, zonal_stats
+from .label import gen_zonal_stats_label, zonal_stats_label
 from .point import gen_point_query, point_query
 from rasterstats import cli
 from rasterstats._version import __version__
@@ -10,6 +11,8 @@ __all__ = [
     "gen_point_query",
     "raster_stats",
     "zonal_stats",
+    "gen_zonal_stats_label",
+    "zonal_stats_label",
     "point_query",
     "cli",
 ]
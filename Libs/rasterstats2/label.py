@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+
+import math
+
+import numpy as np
+import shapely
+from affine import Affine
+from rasterio import features
+from shapely.geometry import shape, box
+
+from .io import read_features, Raster, window_bounds, bounds_window, beyond_extent
+from .utils import check_stats, get_percentile, remap_categories, key_assoc_val, key_assoc_val2, boxify_points
+
+
+DEFAULT_STRIP_PIXELS = 4194304
+
+
+def zonal_stats_label(*args, **kwargs):
+    """Zonal statistics computed with a single label raster pass.
+
+    All arguments are passed directly to ``gen_zonal_stats_label``.
+    Returns a list rather than a generator."""
+    return list(gen_zonal_stats_label(*args, **kwargs))
+
+
+def split_layers(geoms, all_touched=False):
+    """Assign each geometry to a layer so that geometries sharing pixels
+    are never burnt into the same label raster.
+
+    Two geometries conflict when their interiors intersect (or when they
+    simply intersect if ``all_touched``, since boundary pixels are then shared).
+    Non overlapping coverages (grids, segmentations) fit in a single layer.
+
+    Returns
+    -------
+    list of int: layer number of each geometry
+    """
+    geoms_array = np.array(geoms, dtype=object)
+    tree = shapely.STRtree(geoms_array)
+    left, right = tree.query(geoms_array, predicate="intersects")
+    keep = left < right
+    left, right = left[keep], right[keep]
+    if not all_touched and left.size > 0:
+        keep = shapely.relate_pattern(geoms_array[left], geoms_array[right], "T********")
+        left, right = left[keep], right[keep]
+
+    conflicts = [[] for _ in geoms]
+    for i, j in zip(left.tolist(), right.tolist()):
+        conflicts[j].append(i)
+
+    layer_of = [0] * len(geoms)
+    for i in range(len(geoms)):
+        used = set(layer_of[j] for j in conflicts[i])
+        k = 0
+        while k in used:
+            k += 1
+        layer_of[i] = k
+    return layer_of
+
+
+def count_outside(geom, rast, all_touched=False):
+    """Number of pixels of the geometry, rasterized on the raster grid,
+    that fall outside the raster extent (nodata for a boundless read)"""
+    window = bounds_window(geom.bounds, rast.affine)
+    if not beyond_extent(window, rast.shape):
+        return 0
+    (row_start, row_stop), (col_start, col_stop) = window
+    if row_stop <= row_start or col_stop <= col_start:
+        return 0
+    labels = features.rasterize(
+        [(geom, 1)],
+        out_shape=(row_stop - row_start, col_stop - col_start),
+        transform=rast.affine * Affine.translation(col_start, row_start),
+        fill=0,
+        dtype="uint8",
+        all_touched=all_touched,
+    )
+    height, width = rast.shape
+    rows = np.arange(row_start, row_stop)
+    cols = np.arange(col_start, col_stop)
+    inside = ((rows >= 0) & (rows < height))[:, np.newaxis] & ((cols >= 0) & (cols < width))[np.newaxis, :]
+    return int(np.count_nonzero(labels[~inside]))
+
+
+def lerp(a, b, t):
+    """Linear interpolation, written like numpy's percentile interpolation"""
+    if t >= 0.5:
+        return b - (b - a) * (1 - t)
+    return a + (b - a) * t
+
+
+def value_at_rank(keys, cumulated, rank):
+    """Value at the given rank (0 based) of the sorted zone values"""
+    return keys[int(np.searchsorted(cumulated, rank, side="right"))]
+
+
+def gen_zonal_stats_label(
+    vectors,
+    raster,
+    layer=0,
+    band=1,
+    nodata=None,
+    affine=None,
+    stats=None,
+    all_touched=False,
+    categorical=False,
+    category_map=None,
+    prefix=None,
+    strip_pixels=DEFAULT_STRIP_PIXELS,
+    **kwargs,
+):
+    """Zonal statistics of raster values aggregated to vector geometries,
+    computed by burning all zone ids into a label raster aligned with the
+    source raster, one strip of rows at a time.
+
+    Instead of cropping and rasterizing every geometry on its own (as
+    ``gen_zonal_stats`` does), each strip of the raster is read once, all the
+    geometries crossing it are rasterized together and per-zone counts, sums,
+    min/max, variance and value counts are accumulated with ``np.bincount``
+    and sorted reductions. Memory is bounded by the strip size (plus the per
+    zone value counts when categorical statistics are requested).
+
+    Parameters and results are the same as ``gen_zonal_stats`` for the
+    supported options (stats, nodata, band, all_touched, categorical,
+    category_map, prefix). Overlapping geometries are handled by burning
+    them in separate label layers. As with a boundless read, the pixels of
+    a geometry that fall outside the raster are counted as nodata.
+
+    strip_pixels: int, optional
+        maximum number of pixels of a strip of rows, default: 4194304
+
+    Returns
+    -------
+    generator of dicts
+        Each item corresponds to a single vector feature and
+        contains keys for each of the specified stats.
+    """
+    for option in ("zone_func", "add_stats", "raster_out", "geojson_out"):
+        if kwargs.get(option):
+            raise ValueError("Option `%s` is not supported by the label engine, use gen_zonal_stats" % option)
+
+    stats, run_count = check_stats(stats, categorical)
+    percentiles = [s for s in stats if s.startswith("percentile_")]
+    need_counts = run_count or "median" in stats or len(percentiles) > 0
+
+    band_num = kwargs.get("band_num")
+    if band_num:
+        band = band_num
+
+    with Raster(raster, affine, nodata, band) as rast:
+
+        # Zones (the label of geometry i is i + 1, 0 is the background)
+        geoms = []
+        fids = []
+        for i, feat in enumerate(read_features(vectors, layer)):
+            geom = shape(feat["geometry"])
+            if "Point" in geom.geom_type:
+                geom = boxify_points(geom, rast)
+            geoms.append(geom)
+            try:
+                fids.append(int(feat["id"]))
+            except KeyError:
+                fids.append(i)
+
+        nb_zones = len(geoms)
+        if nb_zones == 0:
+            return
+
+        layer_of = np.array(split_layers(geoms, all_touched))
+        nb_layers = int(layer_of.max()) + 1
+        tree = shapely.STRtree(np.array(geoms, dtype=object))
+
+        # Accumulators
+        size = nb_zones + 1
+        count = np.zeros(size, dtype=np.int64)
+        total = np.zeros(size, dtype=np.float64)
+        mean = np.zeros(size, dtype=np.float64)
+        m2 = np.zeros(size, dtype=np.float64)
+        vmin = np.full(size, np.inf)
+        vmax = np.full(size, -np.inf)
+        nodata_count = np.zeros(size, dtype=np.int64)
+        nan_count = np.zeros(size, dtype=np.int64)
+        values_counts = [dict() for _ in range(size)] if need_counts else None
+
+        # pixels outside the raster extent are nodata
+        if "nodata" in stats:
+            for i, geom in enumerate(geoms):
+                nodata_count[i + 1] += count_outside(geom, rast, all_touched)
+
+        dtype = None
+        is_float = False
+
+        height, width = rast.shape
+        strip_rows = max(1, strip_pixels // max(1, width))
+
+        for row_start in range(0, height, strip_rows):
+            window = ((row_start, min(height, row_start + strip_rows)), (0, width))
+            candidates = tree.query(box(*window_bounds(window, rast.affine)))
+            if len(candidates) == 0:
+                continue
+
+            fsrc = rast.read(window=window, boundless=False)
+            array = np.ma.getdata(fsrc.array)
+            if dtype is None:
+                dtype = array.dtype
+                is_float = np.issubdtype(dtype, np.floating)
+
+            # nodata mask
+            isnodata = array == fsrc.nodata
+            if np.ma.is_masked(fsrc.array):
+                isnodata = isnodata | np.ma.getmaskarray(fsrc.array)
+            isnan = None
+            if is_float:
+                isnan = np.isnan(array)
+                isnodata = isnodata | isnan
+
+            for num_layer in range(nb_layers):
+                shapes = [(geoms[i], i + 1) for i in candidates.tolist() if layer_of[i] == num_layer]
+                if shapes == []:
+                    continue
+                labels = features.rasterize(
+                    shapes,
+                    out_shape=array.shape,
+                    transform=fsrc.affine,
+                    fill=0,
+                    dtype="int32",
+                    all_touched=all_touched,
+                )
+                inside = labels > 0
+
+                if "nodata" in stats:
+                    nodata_count += np.bincount(labels[inside & (array == fsrc.nodata)], minlength=size)
+                if "nan" in stats and isnan is not None:
+                    nan_count += np.bincount(labels[inside & isnan], minlength=size)
+
+                valid = inside & ~isnodata
+                lab = labels[valid]
+                if lab.size == 0:
+                    continue
+                val = array[valid]
+                valf = val.astype(np.float64)
+
+                # counts, sums, mean and variance (merged with the previous strips, Chan et al.)
+                strip_count = np.bincount(lab, minlength=size)
+                zones = np.nonzero(strip_count)[0]
+                strip_sum = np.bincount(lab, weights=valf, minlength=size)
+                strip_mean = np.zeros(size, dtype=np.float64)
+                strip_mean[zones] = strip_sum[zones] / strip_count[zones]
+                strip_m2 = np.bincount(lab, weights=(valf - strip_mean[lab]) ** 2, minlength=size)
+
+                count_a = count[zones]
+                count_b = strip_count[zones]
+                count_t = count_a + count_b
+                delta = strip_mean[zones] - mean[zones]
+                mean[zones] += delta * count_b / count_t
+                m2[zones] += strip_m2[zones] + delta * delta * count_a * count_b / count_t
+                count[zones] = count_t
+                total[zones] += strip_sum[zones]
+
+                # min / max
+                order = np.argsort(lab, kind="stable")
+                lab_sorted = lab[order]
+                val_sorted = valf[order]
+                starts = np.concatenate(([0], np.nonzero(np.diff(lab_sorted))[0] + 1))
+                zones_sorted = lab_sorted[starts]
+                vmin[zones_sorted] = np.minimum(vmin[zones_sorted], np.minimum.reduceat(val_sorted, starts))
+                vmax[zones_sorted] = np.maximum(vmax[zones_sorted], np.maximum.reduceat(val_sorted, starts))
+
+                # exact counts per (zone, value)
+                if need_counts:
+                    order = np.lexsort((val, lab))
+                    lab_sorted = lab[order]
+                    val_sorted = val[order]
+                    change = np.ones(len(lab_sorted), dtype=bool)
+                    change[1:] = (lab_sorted[1:] != lab_sorted[:-1]) | (val_sorted[1:] != val_sorted[:-1])
+                    starts = np.nonzero(change)[0]
+                    nb_values = np.diff(np.append(starts, len(lab_sorted)))
+                    for zone, value, nb in zip(lab_sorted[starts].tolist(), val_sorted[starts].tolist(), nb_values.tolist()):
+                        zone_counts = values_counts[zone]
+                        zone_counts[value] = zone_counts.get(value, 0) + nb
+
+                labels = None
+
+        # Results, in the feature order
+        for i in range(nb_zones):
+            zone = i + 1
+            if count[zone] == 0:
+                feature_stats = dict([(stat, None) for stat in stats])
+                if "count" in stats:
+                    feature_stats["count"] = 0
+            else:
+                if need_counts:
+                    pixel_count = dict(sorted(values_counts[zone].items()))
+
+                if categorical:
+                    feature_stats = dict(pixel_count)
+                    if category_map:
+                        feature_stats = remap_categories(category_map, feature_stats)
+                else:
+                    feature_stats = {}
+
+                if "min" in stats:
+                    feature_stats["min"] = float(vmin[zone])
+                if "max" in stats:
+                    feature_stats["max"] = float(vmax[zone])
+                if "mean" in stats:
+                    feature_stats["mean"] = float(total[zone] / count[zone])
+                if "count" in stats:
+                    feature_stats["count"] = int(count[zone])
+                if "sum" in stats:
+                    feature_stats["sum"] = float(total[zone])
+                if "std" in stats:
+                    feature_stats["std"] = float(math.sqrt(m2[zone] / count[zone]))
+                if "median" in stats or percentiles:
+                    keys = np.array(list(pixel_count.keys()), dtype=dtype)
+                    cumulated = np.cumsum(list(pixel_count.values()))
+                    nb = int(cumulated[-1])
+                if "median" in stats:
+                    middle = np.array([value_at_rank(keys, cumulated, (nb - 1) // 2), value_at_rank(keys, cumulated, nb // 2)], dtype=dtype)
+                    feature_stats["median"] = float(np.median(middle))
+                if "all" in stats:
+                    feature_stats["all"] = key_assoc_val2(pixel_count, all)
+                if "majority" in stats:
+                    feature_stats["majority"] = float(key_assoc_val(pixel_count, max))
+                if "minority" in stats:
+                    feature_stats["minority"] = float(key_assoc_val(pixel_count, min))
+                if "unique" in stats:
+                    feature_stats["unique"] = len(list(pixel_count.keys()))
+                if "range" in stats:
+                    feature_stats["range"] = float(vmax[zone]) - float(vmin[zone])
+
+                for pctile in percentiles:
+                    position = get_percentile(pctile) / 100.0 * (nb - 1)
+                    below = math.floor(position)
+                    value_below = np.float64(value_at_rank(keys, cumulated, below))
+                    value_above = np.float64(value_at_rank(keys, cumulated, min(below + 1, nb - 1)))
+                    feature_stats[pctile] = lerp(value_below, value_above, position - below)
+
+            feature_stats["__fid__"] = fids[i]
+
+            if "nodata" in stats:
+                feature_stats["nodata"] = float(nodata_count[zone])
+            if "nan" in stats:
+                feature_stats["nan"] = float(nan_count[zone]) if nan_count[zone] > 0 else 0
+
+            if prefix is not None:
+                prefixed_feature_stats = {}
+                for key, val in feature_stats.items():
+                    newkey = "{}{}".format(prefix, key)
+                    prefixed_feature_stats[newkey] = val
+                feature_stats = prefixed_feature_stats
+
+            yield feature_stats
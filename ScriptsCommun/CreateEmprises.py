@@ -24,7 +24,7 @@ Origine : nouveau
 
 -----------------------------------------------------
 Modifications :
-
+16/10/2026 : emprises des images lues dans un catalogue persistant (ImagesCatalog) mis à jour selon les dates de modification des fichiers
 ------------------------------------------------------
 A Reflechir/A faire :
 
@@ -36,9 +36,10 @@ import sys,os,glob,re,types,shutil,copy, argparse
 from time import *
 from osgeo import ogr
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displayIHM
-from Lib_raster import getEmpriseImage, getPixelSizeImage, polygonizeRaster, getNodataValueImage, createBinaryMaskMultiBand, h5ToGtiff
+from Lib_raster import polygonizeRaster, getNodataValueImage, createBinaryMaskMultiBand, h5ToGtiff
 from Lib_vector import createPolygonsFromCoordList, geometries2multigeometries, fusionNeighbourGeometryBySameValue, dissolveVector, getGeomPolygons, createPolygonsFromGeometryList, cleanMiniAreaPolygons, simplifyVector, bufferVector, cleanRingVector
 from Lib_file import removeFile, removeVectorFile, copyVectorFile, getSubRepRecursifList
+from ImagesCatalog import ImagesCatalog
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 3 : affichage maximum de commentaires lors de l'execution du script. Intermédiaire : affichage intermédiaire
@@ -47,7 +48,7 @@ debug = 3
 #########################################################################
 # FONCTION createEmprise()                                              #
 #########################################################################
-def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_polygons_used, is_not_date, is_optimize_emprise, is_optimize_emprise_nodata, no_data_value, size_erode, path_time_log, separ_name="_", pos_date=1, nb_char_date=8, separ_date="", epsg=2154, format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True):
+def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_polygons_used, is_not_date, is_optimize_emprise, is_optimize_emprise_nodata, no_data_value, size_erode, path_time_log, separ_name="_", pos_date=1, nb_char_date=8, separ_date="", epsg=2154, format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True, catalog_file=""):
     """
     #   Rôle : Cette fonction permet de créer une couche vecteur à partir des emprises des imagettes raster de fichiers (sans assembler les imagettes)
     #   paramètres :
@@ -71,6 +72,7 @@ def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_
     #       extension_vector : extension du fichier vecteur de sortie, par defaut = '.shp'
     #       save_results_intermediate : fichiers de sorties intermediaires non nettoyées, par defaut = False
     #       overwrite : supprime ou non les fichiers existants ayant le meme nom
+    #       catalog_file : fichier catalogue (SQLite) des emprises des images, conservé d'une execution à l'autre, par defaut "" (catalogue en mémoire)
     """
 
     # Affichage des paramètres
@@ -96,6 +98,7 @@ def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_
         print(cyan + "createEmprise() : " + endC + "extension_vector : " + str(extension_vector) + endC)
         print(cyan + "createEmprise() : " + endC + "save_results_intermediate : "+ str(save_results_intermediate))
         print(cyan + "createEmprise() : " + endC + "overwrite : "+ str(overwrite))
+        print(cyan + "createEmprise() : " + endC + "catalog_file : "+ str(catalog_file))
 
    # Constantes
     EXT_LIST_HDF5 = ['h5','H5', 'he5', 'HE5', 'hdf5', 'HDF5']
@@ -154,6 +157,9 @@ def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_
             for sub_repertory in rep_sub_rep_list:
                 sub_rep_list.append(sub_repertory)
 
+        # Catalogue des emprises des images
+        images_catalog = ImagesCatalog(catalog_file, debug)
+
         # Parcours de chaque dossier image du dossier en entrée
         for repertory in sub_rep_list:
             if os.path.isdir(repertory):
@@ -161,20 +167,20 @@ def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_
                 if debug >= 2:
                     print(cyan + "createEmprises() : " + endC + bold + green  + "Traitement de : " + endC + repertory)
 
-                # Récupération des images du dossier en entrée
-                imagettes_jp2_tif_ecw_list = []
+                # Conversion des images hdf5 du dossier en entrée
                 imagettes_list = os.listdir(repertory)
 
                 for elt1 in imagettes_list:
                     path_image = repertory + os.sep + elt1
-                    if (os.path.isfile(path_image)) and (len(elt1.rsplit('.',1)) == 2) and (elt1.rsplit('.',1)[1] in EXT_LIST) :
-                        if elt1.rsplit('.',1)[1] in EXT_LIST_HDF5:
-                            elt1_new = os.path.splitext(elt1)[0] + extension_raster
-                            path_image_new = repertory + os.sep + elt1_new
-                            h5ToGtiff(path_image, path_image_new)
-                            imagettes_jp2_tif_ecw_list.append(elt1_new)
-                        else:
-                            imagettes_jp2_tif_ecw_list.append(elt1)
+                    if (os.path.isfile(path_image)) and (len(elt1.rsplit('.',1)) == 2) and (elt1.rsplit('.',1)[1] in EXT_LIST_HDF5) :
+                        elt1_new = os.path.splitext(elt1)[0] + extension_raster
+                        path_image_new = repertory + os.sep + elt1_new
+                        h5ToGtiff(path_image, path_image_new)
+
+                # Récupération des images du dossier en entrée et de leurs emprises dans le catalogue
+                for path_image in images_catalog.selectErrorImages(repertory, EXT_LIST):
+                    print(cyan + "createEmprise() : " + bold + yellow + " Attention!!! Fichier non traite (ne peut pas être ouvert): " + path_image + endC)
+                imagettes_jp2_tif_ecw_list = images_catalog.selectImages(repertory, EXT_LIST)
 
                 # Pour le cas ou le repertoire contient des fichiers images
                 if not imagettes_jp2_tif_ecw_list == []:
@@ -182,14 +188,12 @@ def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_
                     # Cas ou chaque emprise d'image est un polygone
                     if is_not_assembled or is_optimize_emprise or is_optimize_emprise_nodata:
 
-                        for imagette in imagettes_jp2_tif_ecw_list:
+                        for path_image, xmin, xmax, ymin, ymax, pixel_width, pixel_height, date_metadata in imagettes_jp2_tif_ecw_list:
                             # Récupération des emprises de l'image
-                            path_image = repertory + os.sep + imagette
                             if size_pixel == 0.0:
-                                size_pixel = getPixelSizeImage(path_image)
+                                size_pixel = abs(pixel_width * pixel_height)
 
                             path_info_acquisition = repertory
-                            xmin, xmax, ymin, ymax = getEmpriseImage(path_image)
                             coord_list = [xmin,ymax,xmax,ymax,xmax,ymin,xmin,ymin,xmin,ymax]
 
                             # Saisie des données
@@ -277,10 +281,7 @@ def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_
                         liste_x_r = []
                         liste_y_t = []
 
-                        for imagette in imagettes_jp2_tif_ecw_list:
-                            path_image = repertory + os.sep + imagette
-                            xmin, xmax, ymin, ymax = getEmpriseImage(path_image)
-
+                        for path_image, xmin, xmax, ymin, ymax, pixel_width, pixel_height, date_metadata in imagettes_jp2_tif_ecw_list:
                             liste_x_l.append(xmin)
                             liste_x_r.append(xmax)
                             liste_y_b.append(ymin)
@@ -309,6 +310,8 @@ def createEmprise(repertory_input_list, output_vector, is_not_assembled, is_all_
                         # Récupération du nom du répertoire pour création des champs
                         getDataToFiels(repertory, is_not_date, is_optimize_emprise, separ_name, pos_date, nb_char_date, separ_date, points_list, ref_dossier_list, name_rep_list, date_list, heure_list)
 
+        images_catalog.close()
+
         #  Préparation des attribute_dico et polygons_attr_coord_dico
         if is_not_assembled :
             attribute_dico = {ATTR_NAME_ID:ogr.OFTInteger, ATTR_NAME_NOMIMAGE:ogr.OFTString,ATTR_NAME_DATEACQUI:ogr.OFTDate, ATTR_NAME_HEUREACQUI:ogr.OFTString}
@@ -512,6 +515,7 @@ def main(gui=False):
     parser.add_argument('-vef','--format_vector', default="ESRI Shapefile",help="Format of the output file.", type=str, required=False)
     parser.add_argument('-rae','--extension_raster', default=".tif", help="Option : Extension file for image raster. By default : '.tif'", type=str, required=False)
     parser.add_argument('-vee','--extension_vector',default=".shp",help="Option : Extension file for vector. By default : '.shp'", type=str, required=False)
+    parser.add_argument('-cat','--catalog_file',default="",help="Option : Catalog file (SQLite) of the emprises of the images, kept between runs and updated when files change. By default : '' (catalog in memory)", type=str, required=False)
     parser.add_argument('-log','--path_time_log',default=os.getcwd()+ os.sep + "log.txt",help="Option : Name of log. By default : log.txt", type=str, required=False)
     parser.add_argument('-sav','--save_results_inter',action='store_true',default=False,help="Option : Save or delete intermediate result after the process. By default, False", required=False)
     parser.add_argument('-now','--overwrite',action='store_false',default=True,help="Option : Overwrite files with same names. By default : True", required=False)
@@ -586,6 +590,10 @@ def main(gui=False):
     if args.extension_vector != None:
         extension_vector = args.extension_vector
 
+    # Récupération du fichier catalogue des emprises des images
+    if args.catalog_file != None:
+        catalog_file = args.catalog_file
+
     # Récupération du nom du fichier log
     if args.path_time_log != None:
         path_time_log = args.path_time_log
@@ -622,6 +630,7 @@ def main(gui=False):
         print(cyan + "CreateEmprises : " + endC + "format_vector : " + str(format_vector) + endC)
         print(cyan + "CreateEmprises : " + endC + "extension_raster : " + str(extension_raster) + endC)
         print(cyan + "CreateEmprises : " + endC + "extension_vector : " + str(extension_vector) + endC)
+        print(cyan + "CreateEmprises : " + endC + "catalog_file : " + str(catalog_file) + endC)
         print(cyan + "CreateEmprises : " + endC + "path_time_log : " + str(path_time_log) + endC)
         print(cyan + "CreateEmprises : " + endC + "save_results_intermediate : " + str(save_results_intermediate) + endC)
         print(cyan + "CreateEmprises : " + endC + "overwrite : " + str(overwrite) + endC)
@@ -633,7 +642,7 @@ def main(gui=False):
         os.makedirs(repertory_output)
 
     # Fonction générale
-    createEmprise(repertory_input_list, output_vector, not_assembled, all_polygons_used, not_date, optimize_emprise, optimize_emprise_nodata, no_data_value, size_erode, path_time_log, separname, posdate, nbchardate, separdate, epsg, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite)
+    createEmprise(repertory_input_list, output_vector, not_assembled, all_polygons_used, not_date, optimize_emprise, optimize_emprise_nodata, no_data_value, size_erode, path_time_log, separname, posdate, nbchardate, separdate, epsg, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite, catalog_file)
 
 # ================================================
 
@@ -34,7 +34,7 @@ from __future__ import print_function
 import os,sys,glob,argparse,shutil
 from osgeo import ogr
 #from rasterstats2 import raster_stats
-from rasterstats2 import zonal_stats
+from rasterstats2 import zonal_stats, zonal_stats_label
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displayIHM
 from Lib_log import timeLine
 from Lib_raster import getPixelSizeImage, getEmpriseImage, identifyPixelValues
@@ -393,7 +393,7 @@ def statisticsVectorRaster_sql(image_input, vector_input, vector_output, band_nu
 ###########################################################################################################################################
 # FONCTION statisticsVectorRaster                                                                                                         #
 ###########################################################################################################################################
-def statisticsVectorRaster(image_input, vector_input, vector_output, band_number, enable_stats_all_count, enable_stats_columns_str, enable_stats_columns_real, col_to_delete_list, col_to_add_list, class_label_dico, clean_small_polygons=False, no_data_value=0, format_vector='ESRI Shapefile', path_time_log="", save_results_intermediate=False, overwrite=True) :
+def statisticsVectorRaster(image_input, vector_input, vector_output, band_number, enable_stats_all_count, enable_stats_columns_str, enable_stats_columns_real, col_to_delete_list, col_to_add_list, class_label_dico, clean_small_polygons=False, no_data_value=0, format_vector='ESRI Shapefile', path_time_log="", save_results_intermediate=False, overwrite=True, label_engine=False) :
     """
     # ROLE:
     #     Fonction qui calcule pour chaque polygone d'un fichier vecteur (shape) les statistiques associées de l'intersection avec une image raster (tif)
@@ -416,6 +416,8 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
     #    path_time_log : le fichier de log de sortie
     #    save_results_intermediate : fichiers de sorties intermediaires nettoyees, par defaut = False
     #    overwrite : supprime ou non les fichiers existants ayant le meme nom
+    #    label_engine : calcul des statistiques par une image de labels des polygones (un seul parcours de l'image par bandes de lignes)
+    #                   au lieu d'une rasterisation polygone par polygone, resultats identiques, par defaut = False
     #
     # SORTIES DE LA FONCTION :
     #    Eléments modifiés le fichier shape d'entrée
@@ -440,6 +442,7 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
         print(cyan + "statisticsVectorRaster() : " + endC + "path_time_log : " + str(path_time_log) + endC)
         print(cyan + "statisticsVectorRaster() : " + endC + "save_results_intermediate : " + str(save_results_intermediate) + endC)
         print(cyan + "statisticsVectorRaster() : " + endC + "overwrite : " + str(overwrite) + endC)
+        print(cyan + "statisticsVectorRaster() : " + endC + "label_engine : " + str(label_engine) + endC)
 
     # Constantes
     PREFIX_AREA_COLUMN = "S_"
@@ -687,7 +690,11 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
         print(cyan + "statisticsVectorRaster() : " + bold + green + "Calcul des statistiques " + endC + "Vecteur : %s" %(vector_output) + endC)
         print(cyan + "statisticsVectorRaster() : " + bold + green + "Calcul des statistiques " + endC + "Raster : %s" %(image_input) + endC)
     #stats_info_list = raster_stats(vector_output, image_input, band_num=band_number, stats=col_to_add_inter02_list)
-    stats_info_list = zonal_stats(vector_output, image_input, band_num=band_number, stats=col_to_add_inter02_list, all_touched=False, nodata=None)
+    if label_engine :
+        # Image de labels des polygones : un seul parcours de l'image
+        stats_info_list = zonal_stats_label(vector_output, image_input, band_num=band_number, stats=col_to_add_inter02_list, all_touched=False, nodata=None)
+    else :
+        stats_info_list = zonal_stats(vector_output, image_input, band_num=band_number, stats=col_to_add_inter02_list, all_touched=False, nodata=None)
 
     # Decompte du nombre de polygones
     num_features = layer.GetFeatureCount()
@@ -698,20 +705,28 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
 
     polygone_count = 0
 
-    for polygone_stats in stats_info_list : # Pour chaque polygone représenté dans stats_info_list - et il y a autant de polygone que dans le fichier vecteur
+    # Les valeurs sont d'abord calculées en colonnes (une liste de valeurs par colonne, indexée par le rang du polygone dans stats_info_list)
+    # puis écrites en un seul parcours séquentiel du fichier vecteur (valeur None : colonne non renseignée pour ce polygone)
+    nb_polygons = len(stats_info_list)
+    columns_values_dico = {}
+    def setColumnValue(name_col, index_polygon, value):
+        if name_col not in columns_values_dico:
+            columns_values_dico[name_col] = [None] * nb_polygons
+        columns_values_dico[name_col][index_polygon] = value
+        return
+
+    for index_polygon, polygone_stats in enumerate(stats_info_list) : # Pour chaque polygone représenté dans stats_info_list - et il y a autant de polygone que dans le fichier vecteur
 
-        # Extraction de feature
-        feature = layer.GetFeature(polygone_stats['__fid__'])
         polygone_count = polygone_count + 1
 
         if debug >= 3 and polygone_count%10000 == 0:
             print(cyan + "statisticsVectorRaster() : " + endC + "Avancement : %s polygones traites sur %s" %(polygone_count,num_features))
         if debug >= 5:
-            print(cyan + "statisticsVectorRaster() : " + endC + "Traitement du polygone : ",  stats_info_list.index(polygone_stats) + 1)
+            print(cyan + "statisticsVectorRaster() : " + endC + "Traitement du polygone : ",  index_polygon + 1)
 
         # Remplissage de l'identifiant unique
         if ("UniqueID" in col_to_add_list) or ("uniqueID" in col_to_add_list) or ("ID" in col_to_add_list):
-            feature.SetField('ID', int(stats_info_list.index(polygone_stats)))
+            setColumnValue('ID', index_polygon, index_polygon)
 
         # Initialisation à 0 des colonnes contenant le % de répartition de la classe - Verifier ce qu'il se passe si le nom dépasse 10 caracteres
         if ('all' in col_to_add_list) :
@@ -719,7 +734,7 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
                 name_col = class_label_dico[element]
                 if len(name_col) > 10:
                     name_col = name_col[:10]
-                feature.SetField(name_col,0)
+                setColumnValue(name_col, index_polygon, 0)
 
         # Initialisation à 0 des colonnes contenant la surface correspondant à la classe - Verifier ce qu'il se passe si le nom dépasse 10 caracteres
         if ('all_S' in col_to_add_list) :
@@ -728,7 +743,7 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
                 name_col_area =  PREFIX_AREA_COLUMN + name_col
                 if len(name_col_area) > 10:
                     name_col_area = name_col_area[:10]
-                feature.SetField(name_col_area,0)
+                setColumnValue(name_col_area, index_polygon, 0)
 
         # Remplissage des colonnes contenant le % de répartition et la surface des classes
         if ('all' in col_to_add_list) or ('all_S' in col_to_add_list) :
@@ -794,9 +809,9 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
                             percentage = 0.0
 
                         if ('all' in col_to_add_list) :
-                            feature.SetField(name_col, percentage)      # Injection du pourcentage dans la colonne correpondante
+                            setColumnValue(name_col, index_polygon, percentage)      # Injection du pourcentage dans la colonne correpondante
                         if ('all_S' in col_to_add_list) :
-                            feature.SetField(name_col_area, value_area) # Injection de la surface dans la colonne correpondante
+                            setColumnValue(name_col_area, index_polygon, value_area) # Injection de la surface dans la colonne correpondante
             # Cas ou pas de point dans ce polygone
             else :
                 print(cyan + "statisticsVectorRaster() : " + bold + yellow + "Attention ce polygone %s ne comtient pas d'information statistique du raster (info vide!)" %(polygone_count) + endC,)
@@ -810,7 +825,7 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
                 q = int(float(qstr))
                 value_statis = polygone_stats[stats]
                 name_col = "centile_" + str(q)
-                feature.SetField(name_col, value_statis)
+                setColumnValue(name_col, index_polygon, value_statis)
             elif (stats == 'DateMaj') or  (stats == 'SrcMaj') :          # Cas particulier de 'DateMaj' et 'SrcMaj' : le nom de la colonne est DateMaj ou SrcMaj, mais la statistique utilisée est identifiée par majority
                 name_col = stats                                         # Nom de la colonne. Ex : 'DateMaj'
                 value_statis = polygone_stats['majority']                # Valeur majoritaire. Ex : '203'
@@ -818,11 +833,11 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
                     value_statis_class = 'nan'
                 else :
                     value_statis_class = class_label_dico[value_statis]  # Transformation de la valeur au regard du dictionnaire. Ex : '2011'
-                feature.SetField(name_col, value_statis_class)           # Ajout dans la colonne
+                setColumnValue(name_col, index_polygon, value_statis_class)           # Ajout dans la colonne
 
             elif (stats == 'count') :
                 name_col = stats
-                feature.SetField(name_col,  polygone_stats['count'])     # Injection du nombre de pixels
+                setColumnValue(name_col, index_polygon, polygone_stats['count'])     # Injection du nombre de pixels
 
             elif (stats is None) or (stats == "") or (polygone_stats[stats] is None) or (polygone_stats[stats]) == "" or (polygone_stats[stats]) == 'nan' :
                 # En cas de bug de rasterstats (erreur geometrique du polygone par exemple)
@@ -839,10 +854,44 @@ def statisticsVectorRaster(image_input, vector_input, vector_output, band_number
 
                 if str(type(value_statis_class)) == "<class 'numpy.uint8'>" :
                     value_statis_class = int(value_statis_class)
-                feature.SetField(name_col, value_statis_class)
+                setColumnValue(name_col, index_polygon, value_statis_class)
 
-        layer.SetFeature(feature)
+    # Ecriture de toutes les colonnes en un seul parcours séquentiel du vecteur (dans une transaction si le format le permet)
+    if debug >= 3:
+        print(cyan + "statisticsVectorRaster() : " +  bold + green + "Ecriture des colonnes dans le fichier vecteur " + endC)
+
+    index_polygon_dico = {}
+    for index_polygon, polygone_stats in enumerate(stats_info_list) :
+        index_polygon_dico[polygone_stats['__fid__']] = index_polygon
+
+    layer_definition = layer.GetLayerDefn()
+    columns_index_list = []
+    for name_col in columns_values_dico :
+        index_field = layer_definition.GetFieldIndex(name_col)
+        if index_field == -1 :
+            print(cyan + "statisticsVectorRaster() : " + bold + yellow + "La colonne %s n'existe pas dans le fichier vecteur, elle n'est pas remplie" %(name_col) + endC)
+            continue
+        columns_index_list.append((index_field, columns_values_dico[name_col]))
+
+    use_transaction = layer.TestCapability(ogr.OLCTransactions)
+    if use_transaction :
+        layer.StartTransaction()
+
+    layer.ResetReading()
+    feature = layer.GetNextFeature()
+    while feature is not None :
+        index_polygon = index_polygon_dico.get(feature.GetFID())
+        if index_polygon is not None :
+            for index_field, values_list in columns_index_list :
+                value = values_list[index_polygon]
+                if value is not None :
+                    feature.SetField(index_field, value)
+            layer.SetFeature(feature)
         feature.Destroy()
+        feature = layer.GetNextFeature()
+
+    if use_transaction :
+        layer.CommitTransaction()
 
     # Fermeture du fichier shape
     layer.SyncToDisk()
@@ -920,6 +969,7 @@ def main(gui=False):
     parser.add_argument('-log','--path_time_log',default="",help="Name of log", type=str, required=False)
     parser.add_argument('-sav','--save_results_inter',action='store_true',default=False,help="Save or delete intermediate result after the process. By default, False", required=False)
     parser.add_argument('-now','--overwrite',action='store_false',default=True,help="Overwrite files with same names. By default : True", required=False)
+    parser.add_argument('-lab','--label_engine',action='store_true',default=False,help="Option : compute statistics with a label image of the polygons (single pass over the image) instead of one rasterization per polygon. By default : False", required=False)
     parser.add_argument('-debug','--debug',default=3,help="Option : Value of level debug trace, default : 3 ",type=int, required=False)
     args = displayIHM(gui, parser)
 
@@ -1025,6 +1075,10 @@ def main(gui=False):
     if args.overwrite!= None:
         overwrite = args.overwrite
 
+    # Moteur de calcul par image de labels
+    if args.label_engine!= None:
+        label_engine = args.label_engine
+
     # Récupération de l'option niveau de debug
     if args.debug!= None:
         global debug
@@ -1058,6 +1112,7 @@ def main(gui=False):
         print(cyan + "CrossingVectorRaster : " + endC + "path_time_log : " + str(path_time_log) + endC)
         print(cyan + "CrossingVectorRaster : " + endC + "save_results_inter : " + str(save_results_intermediate) + endC)
         print(cyan + "CrossingVectorRaster : " + endC + "overwrite : " + str(overwrite) + endC)
+        print(cyan + "CrossingVectorRaster : " + endC + "label_engine : " + str(label_engine) + endC)
         print(cyan + "CrossingVectorRaster : " + endC + "debug : " + str(debug) + endC)
 
     if not enable_stats_all_count and not enable_stats_columns_str and not enable_stats_columns_real and not col_to_add_list :
@@ -1075,7 +1130,7 @@ def main(gui=False):
         statisticsVectorRaster_sql(image_input, vector_input, vector_output, band_number, enable_stats_all_count, enable_stats_columns_str, enable_stats_columns_real, col_to_delete_list, class_label_dico, no_data_value, epsg, project_encoding, server_postgis, port_number, user_postgis, password_postgis, database_postgis, schema_postgis, path_time_log, format_vector, save_results_intermediate, overwrite)
     else :
         # Statistiques image avec l'outil rasterstat
-        statisticsVectorRaster(image_input, vector_input, vector_output, band_number, enable_stats_all_count, enable_stats_columns_str, enable_stats_columns_real, col_to_delete_list, col_to_add_list, class_label_dico, clean_small_polygons, no_data_value, format_vector, path_time_log, save_results_intermediate, overwrite)
+        statisticsVectorRaster(image_input, vector_input, vector_output, band_number, enable_stats_all_count, enable_stats_columns_str, enable_stats_columns_real, col_to_delete_list, col_to_add_list, class_label_dico, clean_small_polygons, no_data_value, format_vector, path_time_log, save_results_intermediate, overwrite, label_engine)
 
 # ================================================
 
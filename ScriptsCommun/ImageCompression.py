@@ -15,7 +15,7 @@ Nom de l'objet : ImageCompression.py
 Description :
 -------------
 Objectif : Compresse des image raster (.tif) codé en 16bits en codage 8bits
-Rq : utilisation des OTB Applications :  otbcli_BandMath, otbcli_ConcatenateImages
+Rq : le passage en 8 bits est fait en un seul passage par bandes de lignes (gdal et numpy, threads), la compression par gdal
 
 ----------
 Histoire :
@@ -23,30 +23,38 @@ Histoire :
 Date de creation : 01/10/2014
 -----------------------------------------------------------------------------------------------------
 Modifications :
+16/10/2026 : passage en 8 bits en un seul passage (histogrammes en une lecture, rééchantillonnage par threads et écriture directe de l'image 8 bits et de l'image compressée tuilée ou COG) a la place des commandes otbcli_BandMath, otbcli_ConcatenateImages, otbcli_BandMathX et gdal_translate
 
 A Reflechir/A faire :
 
 """
 
 from __future__ import print_function
-import os, sys, glob, argparse, time, shutil, platform
+import os, sys, glob, argparse, time, shutil, platform, math, numpy
 from osgeo import gdal
 from osgeo.gdalconst import *
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displayIHM
 from Lib_operator import switch, case
 from Lib_log import timeLine
 from Lib_file import removeFile, renameFile
-from Lib_raster import getGeometryImage, getNodataValueImage, setNodataValueImage
+from Lib_raster import getGeometryImage, getNodataValueImage, setNodataValueImage, computeBlocksStatisticsImage, getStripsImage, processStripsImage
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 1 : affichage intermédiaire de commentaires lors de l'execution du script
 # debug = 2 : affichage supérieur de commentaires lors de l'execution du script etc...
 debug = 3
 
+# Nombre de colonnes des histogrammes des bandes
+NBR_COL_HISTO = 256
+# Nombre maximum de pixels d'une bande de lignes lue
+MAX_PIXELS_STRIP = 4194304
+# Valeurs du predicteur pour le format COG
+COG_PREDICTOR_DICO = {1:"NO", 2:"STANDARD", 3:"FLOATING_POINT"}
+
 ###########################################################################################################################################
 # FONCTION convertImage()                                                                                                                 #
 ###########################################################################################################################################
-def convertImage(image_input, image_output_8bits, image_output_compress, need_8bits, need_compress, compress_type, predictor, zlevel, suppr_min, suppr_max, need_optimize8b, need_rvb, need_irc, path_time_log, channel_order=['Red','Green','Blue','NIR'], format_raster='GTiff', extension_raster=".tif", save_results_intermediate=False, overwrite=True):
+def convertImage(image_input, image_output_8bits, image_output_compress, need_8bits, need_compress, compress_type, predictor, zlevel, suppr_min, suppr_max, need_optimize8b, need_rvb, need_irc, path_time_log, channel_order=['Red','Green','Blue','NIR'], format_raster='GTiff', extension_raster=".tif", save_results_intermediate=False, overwrite=True, use_cog=False, nb_workers=0):
     """
     # ROLE :
     # Conversion d'une image en 8bits et/ou compression
@@ -71,6 +79,8 @@ def convertImage(image_input, image_output_8bits, image_output_compress, need_8b
     #    extension_raster : extension des fichiers raster de sortie, par defaut = '.tif'
     #    save_results_intermediate : sauvegarde ou suppression des images résultats, par defaut à False
     #    overwrite : boolen si vrai, ecrase les fichiers existants
+    #    use_cog : booleen si vrai, l'image de sortie est écrite au format COG (Cloud Optimized GeoTiff) avec apercus, par defaut False
+    #    nb_workers : nombre de threads de lecture et de calcul du passage en 8 bits, par defaut 0 (nombre de CPU)
     # SORTIES DE LA FONCTION :
     #    Image convertie
     #
@@ -100,6 +110,8 @@ def convertImage(image_input, image_output_8bits, image_output_compress, need_8b
         print(cyan + "convertImage() : " + endC + "extension_raster : " + str(extension_raster) + endC)
         print(cyan + "convertImage() : " + endC + "save_results_intermediate: ",save_results_intermediate)
         print(cyan + "convertImage() : " + endC + "overwrite: ",overwrite)
+        print(cyan + "convertImage() : " + endC + "use_cog: ",use_cog)
+        print(cyan + "convertImage() : " + endC + "nb_workers: ",nb_workers)
 
     # Constantes
     FOLDER_TEMP = 'Tmp_'
@@ -146,18 +158,16 @@ def convertImage(image_input, image_output_8bits, image_output_compress, need_8b
 
         ###########################################################
         #   Conversion du fichier en 8bits                        #
+        #   (l'image compressée est écrite dans le même passage)  #
         ###########################################################
         if need_8bits:
-            convertion8Bits(image_input, image_output_8bits, repertory_tmp, inputBand4Found, need_optimize8b, need_rvb, need_irc, channel_order, suppr_min, suppr_max, format_raster, extension_raster, save_results_intermediate)
-            image_to_compress = image_output_8bits
-        else :
-            image_to_compress = image_input
+            convertion8Bits(image_input, image_output_8bits, repertory_tmp, inputBand4Found, need_optimize8b, need_rvb, need_irc, channel_order, suppr_min, suppr_max, format_raster, extension_raster, save_results_intermediate, image_output_compress if need_compress else "", compress_type, predictor, zlevel, use_cog, nb_workers)
 
         ###########################################################
         #   Compression du fichier                                #
         ###########################################################
-        if need_compress:
-            compressImage(image_to_compress, image_output_compress, inputBand4Found, compress_type, predictor, zlevel, format_raster)
+        elif need_compress:
+            compressImage(image_input, image_output_compress, inputBand4Found, compress_type, predictor, zlevel, format_raster, use_cog)
 
     ###########################################################
     #   nettoyage du repertoire temporaire                    #
@@ -180,17 +190,277 @@ def convertImage(image_input, image_output_8bits, image_output_compress, need_8b
     timeLine(path_time_log,ending_event)
     return
 
+###########################################################################################################################################
+# FONCTION computeClipValues8Bits()                                                                                                       #
+###########################################################################################################################################
+def computeClipValues8Bits(histogram_list, value_max, suppr_min, suppr_max):
+    """
+    # ROLE :
+    # Calcul des valeurs minimale et maximale gardées d'une bande à partir de son histogramme (256 classes entre le min et le max de la bande)
+    # les suppr_min % plus petites valeurs et les suppr_max % plus grandes valeurs de l'histogramme cumulé sont tronquées
+    #
+    # ENTREES DE LA FONCTION :
+    #    histogram_list : histogramme de la bande (256 classes)
+    #    value_max : valeur maximale de la bande
+    #    suppr_min : Pourcentage des valeurs qui seront tronquees pour les valeurs minimales
+    #    suppr_max : Pourcentage des valeurs qui seront tronquees pour les valeurs maximales
+    # SORTIES DE LA FONCTION :
+    #    les valeurs minimale et maximale gardées
+    #
+    """
+
+    # Calcul du nombre total de pixels et de l'histogramme cumulé
+    cum_hist=[]
+    total = 0
+    for bucket in histogram_list:
+        cum_hist.append(total + bucket)
+        total = total + bucket
+
+    # Determination des numeros de colonne dans l'histogramme (entre 0 et 255) du min,max de la bande
+    index_val_min = 0
+    index_val_max = NBR_COL_HISTO
+
+    for j in range(0,256):
+        if cum_hist[j-1]<=0 and cum_hist[j]>0 :
+            index_val_min=max(0,j-1)
+        elif cum_hist[j-1]<total and cum_hist[j]>=total :
+            index_val_max=min(j,NBR_COL_HISTO)
+            break
+
+    if debug >= 2:
+        print(cyan + "computeClipValues8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur minimale = " + str(index_val_min) + endC)
+        print(cyan + "computeClipValues8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur maximale = " + str(index_val_max) + endC)
+
+    # On ne garde que les valeurs comprises entre suppr_min % et suppr_max %
+    val_cum_min_garde = total*float(suppr_min)/100
+    val_cum_max_garde = total*(1-float(suppr_max)/100)
+
+    # Determination des numeros de colonne dans l'histogramme (entre 0 et 255) du min,max que l'on va garder après suppression des valeurs en bordure
+    index_val_min_garde = 0
+    index_val_max_garde = NBR_COL_HISTO
+
+    for j in range(0,256):
+        if cum_hist[j-1]<=val_cum_min_garde and cum_hist[j]>val_cum_min_garde :
+            index_val_min_garde=max(0,j-1)
+        elif cum_hist[j-1]<val_cum_max_garde and cum_hist[j]>=val_cum_max_garde :
+            index_val_max_garde=min(j,NBR_COL_HISTO)
+            break
+
+    if debug >= 2:
+        print(cyan + "computeClipValues8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur minimale gardee = "+ str(index_val_min_garde) + endC)
+        print(cyan + "computeClipValues8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur maximale gardee = "+ str(index_val_max_garde) + endC)
+
+    # Calcul des valeurs extremes des pixels gardes apres tronquage
+    val_min_garde = index_val_min_garde*value_max/index_val_max
+    val_max_garde = index_val_max_garde*value_max/index_val_max
+
+    return val_min_garde, val_max_garde
+
+###########################################################################################################################################
+# FONCTION computeHistograms8Bits()                                                                                                       #
+###########################################################################################################################################
+def computeHistograms8Bits(image_input, num_bands, nb_workers=0):
+    """
+    # ROLE :
+    # Calcul du min, du max et de l'histogramme (256 classes entre le min et le max, nodata exclu) des bandes d'une image
+    # Pour les images entieres (16 bits ou moins) toutes les bandes sont traitées en une seule lecture de l'image par bandes de lignes
+    # (comptage exact des valeurs), sinon le min, le max et l'histogramme sont calculés par gdal bande par bande
+    #
+    # ENTREES DE LA FONCTION :
+    #    image_input : nom de l'image .tif a traiter
+    #    num_bands : liste des numéros de bandes
+    #    nb_workers : nombre de threads de lecture, par defaut 0 (nombre de CPU)
+    # SORTIES DE LA FONCTION :
+    #    dictionnaire par numéro de bande de [min, max, histogramme]
+    #
+    """
+
+    dataset = gdal.Open(image_input, GA_ReadOnly)
+    data_type_list = [dataset.GetRasterBand(bande).DataType for bande in num_bands]
+    histograms_dico = {}
+
+    if all(data_type in [GDT_Byte, GDT_UInt16, GDT_Int16] for data_type in data_type_list):
+        no_data_dico = {}
+        for bande in num_bands:
+            no_data_dico[bande] = dataset.GetRasterBand(bande).GetNoDataValue()
+        dataset = None
+        statistics_dico = computeBlocksStatisticsImage(image_input, num_bands_list=num_bands, count_values=True, nb_threads=nb_workers, max_pixels_strip=MAX_PIXELS_STRIP)
+        for bande in num_bands:
+            # Les effectifs des valeurs valides (nodata exclu) sont répartis dans les classes comme le fait gdal GetHistogram
+            values_counts_dico = statistics_dico[bande]['values_counts']
+            if no_data_dico[bande] is not None:
+                values_counts_dico.pop(no_data_dico[bande], None)
+            values_array = numpy.array(list(values_counts_dico.keys()), dtype=numpy.float64)
+            counts_array = numpy.array(list(values_counts_dico.values()), dtype=numpy.int64)
+            histogram_list = [0] * NBR_COL_HISTO
+            min_bande, max_bande = None, None
+            if values_array.size > 0:
+                min_bande, max_bande = float(values_array.min()), float(values_array.max())
+                if max_bande > min_bande:
+                    index_array = numpy.floor((values_array - min_bande) * (NBR_COL_HISTO / (max_bande - min_bande)))
+                    inside = (index_array >= 0) & (index_array < NBR_COL_HISTO)
+                    histogram_list = numpy.bincount(index_array[inside].astype(numpy.int64), weights=counts_array[inside], minlength=NBR_COL_HISTO).astype(numpy.int64).tolist()
+            histograms_dico[bande] = [min_bande, max_bande, histogram_list]
+    else :
+        for bande in num_bands:
+            band = dataset.GetRasterBand(bande)
+            a = band.ComputeRasterMinMax()
+            b = band.GetHistogram(min=a[0],max=a[1],buckets=NBR_COL_HISTO,approx_ok=0)
+            histograms_dico[bande] = [a[0], a[1], b]
+        dataset = None
+
+    return histograms_dico
+
+###########################################################################################################################################
+# FONCTION getCompressionOptions()                                                                                                        #
+###########################################################################################################################################
+def getCompressionOptions(compress_type, predictor, zlevel, use_cog=False):
+    """
+    # ROLE :
+    # Liste des options de création gdal d'une image compressée (GeoTiff tuilé ou COG)
+    #
+    # ENTREES DE LA FONCTION :
+    #    compress_type : Type d algorithme disponibles de compression. Choix entre DEFLATE, LZW ou "" (pas de compression)
+    #    predictor : réglage du predicteur pour compression LZW ou DEFLATE
+    #    zlevel : reglage du taux de compression pour la compression DEFLATE
+    #    use_cog : options du format COG (Cloud Optimized GeoTiff, avec apercus), par defaut False
+    # SORTIES DE LA FONCTION :
+    #    la liste des options de création
+    #
+    """
+
+    options_list = []
+    while switch(compress_type.upper()):
+        if case("DEFLATE"):
+            if use_cog :
+                options_list = ["COMPRESS=DEFLATE", "PREDICTOR=%s" %(COG_PREDICTOR_DICO.get(int(predictor), "NO")), "LEVEL=%s" %(zlevel)]
+            else :
+                options_list = ["TILED=YES", "COMPRESS=%s" %(compress_type), "PREDICTOR=%s" %(predictor), "ZLEVEL=%s" %(zlevel)]
+            break
+        if case("LZW"):
+            if use_cog :
+                options_list = ["COMPRESS=LZW", "PREDICTOR=%s" %(COG_PREDICTOR_DICO.get(int(predictor), "NO"))]
+            else :
+                options_list = ["TILED=YES", "COMPRESS=%s" %(compress_type), "ZLEVEL=%s" %(zlevel)]
+            break
+        if case(""):
+            options_list = ["COMPRESS=NONE"] if use_cog else ["TILED=YES"]
+            break
+        break
+    if options_list == []:
+        raise NameError (bold + red + "getCompressionOptions() : Le type de compression n'est pas reconu : "  + str(compress_type + endC))
+
+    options_list.append("BIGTIFF=IF_SAFER")
+    if use_cog :
+        options_list += ["OVERVIEWS=AUTO", "RESAMPLING=AVERAGE", "NUM_THREADS=ALL_CPUS"]
+
+    return options_list
+
+###########################################################################################################################################
+# FONCTION writeImage8Bits()                                                                                                              #
+###########################################################################################################################################
+def writeImage8Bits(image_input, outputs_list, num_bands, clip_values_dico, nbr_bandes_nodata=0, no_data_value=None, inputBand4Found=False, nb_workers=0):
+    """
+    # ROLE :
+    # Ecriture d'une image 8 bits en un seul passage : l'image d'entrée est lue par bandes de lignes alignées sur les blocs,
+    # chaque bande de lignes est rééchantillonnée en 8 bits par un thread et écrite dans l'ordre dans toutes les images de sortie
+    #
+    # ENTREES DE LA FONCTION :
+    #    image_input : nom de l'image .tif a traiter
+    #    outputs_list : liste des images de sortie [image_output, format_raster, options_list]
+    #    num_bands : liste des numéros des bandes de l'image d'entrée, dans l'ordre des bandes de sortie
+    #    clip_values_dico : dictionnaire par numéro de bande des valeurs [min, max] gardées (histogramme optimisé), None pour le rééchantillonnage simple (valeur/16 + 1)
+    #    nbr_bandes_nodata : les pixels dont les nbr_bandes_nodata premieres bandes de l'image d'entrée sont à 0 sont mis à 0 dans toutes les bandes, par defaut 0 (pas de gestion du nodata)
+    #    no_data_value : valeur nodata des images de sortie, par defaut None (pas de valeur nodata)
+    #    inputBand4Found : il existe une band 4 qui ne doit pas etre la transparence, par defaut False
+    #    nb_workers : nombre de threads de calcul des bandes de lignes, par defaut 0 (nombre de CPU)
+    # SORTIES DE LA FONCTION :
+    #    N.A.
+    #
+    """
+
+    dataset = gdal.Open(image_input, GA_ReadOnly)
+    cols = dataset.RasterXSize
+    rows = dataset.RasterYSize
+    block_y = dataset.GetRasterBand(num_bands[0]).GetBlockSize()[1]
+
+    # Création des images de sortie
+    datasets_output_list = []
+    for image_output, format_raster, options_list in outputs_list:
+        driver = gdal.GetDriverByName(format_raster)
+        dataset_output = driver.Create(image_output, cols, rows, len(num_bands), GDT_Byte, options=options_list)
+        if dataset_output is None:
+            raise NameError(bold + red + "writeImage8Bits() : Impossible de créer l'image " + image_output + endC)
+        dataset_output.SetGeoTransform(dataset.GetGeoTransform())
+        dataset_output.SetProjection(dataset.GetProjection())
+        for index_band in range(len(num_bands)):
+            band_output = dataset_output.GetRasterBand(index_band + 1)
+            if no_data_value is not None:
+                band_output.SetNoDataValue(no_data_value)
+            if inputBand4Found and index_band == 3:
+                band_output.SetColorInterpretation(GCI_Undefined)
+        # Les bandes de lignes sont alignées sur les blocs de l'image d'entrée et sur les tuiles de l'image de sortie
+        block_output_y = dataset_output.GetRasterBand(1).GetBlockSize()[1]
+        block_y = block_y * block_output_y // math.gcd(block_y, block_output_y)
+        datasets_output_list.append(dataset_output)
+    dataset = None
+
+    strips_list = getStripsImage(cols, rows, block_y, MAX_PIXELS_STRIP)
+
+    def computeStrip(strip):
+        # Chaque thread ouvre son propre dataset (les datasets GDAL ne sont pas partageables entre threads)
+        yoff, nb_rows = strip
+        dataset_strip = gdal.Open(image_input, GA_ReadOnly)
+        strip_array = numpy.empty((len(num_bands), nb_rows, cols), dtype=numpy.uint8)
+        for index_band, bande in enumerate(num_bands):
+            data = dataset_strip.GetRasterBand(bande).ReadAsArray(0, yoff, cols, nb_rows).astype(numpy.float64)
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                if clip_values_dico is None:
+                    data_8bits = numpy.where(data == 0, 0, data / 16 + 1)
+                else :
+                    val_min_garde, val_max_garde = clip_values_dico[bande]
+                    data_scaled = (data - val_min_garde) * 255 / (val_max_garde - val_min_garde)
+                    data_8bits = numpy.where(data <= val_min_garde, 1, numpy.where(data > val_max_garde, 255, numpy.where(data_scaled <= 1.0, 1, data_scaled)))
+            strip_array[index_band] = numpy.clip(numpy.nan_to_num(data_8bits), 0, 255).astype(numpy.uint8)
+            data, data_8bits = None, None
+
+        # Gestion des valeurs nodata : pixels à 0 sur les premieres bandes de l'image d'entrée
+        if nbr_bandes_nodata > 0:
+            zero_mask = numpy.ones((nb_rows, cols), dtype=bool)
+            for bande in range(1, nbr_bandes_nodata + 1):
+                zero_mask &= dataset_strip.GetRasterBand(bande).ReadAsArray(0, yoff, cols, nb_rows) == 0
+            strip_array[:, zero_mask] = 0
+        dataset_strip = None
+        return yoff, strip_array
+
+    def writeStrip(result):
+        yoff, strip_array = result
+        for dataset_output in datasets_output_list:
+            for index_band in range(len(num_bands)):
+                dataset_output.GetRasterBand(index_band + 1).WriteArray(strip_array[index_band], 0, yoff)
+        return
+
+    # Calcul des bandes de lignes en parallele, écriture dans l'ordre des lignes
+    processStripsImage(strips_list, computeStrip, writeStrip, nb_workers)
+
+    for dataset_output in datasets_output_list:
+        dataset_output.FlushCache()
+    datasets_output_list = None
+
+    return
+
 ###########################################################################################################################################
 # FONCTION convertion8Bits()                                                                                                              #
 ###########################################################################################################################################
-def convertion8Bits(image_input, image_output_8bits, repertory_tmp, inputBand4Found, need_optimize8b, need_rvb, need_irc, channel_order, suppr_min, suppr_max, format_raster, extension_raster=".tif", save_results_intermediate=False):
+def convertion8Bits(image_input, image_output_8bits, repertory_tmp, inputBand4Found, need_optimize8b, need_rvb, need_irc, channel_order, suppr_min, suppr_max, format_raster, extension_raster=".tif", save_results_intermediate=False, image_output_compress="", compress_type="", predictor=2, zlevel=3, use_cog=False, nb_workers=0):
     """
     # ROLE :
     # Conversion d'une image 16 bits en 8 bits
+    # Un premier passage calcule les histogrammes des bandes (si l'optimisation est demandée), un second passage rééchantillonne
+    # toutes les bandes en 8 bits et écrit directement l'image 8 bits et l'image compressée (tuilée, ou COG)
     #
     # ENTREES DE LA FONCTION :
     #    image_input : nom de l'image .tif a traiter
-    #    image_output_compress : non de l'image de sortie compressée
     #    image_output_8bits : nom de l'image 8 bits
     #    repertory_tmp : repertoire temporaire de travail
     #    inputBand4Found : il existe une band 4 qui ne doit pas etre la transparence
@@ -203,15 +473,17 @@ def convertion8Bits(image_input, image_output_8bits, repertory_tmp, inputBand4Fo
     #    format_raster : format de l'image de sortie
     #    extension_raster : extension des fichiers raster de sortie, par defaut = '.tif'
     #    save_results_intermediate : sauvegarde ou suppression des images résultats, par defaut à False
+    #    image_output_compress : non de l'image 8 bits compressée, par defaut "" (pas de compression)
+    #    compress_type : Type d algorithme disponibles de compression. Choix entre DEFLATE, LZW, par defaut ""
+    #    predictor : réglage du predicteur pour compression LZW ou DEFLATE, par defaut 2
+    #    zlevel : reglage du taux de compression pour la compression DEFLATE, par defaut 3
+    #    use_cog : booleen si vrai, l'image compressée (ou l'image 8 bits sans compression) est écrite au format COG avec apercus, par defaut False
+    #    nb_workers : nombre de threads de lecture et de calcul, par defaut 0 (nombre de CPU)
     # SORTIES DE LA FONCTION :
     #    Image 8bits
     #
     """
 
-    # Constantes diverses
-    NBR_COL_HISTO = 256
-    CODAGE = "uint8"
-
     ###############################################################
     # Echantillonage en 8 bits de toutes les bandes de l'image    #
     ###############################################################
@@ -223,6 +495,7 @@ def convertion8Bits(image_input, image_output_8bits, repertory_tmp, inputBand4Fo
     # Chargement de l'image en dataset
     dataset = gdal.Open(image_input, GA_ReadOnly)
     nbr_bandes_entree = dataset.RasterCount
+    dataset = None
 
     # Calcul du nombre de bandes dans l'image
     nbr_bandes = nbr_bandes_entree
@@ -241,211 +514,108 @@ def convertion8Bits(image_input, image_output_8bits, repertory_tmp, inputBand4Fo
     else:
         num_bands = [num_band for num_band in range(1,nbr_bandes+1)]
 
-    ###########################################################
-    # Compression en 8 bits pour chaque bandes                #
-    ###########################################################
-    if debug >= 1:
-        print(cyan + "convertion8Bits() : " + endC + "Debut du passage en 8 bits bandes par bandes de %s" %(image_input))
-    no_data_value = getNodataValueImage(image_input)
+    # L'image 8 bits existe deja, seule la compression est faite a partir de l'image existante
+    if os.path.isfile(image_output_8bits):
+        print(bold + yellow + "ATTENTION : un fichier concatene existe deja dans " + image_output_8bits + endC)
+        print(bold + yellow + "L'image en 8 bits n est pas mise a jour " + endC)
+        if image_output_compress != "":
+            compressImage(image_output_8bits, image_output_compress, inputBand4Found, compress_type, predictor, zlevel, format_raster, use_cog)
+        return
 
     ###########################################################
-    # Chaque bande est compréssée en 8 bits                   #
+    # Si l'optimisation par calcul d'histograme est demandée  #
+    # les extrémités de l'histogramme sont supprimées         #
+    # avant d'être rééchantilonné en bits                     #
     ###########################################################
-
-    for bande in num_bands:
-
-        ###########################################################
-        # Si l'optimisation par calcul d'histograme est demandée  #
-        # les extrémités de l'histogramme sont supprimées         #
-        # avant d'être rééchantilonné en bits                     #
-        ###########################################################
-        if need_optimize8b:
-
-            # Chargement des données de la bandes
-            band = dataset.GetRasterBand(bande)
-
-            # Calcul des valeurs minimales et maximales de la bande
-            a=band.ComputeRasterMinMax()
-            min_Bande=a[0]
-            max_Bande=a[1]
-
-            # Extraction de l'histogramme de la bande
-            b=band.GetHistogram(min=a[0],max=a[1],buckets=NBR_COL_HISTO,approx_ok=0)
-
-            if debug >= 2:
-                print(cyan + "convertion8Bits() : " + endC + "Statistiques de la bande " + str(bande) + " : " + str(a))
-                print(cyan + "convertion8Bits() : " + endC + "[min , max] de la bande " + str(bande) + " : [" + str(min_Bande) + " , " + str(max_Bande) + "]")
-                print(cyan + "convertion8Bits() : " + endC + "Histogramme de la bande " + str(bande))
-
-            # Calcul du nombre total de pixels et de l'histogramme cumulé
-            cum_hist=[]
-            total = 0
-            for bucket in b:
-                cum_hist.append(total + bucket)
-                total = total + bucket
-
-            if debug >= 2:
-                print(cyan + "convertion8Bits() : " + endC + "Histogramme cumule de la bande " + str(bande))
-                print(cum_hist)
-
-            # Determination des numeros de colonne dans l'histogramme (entre 0 et 255) du min,max de la bande
-            index_val_min = 0
-            index_val_max = NBR_COL_HISTO
-
-            for j in range(0,256):
-                if cum_hist[j-1]<=0 and cum_hist[j]>0 :
-                    index_val_min=max(0,j-1)
-                elif cum_hist[j-1]<total and cum_hist[j]>=total :
-                    index_val_max=min(j,NBR_COL_HISTO)
-                    break
-
-            if debug >= 2:
-                print(cyan + "convertion8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur minimale = " + str(index_val_min) + endC)
-                print(cyan + "convertion8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur maximale = " + str(index_val_max) + endC)
-
-            # On ne garde que les valeurs comprises entre suppr_min % et suppr_max %
-            val_cum_min_garde = total*float(suppr_min)/100
-            val_cum_max_garde = total*(1-float(suppr_max)/100)
-
-            if debug >= 2:
-                print(cyan + "convertion8Bits() : " + endC + "Valeur cumulee minimale gardee : "+ str(val_cum_min_garde) + endC)
-                print(cyan + "convertion8Bits() : " + endC + "Valeur cumulee maximale gardee : "+ str(val_cum_max_garde) + endC)
-
-            # Determination des numeros de colonne dans l'histogramme (entre 0 et 255) du min,max que l'on va garder après suppression des valeurs en bordure
-            index_val_min_garde = 0
-            index_val_max_garde = NBR_COL_HISTO
-
-            for j in range(0,256):
-                if cum_hist[j-1]<=val_cum_min_garde and cum_hist[j]>val_cum_min_garde :
-                    index_val_min_garde=max(0,j-1)
-                elif cum_hist[j-1]<val_cum_max_garde and cum_hist[j]>=val_cum_max_garde :
-                    index_val_max_garde=min(j,NBR_COL_HISTO)
-                    break
-
+    clip_values_dico = None
+    if need_optimize8b:
+        if debug >= 1:
+            print(cyan + "convertion8Bits() : " + endC + "Calcul des histogrammes des bandes de %s" %(image_input))
+        histograms_dico = computeHistograms8Bits(image_input, num_bands, nb_workers)
+        clip_values_dico = {}
+        for bande in num_bands:
+            min_bande, max_bande, histogram_list = histograms_dico[bande]
             if debug >= 2:
-                print(cyan + "convertion8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur minimale gardee = "+ str(index_val_min_garde) + endC)
-                print(cyan + "convertion8Bits() : " + endC + "Numero de colonne de l histogramme de la valeur maximale gardee = "+ str(index_val_max_garde) + endC)
-
-            # Calcul des valeurs extremes des pixels gardes apres tronquage
-            val_min_garde = index_val_min_garde*a[1]/index_val_max
-            val_max_garde = index_val_max_garde*a[1]/index_val_max
-
+                print(cyan + "convertion8Bits() : " + endC + "[min , max] de la bande " + str(bande) + " : [" + str(min_bande) + " , " + str(max_bande) + "]")
+            clip_values_dico[bande] = computeClipValues8Bits(histogram_list, max_bande if max_bande is not None else 0, suppr_min, suppr_max)
             if debug >= 2:
-                print(cyan + "convertion8Bits() : " + endC + "Valeur minimale des pixels gardes = "+ str(val_min_garde) + endC)
-                print(cyan + "convertion8Bits() : " + endC + "Valeur maximale des pixels gardes = "+ str(val_max_garde) + endC)
-
-            expression = "\"(im1b" + str(bande)+"<="+str(val_min_garde)+")?1:(im1b" + str(bande)+">"+str(val_max_garde)+")?255:((im1b" + str(bande) + "-" + str( val_min_garde) +")*255/(" + str(val_max_garde) + "-" + str( val_min_garde) +"))<=1.0?1:(im1b" + str(bande) + "-" + str( val_min_garde) +")*255/(" + str(val_max_garde) + "-" + str( val_min_garde) +")\""
-
-        ###########################################################
-        # Pas l'optimisation demandée                             #
-        # Tout l'histogramme est rééchantilonné en bits           #
-        ###########################################################
-        else :
-            # Expression
-            expression = "\"(im1b" + str(bande) + "== 0)?0:((im1b" + str(bande) + "/16) + 1)\""
-
-        # Passage en 8 bits : redistribution des valeurs entre 0 et 255
-        if debug >= 1:
-            print(cyan + "convertion8Bits() : " + endC + bold + green + "Codage en 8 bits de la bande : " + str(bande) + endC)
-
-        image_output = repertory_tmp + os.sep + os.path.splitext(os.path.basename(image_input))[0] + "_band_" + str(bande) + extension_raster
-
-        if debug >= 2:
-            print("Expression : " + str(expression))
-            print("image_input : " + image_input)
-            print("image_output : " + image_output)
-
-        if os.path.isfile(image_output):
-            print("le fichier " + image_output + " est deja traite")
-        else :
-            exitCode = os.system("otbcli_BandMath -il %s -out %s %s -exp %s" %(image_input, image_output, CODAGE, expression))
-            if exitCode != 0:
-                raise NameError(bold + red + "convertion8Bits() : An error occured during otbcli_BandMath command. See error message above." + endC)
-        # end for bande
-
-    if debug >= 1:
-        print(cyan + "convertion8Bits() : " + endC + "Debut du passage en 8 bits bandes par bandes de %s" %(image_input))
+                print(cyan + "convertion8Bits() : " + endC + "Valeur minimale des pixels gardes = "+ str(clip_values_dico[bande][0]) + endC)
+                print(cyan + "convertion8Bits() : " + endC + "Valeur maximale des pixels gardes = "+ str(clip_values_dico[bande][1]) + endC)
 
     ###########################################################
-    # Concatenation des bandes                                #
+    # Images de sortie                                        #
     ###########################################################
+    # Gestion des valeurs nodata (pixels à 0 sur toutes les bandes) pour les sorties 3 ou 4 bandes
+    nbr_bandes_nodata = 0
+    no_data_value = None
+    if (nbr_bandes == 3) or (nbr_bandes == 4) :
+        nbr_bandes_nodata = 3 if (nbr_bandes == 3 and nbr_bandes_entree == 3) else 4
+        no_data_value = getNodataValueImage(image_input)
+
+    # L'image au format COG est réécrite à partir d'une image temporaire tuilée
+    image_cog = image_output_compress if image_output_compress != "" else image_output_8bits
+    image_cog_tmp = repertory_tmp + os.sep + os.path.splitext(os.path.basename(image_input))[0] + "_cog_tmp" + extension_raster
+    outputs_list = []
+    for image_output, options_list in [[image_output_8bits, getCompressionOptions("", predictor, zlevel)], [image_output_compress, getCompressionOptions(compress_type, predictor, zlevel)]]:
+        if image_output == "":
+            continue
+        if use_cog and image_output == image_cog:
+            image_output, options_list = image_cog_tmp, getCompressionOptions("", predictor, zlevel)
+        outputs_list.append([image_output, format_raster, options_list])
 
+    ###########################################################
+    # Passage en 8 bits et ecriture en un seul passage        #
+    ###########################################################
     if debug >= 1:
-        print(cyan + "convertion8Bits() : " + endC + "Debut de la concatenation des bandes en 8 bits de %s" %(image_input))
+        print(cyan + "convertion8Bits() : " + endC + "Debut du passage en 8 bits de %s vers %s" %(image_input, str([output[0] for output in outputs_list])))
+    writeImage8Bits(image_input, outputs_list, num_bands, clip_values_dico, nbr_bandes_nodata, no_data_value, inputBand4Found, nb_workers)
 
-    # Creation de la liste des n bandes a concatener
-    bands_to_concatenate_list = []
-    bands_to_concatenate_list_str = ''
-    for bande in num_bands:
-        band_name = repertory_tmp + os.sep +  os.path.splitext(os.path.basename(image_input))[0] + "_band_" + str(bande) + extension_raster
-        bands_to_concatenate_list.append(band_name)
-        bands_to_concatenate_list_str += band_name + " "
+    if use_cog :
+        translateImageCog(image_cog_tmp, image_cog, compress_type, predictor, zlevel)
+        if not save_results_intermediate :
+            removeFile(image_cog_tmp)
 
-    if os.path.isfile(image_output_8bits):
-        print(bold + yellow + "ATTENTION : un fichier concatene existe deja dans " + image_output_8bits + endC)
-        print(bold + yellow + "L'image en 8 bits n est pas mise a jour " + endC)
-    else :
-        # Concatenation des bandes
-        print( bold + green + "Concatenation des bandes codees en 8 bits : " + image_output_8bits + endC)
-        huit_bits_image_tmp = repertory_tmp + os.sep +  os.path.splitext(os.path.basename(image_input))[0] + "_tmp" + extension_raster
-        command = "otbcli_ConcatenateImages -il %s -out %s %s " %(bands_to_concatenate_list_str, huit_bits_image_tmp, CODAGE)
-        exitCode = os.system(command)
-        if exitCode != 0:
-            print(command)
-            raise NameError(bold + red + "convertion8Bits() : An error occured during otbcli_ConcatenateImages command. See error message above." + endC)
-
-        # Gestion des valeurs nodata
-        print( bold + green + "Gestion des nodata à 0 : " + image_output_8bits + endC)
-        huit_bits_image_tmp2 = repertory_tmp + os.sep +  os.path.splitext(os.path.basename(image_input))[0] + "_tmp2" + extension_raster
-        if (nbr_bandes == 3) or (nbr_bandes == 4) :
-
-            if nbr_bandes == 3 :
-                if nbr_bandes_entree  == 3 :
-                    expression = "\"((im1b1==0 and im1b2==0 and im1b3==0)?{0,0,0}:im2)\""
-                else :
-                    expression = "\"((im1b1==0 and im1b2==0 and im1b3==0 and im1b4==0)?{0,0,0}:im2)\""
-            else :
-                expression = "\"((im1b1==0 and im1b2==0 and im1b3==0 and im1b4==0)?{0,0,0,0}:im2)\""
-            print(command)
-            command = "otbcli_BandMathX -il %s %s -out %s %s -exp %s" %(image_input, huit_bits_image_tmp, huit_bits_image_tmp2, CODAGE, expression)
-            exitCode = os.system(command)
-            if exitCode != 0:
-                print(command)
-                raise NameError(bold + red + "convertion8Bits() : An error occured during otbcli_BandMathX command. See error message above." + endC)
+    if debug >= 1:
+        print(cyan + "convertion8Bits() : " + endC + "Fin du passage en 8 bits de %s" %(image_input) + endC)
 
-            setNodataValueImage(huit_bits_image_tmp2, no_data_value)
+    print(bold + green + "FIN DU CODAGE EN 8 BITS DE " + image_input + endC)
 
-        else :
-            huit_bits_image_tmp2 = huit_bits_image_tmp
+    return
 
-        ###########################################################
-        # La bande 4 ne doit pas etre la transparence             #
-        ###########################################################
-        if inputBand4Found :
-            command = "gdal_translate -of %s -colorinterp_4 undefined %s %s" %(format_raster, huit_bits_image_tmp2, image_output_8bits)
-            exitCode = os.system(command)
-            if exitCode != 0:
-                print(command)
-                raise NameError(bold + red + "convertion8Bits() : An error occured during gdal_translate command. See error message above." + endC)
-
-            if not save_results_intermediate :
-                removeFile(huit_bits_image_tmp2)
-        else :
-            renameFile(huit_bits_image_tmp2, image_output_8bits)
+###########################################################################################################################################
+# FONCTION translateImageCog()                                                                                                            #
+###########################################################################################################################################
+def translateImageCog(image_input, image_output_cog, compress_type, predictor, zlevel):
+    """
+    # ROLE :
+    # Conversion d'une image au format COG (Cloud Optimized GeoTiff) compressé, les apercus sont calculés par gdal
+    #
+    # ENTREES DE LA FONCTION :
+    #    image_input : nom de l'image a convertir
+    #    image_output_cog : nom de l'image COG
+    #    compress_type : Type d algorithme disponibles de compression. Choix entre DEFLATE, LZW ou "" (pas de compression)
+    #    predictor : réglage du predicteur pour compression LZW ou DEFLATE
+    #    zlevel : reglage du taux de compression pour la compression DEFLATE
+    # SORTIES DE LA FONCTION :
+    #    Image COG
+    #
+    """
 
-        if not save_results_intermediate :
-                removeFile(huit_bits_image_tmp)
     if debug >= 1:
-        print(cyan + "convertion8Bits() : " + endC + "Fin de la concatenation des bandes en 8 bits de %s" %(image_input) + endC)
+        print(cyan + "translateImageCog() : " + endC + "Ecriture de l'image COG " + image_output_cog + endC)
 
-    print(bold + green + "FIN DU CODAGE EN 8 BITS DE " + image_input + endC)
+    options_list = getCompressionOptions(compress_type, predictor, zlevel, use_cog=True)
+    dataset_cog = gdal.Translate(image_output_cog, image_input, format="COG", creationOptions=options_list)
+    if dataset_cog is None:
+        raise NameError(bold + red + "translateImageCog() : An error occured during gdal.Translate to COG format of " + image_input + endC)
+    dataset_cog = None
 
     return
 
 ###########################################################################################################################################
 # FONCTION compressImage()                                                                                                                #
 ###########################################################################################################################################
-def compressImage(image_input, image_output_compress, inputBand4Found, compress_type, predictor, zlevel, format_raster):
+def compressImage(image_input, image_output_compress, inputBand4Found, compress_type, predictor, zlevel, format_raster, use_cog=False):
     """
     # ROLE :
     # Compression d'une image Tiff
@@ -458,6 +628,7 @@ def compressImage(image_input, image_output_compress, inputBand4Found, compress_
     #    predictor : réglage du predicteur pour compression LZW ou DEFLATEgdal_translate
     #    zlevel : reglage du taux de compression pour la compression DEFLATE
     #    format_raster : format de l'image compressée
+    #    use_cog : booleen si vrai, l'image compressée est écrite au format COG avec apercus, par defaut False
     # SORTIES DE LA FONCTION :
     #    Image compressé
     #
@@ -467,25 +638,13 @@ def compressImage(image_input, image_output_compress, inputBand4Found, compress_
         print(cyan + "compressImage() : " + endC + "Debut de la compression de %s" %(image_input))
 
     # Preparation de la commande
-    command = ""
     caseBand4 = ""
     if inputBand4Found :
         caseBand4 = "-colorinterp_4 undefined"
-    # Selon le type de compression
-    while switch(compress_type.upper()):
-        if case("DEFLATE"):
-            if debug >= 2:
-                print("Compression DEFLATE : ")
-            command = "gdal_translate -of %s %s -co TILED=YES -co COMPRESS=%s -co PREDICTOR=%s -co ZLEVEL=%s %s %s" %(format_raster, caseBand4, compress_type, predictor, zlevel, image_input, image_output_compress)
-            break
-        if case("LZW"):
-            if debug >= 2:
-                print("Compression LZW : ")
-            command = "gdal_translate -of %s %s -co TILED=YES -co COMPRESS=%s -co ZLEVEL=%s %s %s" %(format_raster, caseBand4, compress_type, zlevel, image_input, image_output_compress)
-            break
-        break
-    if command =="":
-        raise NameError (bold + red + "compressImage() : Le type de compression n'est pas reconu : "  + str(compress_type + endC))
+    if use_cog :
+        format_raster = "COG"
+    options_str = " ".join(["-co " + option for option in getCompressionOptions(compress_type, predictor, zlevel, use_cog)])
+    command = "gdal_translate -of %s %s %s %s %s" %(format_raster, caseBand4, options_str, image_input, image_output_compress)
 
     if debug >= 1:
         print(cyan + "compressImage() : " + endC + "Algorithme de compressions : " + str(compress_type) + endC)
@@ -539,6 +698,8 @@ def main(gui=False):
     parser.add_argument('-chao','--channel_order',nargs="+", default=['Red','Green','Blue','NIR'],help="Type of multispectral image : rapideye or spot6 or pleiade. By default : [Red,Green,Blue,NIR]",type=str,required=False)
     parser.add_argument('-raf','--format_raster', default="GTiff", help="Option : Format output image, by default : GTiff (GTiff, HFA...)", type=str, required=False)
     parser.add_argument('-rae','--extension_raster', default=".tif", help="Option : Extension file for image raster. By default : '.tif'", type=str, required=False)
+    parser.add_argument('-cog','--cog', action='store_true', default=False, help="If active, the output image is written in COG format (Cloud Optimized GeoTiff, with overviews). By default : False", required=False)
+    parser.add_argument('-nbw','--nb_workers',default=0,help="Option : Number of threads for the 8 bits conversion, by default : 0 (number of CPU)", type=int, required=False)
     parser.add_argument('-log','--path_time_log',default="",help="Name of log", type=str, required=False)
     parser.add_argument('-sav','--save_results_inter',action='store_true',default=False,help="Save or delete intermediate result after the process. By default, False", required=False)
     parser.add_argument('-now','--overwrite',action='store_false',default=True,help="Overwrite files with same names. By default : True", required=False)
@@ -596,6 +757,12 @@ def main(gui=False):
     if args.channel_order != None:
         channel_order = args.channel_order
 
+    if args.cog != None:
+        use_cog = args.cog
+
+    if args.nb_workers != None:
+        nb_workers = args.nb_workers
+
     # Paramètre format des images de sortie
     if args.format_raster != None:
         format_raster = args.format_raster
@@ -637,6 +804,8 @@ def main(gui=False):
         print(cyan + "ImageCompression : " + endC + "rvb : " + str(need_rvb) + endC)
         print(cyan + "ImageCompression : " + endC + "irc : " + str(need_irc) + endC)
         print(cyan + "ImageCompression : " + endC + "channel_order : " + str(channel_order) + endC)
+        print(cyan + "ImageCompression : " + endC + "cog : " + str(use_cog) + endC)
+        print(cyan + "ImageCompression : " + endC + "nb_workers : " + str(nb_workers) + endC)
         print(cyan + "ImageCompression : " + endC + "format_raster : " + str(format_raster) + endC)
         print(cyan + "ImageCompression : " + endC + "extension_raster : " + str(extension_raster) + endC)
         print(cyan + "ImageCompression : " + endC + "path_time_log : " + str(path_time_log) + endC)
@@ -657,7 +826,7 @@ def main(gui=False):
 
     # Lancement de la fonction compression d'image
     if need_8bits or need_compress:
-        convertImage(image_input, image_output_8bits, image_output_compress, need_8bits, need_compress, compress_type, predictor, zlevel, suppr_min, suppr_max, need_optimize8b, need_rvb, need_irc, path_time_log, channel_order, format_raster, extension_raster, save_results_intermediate, overwrite)
+        convertImage(image_input, image_output_8bits, image_output_compress, need_8bits, need_compress, compress_type, predictor, zlevel, suppr_min, suppr_max, need_optimize8b, need_rvb, need_irc, path_time_log, channel_order, format_raster, extension_raster, save_results_intermediate, overwrite, use_cog, nb_workers)
 
 # ================================================
 
@@ -29,6 +29,7 @@ Origine : le script originel provient du fichier script_ima_ass.py cree en 2014
 -----------------------------------------------------------------------------------------------------
 Modifications :
 01/10/2014 : refonte du fichier harmonisation des règles de qualité des niveaux de boucles et des paramétres dans args
+16/10/2026 : recherche des images par emprise dans un catalogue persistant (ImagesCatalog) au lieu de l'ouverture de chaque fichier des répertoires
 ------------------------------------------------------
 A Reflechir/A faire :
 Dans la fonction cutOutImages créer un nom de fichier de sortie tel que si format_raster = GTiff alors extension fichier de sortie = .tif
@@ -48,6 +49,7 @@ from Lib_raster import getDataTypeImage, getPixelWidthXYImage, changeDataValueTo
 from Lib_file import removeVectorFile, removeFile, deleteDir
 from Lib_text import appendTextFileCR
 from CreateEmprises import createEmprise
+from ImagesCatalog import ImagesCatalog
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 1 : affichage intermédiaire de commentaires lors de l'execution du script
@@ -73,7 +75,7 @@ class StructZoneDate:
 ###########################################################################################################################################
 # FONCTION selectAssembyImagesByHold                                                                                                      #
 ###########################################################################################################################################
-def selectAssembyImagesByHold(emprise_vector, input_repertories_list, output_file, is_not_assembled, is_zone_date, epsg, is_vrtfile, is_band_stack, is_clean_zero, is_clean_zero_output, clean_zero_value, pixel_size_x, pixel_size_y, no_data_value, separ_name, pos_date, nb_char_date, separ_date, path_time_log, file_out_suffix_error="_error", file_out_suffix_merge="_merge", file_out_suffix_clean="_clean", file_out_suffix_stack="_stack", format_raster='GTiff', format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True):
+def selectAssembyImagesByHold(emprise_vector, input_repertories_list, output_file, is_not_assembled, is_zone_date, epsg, is_vrtfile, is_band_stack, is_clean_zero, is_clean_zero_output, clean_zero_value, pixel_size_x, pixel_size_y, no_data_value, separ_name, pos_date, nb_char_date, separ_date, path_time_log, file_out_suffix_error="_error", file_out_suffix_merge="_merge", file_out_suffix_clean="_clean", file_out_suffix_stack="_stack", format_raster='GTiff', format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True, catalog_file=""):
     """
     # ROLE:
     #    Sectionner et Assembler des images raster selon un fichier masque vecteur
@@ -108,6 +110,7 @@ def selectAssembyImagesByHold(emprise_vector, input_repertories_list, output_fil
     #    extension_vector : extension du fichier vecteur de sortie, par defaut = '.shp'
     #    save_results_intermediate : fichiers de sorties intermediaires non nettoyees, par defaut = False
     #    overwrite : supprime ou non les fichiers existants ayant le meme nom
+    #    catalog_file : fichier catalogue (SQLite) des emprises des images sources, conservé d'une execution à l'autre, par defaut "" (catalogue en mémoire)
     #
     # SORTIES DE LA FONCTION :
     #    Le(s) fichier(s) image assemblé(s)
@@ -145,6 +148,7 @@ def selectAssembyImagesByHold(emprise_vector, input_repertories_list, output_fil
         print(cyan + "selectAssembyImagesByHold() : " + endC + "extension_vector : " + str(extension_vector) + endC)
         print(cyan + "selectAssembyImagesByHold() : " + endC + "save_results_intermediate : " + str(save_results_intermediate))
         print(cyan + "selectAssembyImagesByHold() : " + endC + "overwrite : " + str(overwrite))
+        print(cyan + "selectAssembyImagesByHold() : " + endC + "catalog_file : " + str(catalog_file))
 
     # Constante
     EXT_VRT = ".vrt"
@@ -187,8 +191,10 @@ def selectAssembyImagesByHold(emprise_vector, input_repertories_list, output_fil
     if debug >= 4:
          print(cyan + "selectAssembyImagesByHold : " + endC + "table_images_list : " + str(table_images_list) + endC)
 
+    images_catalog = ImagesCatalog(catalog_file, debug)
     for repertory in input_repertories_list:
-        selectImagesFile(table_images_list, images_error_list, repertory, empr_xmin, empr_xmax, empr_ymin, empr_ymax, is_zone_date, separ_name, pos_date, nb_char_date, separ_date)
+        selectImagesFile(table_images_list, images_error_list, repertory, empr_xmin, empr_xmax, empr_ymin, empr_ymax, is_zone_date, separ_name, pos_date, nb_char_date, separ_date, images_catalog)
+    images_catalog.close()
 
     if debug >= 4:
          print(cyan + "selectAssembyImagesByHold : " + endC + "table_images_list : " + str(table_images_list) + endC)
@@ -386,7 +392,7 @@ def selectAssembyImagesByHold(emprise_vector, input_repertories_list, output_fil
 ###########################################################################################################################################
 # FONCTION selectImagesFile()                                                                                                             #
 ###########################################################################################################################################
-def selectImagesFile(table_images_list, images_error_list, repertory, empr_xmin, empr_xmax, empr_ymin, empr_ymax, is_zone_date, separ_name, pos_date, nb_char_date, separ_date):
+def selectImagesFile(table_images_list, images_error_list, repertory, empr_xmin, empr_xmax, empr_ymin, empr_ymax, is_zone_date, separ_name, pos_date, nb_char_date, separ_date, images_catalog):
     """
     # ROLE:
     #     Rechercher dans un repetoire toutes les images qui sont contenues ou qui intersectes l'emprise
@@ -404,6 +410,7 @@ def selectImagesFile(table_images_list, images_error_list, repertory, empr_xmin,
     #    pos_date     : Paramètre date acquisition dans le nom, position relatif au séparateur d'information
     #    nb_char_date : Paramètre date acquisition dans le nom, nombre de caractères constituant la date
     #    separ_date   : Paramètre date acquisition dans le nom, séparateur dans l'information date
+    #    images_catalog : Catalogue des emprises des images (ImagesCatalog)
     #
     # SORTIES DE LA FONCTION :
     #    La liste des images selectionnées dans l'emprise
@@ -422,115 +429,68 @@ def selectImagesFile(table_images_list, images_error_list, repertory, empr_xmin,
 
     EXT_LIST = ['tif','TIF','tiff','TIFF','ecw','ECW','jp2','JP2','asc','ASC']
 
-    for imagefile in glob.glob(repertory + os.sep + '*.*'):
-        ok = True
-        if imagefile.rsplit('.',1)[1] in EXT_LIST :
-            try:
-                dataset = gdal.Open(imagefile, GA_ReadOnly)
-            except RuntimeError:
-                print(cyan + "selectImagesFile : " + bold + red + "Erreur Impossible d'ouvrir le fichier : " + imagefile, file=sys.stderr)
-                images_error_list.append(imagefile)
-                ok = False
-            if ok and dataset is None :
-                images_error_list.append(imagefile)
-                ok = False
-            if ok :
-                cols = dataset.RasterXSize
-                rows = dataset.RasterYSize
-                bands = dataset.RasterCount
-
-                geotransform = dataset.GetGeoTransform()
-                pixel_width = geotransform[1]  # w-e pixel resolution
-                pixel_height = geotransform[5] # n-s pixel resolution
-
-                imag_xmin = geotransform[0]     # top left x
-                imag_ymax = geotransform[3]     # top left y
-                imag_xmax = imag_xmin + (cols * pixel_width)
-                imag_ymin = imag_ymax + (rows * pixel_height)
-
-                if debug >= 5:
-                    print(cyan + "selectImagesFile : " + endC + "imag_xmin : " + str(imag_xmin) + endC)
-                    print(cyan + "selectImagesFile : " + endC + "imag_ymax : " + str(imag_ymax) + endC)
-                    print(cyan + "selectImagesFile : " + endC + "imag_xmax : " + str(imag_xmax) + endC)
-                    print(cyan + "selectImagesFile : " + endC + "imag_ymin : " + str(imag_ymin) + endC)
-
-
-                # Si l'image et l'emprise sont complement disjointe l'image n'est pas selectionée
-                if not ((imag_xmin > empr_xmax) or (imag_xmax < empr_xmin) or (imag_ymin > empr_ymax) or (imag_ymax < empr_ymin)) :
-
-                    datePriseDeVue = ""
-                    # Cas ou l'on attend des zones fusionées par date
-                    if is_zone_date :
-                       metaData = dataset.GetMetadata()
-                       fileTest = os.path.basename(imagefile)
-                       extension = fileTest.split('.')[1]
-
-                       # Fichiers tif
-                       if extension.lower() == 'tif' or extension.lower() == 'tiff' :
-                           # tag TIFFTAG_DATETIME pour .tif format "YYYY:MM:DD HH:MM:SS"
-                           if 'TIFFTAG_DATETIME' in metaData :
-                               infoTag = metaData['TIFFTAG_DATETIME']
-                               datePriseDeVue = infoTag.split(' ')[0].replace(":","")
-
-                       # Fichiers ecw
-                       elif extension.lower() == 'ecw' :
-                           # tag FILE_METADATA_ACQUISITION_DATE pour .ecw format "YYYY-MM-DD"
-                           if extension.lower() == 'ecw' and 'FILE_METADATA_ACQUISITION_DATE' in metaData :
-                               infoTag = metaData['FILE_METADATA_ACQUISITION_DATE']
-                               datePriseDeVue = infoTag.replace("-","")
-
-                       # Fichiers jp2
-                       elif extension.lower() == 'jp2':
-                           datePriseDeVue == ""
-
-                       # Fichiers asc
-                       elif extension.lower() == 'asc':
-                           datePriseDeVue == ""
-
-                       # Cas ou les metadata ne sont pas renseignés recherche de la date d'acquisition dans le nom du fichier avec valeurs de la postion passés en paramètres
-                       if datePriseDeVue == "" :
-                           filename = os.path.basename(imagefile)
-                           print(cyan + "selectImagesFile : " + endC + "filename : " + str(filename) + endC)
-                           infoDate = filename.split(separ_name)[pos_date]
-                           datePriseDeVue = infoDate[:nb_char_date]
-                           datePriseDeVue = datePriseDeVue.replace(separ_date,"")
-
-                       if debug >= 4:
-                           print(cyan + "selectImagesFile : " + endC + "infoDate : " + str(infoDate) + endC)
-                           print(cyan + "selectImagesFile : " + endC + "datePriseDeVue : " + str(datePriseDeVue) + endC)
-                           print(cyan + "selectImagesFile : " + endC + "table_images_list : " + str(table_images_list) + endC)
-
-                    # Vérifier dans la hastable si la key correspondante existe sinon creer une nouvelle key
-                    if datePriseDeVue not in table_images_list :
-                        s_zone_date = StructZoneDate()
-                        s_zone_date.date = datePriseDeVue
-                        s_zone_date.images_list = []
-                        s_zone_date.xmin = 999999999999999.0
-                        s_zone_date.ymax = 0.0
-                        s_zone_date.xmax = 0.0
-                        s_zone_date.ymin = 999999999999999.0
-                        table_images_list[datePriseDeVue] = s_zone_date
-
-                        if debug >= 4:
-                            print(cyan + "selectImagesFile : " + endC + "s_zone_date.date : " + str(s_zone_date.date) + endC)
-
-                    if debug >= 4:
-                        print(cyan + "selectImagesFile : " + endC + "table_images_list : " + str(table_images_list) + endC)
-
-                    # Récuperer dans la hastable la liste d'image correspondant à la date et mettre a jour l'information
-                    s_zone_date = table_images_list.get(datePriseDeVue)
-                    s_zone_date.images_list.append(imagefile)
-
-                    if imag_xmin < s_zone_date.xmin :
-                        s_zone_date.xmin = imag_xmin
-                    if imag_ymin < s_zone_date.ymin:
-                        s_zone_date.ymin = imag_ymin
-                    if imag_xmax > s_zone_date.xmax :
-                        s_zone_date.xmax = imag_xmax
-                    if imag_ymax > s_zone_date.ymax:
-                        s_zone_date.ymax = imag_ymax
-                    newSZoneDate = {datePriseDeVue : s_zone_date}
-                    table_images_list.update(newSZoneDate)
+    # Images du répertoire qui ne peuvent pas être ouvertes
+    for imagefile in images_catalog.selectErrorImages(repertory, EXT_LIST):
+        print(cyan + "selectImagesFile : " + bold + red + "Erreur Impossible d'ouvrir le fichier : " + imagefile + endC, file=sys.stderr)
+        images_error_list.append(imagefile)
+
+    # Recherche par emprise dans le catalogue des images contenues dans ou qui intersectent l'emprise
+    for imagefile, imag_xmin, imag_xmax, imag_ymin, imag_ymax, pixel_width, pixel_height, date_metadata in images_catalog.selectImages(repertory, EXT_LIST, empr_xmin, empr_xmax, empr_ymin, empr_ymax):
+        if debug >= 5:
+            print(cyan + "selectImagesFile : " + endC + "imag_xmin : " + str(imag_xmin) + endC)
+            print(cyan + "selectImagesFile : " + endC + "imag_ymax : " + str(imag_ymax) + endC)
+            print(cyan + "selectImagesFile : " + endC + "imag_xmax : " + str(imag_xmax) + endC)
+            print(cyan + "selectImagesFile : " + endC + "imag_ymin : " + str(imag_ymin) + endC)
+
+        datePriseDeVue = ""
+        # Cas ou l'on attend des zones fusionées par date
+        if is_zone_date :
+           # Date d'acquisition des métadonnées (tag TIFFTAG_DATETIME des .tif, FILE_METADATA_ACQUISITION_DATE des .ecw) lue dans le catalogue
+           datePriseDeVue = date_metadata
+
+           # Cas ou les metadata ne sont pas renseignés recherche de la date d'acquisition dans le nom du fichier avec valeurs de la postion passés en paramètres
+           if datePriseDeVue == "" :
+               filename = os.path.basename(imagefile)
+               print(cyan + "selectImagesFile : " + endC + "filename : " + str(filename) + endC)
+               infoDate = filename.split(separ_name)[pos_date]
+               datePriseDeVue = infoDate[:nb_char_date]
+               datePriseDeVue = datePriseDeVue.replace(separ_date,"")
+
+           if debug >= 4:
+               print(cyan + "selectImagesFile : " + endC + "datePriseDeVue : " + str(datePriseDeVue) + endC)
+               print(cyan + "selectImagesFile : " + endC + "table_images_list : " + str(table_images_list) + endC)
+
+        # Vérifier dans la hastable si la key correspondante existe sinon creer une nouvelle key
+        if datePriseDeVue not in table_images_list :
+            s_zone_date = StructZoneDate()
+            s_zone_date.date = datePriseDeVue
+            s_zone_date.images_list = []
+            s_zone_date.xmin = 999999999999999.0
+            s_zone_date.ymax = 0.0
+            s_zone_date.xmax = 0.0
+            s_zone_date.ymin = 999999999999999.0
+            table_images_list[datePriseDeVue] = s_zone_date
+
+            if debug >= 4:
+                print(cyan + "selectImagesFile : " + endC + "s_zone_date.date : " + str(s_zone_date.date) + endC)
+
+        if debug >= 4:
+            print(cyan + "selectImagesFile : " + endC + "table_images_list : " + str(table_images_list) + endC)
+
+        # Récuperer dans la hastable la liste d'image correspondant à la date et mettre a jour l'information
+        s_zone_date = table_images_list.get(datePriseDeVue)
+        s_zone_date.images_list.append(imagefile)
+
+        if imag_xmin < s_zone_date.xmin :
+            s_zone_date.xmin = imag_xmin
+        if imag_ymin < s_zone_date.ymin:
+            s_zone_date.ymin = imag_ymin
+        if imag_xmax > s_zone_date.xmax :
+            s_zone_date.xmax = imag_xmax
+        if imag_ymax > s_zone_date.ymax:
+            s_zone_date.ymax = imag_ymax
+        newSZoneDate = {datePriseDeVue : s_zone_date}
+        table_images_list.update(newSZoneDate)
 
     if debug >= 3:
         print(cyan + "selectImagesFile : Fin de la sélection des dossiers images" + endC)
@@ -995,6 +955,7 @@ def main(gui=False):
     parser.add_argument('-vef','--format_vector', default="ESRI Shapefile",help="Format of the output file.", type=str, required=False)
     parser.add_argument('-rae','--extension_raster', default=".tif", help="Option : Extension file for image raster. By default : '.tif'", type=str, required=False)
     parser.add_argument('-vee','--extension_vector',default=".shp",help="Option : Extension file for vector. By default : '.shp'", type=str, required=False)
+    parser.add_argument('-cat','--catalog_file',default="",help="Option : Catalog file (SQLite) of the emprises of the source images, kept between runs and updated when files change. By default : '' (catalog in memory)", type=str, required=False)
     parser.add_argument('-log','--path_time_log',default="",help="Name of log", type=str, required=False)
     parser.add_argument('-sav','--save_results_inter',action='store_true',default=False,help="Save or delete intermediate result after the process. By default, False", required=False)
     parser.add_argument('-now','--overwrite',action='store_false',default=True,help="Overwrite files with same names. By default : True", required=False)
@@ -1102,6 +1063,10 @@ def main(gui=False):
     if args.extension_vector != None:
         extension_vector = args.extension_vector
 
+    # Récupération du fichier catalogue des emprises des images
+    if args.catalog_file != None:
+        catalog_file = args.catalog_file
+
     # Récupération du nom du fichier log
     if args.path_time_log != None:
         path_time_log = args.path_time_log
@@ -1147,6 +1112,7 @@ def main(gui=False):
         print(cyan + "ImagesAssembly : " + endC + "format_vector : " + str(format_vector) + endC)
         print(cyan + "ImagesAssembly : " + endC + "extension_raster : " + str(extension_raster) + endC)
         print(cyan + "ImagesAssembly : " + endC + "extension_vector : " + str(extension_vector) + endC)
+        print(cyan + "ImagesAssembly : " + endC + "catalog_file : " + str(catalog_file) + endC)
         print(cyan + "ImagesAssembly : " + endC + "path_time_log : " + str(path_time_log) + endC)
         print(cyan + "ImagesAssembly : " + endC + "save_results_inter : " + str(save_results_intermediate) + endC)
         print(cyan + "ImagesAssembly : " + endC + "overwrite : " + str(overwrite) + endC)
@@ -1159,7 +1125,7 @@ def main(gui=False):
         os.makedirs(repertory_output)
 
     # Fonction générale
-    selectAssembyImagesByHold(emprise_input, repertory_input_list, image_output, not_assembled, zone_date, epsg, vrtfile, band_stack, clean_zero, clean_zero_output, clean_zero_value,pixel_size_x, pixel_size_y, no_data_value, separname, posdate, nbchardate, separdate, path_time_log, file_out_suffix_error, file_out_suffix_merge, file_out_suffix_clean, file_out_suffix_stack, format_raster, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite)
+    selectAssembyImagesByHold(emprise_input, repertory_input_list, image_output, not_assembled, zone_date, epsg, vrtfile, band_stack, clean_zero, clean_zero_output, clean_zero_value,pixel_size_x, pixel_size_y, no_data_value, separname, posdate, nbchardate, separdate, path_time_log, file_out_suffix_error, file_out_suffix_merge, file_out_suffix_clean, file_out_suffix_stack, format_raster, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite, catalog_file)
 
 # ================================================
 
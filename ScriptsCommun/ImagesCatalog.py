@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python
+
+#############################################################################################################################################
+# Copyright (©) CEREMA/DTerOCC/DT/OSECC  All rights reserved.                                                                               #
+#############################################################################################################################################
+
+#############################################################################################################################################
+#                                                                                                                                           #
+# CATALOGUE DES EMPRISES DES IMAGES RASTER D'UN REPERTOIRE : INDEX SPATIAL PERSISTANT MIS A JOUR DE FACON INCREMENTALE                      #
+#                                                                                                                                           #
+#############################################################################################################################################
+"""
+ Ce module contient le catalogue des emprises des images (dalles) des répertoires d'images sources.
+ Pour chaque image le catalogue (base SQLite) conserve le chemin, l'emprise, la résolution, la date d'acquisition lue dans les métadonnées,
+ la date de modification et la taille du fichier. L'emprise est indexée dans une table R-tree pour une recherche par rectangle englobant.
+ A chaque utilisation d'un répertoire seuls les fichiers nouveaux ou dont la date de modification ou la taille ont changé sont ouverts
+ avec gdal, les fichiers supprimés sont retirés du catalogue.
+ Sans fichier catalogue, le catalogue est créé en mémoire et n'est pas conservé d'une execution à l'autre.
+"""
+
+# IMPORTS UTILES
+from __future__ import print_function
+import os, sys, threading, sqlite3
+from osgeo import gdal
+from osgeo.gdalconst import GA_ReadOnly
+from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+
+# Extensions des images référencées dans le catalogue
+CATALOG_EXT_LIST = ['tif','tiff','ecw','jp2','dim','asc']
+
+#############################################################################################
+# CLASSE ImagesCatalog()                                                                    #
+#############################################################################################
+class ImagesCatalog:
+    """
+    # ROLE :
+    #   Catalogue des emprises des images : mise à jour incrementale par répertoire et recherche des images par emprise
+    """
+
+    def __init__(self, catalog_file="", debug=0):
+        self.catalog_file = catalog_file
+        self.debug = debug
+        self.lock = threading.Lock()
+        self.refreshed_set = set()
+        if catalog_file == "":
+            catalog_file = ":memory:"
+        self.connection = sqlite3.connect(catalog_file, timeout=60, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS images (id INTEGER PRIMARY KEY, path TEXT UNIQUE, repertory TEXT, mtime INTEGER, size INTEGER, xmin REAL, xmax REAL, ymin REAL, ymax REAL, pixel_width REAL, pixel_height REAL, date TEXT, error INTEGER)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS images_repertory ON images (repertory)")
+            # Index spatial R-tree (si le module rtree n'est pas disponible dans SQLite, la recherche se fait sur la table images)
+            try:
+                self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS images_rtree USING rtree(id, xmin, xmax, ymin, ymax)")
+                self.use_rtree = True
+            except sqlite3.OperationalError:
+                self.use_rtree = False
+
+    def readImageInfo(self, image_file):
+        """
+        # ROLE :
+        #   Lit avec gdal l'emprise, la résolution et la date d'acquisition des métadonnées d'une image
+        #   (tag TIFFTAG_DATETIME pour les .tif, FILE_METADATA_ACQUISITION_DATE pour les .ecw)
+        #
+        # ENTREES :
+        #   image_file : le fichier image
+        #
+        # SORTIES :
+        #   la liste [xmin, xmax, ymin, ymax, pixel_width, pixel_height, date] ou None si l'image ne peut pas être ouverte
+        """
+
+        try:
+            dataset = gdal.Open(image_file, GA_ReadOnly)
+        except RuntimeError:
+            dataset = None
+        if dataset is None:
+            return None
+
+        cols = dataset.RasterXSize
+        rows = dataset.RasterYSize
+        geotransform = dataset.GetGeoTransform()
+        pixel_width = geotransform[1]  # w-e pixel resolution
+        pixel_height = geotransform[5] # n-s pixel resolution
+        xmin = geotransform[0]     # top left x
+        ymax = geotransform[3]     # top left y
+        xmax = xmin + (cols * pixel_width)
+        ymin = ymax + (rows * pixel_height)
+
+        date = ""
+        meta_data = dataset.GetMetadata()
+        extension = os.path.splitext(image_file)[1][1:].lower()
+        # Fichiers tif : tag TIFFTAG_DATETIME format "YYYY:MM:DD HH:MM:SS"
+        if extension in ['tif', 'tiff'] and 'TIFFTAG_DATETIME' in meta_data:
+            date = meta_data['TIFFTAG_DATETIME'].split(' ')[0].replace(":","")
+        # Fichiers ecw : tag FILE_METADATA_ACQUISITION_DATE format "YYYY-MM-DD"
+        elif extension == 'ecw' and 'FILE_METADATA_ACQUISITION_DATE' in meta_data:
+            date = meta_data['FILE_METADATA_ACQUISITION_DATE'].replace("-","")
+        dataset = None
+
+        return [xmin, xmax, ymin, ymax, pixel_width, pixel_height, date]
+
+    def refreshRepertory(self, repertory):
+        """
+        # ROLE :
+        #   Met à jour le catalogue pour les images d'un répertoire (non récursif) : les images nouvelles ou modifiées
+        #   (date de modification ou taille différente) et les images en erreur sont relues, les images supprimées sont retirées
+        #   Un répertoire n'est mis à jour qu'une fois par catalogue ouvert
+        #
+        # ENTREES :
+        #   repertory : le répertoire des images
+        """
+
+        repertory = os.path.abspath(repertory)
+        if repertory in self.refreshed_set:
+            return
+
+        # Etat des fichiers images du répertoire
+        files_dico = {}
+        for entry in os.scandir(repertory):
+            if entry.name.startswith('.') or os.path.splitext(entry.name)[1][1:].lower() not in CATALOG_EXT_LIST:
+                continue
+            if entry.is_file():
+                stat_file = entry.stat()
+                files_dico[entry.path] = (stat_file.st_mtime_ns, stat_file.st_size)
+
+        with self.lock:
+            known_dico = {}
+            for id_image, path, mtime, size, error in self.connection.execute("SELECT id, path, mtime, size, error FROM images WHERE repertory = ?", (repertory,)):
+                known_dico[path] = (id_image, mtime, size, error)
+
+        removed_id_list = [known_dico[path][0] for path in known_dico if path not in files_dico]
+        update_list = []
+        for path in sorted(files_dico):
+            if path not in known_dico or known_dico[path][1:3] != files_dico[path] or known_dico[path][3]:
+                update_list.append(path)
+
+        # Lecture des images nouvelles ou modifiées (hors verrou)
+        rows_list = []
+        for path in update_list:
+            info_list = self.readImageInfo(path)
+            if info_list is None:
+                rows_list.append((path, repertory, files_dico[path][0], files_dico[path][1], None, None, None, None, None, None, "", 1))
+            else:
+                rows_list.append((path, repertory, files_dico[path][0], files_dico[path][1]) + tuple(info_list) + (0,))
+
+        if removed_id_list == [] and rows_list == []:
+            self.refreshed_set.add(repertory)
+            return
+
+        with self.lock:
+            with self.connection:
+                for id_image in removed_id_list:
+                    self.deleteImage(id_image)
+                for row in rows_list:
+                    for (id_image,) in self.connection.execute("SELECT id FROM images WHERE path = ?", (row[0],)).fetchall():
+                        self.deleteImage(id_image)
+                    cursor = self.connection.execute("INSERT INTO images (path, repertory, mtime, size, xmin, xmax, ymin, ymax, pixel_width, pixel_height, date, error) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", row)
+                    if self.use_rtree and not row[11]:
+                        self.connection.execute("INSERT INTO images_rtree VALUES (?,?,?,?,?)", (cursor.lastrowid, row[4], row[5], min(row[6], row[7]), max(row[6], row[7])))
+
+        self.refreshed_set.add(repertory)
+        if self.debug >= 2:
+            print(cyan + "ImagesCatalog.refreshRepertory : " + endC + repertory + " : " + str(len(files_dico)) + " images, " + str(len(rows_list)) + " lues, " + str(len(removed_id_list)) + " retirées du catalogue" + endC)
+        return
+
+    def deleteImage(self, id_image):
+        """
+        # ROLE :
+        #   Supprime une image du catalogue (à appeler dans une transaction, verrou pris)
+        """
+
+        self.connection.execute("DELETE FROM images WHERE id = ?", (id_image,))
+        if self.use_rtree:
+            self.connection.execute("DELETE FROM images_rtree WHERE id = ?", (id_image,))
+        return
+
+    def selectImages(self, repertory, extension_list=None, xmin=None, xmax=None, ymin=None, ymax=None):
+        """
+        # ROLE :
+        #   Recherche dans le catalogue les images d'un répertoire qui sont contenues dans ou qui intersectent une emprise
+        #   Le répertoire est mis à jour avant la recherche
+        #
+        # ENTREES :
+        #   repertory : le répertoire des images
+        #   extension_list : liste des extensions des images recherchées, par defaut None (toutes les images du catalogue)
+        #   xmin, xmax, ymin, ymax : l'emprise de recherche, par defaut None (toutes les images du répertoire)
+        #
+        # SORTIES :
+        #   la liste triée par chemin des images [path, xmin, xmax, ymin, ymax, pixel_width, pixel_height, date]
+        """
+
+        self.refreshRepertory(repertory)
+        repertory = os.path.abspath(repertory)
+
+        if xmin is None:
+            request = "SELECT path, xmin, xmax, ymin, ymax, pixel_width, pixel_height, date FROM images WHERE repertory = ? AND error = 0 ORDER BY path"
+            parameters = (repertory,)
+        elif self.use_rtree:
+            # L'index R-tree (flottants simple précision arrondis vers l'extérieur) filtre, le test exact est fait sur la table images
+            request = "SELECT i.path, i.xmin, i.xmax, i.ymin, i.ymax, i.pixel_width, i.pixel_height, i.date FROM images_rtree r JOIN images i ON i.id = r.id WHERE r.xmin <= ? AND r.xmax >= ? AND r.ymin <= ? AND r.ymax >= ? AND i.repertory = ? AND i.xmin <= ? AND i.xmax >= ? AND i.ymin <= ? AND i.ymax >= ? ORDER BY i.path"
+            parameters = (xmax, xmin, ymax, ymin, repertory, xmax, xmin, ymax, ymin)
+        else:
+            request = "SELECT path, xmin, xmax, ymin, ymax, pixel_width, pixel_height, date FROM images WHERE repertory = ? AND error = 0 AND xmin <= ? AND xmax >= ? AND ymin <= ? AND ymax >= ? ORDER BY path"
+            parameters = (repertory, xmax, xmin, ymax, ymin)
+
+        with self.lock:
+            images_list = [list(row) for row in self.connection.execute(request, parameters)]
+
+        if extension_list is not None:
+            images_list = [image for image in images_list if os.path.splitext(image[0])[1][1:] in extension_list]
+        return images_list
+
+    def selectErrorImages(self, repertory, extension_list=None):
+        """
+        # ROLE :
+        #   Retourne la liste des images d'un répertoire qui n'ont pas pu être ouvertes
+        """
+
+        self.refreshRepertory(repertory)
+        with self.lock:
+            error_list = [row[0] for row in self.connection.execute("SELECT path FROM images WHERE repertory = ? AND error = 1 ORDER BY path", (os.path.abspath(repertory),))]
+        if extension_list is not None:
+            error_list = [path for path in error_list if os.path.splitext(path)[1][1:] in extension_list]
+        return error_list
+
+    def close(self):
+        """
+        # ROLE :
+        #   Ferme le catalogue
+        """
+
+        self.connection.close()
+        return
@@ -27,6 +27,8 @@ Modifications :
     - 22/04/2024 : ajout fonction createMnhFromMnsCorrel() pour générer un MNH à partir du MNS-Correl (image_mns_input et image_mnt_input sont des répertoires où sont stockées les archives MNS-Correl et RGE ALTI 1M)
     - 20/02/2025 : ajout fonction createMnhFromLidarHd() pour générer un MNH à partir de nuages de points LiDAR HD (lhd_directory_list est une liste de répertoires où sont stockées les nuages de points LiDAR HD)
     - 26/02/2025 : parallélisation des scripts createMnhFromMnsCorrel() et createMnhFromLidarHd() avec ajout d'un paramètre 'nb_cpus' permettant de choisir les ressources à utiliser.
+    - 16/10/2026 : createMnhFromLidarHd() calcule le MNT et le MNS de chaque dalle en une seule lecture du nuage de points (pipeline PDAL à deux branches), avec cache des dalles ('tiles_cache_directory') et MNH par dalle optionnel ('mnh_by_tile').
+    - 16/10/2026 : createMnh() calcule le MNH (masque de seuillage et incrustation des routes) et la fusion des batis avec la calculatrice raster Lib_bandmath au lieu d'otbcli_BandMath.
 A Reflechir/A faire :
 
 """
@@ -34,8 +36,8 @@ A Reflechir/A faire :
 # Import des bibliothèques Python
 from __future__ import print_function
 from builtins import input
-import os,sys,glob,argparse,string,math,datetime,subprocess,threading,psutil,time
-from concurrent.futures import ThreadPoolExecutor
+import os,sys,glob,argparse,string,math,datetime,subprocess,threading,psutil,time,json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from osgeo import ogr
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displayIHM
 from Lib_log import timeLine
@@ -44,6 +46,7 @@ from Lib_file import removeFile, removeVectorFile, cleanTempData, deleteDir, rea
 from Lib_postgis import openConnection, getData, closeConnection
 from Lib_text import readTextFileBySeparator, writeTextFile
 from Lib_raster import getNodataValueImage, countPixelsOfValue, cutImageByVector, createBinaryMask, rasterizeBinaryVector, rasterizeVector, getEmpriseImage, getPixelWidthXYImage, getProjectionImage
+from Lib_bandmath import bandExpression, whereExpression, writeRasterExpressions
 from Lib_vector import cutoutVectors, fusionVectors, addNewFieldVector, getAttributeValues, setAttributeIndexValuesList, filterSelectDataVector, getProjection
 from Lib_saga import fillNodata
 from MacroSamplesCreation import createMacroSamples
@@ -321,7 +324,10 @@ def createMnh(image_mns_input, image_mnt_input, image_threshold_input, vector_em
         if image_threshold_input != "" :
             if not cutImageByVector(vector_emprise_input, image_threshold_input, image_threshold_cut, None, None, False, no_data_value, epsg, format_raster, format_vector) :
                 raise NameError (cyan + "createMnh() : " + bold + red + "!!! Une erreur c'est produite au cours du decoupage de l'image : " + image_threshold_input + ". Voir message d'erreur." + endC)
-            createBinaryMask(image_threshold_cut, image_threshold_mask, threshold_bd_value, False, CODAGE_8B)
+            # Le masque est une expression raster calculée avec le MNH, il n'est écrit que si les résultats intermédiaires sont conservés
+            threshold_mask_expression = createBinaryMask(image_threshold_cut, None, threshold_bd_value, False, CODAGE_8B)
+            if save_results_intermediate:
+                writeRasterExpressions([threshold_mask_expression], image_threshold_mask, CODAGE_8B, format_raster, ram_max=ram_otb, image_reference=image_threshold_cut)
 
         # Execution de la fonction createMacroSamples pour une image correspondant au données routes
         if bd_road_vector_input_list != [] :
@@ -332,38 +338,22 @@ def createMnh(image_mns_input, image_mnt_input, image_threshold_input, vector_em
 
         # CALCUL DU MNH
 
-        # Calcul par bandMath du MNH definir l'expression qui soustrait le MNT au MNS en introduisant le biais et en mettant les valeurs à 0 à une valeur approcher de 0.0000001
-        delta = ""
-        if height_bias > 0 :
-            delta = "+%s" %(str(height_bias))
-        elif height_bias < 0 :
-            delta = "-%s" %(str(abs(height_bias)))
-        else :
-            delta = ""
+        # Calcul du MNH : expression qui soustrait le MNT au MNS en introduisant le biais et en mettant les valeurs à 0 à une valeur approcher de 0.0000001
+        # Expression : (im1b1-im2b1+delta) > 0.0?im1b1-im2b1+delta:PRECISION
+        mnh_expression = bandExpression(image_mns_clean) - bandExpression(image_mnt_clean_sample) + height_bias
+        mnh_expression = whereExpression(mnh_expression > 0.0, mnh_expression, PRECISION)
 
-        # Definition de l'expression
+        # Incrustation des routes : im3b1 > 0?PRECISION:... ou im3b1 > 0 and im4b1 > 0?PRECISION:...
         if bd_road_vector_input_list != [] :
+            road_expression = bandExpression(raster_bd_road_mask) > 0
             if image_threshold_input != "" :
-                expression = "\"im3b1 > 0 and im4b1 > 0?%s:(im1b1-im2b1%s) > 0.0?im1b1-im2b1%s:%s\"" %(str(PRECISION), delta, delta, str(PRECISION))
-                command = "otbcli_BandMath -il %s %s %s %s -out %s %s -exp %s" %(image_mns_clean, image_mnt_clean_sample, raster_bd_road_mask, image_threshold_mask, image_mnh_tmp, CODAGE_F, expression)
-            else :
-                expression = "\"im3b1 > 0?%s:(im1b1-im2b1%s) > 0.0?im1b1-im2b1%s:%s\"" %(str(PRECISION), delta, delta, str(PRECISION))
-                command = "otbcli_BandMath -il %s %s %s -out %s %s -exp %s" %(image_mns_clean, image_mnt_clean_sample, raster_bd_road_mask, image_mnh_tmp, CODAGE_F, expression)
-        else :
-            expression = "\"(im1b1-im2b1%s) > 0.0?im1b1-im2b1%s:%s\"" %(delta, delta, str(PRECISION))
-            command = "otbcli_BandMath -il %s %s -out %s %s -exp %s" %(image_mns_clean, image_mnt_clean_sample, image_mnh_tmp, CODAGE_F, expression)
-
-        if ram_otb > 0:
-            command += " -ram %d" %(ram_otb)
+                road_expression = road_expression & (threshold_mask_expression > 0)
+            mnh_expression = whereExpression(road_expression, PRECISION, mnh_expression)
 
         if debug >= 3:
             print(cyan + "createMnh() : " + bold + green + "Calcul du MNH  %s difference du MNS : %s par le MNT :%s" %(image_mnh_tmp, image_mns_clean, image_mnt_clean_sample) + endC)
-            print(command)
 
-        exitCode = os.system(command)
-        if exitCode != 0:
-            print(command)
-            raise NameError(cyan + "createMnh() : " + bold + red + "An error occured during otbcli_BandMath command to compute MNH " + image_mnh_tmp + ". See error message above." + endC)
+        writeRasterExpressions([mnh_expression], image_mnh_tmp, CODAGE_F, format_raster, ram_max=ram_otb, image_reference=image_mns_clean)
 
         # DECOUPAGE DU MNH
 
@@ -448,20 +438,14 @@ def createMnh(image_mns_input, image_mnt_input, image_threshold_input, vector_em
             rasterizeVector(vector_bd_bati, raster_bd_bati, image_mnh_road, COLUMN_H_BUILD, codage=CODAGE_F)
 
             # Fusion du mask des batis et du MNH temporaire
-            expression = "\"im1b1 > 0.0?im1b1:im2b1\""
-            command = "otbcli_BandMath -il %s %s -out %s %s -exp %s" %(raster_bd_bati, image_mnh_road, image_mnh_output, CODAGE_F, expression)
-
-            if ram_otb > 0:
-                command += " -ram %d" %(ram_otb)
+            # Expression : im1b1 > 0.0?im1b1:im2b1
+            bati_expression = bandExpression(raster_bd_bati)
+            mnh_bati_expression = whereExpression(bati_expression > 0.0, bati_expression, bandExpression(image_mnh_road))
 
             if debug >= 3:
                 print(cyan + "createMnh() : " + bold + green + "Amelioration du MNH  %s ajout des hauteurs des batis %s" %(image_mnh_road, raster_bd_bati) + endC)
-                print(command)
 
-            exitCode = os.system(command)
-            if exitCode != 0:
-                print(command)
-                raise NameError(cyan + "createMnh() : " + bold + red + "An error occured during otbcli_BandMath command to compute MNH Final " + image_mnh_output + ". See error message above." + endC)
+            writeRasterExpressions([mnh_bati_expression], image_mnh_output, CODAGE_F, format_raster, ram_max=ram_otb, image_reference=raster_bd_bati)
 
     # SUPPRESIONS FICHIERS INTERMEDIAIRES INUTILES
 
@@ -940,10 +924,54 @@ def createMnhFromMnsCorrel(vector_emprise_input, image_mnh_output, image_referen
 
     return 0
 
+########################################################################
+# FONCTION createPipelineLidarHdTile()                                 #
+########################################################################
+def createPipelineLidarHdTile(LHD_file, dtm_tile_output, dsm_tile_output, resolution, xmin_tile, ymin_tile, tile_size):
+    '''
+    # ROLE :
+    #     Création du pipeline PDAL (JSON) calculant en une seule lecture du nuage de points d'une dalle LiDAR HD
+    #     le MNT (sol, eau, points virtuels) et le MNS (sol, végétation, bâti, eau, ponts)
+    #     Le nuage est lu une fois puis le pipeline se sépare en deux branches (MNT et MNS), chacune avec son filtre SMRF,
+    #     son filtre de classes et son écriture GDAL. Le filtre SMRF modifiant la classification des points,
+    #     la classification d'origine est sauvegardée après la lecture et restaurée en tête de chaque branche.
+    #     Les deux rasters sont calés sur la grille de la dalle afin d'être superposables pixel à pixel.
+    #
+    # ENTREES DE LA FONCTION :
+    #     LHD_file : fichier nuage de points LiDAR HD (.copc.laz)
+    #     dtm_tile_output : fichier raster MNT de sortie de la dalle
+    #     dsm_tile_output : fichier raster MNS de sortie de la dalle
+    #     resolution : résolution des rasters de sortie
+    #     xmin_tile : coordonnée X minimale de la dalle
+    #     ymin_tile : coordonnée Y minimale de la dalle
+    #     tile_size : taille de la dalle (en mètres)
+    #
+    # SORTIES DE LA FONCTION :
+    #     le texte JSON du pipeline PDAL
+    '''
+
+    # Classes ignorées par le filtre SMRF et classes conservées, pour chaque branche
+    branches_list = [
+        ("mnt", dtm_tile_output, "Classification[0:1],Classification[3:6],Classification[7:7],Classification[8:8],Classification[10:65],Classification[67:255]", "Classification[2:2],Classification[9:9],Classification[66:66]"),
+        ("mns", dsm_tile_output, "Classification[0:1],Classification[7:7],Classification[8:8],Classification[10:16],Classification[18:255]", "Classification[2:6],Classification[9:9],Classification[17:17]")
+    ]
+    size_grid = int(math.ceil(tile_size / resolution))
+
+    pipeline_list = []
+    pipeline_list.append({"type":"readers.copc", "filename":LHD_file, "tag":"lecture"})
+    pipeline_list.append({"type":"filters.ferry", "dimensions":"Classification => ClassificationOrigine", "inputs":["lecture"], "tag":"sauvegarde"})
+    for branch, raster_output, ignore_classes, limits_classes in branches_list:
+        pipeline_list.append({"type":"filters.ferry", "dimensions":"ClassificationOrigine => Classification", "inputs":["sauvegarde"], "tag":branch + "_restauration"})
+        pipeline_list.append({"type":"filters.smrf", "ignore":ignore_classes, "inputs":[branch + "_restauration"], "tag":branch + "_smrf"})
+        pipeline_list.append({"type":"filters.range", "limits":limits_classes, "inputs":[branch + "_smrf"], "tag":branch + "_range"})
+        pipeline_list.append({"type":"writers.gdal", "filename":raster_output, "output_type":"mean", "gdaldriver":"GTiff", "resolution":resolution, "origin_x":xmin_tile, "origin_y":ymin_tile, "width":size_grid, "height":size_grid, "data_type":"float", "inputs":[branch + "_range"], "tag":branch + "_ecriture"})
+
+    return json.dumps(pipeline_list, indent=4) + "\n"
+
 ########################################################################
 # FONCTION createMnhFromLidarHd()                                      #
 ########################################################################
-def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference_input, lhd_directory_list, keep_mnt_mns=True, nb_cpus=30, path_time_log="", save_results_intermediate=False, overwrite=True):
+def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference_input, lhd_directory_list, keep_mnt_mns=True, nb_cpus=30, tiles_cache_directory="", mnh_by_tile=False, path_time_log="", save_results_intermediate=False, overwrite=True):
     '''
     # ROLE :
     #     Création d'un MNH à partir de nuages de points LiDAR HD
@@ -955,9 +983,11 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
     #     lhd_directory_list : liste de répertoires, où sont stockés les nuages de points LiDAR HD. L'ordre des répertoires est important : si la même donnée est dans plusieurs répertoires, le premier sera privilégié.
     #     keep_mnt_mns : choix de garder les MNT et MNS à la fin du traitement. Par défaut, True
     #     nb_cpus : nombre de CPUs à utiliser pour lancer l'exécution en parallèle (les threads, ou tâches, seront alors équitablement répartis sur la ressource).
+    #     tiles_cache_directory : répertoire de cache des dalles MNT/MNS (et MNH) calculées par nuage de points, conservé d'un traitement à l'autre : les dalles déjà calculées (même nuage, même résolution) sont réutilisées. Par défaut, vide (dalles dans le répertoire temporaire)
+    #     mnh_by_tile : calcul du MNH directement sur chaque dalle puis assemblage des dalles MNH (sans bouchage des trous des MNT/MNS assemblés). Par défaut, False
     #     path_time_log : fichier log de sortie, par défaut vide
     #     save_results_intermediate : conserver les fichiers temporaires, par défaut = False
-    #     overwrite : écraser si un fichier existant a le même nom qu'un fichier de sortie, par défaut = True
+    #     overwrite : écraser si un fichier existant a le même nom qu'un fichier de sortie, par défaut = True (les dalles du cache ne sont jamais supprimées)
     #
     # SORTIES DE LA FONCTION :
     #     N.A.
@@ -970,6 +1000,8 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
         print(cyan + "createMnhFromLidarHd() : " + endC + "lhd_directory_list : " + str(lhd_directory_list) + endC)
         print(cyan + "createMnhFromLidarHd() : " + endC + "keep_mnt_mns : " + str(keep_mnt_mns) + endC)
         print(cyan + "createMnhFromLidarHd() : " + endC + "nb_cpus : " + str(nb_cpus) + endC)
+        print(cyan + "createMnhFromLidarHd() : " + endC + "tiles_cache_directory : " + str(tiles_cache_directory) + endC)
+        print(cyan + "createMnhFromLidarHd() : " + endC + "mnh_by_tile : " + str(mnh_by_tile) + endC)
         print(cyan + "createMnhFromLidarHd() : " + endC + "path_time_log : " + str(path_time_log) + endC)
         print(cyan + "createMnhFromLidarHd() : " + endC + "save_results_intermediate : " + str(save_results_intermediate) + endC)
         print(cyan + "createMnhFromLidarHd() : " + endC + "overwrite : " + str(overwrite) + endC + "\n")
@@ -978,8 +1010,9 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
     TEMP_SUFFIX = "_temp"
     TXT_EXT, VRT_EXT, JSON_EXT = ".txt", ".vrt", ".json"
     LHD_BASENAME_1, LHD_BASENAME_2 = "LHD_FXX_", "_PTS_C_LAMB93_IGN69.copc.laz"
-    DTM_TEMP_DIR_BASENAME, DSM_TEMP_DIR_BASENAME = "MNT_par_dalle", "MNS_par_dalle"
-    DTM_SUFFIX, DSM_SUFFIX = "_-_MNT", "_-_MNS"
+    TILES_TEMP_DIR_BASENAME, PIPELINES_TEMP_DIR_BASENAME = "MNT_MNS_par_dalle", "Pipelines_par_dalle"
+    DTM_SUFFIX, DSM_SUFFIX, MNH_SUFFIX = "_-_MNT", "_-_MNS", "_-_MNH"
+    RESOLUTION_SUFFIX = "_R"
     TILE_SIZE = 1000
     FILLNODATA_MD, FILLNODATA_SI = 2000, 10
     INPUT_NODATA, OUTPUT_NODATA = -9999, -1
@@ -1014,8 +1047,11 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
 
     # Définition des variables répertoires
     temp_directory = image_mnh_output_dirname + os.sep + image_mnh_output_basename + TEMP_SUFFIX
-    dtm_tiles_directory = temp_directory + os.sep + DTM_TEMP_DIR_BASENAME
-    dsm_tiles_directory = temp_directory + os.sep + DSM_TEMP_DIR_BASENAME
+    pipelines_directory = temp_directory + os.sep + PIPELINES_TEMP_DIR_BASENAME
+    if tiles_cache_directory != "":
+        tiles_directory = tiles_cache_directory
+    else:
+        tiles_directory = temp_directory + os.sep + TILES_TEMP_DIR_BASENAME
 
     # Définition des variables fichiers
     dtm_to_vrt_files = temp_directory + os.sep + image_mnh_output_basename + DTM_SUFFIX + TXT_EXT
@@ -1026,6 +1062,8 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
     dsm_raster_vrt = temp_directory + os.sep + image_mnh_output_basename + DSM_SUFFIX + VRT_EXT
     dsm_raster_temp = temp_directory + os.sep + image_mnh_output_basename + DSM_SUFFIX + image_mnh_output_extension
     dsm_raster = image_mnh_output_dirname + os.sep + image_mnh_output_basename + DSM_SUFFIX + image_mnh_output_extension
+    mnh_to_vrt_files = temp_directory + os.sep + image_mnh_output_basename + MNH_SUFFIX + TXT_EXT
+    mnh_raster_vrt = temp_directory + os.sep + image_mnh_output_basename + MNH_SUFFIX + VRT_EXT
 
     # Nettoyage des traitements précédents
     if overwrite:
@@ -1041,10 +1079,10 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
             raise
         pass
 
-    if not os.path.exists(dtm_tiles_directory):
-        os.makedirs(dtm_tiles_directory)
-    if not os.path.exists(dsm_tiles_directory):
-        os.makedirs(dsm_tiles_directory)
+    if not os.path.exists(tiles_directory):
+        os.makedirs(tiles_directory)
+    if not os.path.exists(pipelines_directory):
+        os.makedirs(pipelines_directory)
 
     ####################################################################
 
@@ -1100,147 +1138,108 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
                     tile_name = "00%s_%s" % (x, y)
                 for LHD_directory in lhd_directory_list:
                     LHD_file = LHD_BASENAME_1 + tile_name + LHD_BASENAME_2
-                    if os.path.exists(LHD_directory + os.sep + LHD_file) and not any(map(lambda x: LHD_file in x, LHD_files_list)):
-                        LHD_files_list.append(LHD_directory + os.sep + LHD_file)
-
-    #############
-    # Etape 1/5 # Calcul du MNT sur chaque nuage de points
-    #############
-    if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 1/5 - Début du calcul du MNT sur chaque nuage de points." + endC + "\n")
-
-    if not os.path.exists(dtm_raster):
-        tasks = []
-        for LHD_file in LHD_files_list:
-            LHD_basename = os.path.basename(LHD_file).split(".")[0]
-            DTM_raster_tile = dtm_tiles_directory + os.sep + LHD_basename + DTM_SUFFIX + image_mnh_output_extension
-            DTM_raster_tile_JSON = dtm_tiles_directory + os.sep + LHD_basename + DTM_SUFFIX + JSON_EXT
-            if not os.path.exists(DTM_raster_tile):
-                JSON = """[\n"""
-                JSON += """    "%s",\n""" % LHD_file
-                JSON += """    {\n"""
-                JSON += """        "type":"filters.smrf",\n"""
-                JSON += """        "ignore":"Classification[0:1],Classification[3:6],Classification[7:7],Classification[8:8],Classification[10:65],Classification[67:255]"\n"""
-                JSON += """    },\n"""
-                JSON += """    {\n"""
-                JSON += """        "type":"filters.range",\n"""
-                JSON += """        "limits":"Classification[2:2],Classification[9:9],Classification[66:66]"\n"""
-                JSON += """    },\n"""
-                JSON += """    {\n"""
-                JSON += """        "type":"writers.gdal",\n"""
-                JSON += """        "filename":"%s",\n""" % DTM_raster_tile
-                JSON += """        "output_type":"mean",\n"""
-                JSON += """        "gdaldriver":"GTiff",\n"""
-                JSON += """        "resolution":%s,\n""" % abs(pixel_width)
-                JSON += """        "data_type":"float"\n"""
-                JSON += """    }\n"""
-                JSON += """]\n"""
-                writeTextFile(DTM_raster_tile_JSON, JSON)
-                tasks.append((LHD_file, "pdal pipeline %s" % DTM_raster_tile_JSON))
-            else:
-                print(bold + yellow + "    Le MNT pour le fichier \"%s\" existe déjà." % (LHD_file) + endC)
-        time.sleep(2)
-
-        def process_command(task):
-            LHD_file,command = task
-            if debug >= 1:
-                print(bold + green + "    Traitement MNT de \"%s\"..." % (LHD_file) + endC)
-            thread = SubprocessThread(command)
-            thread.start()
-            thread.join()
-            if thread.stderr:
-                raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + f"Erreur d'exécution MNT de {LHD_file} : {str(thread.stderr)}" + endC)
-            if debug >= 1:
-                print(bold + yellow + "        Traitement MNT de \"%s\" fait" % (LHD_file) + endC)
-
-        if tasks:
-            with ThreadPoolExecutor(max_workers=nb_cpus) as executor:
-                results = list(executor.map(process_command, tasks))
-        else:
-            if debug >= 1:
-                print(bold + red + "Traitement MNT : Aucune tuile à traiter" + endC)
-    else:
-        print(yellow + "    L'assemblage des dalles MNT a déjà été réalisé." + endC)
+                    if os.path.exists(LHD_directory + os.sep + LHD_file) and not any(map(lambda x: LHD_file in x[0], LHD_files_list)):
+                        LHD_files_list.append((LHD_directory + os.sep + LHD_file, xmin_tile, ymin_tile))
 
-    if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 1/5 - Fin du calcul du MNT sur chaque nuage de points." + endC + "\n")
+    # Expression de calcul du MNH (MNS - MNT)
+    expression = "im1b1==%s or im2b1==%s ? %s : (im1b1-im2b1<0 ? 0 : im1b1-im2b1)" % (INPUT_NODATA, INPUT_NODATA, OUTPUT_NODATA)
 
     #############
-    # Etape 2/5 # Calcul du MNS sur chaque nuage de points
+    # Etape 1/4 # Calcul du MNT et du MNS (et du MNH) sur chaque nuage de points
     #############
     if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 2/5 - Début du calcul du MNS sur chaque nuage de points." + endC + "\n")
+        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 1/4 - Début du calcul du MNT et du MNS sur chaque nuage de points." + endC + "\n")
+
+    # Dalles (MNT, MNS, MNH) de chaque nuage de points, nommées d'après le nuage et la résolution pour pouvoir être réutilisées par d'autres emprises
+    resolution = abs(pixel_width)
+    tiles_dico = {}
+    for LHD_file, xmin_tile, ymin_tile in LHD_files_list:
+        LHD_basename = os.path.basename(LHD_file).split(".")[0]
+        tile_basename = tiles_directory + os.sep + LHD_basename + RESOLUTION_SUFFIX + str(resolution).replace(".", "_")
+        tiles_dico[LHD_file] = (xmin_tile, ymin_tile, tile_basename + DTM_SUFFIX + image_mnh_output_extension, tile_basename + DSM_SUFFIX + image_mnh_output_extension, tile_basename + MNH_SUFFIX + image_mnh_output_extension)
 
-    if not os.path.exists(dsm_raster):
+    if not (os.path.exists(dtm_raster) and os.path.exists(dsm_raster)) or mnh_by_tile:
         tasks = []
-        for LHD_file in LHD_files_list:
-            LHD_basename = os.path.basename(LHD_file).split(".")[0]
-            DSM_raster_tile = dsm_tiles_directory + os.sep + LHD_basename + DSM_SUFFIX + image_mnh_output_extension
-            DSM_raster_tile_JSON = dsm_tiles_directory + os.sep + LHD_basename + DSM_SUFFIX + JSON_EXT
-            if not os.path.exists(DSM_raster_tile):
-                JSON = """[\n"""
-                JSON += """    "%s",\n""" % LHD_file
-                JSON += """    {\n"""
-                JSON += """        "type":"filters.smrf",\n"""
-                JSON += """        "ignore":"Classification[0:1],Classification[7:7],Classification[8:8],Classification[10:16],Classification[18:255]"\n"""
-                JSON += """    },\n"""
-                JSON += """    {\n"""
-                JSON += """        "type":"filters.range",\n"""
-                JSON += """        "limits":"Classification[2:6],Classification[9:9],Classification[17:17]"\n"""
-                JSON += """    },\n"""
-                JSON += """    {\n"""
-                JSON += """        "type":"writers.gdal",\n"""
-                JSON += """        "filename":"%s",\n""" % DSM_raster_tile
-                JSON += """        "output_type":"mean",\n"""
-                JSON += """        "gdaldriver":"GTiff",\n"""
-                JSON += """        "resolution":%s,\n""" % abs(pixel_width)
-                JSON += """        "data_type":"float"\n"""
-                JSON += """    }\n"""
-                JSON += """]\n"""
-                writeTextFile(DSM_raster_tile_JSON, JSON)
-                tasks.append((LHD_file, "pdal pipeline %s" % DSM_raster_tile_JSON))
+        for LHD_file, xmin_tile, ymin_tile in LHD_files_list:
+            DTM_raster_tile, DSM_raster_tile, MNH_raster_tile = tiles_dico[LHD_file][2:]
+            if os.path.exists(DTM_raster_tile) and os.path.exists(DSM_raster_tile) and (not mnh_by_tile or os.path.exists(MNH_raster_tile)):
+                if debug >= 3:
+                    print(bold + yellow + "    Les dalles MNT et MNS pour le fichier \"%s\" existent déjà." % (LHD_file) + endC)
             else:
-                print(bold + yellow + "Le MNS pour le fichier \"%s\" existe déjà." % (LHD_file) + endC)
-        time.sleep(2)
+                tasks.append(LHD_file)
 
-        def process_command(task):
-            LHD_file,command = task
+        def process_tile(LHD_file):
+            xmin_tile, ymin_tile, DTM_raster_tile, DSM_raster_tile, MNH_raster_tile = tiles_dico[LHD_file]
+            LHD_basename = os.path.basename(LHD_file).split(".")[0]
             if debug >= 1:
-                print(bold + green + "    Traitement MNS de \"%s\"..." % (LHD_file) + endC)
-            thread = SubprocessThread(command)
-            thread.start()
-            thread.join()
-            if thread.stderr:
-                raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + f"Erreur d'exécution MNS de {LHD_file} : {str(thread.stderr)}" + endC)
+                print(bold + green + "    Traitement MNT/MNS de \"%s\"..." % (LHD_file) + endC)
+
+            # Calcul du MNT et du MNS en une seule lecture du nuage de points, écrits sous un nom temporaire puis renommés (dalles incomplètes jamais réutilisées)
+            if not (os.path.exists(DTM_raster_tile) and os.path.exists(DSM_raster_tile)):
+                DTM_raster_tile_temp = os.path.splitext(DTM_raster_tile)[0] + TEMP_SUFFIX + str(os.getpid()) + image_mnh_output_extension
+                DSM_raster_tile_temp = os.path.splitext(DSM_raster_tile)[0] + TEMP_SUFFIX + str(os.getpid()) + image_mnh_output_extension
+                pipeline_JSON = pipelines_directory + os.sep + LHD_basename + JSON_EXT
+                writeTextFile(pipeline_JSON, createPipelineLidarHdTile(LHD_file, DTM_raster_tile_temp, DSM_raster_tile_temp, resolution, xmin_tile, ymin_tile, TILE_SIZE))
+                process = subprocess.run(["pdal", "pipeline", pipeline_JSON], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                if process.returncode != 0:
+                    removeFile(DTM_raster_tile_temp)
+                    removeFile(DSM_raster_tile_temp)
+                    raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + f"Erreur d'exécution MNT/MNS de {LHD_file} : {str(process.stderr)}" + endC)
+                os.replace(DTM_raster_tile_temp, DTM_raster_tile)
+                os.replace(DSM_raster_tile_temp, DSM_raster_tile)
+
+            # Calcul du MNH de la dalle (MNT et MNS sont calés sur la même grille)
+            if mnh_by_tile and not os.path.exists(MNH_raster_tile):
+                MNH_raster_tile_temp = os.path.splitext(MNH_raster_tile)[0] + TEMP_SUFFIX + str(os.getpid()) + image_mnh_output_extension
+                command = "otbcli_BandMath -il %s %s -out '%s?&nodata=%s' -exp '%s'" % (DSM_raster_tile, DTM_raster_tile, MNH_raster_tile_temp, OUTPUT_NODATA, expression)
+                process = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                if process.returncode != 0:
+                    removeFile(MNH_raster_tile_temp)
+                    raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + f"Erreur d'exécution MNH de {LHD_file} : {str(process.stderr)}" + endC)
+                os.replace(MNH_raster_tile_temp, MNH_raster_tile)
+
             if debug >= 1:
-                print(bold + yellow + "        Traitement MNS de \"%s\" fait" % (LHD_file) + endC)
+                print(bold + yellow + "        Traitement MNT/MNS de \"%s\" fait" % (LHD_file) + endC)
 
         if tasks:
             with ThreadPoolExecutor(max_workers=nb_cpus) as executor:
-                results = list(executor.map(process_command, tasks))
+                futures_list = [executor.submit(process_tile, LHD_file) for LHD_file in tasks]
+                try:
+                    for future in as_completed(futures_list):
+                        future.result()
+                except Exception:
+                    for future in futures_list:
+                        future.cancel()
+                    raise
         else:
             if debug >= 1:
-                print(bold + red + "Traitement MNS : Aucune tuile à traiter" + endC)
+                print(bold + yellow + "    Traitement MNT/MNS : Aucune dalle à calculer" + endC)
     else:
-        print(yellow + "    L'assemblage des dalles MNS a déjà été réalisé." + endC)
+        print(yellow + "    L'assemblage des dalles MNT et MNS a déjà été réalisé." + endC)
 
     if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 2/5 - Fin du calcul du MNS sur chaque nuage de points." + endC + "\n")
+        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 1/4 - Fin du calcul du MNT et du MNS sur chaque nuage de points." + endC + "\n")
+
+    # Les dalles MNT/MNS ne sont assemblées que si le MNH est calculé à partir des MNT/MNS assemblés ou si elles sont conservées
+    assemble_mnt_mns = not mnh_by_tile or keep_mnt_mns
 
     #############
-    # Etape 3/5 # Assemblage des dalles MNT
+    # Etape 2/4 # Assemblage des dalles MNT
     #############
     if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 3/5 - Début de l'assemblage des dalles MNT." + endC + "\n")
+        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 2/4 - Début de l'assemblage des dalles MNT." + endC + "\n")
 
-    if not os.path.exists(dtm_raster):
+    if not assemble_mnt_mns:
+        if debug >= 3:
+            print(yellow + "    Le MNH est assemblé à partir des dalles MNH, les dalles MNT ne sont pas assemblées." + endC)
+    elif not os.path.exists(dtm_raster):
         if debug >= 3:
             print(bold + green + "    Assemblage des dalles MNT issues des nuages de points." + endC)
         if not os.path.exists(dtm_raster_temp):
             if not os.path.exists(dtm_raster_vrt):
                 VRT_files_list = ""
-                for DTM_raster in glob.glob(dtm_tiles_directory + os.sep + "*" + image_mnh_output_extension):
-                    VRT_files_list += DTM_raster + "\n"
+                for LHD_file, xmin_tile, ymin_tile in LHD_files_list:
+                    VRT_files_list += tiles_dico[LHD_file][2] + "\n"
                 writeTextFile(dtm_to_vrt_files, VRT_files_list)
                 command = "gdalbuildvrt -input_file_list %s %s" % (dtm_to_vrt_files, dtm_raster_vrt)
                 exitCode = os.system(command)
@@ -1261,22 +1260,25 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
         print(yellow + "    L'assemblage des dalles MNT a déjà été réalisé." + endC)
 
     if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 3/5 - Fin de l'assemblage des dalles MNT." + endC + "\n")
+        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 2/4 - Fin de l'assemblage des dalles MNT." + endC + "\n")
 
     #############
-    # Etape 4/5 # Assemblage des dalles MNS
+    # Etape 3/4 # Assemblage des dalles MNS
     #############
 
-    print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 4/5 - Début de l'assemblage des dalles MNS." + endC + "\n")
+    print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 3/4 - Début de l'assemblage des dalles MNS." + endC + "\n")
 
-    if not os.path.exists(dsm_raster):
+    if not assemble_mnt_mns:
+        if debug >= 3:
+            print(yellow + "    Le MNH est assemblé à partir des dalles MNH, les dalles MNS ne sont pas assemblées." + endC)
+    elif not os.path.exists(dsm_raster):
         if debug >= 3:
             print(bold + green + "    Assemblage des dalles MNS issues des nuages de points." + endC)
         if not os.path.exists(dsm_raster_temp):
             if not os.path.exists(dsm_raster_vrt):
                 VRT_files_list = ""
-                for DSM_raster in glob.glob(dsm_tiles_directory + os.sep + "*" + image_mnh_output_extension):
-                    VRT_files_list += DSM_raster + "\n"
+                for LHD_file, xmin_tile, ymin_tile in LHD_files_list:
+                    VRT_files_list += tiles_dico[LHD_file][3] + "\n"
                 writeTextFile(dsm_to_vrt_files, VRT_files_list)
                 command = "gdalbuildvrt -input_file_list %s %s" % (dsm_to_vrt_files, dsm_raster_vrt)
                 exitCode = os.system(command)
@@ -1297,22 +1299,38 @@ def createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference
     else:
         print(yellow + "    L'assemblage des dalles MNS a déjà été réalisé." + endC)
     if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 4/5 - Fin de l'assemblage des dalles MNS." + endC + "\n")
+        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 3/4 - Fin de l'assemblage des dalles MNS." + endC + "\n")
 
     #############
-    # Etape 5/5 # Calcul du MNH issu de nuages de points LiDAR HD
+    # Etape 4/4 # Calcul du MNH issu de nuages de points LiDAR HD
     #############
     if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 5/5 - Début du calcul du MNH issu de nuages de points LiDAR HD." + endC + "\n")
-
-    expression = "im1b1==%s or im2b1==%s ? %s : (im1b1-im2b1<0 ? 0 : im1b1-im2b1)" % (INPUT_NODATA, INPUT_NODATA, OUTPUT_NODATA)
-    command = "otbcli_BandMath -il %s %s -out '%s?&nodata=%s' -exp '%s'" % (dsm_raster, dtm_raster, image_mnh_output, OUTPUT_NODATA, expression)
-    exitCode = os.system(command)
-    if exitCode != 0:
-        print(command)
-        raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + "An error occured during otbcli_BandMath command to compute MNH Final " + image_mnh_output + ". See error message above." + endC)
+        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 4/4 - Début du calcul du MNH issu de nuages de points LiDAR HD." + endC + "\n")
+
+    if mnh_by_tile:
+        # Assemblage des dalles MNH calculées à l'étape 1
+        VRT_files_list = ""
+        for LHD_file, xmin_tile, ymin_tile in LHD_files_list:
+            VRT_files_list += tiles_dico[LHD_file][4] + "\n"
+        writeTextFile(mnh_to_vrt_files, VRT_files_list)
+        command = "gdalbuildvrt -input_file_list %s %s" % (mnh_to_vrt_files, mnh_raster_vrt)
+        exitCode = os.system(command)
+        if exitCode != 0:
+            print(command)
+            raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + "An error occured during gdalbuildvrt command to compute MNH Final " + image_mnh_output + ". See error message above." + endC)
+        command = "gdalwarp -multi -wo NUM_THREADS=%s -co NUM_THREADS=%s -co BIGTIFF=YES -co TILED=YES -wm 4096 --config GDAL_CACHEMAX 4096 --config CPL_DEBUG OFF -te %s %s %s %s -tr %s %s -dstnodata %s -cutline %s %s %s" % (nb_cpus, nb_cpus, xmin_ref, ymin_ref, xmax_ref, ymax_ref, pixel_width, pixel_height, OUTPUT_NODATA, vector_emprise_input, mnh_raster_vrt, image_mnh_output)
+        exitCode = os.system(command)
+        if exitCode != 0:
+            print(command)
+            raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + "An error occured during gdalwarp command to compute MNH Final " + image_mnh_output + ". See error message above." + endC)
+    else:
+        command = "otbcli_BandMath -il %s %s -out '%s?&nodata=%s' -exp '%s'" % (dsm_raster, dtm_raster, image_mnh_output, OUTPUT_NODATA, expression)
+        exitCode = os.system(command)
+        if exitCode != 0:
+            print(command)
+            raise NameError(cyan + "createMnhFromLidarHd() : " + bold + red + "An error occured during otbcli_BandMath command to compute MNH Final " + image_mnh_output + ". See error message above." + endC)
     if debug >= 2:
-        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 5/5 - Fin du calcul du MNH issu de nuages de points LiDAR HD." + endC + "\n")
+        print(cyan + "createMnhFromLidarHd() : " + bold + green + "ETAPE 4/4 - Fin du calcul du MNH issu de nuages de points LiDAR HD." + endC + "\n")
 
     ####################################################################
 
@@ -1382,6 +1400,8 @@ def main(gui=False):
     parser.add_argument('-is','--image_mns_input',default="",help="Image MNS input, or Input MNS archives directory for MNH creation with MNS-Correl.", type=str, required=False)
     parser.add_argument('-it','--image_mnt_input',default="",help="Image MNT input, or Input MNT archives directory for MNH creation with MNS-Correl.", type=str, required=False)
     parser.add_argument("-lhddl", "--lhd_directory_list", default=None, nargs="+", type=str, required=False, help="List of folders, containing LiDAR HD points clouds files.")
+    parser.add_argument("-lhdc", "--tiles_cache_directory", default="", type=str, required=False, help="Cache folder of DTM/DSM tiles computed from LiDAR HD points clouds, reused between processes. Default: '' (tiles in the temporary folder).")
+    parser.add_argument("-mnht", "--mnh_by_tile", action="store_true", default=False, required=False, help="Compute MNH on each LiDAR HD tile, then mosaic the MNH tiles. Default: False.")
     parser.add_argument('-ithr','--image_threshold_input',default="",help="Image threshold BD road input", type=str, required=False)
     parser.add_argument('-iref','--image_reference_input',default="",help="Input reference image for MNH creation with MNS-Correl.", type=str, required=False)
     parser.add_argument('-v','--vector_emprise_input',default="",help="Input emprise vector study.", type=str, required=True)
@@ -1435,6 +1455,14 @@ def main(gui=False):
     else :
         lhd_directory_list = []
 
+    # Récupération du répertoire de cache des dalles LiDAR HD
+    if args.tiles_cache_directory != None:
+        tiles_cache_directory = args.tiles_cache_directory
+
+    # Récupération de l'option de calcul du MNH par dalle LiDAR HD
+    if args.mnh_by_tile != None:
+        mnh_by_tile = args.mnh_by_tile
+
     # Récupération de l'image de filtrage d'entrée
     if args.image_threshold_input != None:
         image_threshold_input = args.image_threshold_input
@@ -1576,6 +1604,8 @@ def main(gui=False):
         print(cyan + "MnhCreation : " + endC + "image_mns_input : " + str(image_mns_input) + endC)
         print(cyan + "MnhCreation : " + endC + "image_mnt_input : " + str(image_mnt_input) + endC)
         print(cyan + "MnhCreation : " + endC + "lhd_directory_list : " + str(lhd_directory_list) + endC)
+        print(cyan + "MnhCreation : " + endC + "tiles_cache_directory : " + str(tiles_cache_directory) + endC)
+        print(cyan + "MnhCreation : " + endC + "mnh_by_tile : " + str(mnh_by_tile) + endC)
         print(cyan + "MnhCreation : " + endC + "image_threshold_input : " + str(image_threshold_input) + endC)
         print(cyan + "MnhCreation : " + endC + "image_reference_input : " + str(image_reference_input) + endC)
         print(cyan + "MnhCreation : " + endC + "vector_emprise_input : " + str(vector_emprise_input) + endC)
@@ -1616,7 +1646,7 @@ def main(gui=False):
 
     # Cas création MNH à partir de nuages de points LiDAR HD
     if lhd_directory_list != []:
-        createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference_input, lhd_directory_list, keep_mnt_mns, nb_cpus, path_time_log, save_results_intermediate, overwrite)
+        createMnhFromLidarHd(vector_emprise_input, image_mnh_output, image_reference_input, lhd_directory_list, keep_mnt_mns, nb_cpus, tiles_cache_directory, mnh_by_tile, path_time_log, save_results_intermediate, overwrite)
     # Cas création MNH à partir de données MNS-Correl et RGE ALTI 1M
     elif os.path.isdir(image_mns_input) and os.path.isdir(image_mnt_input):
         createMnhFromMnsCorrel(vector_emprise_input, image_mnh_output, image_reference_input, image_mnt_input, image_mns_input, year, zone, keep_mnt_mns, nb_cpus, path_time_log, save_results_intermediate, overwrite)
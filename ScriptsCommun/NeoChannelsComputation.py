@@ -15,7 +15,7 @@ Nom de l'objet : NeoChannelsComputation.py
 Description :
 -------------
 Objectif : calculer les textures et indices d une image donnee
-Rq : utilisation des OTB Applications : otbcli_HaralickTextureExtraction, otbcli_SplitImage, otbcli_BandMath
+Rq : utilisation des OTB Applications : otbcli_HaralickTextureExtraction (par tuiles en parallele)
 
 Date de creation : 05/08/2014
 ----------
@@ -37,12 +37,17 @@ correction erreur syntax dans la variable "eta"(bandmath) necessaire au calcul d
 """
 
 from __future__ import print_function
-import os, sys, glob ,string, math, argparse, shutil, time, platform, ast
+import os, sys, glob ,string, math, argparse, shutil, time, platform, ast, threading, subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from osgeo import gdal
+from osgeo.gdalconst import GA_ReadOnly, GA_Update
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displayIHM
 from Lib_log import timeLine
 from Lib_file import removeFile
-from Lib_raster import getMinMaxValueBandImage
-from Lib_index import createNDVI, createNDVIMod, createTNDVI, createPNDVI, createNDWI, createNDWI2, createNDWI2Mod, createNDMI, createMNDWI, createISU, createGEMI, createBSI, createNDBI, createNBI, createIR, createCI, createBI, createBI2, createMSAVI2, createSIPI, createISI, createHIS, createVSSI, createBlueI, createSCoWI
+from Lib_raster import getMinMaxValueBandImage, getFormatRasterFromExtension
+from Lib_operator import getNumberCPU
+from Lib_index import createISI, createHIS, createIndicesImage
+from Lib_bandmath import CODAGE_DICO
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 1 : affichage intermédiaire de commentaires lors de l'execution du script
@@ -50,6 +55,9 @@ from Lib_index import createNDVI, createNDVIMod, createTNDVI, createPNDVI, creat
 debug = 3
 sys.dont_write_bytecode = True
 
+# Indices calculés par extractTexture() avec le moteur d'indices de Lib_index (ISI et HIS sont calculés séparément)
+INDICES_ENGINE_LIST = ["NDVI", "NDVIMod", "NDMI", "TNDVI", "NDWI", "ISU", "GEMI", "BSI", "NDBI", "NDWI2", "NDWI2Mod", "MNDWI", "IR", "NBI", "PNDVI", "CI", "BI", "BI2", "MSAVI2", "SIPI", "VSSI", "BLUEI", "SCoWI"]
+
 # Les sorties de la fonction OTB otbcli_HaralickTextureExtraction a changé à partir de la version 7.x??? de l'OTB
 pythonpath = os.environ["PYTHONPATH"]
 print ("Identifier la version d'OTB : ")
@@ -65,10 +73,152 @@ if int(otb_info.split(".")[0]) >= 7 :
 else :
     IS_VERSION_UPPER_OTB_7_0 = False
 
+# Calcul des textures par tuiles : suffixe du repertoire des tuiles, extension du fichier d'etat des tuiles terminées et taille des tuiles par defaut (pixels)
+SUFFIX_TILES = "_tiles_textures"
+EXT_STATE_TILES = "_tiles.txt"
+TILE_SIZE = 2048
+
+# Décalage du vecteur de co-occurrence de otbcli_HaralickTextureExtraction (parameters.xoff et parameters.yoff), ajouté au rayon dans la marge des tuiles
+TEXTURE_OFFSET = 1
+
+###########################################################################################################################################
+# FONCTION computeTexturesTiles()                                                                                                         #
+###########################################################################################################################################
+def computeTexturesTiles(image_input, textures_jobs_list, tile_size=TILE_SIZE, nb_workers=0, codage="float", save_results_intermediate=False):
+    """
+    # ROLE:
+    # calculer plusieurs textures (combinaisons canal / famille / rayon) par tuiles chevauchantes, en parallele sur un pool de processus OTB
+    # Chaque tuile est lue avec une marge egale au rayon de la texture plus le décalage de co-occurrence (image virtuelle VRT, sans copie), otbcli_HaralickTextureExtraction
+    # y est lancé et la partie centrale de chaque bande du resultat est écrite directement dans le fichier de la texture correspondante
+    # (min et max de quantification calculés sur l'image entiere : les tuiles mosaiquées sont identiques au calcul sur l'image entiere)
+    # Les tuiles terminées sont enregistrées dans un fichier d'etat par combinaison : un calcul interrompu reprend aux tuiles restantes
+    #
+    # ENTREES DE LA FONCTION :
+    #    image_input : image a laquelle on souhaite calculer les textures
+    #    textures_jobs_list : liste des calculs, dictionnaires {'channel_num', 'radius', 'texture', 'minimum', 'maximum', 'bin_number',
+    #                         'files_list' (fichiers de sortie par bande de texture), 'state_file' (fichier d'etat), 'tiles_base_name' (nom de base des tuiles)}
+    #    tile_size : taille des tuiles en pixels (hors marge), par defaut TILE_SIZE
+    #    nb_workers : nombre de processus OTB lancés en parallele, par defaut 0 (nombre de CPU)
+    #    codage : type de codage des fichiers de sortie, par defaut "float"
+    #    save_results_intermediate : conserver les tuiles intermediaires, par defaut False
+    #
+    # SORTIES DE LA FONCTION :
+    #     Les images de textures
+    #
+    """
+
+    if nb_workers <= 0:
+        nb_workers = getNumberCPU()
+
+    # Les threads ITK sont répartis entre les processus OTB lancés en parallele
+    env_otb = os.environ.copy()
+    env_otb["ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS"] = str(max(1, getNumberCPU() // nb_workers))
+
+    dataset = gdal.Open(image_input, GA_ReadOnly)
+    cols = dataset.RasterXSize
+    rows = dataset.RasterYSize
+    geotransform = dataset.GetGeoTransform()
+    projection = dataset.GetProjection()
+    dataset = None
+
+    tiles_list = [(xoff, yoff, min(tile_size, cols - xoff), min(tile_size, rows - yoff)) for yoff in range(0, rows, tile_size) for xoff in range(0, cols, tile_size)]
+    data_type = CODAGE_DICO[codage][0]
+
+    # Preparation des fichiers de sortie ou reprise d'un calcul interrompu
+    tasks_list = []
+    for job in textures_jobs_list:
+        done_tiles_set = set()
+        if os.path.isfile(job['state_file']) and all(os.path.isfile(file_texture) for file_texture in job['files_list']):
+            with open(job['state_file']) as file_state:
+                done_tiles_set = set(line.strip() for line in file_state if line.strip() != "")
+            print(cyan + "computeTexturesTiles() : " + endC + bold + yellow + "Reprise du calcul %s : %s tuile(s) déjà calculée(s) sur %s" %(job['state_file'], len(done_tiles_set), len(tiles_list)) + endC)
+        else:
+            for file_texture in job['files_list']:
+                removeFile(file_texture)
+                driver = gdal.GetDriverByName(getFormatRasterFromExtension(file_texture))
+                dataset_output = driver.Create(file_texture, cols, rows, 1, data_type)
+                dataset_output.SetGeoTransform(geotransform)
+                dataset_output.SetProjection(projection)
+                dataset_output = None
+            open(job['state_file'], 'w').close()
+        job['nb_tiles_todo'] = 0
+        for tile in tiles_list:
+            if "%s,%s,%s,%s" %tile not in done_tiles_set:
+                tasks_list.append((job, tile))
+                job['nb_tiles_todo'] += 1
+
+    lock = threading.Lock()
+
+    def computeTile(job, tile):
+        xoff, yoff, width, height = tile
+        radius = job['radius']
+        # Marge : la fenetre de rayon radius et les pixels voisins a TEXTURE_OFFSET de ses pixels
+        margin = radius + TEXTURE_OFFSET
+        ext_xoff = max(0, xoff - margin)
+        ext_yoff = max(0, yoff - margin)
+        ext_width = min(cols, xoff + width + margin) - ext_xoff
+        ext_height = min(rows, yoff + height + margin) - ext_yoff
+        tile_name = job['tiles_base_name'] + "_x%s_y%s" %(xoff, yoff)
+        tile_input = tile_name + ".vrt"
+        tile_output = tile_name + ".tif"
+
+        # Tuile avec sa marge, en image virtuelle sur le canal à traiter
+        gdal.Translate(tile_input, image_input, format="VRT", srcWin=[ext_xoff, ext_yoff, ext_width, ext_height], bandList=[job['channel_num']])
+
+        command = "otbcli_HaralickTextureExtraction -in %s -channel 1 -parameters.xrad %s -parameters.yrad %s -parameters.min %s -parameters.max %s -parameters.nbbin %s -parameters.xoff %s -parameters.yoff %s -texture %s -out %s %s" %(tile_input, str(radius), str(radius), job['minimum'], job['maximum'], job['bin_number'], str(TEXTURE_OFFSET), str(TEXTURE_OFFSET), job['texture'], tile_output, codage)
+        if debug >= 3:
+            print(cyan + "computeTexturesTiles() : " + endC + "command otbcli_HaralickTextureExtraction : %s " %(command) + endC)
+        exit_code = subprocess.call(command, shell=True, env=env_otb)
+        if exit_code != 0:
+            raise NameError(cyan + "computeTexturesTiles() : " + bold + red + "An error occured during otbcli_HaralickTextureExtraction command on tile %s. See error message above." %(tile_name) + endC)
+
+        # Partie centrale de la tuile (sans la marge) pour chaque bande de texture
+        dataset_tile = gdal.Open(tile_output, GA_ReadOnly)
+        arrays_list = [dataset_tile.GetRasterBand(num_band + 1).ReadAsArray(xoff - ext_xoff, yoff - ext_yoff, width, height) for num_band in range(len(job['files_list']))]
+        dataset_tile = None
+
+        # Mosaique dans les fichiers de textures et enregistrement de la tuile terminée
+        with lock:
+            for index in range(len(job['files_list'])):
+                dataset_output = gdal.Open(job['files_list'][index], GA_Update)
+                dataset_output.GetRasterBand(1).WriteArray(arrays_list[index], xoff, yoff)
+                dataset_output = None
+            with open(job['state_file'], 'a') as file_state:
+                file_state.write("%s,%s,%s,%s\n" %tile)
+            job['nb_tiles_todo'] -= 1
+            if job['nb_tiles_todo'] == 0:
+                # Combinaison terminée : le fichier d'etat est supprimé
+                removeFile(job['state_file'])
+
+        if not save_results_intermediate:
+            removeFile(tile_input)
+            removeFile(tile_output)
+        return
+
+    print(cyan + "computeTexturesTiles() : " + bold + green + "Calcul de %s texture(s) sur %s tuile(s) de %s pixels : %s calcul(s) de tuile en %s processus" %(len(textures_jobs_list), len(tiles_list), tile_size, len(tasks_list), nb_workers) + endC)
+
+    with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+        futures_list = [executor.submit(computeTile, job, tile) for job, tile in tasks_list]
+        try:
+            for future in as_completed(futures_list):
+                future.result()
+        except Exception:
+            # Arret sur erreur : les tuiles non commencées sont abandonnées, les tuiles terminées restent enregistrées pour la reprise
+            for future in futures_list:
+                future.cancel()
+            raise
+
+    # Combinaisons dont toutes les tuiles étaient déjà calculées
+    for job in textures_jobs_list:
+        if job['nb_tiles_todo'] == 0:
+            removeFile(job['state_file'])
+
+    return
+
 ###########################################################################################################################################
 # FONCTION extractTexture()                                                                                                               #
 ###########################################################################################################################################
-def extractTexture(image_input, repertory_neochannels_output, path_time_log, channels_list, texture_families_list, radius_list, indices_to_compute_list=[], channel_order=['Red','Green','Blue','NIR'], extension_raster=".tif", save_results_intermediate=False, overwrite=True, bin_number=64):
+def extractTexture(image_input, repertory_neochannels_output, path_time_log, channels_list, texture_families_list, radius_list, indices_to_compute_list=[], channel_order=['Red','Green','Blue','NIR'], extension_raster=".tif", save_results_intermediate=False, overwrite=True, bin_number=64, tile_size=TILE_SIZE, nb_workers=0):
     """
     # ROLE:
     # calculer les textures et indices definis d'une image donnee
@@ -89,6 +239,8 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
     #    save_results_intermediate : fichiers de sorties intermediaires nettoyees, par defaut = False
     #    overwrite : supprime ou non les fichiers existants ayant le meme nom, defaut=True
     #    bin_number : Nombre de subdivisions prises en compte pour le calcul des tectures. Choix entre 4,8,32 et 64, defaut=64
+    #    tile_size : taille des tuiles du calcul des textures en pixels, defaut=TILE_SIZE
+    #    nb_workers : nombre de calculs de textures lancés en parallele, defaut=0 (nombre de CPU)
     #
     # SORTIES DE LA FONCTION :
     #     Les images neocannaux
@@ -112,6 +264,8 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
         print(cyan + "extractTexture() : " + endC + "extension_raster : " + str(extension_raster) + endC)
         print(cyan + "extractTexture() : " + endC + "overwrite: " + str(overwrite) + endC)
         print(cyan + "extractTexture() : " + endC + "bin_number: " + str(bin_number) + endC)
+        print(cyan + "extractTexture() : " + endC + "tile_size: " + str(tile_size) + endC)
+        print(cyan + "extractTexture() : " + endC + "nb_workers: " + str(nb_workers) + endC)
 
     # Constantes
     CODAGE = "float"
@@ -219,6 +373,8 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
 
     image_name = os.path.splitext(os.path.basename(image_input))[0] # Récupération du nom simple de l'image (sans le tif). Exemple : image_name = Image_01
     repertory_neochannels_output += os.sep
+    repertory_tiles = repertory_neochannels_output + image_name + SUFFIX_TILES
+    textures_jobs_list = []
 
     print(cyan + "extractTexture() : " + bold + green + "DEBUT DU CALCUL DE IMAGE : %s , BANDES(S) : %s , TEXTURE(S) : %s, RAYON(S) : %s " %(image_input,channels_list,texture_families_list,radius_list) + endC)
 
@@ -251,8 +407,6 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
 
                 output_textures_base_name = repertory_neochannels_output + image_name + "_chan" + channel + "_rad" + str(radius) # Exemple : /home/scgsi/Desktop/Jacques/TravailV2/ImagesTestChaine/APTV_01/NeoCanaux/Image_01_chan1_rad3
                 output_textures_image_name = output_textures_base_name + "_" + texture
-                output_textures = output_textures_image_name + extension_raster                                                  # Exemple : /home/scgsi/Desktop/Jacques/TravailV2/ImagesTestChaine/APTV_01/NeoCanaux/Image_01_chan1_rad3_simple.tif
-                output_textures_split =  output_textures_image_name + "_band" + extension_raster                                 # Exemple : /home/scgsi/Desktop/Jacques/TravailV2/ImagesTestChaine/APTV_01/NeoCanaux/Image_01_chan1_rad3_simple_band.tif
 
                 if debug >= 4:
                     print(cyan + "extractTexture() : " + bold + green + "Nom des textures en sortie" + endC)
@@ -261,8 +415,6 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
                     print(cyan + "extractTexture() : " + endC + "channel                      : " + str(channel) + endC)
                     print(cyan + "extractTexture() : " + endC + "texture                      : " + str(texture) + endC)
                     print(cyan + "extractTexture() : " + endC + "radius                       : " + str(radius) + endC)
-                    print(cyan + "extractTexture() : " + endC + "output_textures              : " + str(output_textures) + endC)
-                    print(cyan + "extractTexture() : " + endC + "output_textures_split        : " + str(output_textures_split) + endC)
 
                 # Test si les fichiers resultats existent deja
                 files_exist = False
@@ -327,10 +479,12 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
                             files_exist = False
                             break
 
-                if not overwrite and files_exist:
+                # Fichier d'etat des tuiles terminées : sa présence indique un calcul interrompu, repris quelle que soit l'option overwrite
+                state_file = output_textures_image_name + EXT_STATE_TILES
+                if not overwrite and files_exist and not os.path.isfile(state_file):
                     print( cyan + "extractTexture() : " + endC + "Textures %s have already been calculated for image %s , channel %s and radius %s. not overwrite : they will not be calculated again." %(texture,image_input,channel,radius) + endC)
                 else:
-                    # sinon (option écrasement activée ou configuration non calculée) : lancement du calcul de la texture
+                    # sinon (option écrasement activée, configuration non calculée ou interrompue) : calcul de la texture ajouté à la liste des calculs par tuiles
                     if debug >= 2:
                         print(cyan + "extractTexture() : " + bold + green + "Parametres d entree de otbcli_HaralickTextureExtraction" + endC)
                         print(cyan + "extractTexture() : " + endC + "image_input     : " + str(image_input) + endC)
@@ -340,67 +494,22 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
                         print(cyan + "extractTexture() : " + endC + "image_maximum   : " + str(image_maximum) + endC)
                         print(cyan + "extractTexture() : " + endC + "bin_number      : " + str(bin_number) + endC)
                         print(cyan + "extractTexture() : " + endC + "texture         : " + str(texture) + endC)
-                        print(cyan + "extractTexture() : " + endC + "output_textures : " + str(output_textures) + endC)
-
-                    # Nettoyage des fichiers de texture
-                    for file_texture in files_name_texture_list :
-                        removeFile(file_texture)
-
-                    try: # Suppression de l'éventuel fichier existant
-                        removeFile(output_textures)
-                    except Exception:
-                        pass # Si le fichier ne peut pas être supprimé, on suppose qu'il n'existe pas et on passe à la suite
-
-                    ########################################
-                    # CALCUL DES TEXTURES                  #
-                    ########################################
-
-                    command = "otbcli_HaralickTextureExtraction -in %s -channel %s -parameters.xrad %s -parameters.yrad %s -parameters.min %s -parameters.max %s -parameters.nbbin %s -texture %s -out %s %s" %(image_input, channel_num , str(radius), str(radius), image_minimum, image_maximum, bin_number, texture, output_textures, CODAGE)
-
-                    if debug >= 2:
-                            print(cyan + "extractTexture() : " + endC + "command otbcli_HaralickTextureExtraction : %s " %(command)+ endC)
-
-                    exitCode = os.system(command) # Execution de la commande
-                    if exitCode != 0:
-                        raise NameError(cyan + "extractTexture() : " + bold + red + "An error occured during otbcli_HaralickTextureExtraction command. See error message above." + endC)
-
-                    if debug >= 2:
-                        print(cyan + "extractTexture() : " + endC + bold + green + "Parametres d entree de otbcli_SplitImage" + endC)
-                        print(cyan + "extractTexture() : " + endC + "output_textures : " + str(output_textures) + endC)
-                        print(cyan + "extractTexture() : " + endC + "output_textures_split   : " + str(output_textures_split) + endC)
+                        print(cyan + "extractTexture() : " + endC + "state_file      : " + str(state_file) + endC)
 
-                    # Découpage de l'image avec 8 ou 9 bandes de texture en 8 ou 9 images-textures. Atribution automatique des noms par otbcli_SplitImage
-                    command = "otbcli_SplitImage -in %s -out %s" %(output_textures, output_textures_split)
-
-                    if debug >= 2:
-                        print(cyan + "extractTexture() : " + endC + "command otbcli_SplitImage : %s " %(command)+ endC)
-
-                    exitCode = os.system(command)
-                    if exitCode != 0:
-                        raise NameError(cyan + "extractTexture() : " + bold + red + "An error occured during otbcli_SplitImage command. See error message above."  + endC)
-
-                    # Nettoyage du fichier intermediaire
-                    if  not  save_results_intermediate :
-                        removeFile(output_textures)
-
-                    ################################################################################################
-                    # RENOMAGE DES NOMS DE TEXTURE                                                                 #
-                    # Supression du nom de la famille et transformation du numéro de bande en nom de texture       #
-                    ################################################################################################
-
-                    print(cyan + "extractTexture() : " + endC + bold + green + "Debut du renomage des textures de l'image " + str(image_input)  + endC)
-
-                    # Réecriture des nom de textures simples ou advanced ou higher
-                    for i in range (len(files_name_texture_list)) :
-                        texture_name_final = files_name_texture_list[i]
-                        texture_name = output_textures_base_name + "_" + texture + "_band" + "_" + str(i) + extension_raster
-                        os.rename(texture_name, texture_name_final)
-
-                    print(cyan + "extractTexture() : " + endC + bold + green + "Fin du renomage des textures de l'image " + str(image_input)  + endC)
+                    textures_jobs_list.append({'channel_num' : channel_num, 'radius' : radius, 'texture' : texture, 'minimum' : image_minimum, 'maximum' : image_maximum, 'bin_number' : bin_number, 'files_list' : files_name_texture_list, 'state_file' : state_file, 'tiles_base_name' : repertory_tiles + os.sep + os.path.basename(output_textures_image_name)})
 
                 print(cyan + "extractTexture() : " + endC + bold + green + "Fin du calcul de image : %s , bande(s) : %s , texture(s) : %s, rayon(s) : %s " %(image_input,channel,texture,radius) + endC)
             print(cyan + "extractTexture() : " + endC + bold + green + "Fin du calcul de image : %s , bande(s) : %s , texture(s) : %s, rayon(s) : %s " %(image_input,channel,texture,radius_list) + endC)
         print(cyan + "extractTexture() : " + endC + bold + green + "Fin du calcul de image : %s , bande(s) : %s , texture(s) : %s, rayon(s) : %s " %(image_input,channel,texture_families_list,radius_list) + endC)
+
+    # Calcul par tuiles, en parallele, de toutes les combinaisons canal / famille / rayon retenues
+    if textures_jobs_list != []:
+        if not os.path.isdir(repertory_tiles):
+            os.makedirs(repertory_tiles)
+        computeTexturesTiles(image_input, textures_jobs_list, tile_size, nb_workers, CODAGE, save_results_intermediate)
+        if not save_results_intermediate and os.listdir(repertory_tiles) == []:
+            os.rmdir(repertory_tiles)
+
     print(bold + green + "FIN DU CALCUL DE IMAGE : %s , BANDE(S) : %s , TEXTURE(S) : %s, RAYON(S) : %s " %(image_input,channels_list,texture_families_list,radius_list) + endC)
 
     ########################################
@@ -409,207 +518,25 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
 
     print(bold + green + "DEBUT DU CALCUL DES INDICES %s DE L'IMAGE %s" %(indices_to_compute_list,image_input) + endC)
 
+    # Indices calculés en une seule lecture de l'image (moteur d'indices de Lib_index), ISI et HIS restent calculés séparément
+    indices_engine_list = []
+    images_engine_output_list = []
     for indice in indices_to_compute_list:
-        # NDVI (Vegetation)
-        if indice == "NDVI" :
-            output_NDVI = repertory_neochannels_output + image_name + "_NDVI" + extension_raster
-            check_NDVI = os.path.isfile(output_NDVI)
-
-            if check_NDVI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NDVI + " already exists and will not be calculated again.")
-            else:
-                createNDVI(image_input, output_NDVI, channel_order, CODAGE)
-
-        # NDVIMod (Vegetation)
-        if indice == "NDVIMod":
-            output_NDVImod = repertory_neochannels_output + image_name + "_NDVImod" + extension_raster
-            check_NDVImod = os.path.isfile(output_NDVImod)
-
-            if check_NDVImod and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NDVImod + " already exists and will not be calculated again.")
-            else:
-                createNDVIMod(image_input, output_NDVImod, channel_order, CODAGE)
-
-        # NDMI (Humidité)
-        if indice == "NDMI":
-            output_NDMI = repertory_neochannels_output + image_name + "_NDMI" + extension_raster
-            check_NDMI = os.path.isfile(output_NDMI)
-
-            if check_NDMI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NDMI + " already exists and will not be calculated again.")
-            else:
-                createNDMI(image_input, output_NDMI, channel_order, CODAGE)
-
-        # TNDVI (Vegetation)
-        if indice == "TNDVI":
-            output_TNDVI = repertory_neochannels_output + image_name + "_TNDVI" + extension_raster
-            check_TNDVI = os.path.isfile(output_TNDVI)
-
-            if check_TNDVI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_TNDVI + " already exists and will not be calculated again.")
-            else:
-                createTNDVI(image_input, output_TNDVI, channel_order, CODAGE)
-
-        # NDWI (Eau)
-        if indice == "NDWI":
-            output_NDWI = repertory_neochannels_output + image_name + "_NDWI" + extension_raster
-            check_NDWI = os.path.isfile(output_NDWI)
-
-            if check_NDWI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NDWI + " already exists and will not be calculated again.")
-            else:
-                createNDWI(image_input, output_NDWI, channel_order, CODAGE)
-
-        # ISU (Bati)
-        if indice == "ISU":
-            output_ISU = repertory_neochannels_output + image_name + "_ISU" + extension_raster
-            check_ISU = os.path.isfile(output_ISU)
-
-            if check_ISU and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_ISU + " already exists and will not be calculated again.")
-            else:
-                createISU(image_input, output_ISU, channel_order, CODAGE)
-
-        # GEMI (Vegetation)
-        if indice == "GEMI":
-            output_GEMI = repertory_neochannels_output + image_name + "_GEMI" + extension_raster
-            check_GEMI = os.path.isfile(output_GEMI)
-
-            if check_GEMI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_GEMI + " already exists and will not be calculated again.")
-            else:
-                createGEMI(image_input, output_GEMI, channel_order, CODAGE)
-
-        # BSI (Vegetation)
-        if indice == "BSI":
-            output_BSI = repertory_neochannels_output + image_name + "_BSI" + extension_raster
-            check_BSI = os.path.isfile(output_BSI)
-
-            if check_BSI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_BSI + " already exists and will not be calculated again.")
-            else:
-                createBSI(image_input, output_BSI, channel_order, CODAGE)
-
-        # NDBI (Bati)
-        if indice == "NDBI":
-            output_NDBI = repertory_neochannels_output + image_name + "_NDBI" + extension_raster
-            check_NDBI = os.path.isfile(output_NDBI)
-
-            if check_NDBI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NDBI + " already exists and will not be calculated again.")
-            else:
-                createNDBI(image_input, output_NDBI, channel_order, CODAGE)
-
-        # NDWI2 (Eau)
-        if indice == "NDWI2":
-            output_NDWI2 = repertory_neochannels_output + image_name + "_NDWI2" + extension_raster
-            check_NDWI2 = os.path.isfile(output_NDWI2)
-
-            if check_NDWI2 and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NDWI2 + " already exists and will not be calculated again.")
-            else:
-                createNDWI2(image_input, output_NDWI2, channel_order, CODAGE)
-
-        # NDWI2Mod (Eau)
-        if indice == "NDWI2Mod":
-            output_NDWI2Mod = repertory_neochannels_output + image_name + "_NDWI2Mod" + extension_raster
-            check_NDWI2Mod = os.path.isfile(output_NDWI2Mod)
-
-            if check_NDWI2Mod and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NDWI2Mod + " already exists and will not be calculated again.")
-            else:
-                createNDWI2Mod(image_input, output_NDWI2Mod, channel_order, CODAGE)
-
-        # MNDWI (Eau)
-        if indice == "MNDWI":
-            output_MNDWI = repertory_neochannels_output + image_name + "_MNDWI" + extension_raster
-            check_MNDWI = os.path.isfile(output_MNDWI)
-
-            if check_MNDWI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_MNDWI + " already exists and will not be calculated again.")
-            else:
-                createMNDWI(image_input, output_MNDWI, channel_order, CODAGE)
-
-        # IR (Sol)
-        if indice == "IR":
-            output_IR = repertory_neochannels_output + image_name + "_IR" + extension_raster
-            check_IR = os.path.isfile(output_IR)
-
-            if check_IR and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_IR + " already exists and will not be calculated again.")
-            else:
-                createIR(image_input, output_IR, channel_order, CODAGE)
-
-        # NBI (Bati)
-        if indice == "NBI":
-            output_NBI = repertory_neochannels_output + image_name + "_NBI" + extension_raster
-            check_NBI = os.path.isfile(output_NBI)
-
-            if check_NBI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_NBI + " already exists and will not be calculated again.")
-            else:
-                createNBI(image_input, output_NBI, channel_order, CODAGE)
-
-        # PNDVI (Vegetation)
-        if indice == "PNDVI":
-            output_PNDVI = repertory_neochannels_output + image_name + "_PNDVI" + extension_raster
-            check_PNDVI = os.path.isfile(output_PNDVI)
-
-            if check_PNDVI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_PNDVI + " already exists and will not be calculated again.")
-            else:
-                createPNDVI(image_input, output_PNDVI, channel_order, CODAGE)
-
-        # CI (Sol)
-        if indice == "CI":
-            output_CI = repertory_neochannels_output + image_name + "_CI" + extension_raster
-            check_CI = os.path.isfile(output_CI)
-
-            if check_CI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_CI + " already exists and will not be calculated again.")
-            else:
-                createCI(image_input, output_CI, channel_order, CODAGE)
-
-        # BI (Brillance)
-        if indice == "BI":
-            output_BI = repertory_neochannels_output + image_name + "_BI" + extension_raster
-            check_BI = os.path.isfile(output_BI)
-
-            if check_BI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_BI + " already exists and will not be calculated again.")
-            else:
-                createBI(image_input, output_BI, channel_order, CODAGE)
-
-        # BI2 (Brillance)
-        if indice == "BI2":
-            output_BI2 = repertory_neochannels_output + image_name + "_BI2" + extension_raster
-            check_BI2 = os.path.isfile(output_BI2)
-
-            if check_BI2 and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_BI2 + " already exists and will not be calculated again.")
-            else:
-                createBI2(image_input, output_BI2, channel_order, CODAGE)
-
-        # MSAVI2 (Vegetation)
-        if indice == "MSAVI2" :
-            output_MSAVI2 = repertory_neochannels_output + image_name + "_MSAVI2" + extension_raster
-            check_MSAVI2 = os.path.isfile(output_MSAVI2)
-
-            if check_MSAVI2 and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_MSAVI2 + " already exists and will not be calculated again.")
-            else:
-                createMSAVI2(image_input, output_MSAVI2, channel_order, CODAGE)
-
-        # SIPI (Vegetation)
-        if indice == "SIPI" :
-            output_SIPI = repertory_neochannels_output + image_name + "_SIPI" + extension_raster
-            check_SIPI = os.path.isfile(output_SIPI)
-
-            if check_SIPI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_SIPI + " already exists and will not be calculated again.")
-            else:
-                createSIPI(image_input, output_SIPI, channel_order, CODAGE)
+        if indice not in INDICES_ENGINE_LIST :
+            continue
+        # Le fichier NDVIMod garde son nom historique
+        suffix_indice = "_NDVImod" if indice == "NDVIMod" else "_" + indice
+        output_indice = repertory_neochannels_output + image_name + suffix_indice + extension_raster
+        if os.path.isfile(output_indice) and not overwrite:
+            print(cyan + "extractTexture() : " + endC + "File " + output_indice + " already exists and will not be calculated again.")
+        elif indice not in indices_engine_list:
+            indices_engine_list.append(indice)
+            images_engine_output_list.append(output_indice)
+
+    if indices_engine_list != []:
+        createIndicesImage(image_input, indices_engine_list, channel_order, images_engine_output_list, codage=CODAGE, format_raster=getFormatRasterFromExtension(extension_raster))
 
+    for indice in indices_to_compute_list:
         # ISI (Ombre)
         if indice == "ISI" :
             output_ISI = repertory_neochannels_output + image_name + "_ISI" + extension_raster
@@ -630,36 +557,6 @@ def extractTexture(image_input, repertory_neochannels_output, path_time_log, cha
             else:
                 createHIS(image_input, output_HIS, channel_order, CODAGE)
 
-        # VSSI (Salinité)
-        if indice == "VSSI" :
-            output_VSSI = repertory_neochannels_output + image_name + "_VSSI" + extension_raster
-            check_VSSI = os.path.isfile(output_VSSI)
-
-            if check_VSSI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_VSSI + " already exists and will not be calculated again.")
-            else:
-                createVSSI(image_input, output_VSSI, channel_order, CODAGE)
-
-        # BlueI (Nuage)
-        if indice == "BLUEI" :
-            output_BLUEI = repertory_neochannels_output + image_name + "_BLUEI" + extension_raster
-            check_BLUEI = os.path.isfile(output_BLUEI)
-
-            if check_BLUEI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_BLUEI + " already exists and will not be calculated again.")
-            else:
-                createBlueI(image_input, output_BLUEI, channel_order, CODAGE)
-
-        # SCoWI (Eau)
-        if indice == "SCoWI" :
-            output_SCoWI = repertory_neochannels_output + image_name + "_SCoWI" + extension_raster
-            check_SCoWI = os.path.isfile(output_SCoWI)
-
-            if check_SCoWI and not overwrite:
-                print(cyan + "extractTexture() : " + endC + "File " + output_SCoWI + " already exists and will not be calculated again.")
-            else:
-                createSCoWI(image_input, output_SCoWI, channel_order, CODAGE)
-
     # Supression des .geom des fichiers d'indices - A GARDER?
     for file_to_remove in glob.glob(repertory_neochannels_output + os.sep + "*.geom"):
         removeFile(file_to_remove)
@@ -704,6 +601,8 @@ def main(gui=False):
     parser.add_argument('-rad','--radius_list',nargs="+", default=[],help="List of radius to process. Available  radius values are [1, 2, 3 ,4, 5, 7 ...]",type=int,required=False)
     parser.add_argument('-chao','--channel_order',nargs="+", default=['Red','Green','Blue','NIR'],help="Type of multispectral image : rapideye or spot6 or pleiade. By default : [Red,Green,Blue,NIR]",type=str,required=False)
     parser.add_argument('-bin','--bin_number',default=64,help="Number of subdivisions considered for the  computing textures. Chose between 4,8,32 and 64", type=int, required=False)
+    parser.add_argument('-tile','--tile_size',default=TILE_SIZE,help="Size in pixels of the tiles used to compute textures in parallel. By default : %s" %(TILE_SIZE), type=int, required=False)
+    parser.add_argument('-nbw','--nb_workers',default=0,help="Number of textures tiles computed in parallel. By default : 0 (number of CPU)", type=int, required=False)
     parser.add_argument('-ind','--indices_list',nargs="+", default=[], help="List of indices to process. Available indices are [NDVI, NDVIMod, TNDVI, NDWI, ISU, GEMI, BSI, NDBI, NDWI2, NDWI2Mod, MNDWI, IR, NBI, PNDVI, CI, BI]. By default, none indice",type=str, required=False)
     parser.add_argument('-rae','--extension_raster', default=".tif", help="Option : Extension file for image raster. By default : '.tif'", type=str, required=False)
     parser.add_argument('-log','--path_time_log',default="",help="Name of log", type=str, required=False)
@@ -740,6 +639,12 @@ def main(gui=False):
     if args.bin_number != None:
         bin_number = args.bin_number
 
+    if args.tile_size != None:
+        tile_size = args.tile_size
+
+    if args.nb_workers != None:
+        nb_workers = args.nb_workers
+
     if args.indices_list != None:
         indices_to_compute_list = args.indices_list
 
@@ -771,6 +676,8 @@ def main(gui=False):
         print(cyan + "NeoChannelsComputation : " + endC + "radius_list : " + str(radius_list) + endC)
         print(cyan + "NeoChannelsComputation : " + endC + "channel_order : " + str(channel_order) + endC)
         print(cyan + "NeoChannelsComputation : " + endC + "bin_number : " + str(bin_number) + endC)
+        print(cyan + "NeoChannelsComputation : " + endC + "tile_size : " + str(tile_size) + endC)
+        print(cyan + "NeoChannelsComputation : " + endC + "nb_workers : " + str(nb_workers) + endC)
         print(cyan + "NeoChannelsComputation : " + endC + "indices_list : " + str(indices_to_compute_list) + endC)
         print(cyan + "NeoChannelsComputation : " + endC + "extension_raster : " + str(extension_raster) + endC)
         print(cyan + "NeoChannelsComputation : " + endC + "path_time_log : " + str(path_time_log) + endC)
@@ -784,7 +691,7 @@ def main(gui=False):
         os.makedirs(repertory_neochannels_output)
 
     # execution de la fonction pour une image
-    extractTexture(image_input, repertory_neochannels_output, path_time_log, channels_list, texture_families_list, radius_list, indices_to_compute_list, channel_order, extension_raster, save_results_intermediate, overwrite, bin_number)
+    extractTexture(image_input, repertory_neochannels_output, path_time_log, channels_list, texture_families_list, radius_list, indices_to_compute_list, channel_order, extension_raster, save_results_intermediate, overwrite, bin_number, tile_size, nb_workers)
 
 # ================================================
 
@@ -77,8 +77,8 @@ from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displ
 from Lib_file import removeVectorFile, renameVectorFile, removeFile, deleteDir
 from Lib_text import fillTableFiles, writeTextFile, appendTextFileCR
 from Lib_operator import getNumberCPU
-from Lib_vector import saveVectorFromDataframe, simplifyVector, createGridVector, splitVector, cutVectorAll, createPolygonsFromCoordList, intersectVector, getNumberFeature, getGeometryType, getGeomPolygons, filterSelectDataVector, renameFieldsVector
-from Lib_raster import getProjectionImage, getEmpriseVector, getPixelWidthXYImage, getGeometryImage, getEmpriseImage, getNodataValueImage, getPixelWidthXYImage, cutImageByVector, createVectorMask, cutImageByGrid
+from Lib_vector import saveVectorFromDataframe, simplifyVector, createGridVector, iterTilesVector, cutVectorAll, createPolygonsFromCoordList, intersectVector, getNumberFeature, getGeometryType, getGeomPolygons, filterSelectDataVector, renameFieldsVector
+from Lib_raster import getProjectionImage, getEmpriseVector, getPixelWidthXYImage, getGeometryImage, getEmpriseImage, getNodataValueImage, getPixelWidthXYImage, cutImageByVector, createVectorMask, cutImageByTile
 from CrossingVectorRaster import statisticsVectorRaster
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
@@ -217,7 +217,7 @@ def decoupeImageTraining( training_input, vector_training_input, path_output, si
     #    epsg (int) : Identificateur de projection
     #    folder_imagette (int) : nom du sous répertoire contenant les imagettes découpé selon la grille + le débord
     #    folder_train (int) :  nom du sous répertoire contenant les vecteurs de données d'apprentissage découpé selon la grille + le débord
-    #    folder_grid (int) :  nom du sous répertoire contenant les vecteurs de coupe des carrés de grille
+    #    folder_grid (int) :  non utilisé, les carrés de grille sont parcourus sans fichier vecteur de coupe (conservé pour compatibilité)
     #    extension_raster (string) : extension de fichier des imagettes
     #    extension_vector (string) : extension de fichier des vecteurs
     #    format_raster (string) : format des imagettes
@@ -239,7 +239,6 @@ def decoupeImageTraining( training_input, vector_training_input, path_output, si
     SUFFIX_VECTOR_SIMPLIFY = "_vect_simplify"
     SUFFIX_EMPRISE = "_emprise"
     SUFFIX_GRID = "_grid"
-    SUFFIX_BUFF = "_buff"
     SUFFIX_INTER = "_inter"
 
     # Récupération de la taille d'un pixel
@@ -334,18 +333,13 @@ def decoupeImageTraining( training_input, vector_training_input, path_output, si
     if not os.path.isdir(repertory_data_train_temp):
         os.makedirs(repertory_data_train_temp)
 
-    # Création du dossier contenant les polygones de la grille s'il n'existe pas déjà
-    repertory_data_grid_temp = path_output + os.sep + folder_grid
-    if not os.path.isdir(repertory_data_grid_temp):
-        os.makedirs(repertory_data_grid_temp)
-
-    # Extraire chaque polygone en un fichier vector_grid_temp_inter
-    split_tile_vector_list = splitVector(vector_grid_temp_inter, repertory_data_grid_temp, FIELD_NAME, epsg, format_vector, extension_vector)
+    # Parcours des carrés de la grille (sans fichier vecteur par carré), l'emprise retournée est agrandie du débord
+    tiles_list = list(iterTilesVector(vector_grid_temp_inter, FIELD_NAME, debord * pixel_size, None, None, format_vector))
     if debug >= 4:
-        print(cyan + "decoupeImageTraining() : " + endC + "len(split_tile_vector_list) : " + str(len(split_tile_vector_list)))
+        print(cyan + "decoupeImageTraining() : " + endC + "len(tiles_list) : " + str(len(tiles_list)))
 
-    # Récupération des dimensions des la listes des vecteurs de découpe
-    number_vector = len(split_tile_vector_list)
+    # Récupération du nombre de carrés de découpe
+    number_vector = len(tiles_list)
 
     # Initialisation des deux matrices
     training_table = []
@@ -354,36 +348,31 @@ def decoupeImageTraining( training_input, vector_training_input, path_output, si
         input_table.append([])
         training_table.append([])
 
-    # Récupération du nombre de vecteurs de découpe et définition du nombre de threads à utiliser
-    number_CPU = int(getNumberCPU()/2)
-    rapport_division_CPU = number_vector // number_CPU
-    rapport_modulo_CPU = number_vector % number_CPU
+    # Définition du nombre de threads à utiliser
+    number_CPU = max(1, int(getNumberCPU()/2))
     if debug >= 3:
         print(cyan + "decoupeImageTraining() : " + endC + "number_vector :" + str(number_vector  ))
         print(cyan + "decoupeImageTraining() : " + endC + "number_ligne :" + str(grid_ligne  ))
-        print(cyan + "decoupeImageTraining() : " + endC + "number_colonne :" + str(grid_ligne  ))
+        print(cyan + "decoupeImageTraining() : " + endC + "number_colonne :" + str(grid_colonne  ))
         print(cyan + "decoupeImageTraining() : " + endC + "number_CPU :" + str(number_CPU  ))
-        print(cyan + "decoupeImageTraining() : " + endC + "rapport_division_CPU :" + str(rapport_division_CPU))
-        print(cyan + "decoupeImageTraining() : " + endC + "rapport_modulo_CPU :" + str(rapport_modulo_CPU))
 
-    # Découpage de l'image d'entrée
-    for i in range(rapport_division_CPU):
+    # Découpage de l'image d'entrée par lots de number_CPU threads
+    for start_tile in range(0, number_vector, number_CPU):
         # Initialisation de la liste pour le multi-threading
         thread_list = []
-        for j in range(number_CPU):
-            output_image = fillTableFiles(split_tile_vector_list[(i * number_CPU) + j], input_table, repertory_data_imagette_temp, BASE_NAME_IMAGETTE, extension_raster)
+        for index_tile in range(start_tile, min(number_vector, start_tile + number_CPU)):
+            tile_name, tile_geometry, _, _ = tiles_list[index_tile]
+            output_image = fillTableFiles(tile_name, input_table, repertory_data_imagette_temp, BASE_NAME_IMAGETTE, extension_raster)
             output_image_path_list.append(output_image)
             if debug >= 4:
                 print(cyan + "decoupeImageTraining() : " + endC + "Output image :" + output_image)
             if debug >= 2 :
-                print(cyan + "decoupeImageTraining() : " + endC + "Traitement de la tuile " + str((i * number_CPU) + j + 1) + "/" + str(number_vector) + "...")
+                print(cyan + "decoupeImageTraining() : " + endC + "Traitement de la tuile " + str(index_tile + 1) + "/" + str(number_vector) + "...")
 
-            if os.path.exists(split_tile_vector_list[(i * number_CPU) + j]):
-                # Découpage de l'image par multi-threading
-                image_tmp = split_tile_vector_list[i * number_CPU + j]
-                thread = threading.Thread(target=cutImageByGrid, args=(image_tmp, training_input, output_image, dimension_grid, dimension_grid, debord, pixel_size, pixel_size, no_data_value, epsg, format_raster, format_vector))
-                thread.start()
-                thread_list.append(thread)
+            # Découpage de l'image par multi-threading sur l'emprise du carré
+            thread = threading.Thread(target=cutImageByTile, args=(tile_geometry.GetEnvelope(), training_input, output_image, dimension_grid, dimension_grid, debord, pixel_size, pixel_size, no_data_value, epsg, format_raster))
+            thread.start()
+            thread_list.append(thread)
 
         # Attente fin de tout les threads
         try:
@@ -392,66 +381,26 @@ def decoupeImageTraining( training_input, vector_training_input, path_output, si
         except:
             print(cyan + "decoupeImageTraining() : " + bold + red + "Erreur lors de le decoupe : impossible de demarrer le thread" + endC, file=sys.stderr)
 
-    # Initialisation de la liste pour le multi-threading
-    thread_list = []
-    for i in range(rapport_modulo_CPU):
-
-        output_image = fillTableFiles(split_tile_vector_list[(rapport_division_CPU * number_CPU) + i], input_table, repertory_data_imagette_temp, BASE_NAME_IMAGETTE, extension_raster)
-        output_image_path_list.append(output_image)
-        if debug >= 4:
-            print(cyan + "decoupeImageTraining() : " + endC + "Output image :" + output_image)
-        if debug >= 2 :
-            print(cyan + "decoupeImageTraining() : " + endC + "Traitement de la tuile " + str((rapport_division_CPU * number_CPU) + i + 1) + "/" + str(number_vector) + "...")
-
-        if os.path.exists(split_tile_vector_list[(rapport_division_CPU * number_CPU) + i]):
-
-            # Découpage de l'image par multi-threading
-            image_tmp = split_tile_vector_list[rapport_division_CPU * number_CPU + i]
-            thread = threading.Thread(target=cutImageByGrid, args=(image_tmp, training_input, output_image, dimension_grid, dimension_grid, debord, pixel_size, pixel_size, no_data_value, epsg, format_raster, format_vector))
-            thread.start()
-            thread_list.append(thread)
-
-    # Attente fin de tout les threads
-    try:
-        for thread in thread_list:
-            thread.join()
-    except:
-        print(cyan + "decoupeImageTraining() : " + bold + red + "Erreur lors de le decoupe : impossible de demarrer le thread" + endC, file=sys.stderr)
-
     if vector_training_input != "" :
 
-        # Découpage des données vecteur d'entrainement
-        for i in range(rapport_division_CPU):
+        # Découpage des données vecteur d'entrainement par lots de number_CPU threads
+        for start_tile in range(0, number_vector, number_CPU):
             # Initialisation de la liste pour le multi-threading
             thread_list = []
-            for j in range(number_CPU):
-                output_train_vector = fillTableFiles(split_tile_vector_list[(i * number_CPU) + j], training_table, repertory_data_train_temp, BASE_NAME_TRAIN, extension_vector)
+            for index_tile in range(start_tile, min(number_vector, start_tile + number_CPU)):
+                tile_name, _, tile_bounds, _ = tiles_list[index_tile]
+                output_train_vector = fillTableFiles(tile_name, training_table, repertory_data_train_temp, BASE_NAME_TRAIN, extension_vector)
                 output_train_vector_path_list.append(output_train_vector)
                 if debug >= 4:
                     print(cyan + "decoupeImageTraining() : " + endC + "Output train vector : " + output_train_vector)
                 if debug >= 2 :
-                    print(cyan + "decoupeImageTraining() : " + endC + "Traitement du vecteur d'apprentissage : " + str((i * number_CPU) + j + 1) + "/" + str(number_vector) + "...")
-
-                # Découpage du masque
-                if os.path.exists(split_tile_vector_list[(i * number_CPU) + j]):
-
-                    # Découpage du vecteur par multi-threading
-                    vector_tmp = split_tile_vector_list[i * number_CPU + j]
-                    vector_cut_buf = os.path.splitext(vector_tmp)[0] + SUFFIX_BUFF + extension_vector
-                    xmin,xmax,ymin,ymax = getEmpriseVector(vector_tmp, format_vector)
-                    x1 = xmin - debord * pixel_size                  # x1,y1          x2,y2
-                    y1 = ymax + debord * pixel_size                  #    ---------------
-                    x2 = xmax + debord * pixel_size                  #    |             |
-                    y2 = ymax + debord * pixel_size                  #    |             |
-                    x3 = xmax + debord * pixel_size                  #    |             |
-                    y3 = ymin - debord * pixel_size                  #    |             |
-                    x4 = xmin - debord * pixel_size                  #    ---------------
-                    y4 = ymin - debord * pixel_size                  # x4,y4          x3,y3
-                    polygons_attr_coord_dico = {1:[[x1, y1, x2, y2, x3, y3, x4, y4], {}]}
-                    createPolygonsFromCoordList({}, polygons_attr_coord_dico, vector_cut_buf, epsg, format_vector)
-                    thread = threading.Thread(target=cutVectorAll, args=(vector_cut_buf, vector_training_input, output_train_vector, overwrite, format_vector))
-                    thread.start()
-                    thread_list.append(thread)
+                    print(cyan + "decoupeImageTraining() : " + endC + "Traitement du vecteur d'apprentissage : " + str(index_tile + 1) + "/" + str(number_vector) + "...")
+
+                # Découpage du vecteur par multi-threading sur l'emprise du carré agrandie du débord (xmin ymin xmax ymax)
+                clip_emprise = "%s %s %s %s" %(tile_bounds[0], tile_bounds[2], tile_bounds[1], tile_bounds[3])
+                thread = threading.Thread(target=cutVectorAll, args=(clip_emprise, vector_training_input, output_train_vector, overwrite, format_vector))
+                thread.start()
+                thread_list.append(thread)
 
             # Attente fin de tout les threads
             try:
@@ -460,43 +409,6 @@ def decoupeImageTraining( training_input, vector_training_input, path_output, si
             except:
                 print(cyan + "decoupeImageTraining() : " + bold + red + "Erreur lors de le decoupe : impossible de demarrer le thread" + endC, file=sys.stderr)
 
-        # Initialisation de la liste pour le multi-threading
-        thread_list = []
-        for i in range(rapport_modulo_CPU):
-
-            output_train_vector = fillTableFiles(split_tile_vector_list[(rapport_division_CPU * number_CPU) + i], training_table, repertory_data_train_temp, BASE_NAME_TRAIN, extension_vector)
-            output_train_vector_path_list.append(output_train_vector)
-            if debug >= 4:
-                print(cyan + "decoupeImageTraining() : " + endC + "Output train vector :" + output_train_vector)
-            if debug >= 2 :
-                print(cyan + "decoupeImageTraining() : " + endC + "Traitement du vecteur d'apprentissage : " + str((rapport_division_CPU * number_CPU) + i + 1) + "/" + str(number_vector) + "...")
-
-            if os.path.exists(split_tile_vector_list[(rapport_division_CPU * number_CPU) + i]):
-                # Découpage du vecteur par multi-threading
-                vector_tmp = split_tile_vector_list[(rapport_division_CPU * number_CPU) + i]
-                vector_cut_buf = os.path.splitext(vector_tmp)[0] + SUFFIX_BUFF + extension_vector
-                xmin,xmax,ymin,ymax = getEmpriseVector(vector_tmp, format_vector)
-                x1 = xmin - debord * pixel_size                  # x1,y1          x2,y2
-                y1 = ymax + debord * pixel_size                  #    ---------------
-                x2 = xmax + debord * pixel_size                  #    |             |
-                y2 = ymax + debord * pixel_size                  #    |             |
-                x3 = xmax + debord * pixel_size                  #    |             |
-                y3 = ymin - debord * pixel_size                  #    |             |
-                x4 = xmin - debord * pixel_size                  #    ---------------
-                y4 = ymin - debord * pixel_size                  # x4,y4          x3,y3
-                polygons_attr_coord_dico = {1:[[x1, y1, x2, y2, x3, y3, x4, y4], {}]}
-                createPolygonsFromCoordList({}, polygons_attr_coord_dico, vector_cut_buf, epsg, format_vector)
-                thread = threading.Thread(target=cutVectorAll, args=(vector_cut_buf, vector_training_input, output_train_vector, overwrite, format_vector))
-                thread.start()
-                thread_list.append(thread)
-
-        # Attente fin de tout les threads
-        try:
-            for thread in thread_list:
-                thread.join()
-        except:
-            print(cyan + "decoupeImageTraining() : " + bold + red + "Erreur lors de le decoupe : impossible de demarrer le thread" + endC, file=sys.stderr)
-
     return output_image_path_list, output_train_vector_path_list
 
 ###########################################################################################################################################
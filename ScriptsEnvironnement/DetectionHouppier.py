@@ -31,7 +31,7 @@ adapte par Emma Bousquet, 2023, Cerema groupe OSECC
 formatage code par Gilles Fouvet, 2023, Cerema groupe OSECC
 -----------------------------------------------------------------------------------------------------
 Modifications :
-
+16/10/2026 : traitement des segments vectorisé (max par segment par tri, liens par KD-tree, regroupement par union-find) et parallélisé par bandes de lignes
 ------------------------------------------------------
 A Reflechir/A faire :
 
@@ -39,16 +39,21 @@ A Reflechir/A faire :
 
 import os,sys,glob, time, string, argparse, shutil, platform, math
 import numpy as np
-from PIL import Image
-from skimage import io
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scipy.spatial import cKDTree
 from osgeo import gdal, ogr
-import networkx as nx
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 1 : affichage intermédiaire de commentaires lors de l'execution du script
 # debug = 2 : affichage supérieur de commentaires lors de l'execution du script etc...
 debug = 3
 
+# Nombre maximum de pixels d'une bande de lignes traitée par un processus
+MAX_PIXELS_STRIP = 4194304
+# Distance maximale (en pixels) et difference de hauteur maximale entre deux points max liés
+DISTANCE_LINKS_MAX = 10
+HEIGHT_DIFF_MAX = 1.1
+
 ###################### FONCTIONS ########################################
 # Pour y accéder dans un script : from fcts_Affichage import bold,black,red,green,yellow,blue,magenta,cyan,endC
 osSystem = platform.system()
@@ -135,220 +140,210 @@ def timeLine(path_timelog,step):
     return
 
 #########################################################################
-# FONCTION giveListCoordsSgtsImg()                                      #
+# FONCTION giveStripsImg()                                              #
 #########################################################################
-def giveListCoordsSgtsImg(img_sgts):
+def giveStripsImg(rows, cols, max_pixels_strip=MAX_PIXELS_STRIP):
     """
         Rôle :
-            Fonction qui recupere la liste des coordonnées x et y des pixels par segments
-            ie ensemble des pixels appartennant au même segment
+            Fonction qui découpe une image en bandes de lignes traitées chacune par un processus
         Entree :
-            img_sgts : matrice de l'image segments
+            rows : nombre de lignes de l'image
+            cols : nombre de colonnes de l'image
+            max_pixels_strip : nombre maximum de pixels d'une bande de lignes
         Sortie :
-            x_list : liste des coordonnées x des pixels appartenant a chaque segment
-            y_list : liste des coordonnées y des pixels appartenant a chaque segment
+            strips_list : liste des bandes de lignes [ligne de debut, nombre de lignes]
     """
-    x_list = []
-    y_list = []
-    li_uni_sgts = np.unique(img_sgts) #copie de l'image segmentée végétation
-    for el in li_uni_sgts:
-        # Renvoie la liste des coords de pixels qui
-        # Appartiennent au même segment dont le label est la valeur el
-        li_pxl_sgt = np.where(img_sgts == el)
-        x_list.append(li_pxl_sgt[0])
-        y_list.append(li_pxl_sgt[1])
-    return x_list, y_list
+    strip_rows = max(1, max_pixels_strip // max(1, cols))
+    strips_list = [[yoff, min(strip_rows, rows - yoff)] for yoff in range(0, rows, strip_rows)]
+    return strips_list
 
 #########################################################################
-# FONCTION giveCoordsMaxSGTS()                                          #
+# FONCTION giveMaxSgtsStrip()                                           #
 #########################################################################
-def giveCoordsMaxSGTS(x_list, y_list, img_mnh):
+def giveMaxSgtsStrip(segments_file, mnh_file, yoff, nb_rows, cols):
     """
         Rôle :
-            Fonction qui renvoie les valeurs de hauteur max et les coordonnées
-            de ces pixel dans la matrice de l'image segmentée
-            (une valeur max. par segment)
+            Fonction qui renvoie pour une bande de lignes le pixel de hauteur max de chaque segment
+            (en cas d'égalité le premier pixel dans l'ordre des lignes puis des colonnes)
         Entree :
-            x_list : liste des coordonnées x des pixels appartenant a chaque segment
-            y_list : liste des coordonnées y des pixels appartenant a chaque segment
-            img_mnh : matrice de l'image mnh
+            segments_file : fichier de l'image segmentée
+            mnh_file : fichier de l'image mnh
+            yoff : ligne de debut de la bande de lignes
+            nb_rows : nombre de lignes de la bande de lignes
+            cols : nombre de colonnes communes aux deux images
         Sortie :
-            pts_list : liste des points [xhmax, yhmax]
+            labels, hauteurs max, lignes et colonnes (dans l'image) des pixels de hauteur max de chaque segment de la bande de lignes
     """
-    pts_list = []
-    for sgt in range(len(x_list)): # On rentre dans chaque segment sgt
-        valx = x_list[sgt][0]
-        valy = y_list[sgt][0]
-        if valx<np.shape(img_mnh)[0] and valy<np.shape(img_mnh)[1]: #pour ne pas aller au-dela de la taille du MNH
-            hmax = img_mnh[valx,valy] # Valeur de hauteur du pixel du segment z
-            coords_max = [valx,valy]  # Coords du pixel
-            for pxl in range(1,len(x_list[sgt])): # Dans le segment z, on parcourt tous les pixels et on cherche le hmax et les coords max
-                x = x_list[sgt][pxl]
-                y = y_list[sgt][pxl]
-                if x<np.shape(img_mnh)[0] and y<np.shape(img_mnh)[1]:
-                    if img_mnh[x,y] > hmax:
-                        hmax = img_mnh[x,y]
-                        coords_max = [x,y]
-            pts_list.append(coords_max)
-
-    return pts_list
+    dataset_sgts = gdal.Open(segments_file)
+    labels = dataset_sgts.GetRasterBand(1).ReadAsArray(0, yoff, cols, nb_rows).ravel()
+    dataset_sgts = None
+    dataset_mnh = gdal.Open(mnh_file)
+    heights = dataset_mnh.GetRasterBand(1).ReadAsArray(0, yoff, cols, nb_rows).ravel().astype(np.float64)
+    dataset_mnh = None
+
+    # Tri par label, hauteur décroissante puis position : le premier pixel de chaque label est son max
+    order = np.lexsort((np.arange(len(labels)), -heights, labels))
+    labels_sorted = labels[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = labels_sorted[1:] != labels_sorted[:-1]
+    index_max = order[first]
+
+    return labels[index_max], heights[index_max], yoff + index_max // cols, index_max % cols
 
 #########################################################################
-# FONCTION searchLinksPts()                                             #
+# FONCTION giveCoordsMaxSGTS()                                          #
 #########################################################################
-def searchLinksPts(pt, pts_list, links):
+def giveCoordsMaxSGTS(segments_file, mnh_file, nb_workers):
     """
         Rôle :
-            Fonction qui crée une liste de tuple (u,v) qui correspondent aux
-            liens entre un point max d'origine et tous les autres points max de la matrice
-            selon un critère de distance
-            u --> point d'origine et v --> point de chute
+            Fonction qui renvoie les valeurs de hauteur max et les coordonnées
+            de ces pixel dans la matrice de l'image segmentée
+            (une valeur max. par segment, calculée par bandes de lignes sur plusieurs processus)
         Entree :
-            pt : valeur du point d'origine traité
-            pts_list : liste des coordonnées des points max
-            l_droites : liste des liens
+            segments_file : fichier de l'image segmentée
+            mnh_file : fichier de l'image mnh
+            nb_workers : nombre de processus
         Sortie :
-            l_droites : liste des liens remplie en partant du point d'origine
+            labels_array : labels des segments (triés)
+            heights_array : hauteur max de chaque segment
+            pts_array : tableau des points [xhmax, yhmax] de chaque segment
     """
-    x1 = pts_list[pt][0]
-    y1 = pts_list[pt][1]
-    for i in range(len(pts_list)):
-        if pts_list[i] != pts_list[pt]:
-            x2 = pts_list[i][0]
-            y2 = pts_list[i][1]
-            dh = math.sqrt((x1-x2)**2+(y1-y2)**2)
-            if dh <= 10 :
-                links.append((pt,i))
-    return links
+    # Seule la partie commune aux deux matrices est parcourue (pour ne pas aller au-dela de la taille du MNH)
+    dataset_sgts = gdal.Open(segments_file)
+    dataset_mnh = gdal.Open(mnh_file)
+    rows = min(dataset_sgts.RasterYSize, dataset_mnh.RasterYSize)
+    cols = min(dataset_sgts.RasterXSize, dataset_mnh.RasterXSize)
+    dataset_sgts = None
+    dataset_mnh = None
+
+    results_list = []
+    with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        futures_list = [executor.submit(giveMaxSgtsStrip, segments_file, mnh_file, yoff, nb_rows, cols) for yoff, nb_rows in giveStripsImg(rows, cols)]
+        try:
+            for future in as_completed(futures_list):
+                results_list.append(future.result())
+        except Exception:
+            for future in futures_list:
+                future.cancel()
+            raise
+
+    if results_list == []:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, 2), dtype=np.int64)
+
+    # Fusion des bandes de lignes : max par segment, en cas d'égalité le premier pixel de l'image
+    labels = np.concatenate([result[0] for result in results_list])
+    heights = np.concatenate([result[1] for result in results_list])
+    x_array = np.concatenate([result[2] for result in results_list])
+    y_array = np.concatenate([result[3] for result in results_list])
+    order = np.lexsort((y_array, x_array, -heights, labels))
+    labels_sorted = labels[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = labels_sorted[1:] != labels_sorted[:-1]
+    index_max = order[first]
+
+    return labels[index_max], heights[index_max], np.column_stack((x_array[index_max], y_array[index_max]))
 
 #########################################################################
 # FONCTION createAllLinks()                                             #
 #########################################################################
-def createAllLinks(pts_list):
+def createAllLinks(pts_array, distance_max=DISTANCE_LINKS_MAX):
     """
         Rôle :
-            Fonction qui créé la liste des liens à représenter sur le graphe
+            Fonction qui créé la liste des liens à représenter sur le graphe :
+            les couples de points max distants d'au plus distance_max pixels (recherche par KD-tree)
         Entree :
-            pts_list : liste des coordonnées de points max
+            pts_array : tableau des coordonnées de points max
+            distance_max : distance maximale entre deux points liés (en pixels)
         Sortie :
-            pos : dictionnaire {valeur point : (coordx,coordy)}
-            links : liste des tuples de liens de l'image
+            links : tableau des liens (i, j) avec i < j
     """
-    pos = {}
-    links = []
-    links = searchLinksPts(0, pts_list, links)
-    pos[0]= (pts_list[0][0],pts_list[0][1])
-    for el in range(1,len(pts_list)):
-        pos[el]=(pts_list[el][0],pts_list[el][1])
-        links = searchLinksPts(el, pts_list, links)
-
-    return pos, links
+    if len(pts_array) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    tree = cKDTree(pts_array)
+    links = tree.query_pairs(distance_max, output_type='ndarray')
+    return links
 
 #########################################################################
 # FONCTION cleanGraph()                                                 #
 #########################################################################
-def cleanGraph(graph, pos, links, mat_mnh):
+def cleanGraph(links, heights_array, height_diff_max=HEIGHT_DIFF_MAX):
     """
         Rôle :
             Fonction qui supprime les liens entre points ne rentrants pas dans les conditions
-            de distance et de hauteur
+            de hauteur
         Entree :
-            graph : graphe
-            pos : dictionnaire {valeur point : (coordx,coordy)}
-            links : liste des tuples de liens de l'image
-            mat_mnh : matrice de l'image MNH
+            links : tableau des liens (i, j)
+            heights_array : hauteur de chaque point max
+            height_diff_max : difference de hauteur maximale entre deux points liés
         Sortie :
-            aucune
+            links : tableau des liens conservés
     """
-    for el in links:
-        el1 = el[0]
-        el2 = el[1]
-        coords_el1 = pos.get(el1)
-        coords_el2 = pos.get(el2)
-        if abs(mat_mnh[coords_el1[0]][coords_el1[1]]-mat_mnh[coords_el2[0]][coords_el2[1]])>1.1 and graph.has_edge(el1,el2) == True:
-            graph.remove_edge(el1,el2)
-
-    return
-
-#########################################################################
-# FONCTION clustSgtOneNode()                                            #
-#########################################################################
-def clustSgtOneNode(node, li_node, sgts, pos):
-    """
-        Rôle :
-            Fonction qui regroupe les segments en un super-segment pour un point max donné
-        Entrée :
-            node : valeur du point max d'origine
-            li_node : liste des points max rattachés au point lax d'origine
-            sgts : matrice de l'image segmentée
-            pos : dictionnaire des points du graphes contenant la valeur des points et leur position dans le graphe et dans la matrice d'image segmentée
-        Sortie :
-            sgts : matrice d'image segmentée où les segments doivent correspondrent aux houppiers
-    """
-    num_sgt_origin = sgts[pos.get(node)[0], pos.get(node)[1]] # Label du segment d'origine
-    for key in li_node.keys():
-        coord_img = pos.get(key)
-        num_sgt = sgts[coord_img[0], coord_img[1]]
-        if num_sgt != num_sgt_origin : # Si le pixel accroché au noeud d'origine n'appartient pas déjà au même segment
-            sgts[sgts==num_sgt]=num_sgt_origin  # On attribut le nouveau label au point lié dans la matrice de l'image segmentée
-
-    return sgts
+    diff_heights = np.abs(heights_array[links[:, 0]] - heights_array[links[:, 1]])
+    return links[~(diff_heights > height_diff_max)]
 
 #########################################################################
 # FONCTION clustSgtInCrown()                                            #
 #########################################################################
-def clustSgtInCrown(graph, sgts_c, pos):
+def clustSgtInCrown(labels_array, links):
     """
         Rôle :
-            Fonction qui attribue les mêmes valeurs aux pixels appartenants au même segment de houppier dans une matrice image segmentée
+            Fonction qui attribue le même label aux segments appartenants au même houppier (composantes connexes du graphe)
+            Pour chaque point dans l'ordre, chaque point lié prend le label du point d'origine
         Entree :
-            G : graphe
-            sgts_c : copie de la matrice de l'image segmentée
-            pos : dictionnaire des
+            labels_array : labels des segments de chaque point max
+            links : tableau des liens (i, j)
         Sortie :
-            sgts :
+            final_labels_array : label du houppier de chaque segment
     """
-    nodes = list(graph.nodes) # Liste les points du graphe
-    edges = list(graph.edges) # Liste les droites reliants les points du graphe
-    for node in nodes:
-        li_node = graph[node] # Recupere liste des points reliésau point "node"
-        sgts = clustSgtOneNode(node,li_node, sgts_c, pos)
-
-    return sgts
+    parent = list(range(len(labels_array)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Les liens sont parcourus dans les deux sens, par point d'origine puis point lié croissants
+    directed_links = np.concatenate((links, links[:, ::-1]))
+    order = np.lexsort((directed_links[:, 1], directed_links[:, 0]))
+    for node, key in directed_links[order].tolist():
+        root_node = find(node)
+        root_key = find(key)
+        if root_node != root_key:
+            parent[root_key] = root_node
+
+    final_labels_array = np.array([labels_array[find(i)] for i in range(len(labels_array))], dtype=np.int64)
+    return final_labels_array
 
 #########################################################################
-# FONCTION writeImage1B()                                               #
+# FONCTION relabelSgtsStrip()                                           #
 #########################################################################
-def writeImage1B(filename, arr, dataset_input, format_raster="GTiff"):
+def relabelSgtsStrip(segments_file, yoff, nb_rows, labels_array, final_labels_array):
     """
         Rôle :
-            Fonction d'écrite d'une image Geotiff
+            Fonction qui applique les labels des houppiers à une bande de lignes de l'image segmentée
         Entree :
-            filename : chemin absolu de l'image que l'on souhaite creer
-            arr : image en array que l'on souhaite creer
-            dataset_input : image a partir de laquelle on va recuperer les infos pour le georeferencement
+            segments_file : fichier de l'image segmentée
+            yoff : ligne de debut de la bande de lignes
+            nb_rows : nombre de lignes de la bande de lignes
+            labels_array : labels des segments (triés)
+            final_labels_array : label du houppier de chaque segment
+        Sortie :
+            la bande de lignes des houppiers
     """
-    if arr.dtype == np.float32:
-        arr_type = gdal.GDT_Float32
-    else:
-        arr_type = gdal.GDT_Int32
-
-    driver = gdal.GetDriverByName(format_raster)
-    dataset_out = driver.Create(filename, arr.shape[1], arr.shape[0], 1, arr_type)
-    dataset_out.SetProjection(dataset_input.GetProjection())
-    dataset_out.SetGeoTransform(dataset_input.GetGeoTransform())
-    band = dataset_out.GetRasterBand(1)
-    band.WriteArray(arr[:,:])
-    band.FlushCache()
-    band.ComputeStatistics(False)
-    dataset_out = None
-
-    return
+    dataset_sgts = gdal.Open(segments_file)
+    sgts = dataset_sgts.GetRasterBand(1).ReadAsArray(0, yoff, dataset_sgts.RasterXSize, nb_rows).astype(np.int32)
+    dataset_sgts = None
+    if len(labels_array) > 0:
+        index = np.minimum(np.searchsorted(labels_array, sgts), len(labels_array) - 1)
+        found = labels_array[index] == sgts
+        sgts[found] = final_labels_array[index[found]]
+    return sgts
 
 ###########################################################################################################################################
 # FONCTION detecterHouppier()                                                                                                             #
 ###########################################################################################################################################
-def detecterHouppier(image_input, image_mnh_input, houppier_image_output, houppier_vector_output, threshold_mnh_value, threshold_ndvi_value,  path_time_log, ram_otb=0, format_raster='GTiff', format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True):
+def detecterHouppier(image_input, image_mnh_input, houppier_image_output, houppier_vector_output, threshold_mnh_value, threshold_ndvi_value,  path_time_log, ram_otb=0, nb_workers=0, format_raster='GTiff', format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True):
     """
         ROLE:
             detecter les houppiers des arbres dans une image
@@ -362,6 +357,7 @@ def detecterHouppier(image_input, image_mnh_input, houppier_image_output, houppi
             threshold_ndvi_value : seuil du fichier NDVI
             path_time_log : le fichier de log de sortie
             ram_otb : memoire RAM disponible pour les applications OTB
+            nb_workers : nombre de processus pour le traitement des segments, par défaut 0 (nombre de CPU)
             format_raster : Format de l'image de sortie, par défaut : GTiff
             format_vector : format du fichier vecteur. Optionnel, par default : 'ESRI Shapefile'
             extension_raster : extension des fichiers raster de sortie, par defaut = '.tif'
@@ -388,6 +384,7 @@ def detecterHouppier(image_input, image_mnh_input, houppier_image_output, houppi
         print(cyan + "detecterHouppier() : " + endC + "threshold_ndvi_value : " + str(threshold_ndvi_value) + endC)
         print(cyan + "detecterHouppier() : " + endC + "path_time_log : " + str(path_time_log) + endC)
         print(cyan + "detecterHouppier() : " + endC + "ram_otb : " + str(ram_otb) + endC)
+        print(cyan + "detecterHouppier() : " + endC + "nb_workers : " + str(nb_workers) + endC)
         print(cyan + "detecterHouppier() : " + endC + "format_raster : " + str(format_raster) + endC)
         print(cyan + "detecterHouppier() : " + endC + "format_vector : " + str(format_vector) + endC)
         print(cyan + "detecterHouppier() : " + endC + "extension_raster : " + str(extension_raster) + endC)
@@ -540,54 +537,63 @@ def detecterHouppier(image_input, image_mnh_input, houppier_image_output, houppi
         if debug >= 2:
             print(cyan + "detecterHouppier() : " + bold + green + "################ TRAITEMENT DES SEGMENTS ###############" + endC)
 
-        # Conversion image en matrice
-        segments_arbo_matrix = io.imread(segments_high_vegetation_mask_raster_output)
-        mnh_matrix = io.imread(image_mnh_input)
-
-        # Lecture des parametres de l'image
-        dataset_sgts_arbore = gdal.Open(segments_high_vegetation_mask_raster_output)
-
-        # Recupere les coords des valeurs uniques des segments
-        if debug >= 3:
-            print(cyan + "detecterHouppier() : " + bold + green + "Debut Recuperation des coordonnees des valeurs uniques des segments" + endC)
-        x_coords_sgts_arbo, y_coords_sgts_arbo = giveListCoordsSgtsImg(segments_arbo_matrix)
-
-        if debug >= 3:
-            print(cyan + "detecterHouppier() : " + bold + green + "Fin Recuperation des coordonnees des valeurs uniques des segments" + endC)
+        if nb_workers <= 0:
+            nb_workers = os.cpu_count()
 
         # Recupere les coords de la val max pour chaque segment
         if debug >= 3:
             print(cyan + "detecterHouppier() : " + bold + green + "Debut Recuperation des coordonnees de la valeur max pour chaque segment" + endC)
-        coords_pts_max_arbo_list = giveCoordsMaxSGTS(x_coords_sgts_arbo, y_coords_sgts_arbo, mnh_matrix)
+        labels_sgts_arbo, heights_pts_max_arbo, coords_pts_max_arbo = giveCoordsMaxSGTS(segments_high_vegetation_mask_raster_output, image_mnh_input, nb_workers)
 
         if debug >= 3:
-            print(cyan + "detecterHouppier() : " + bold + green + "Fin Recuperation des coordonnees de la valeur max pour chaque segment" + endC)
+            print(cyan + "detecterHouppier() : " + bold + green + "Fin Recuperation des coordonnees de la valeur max pour chaque segment (" + str(len(labels_sgts_arbo)) + " segments)" + endC)
 
         # Creation liens de connexion
         if debug >= 3:
             print(cyan + "detecterHouppier() : " + bold + green + "Debut Création des liens de connexion entre les points max de hauteur" + endC)
-        pos_arbo, lali_arbo = createAllLinks(coords_pts_max_arbo_list)
+        links_arbo = createAllLinks(coords_pts_max_arbo)
 
         if debug >= 3:
-            print(cyan + "detecterHouppier() : " + bold + green + "Fin Création des liens de connexion entre les points max de hauteur" + endC)
-
-        # Creation Graphe
-        if debug >= 3:
-            print(cyan + "detecterHouppier() : " + bold + green + "Création du graphe" + endC)
-        gp = nx.Graph()
-        gp.add_nodes_from([valeur for valeur in pos_arbo.keys()])
-        gp.add_edges_from([valeur for valeur in lali_arbo])
+            print(cyan + "detecterHouppier() : " + bold + green + "Fin Création des liens de connexion entre les points max de hauteur (" + str(len(links_arbo)) + " liens)" + endC)
 
+        # Nettoyage du graphe
         if debug >= 3:
             print(cyan + "detecterHouppier() : " + bold + green + "Nettoyage du graphe" + endC)
-        cleanGraph(gp, pos_arbo, lali_arbo, mnh_matrix)
+        links_arbo = cleanGraph(links_arbo, heights_pts_max_arbo)
+
+        # Regroupement des segments en houppiers
+        final_labels_sgts_arbo = clustSgtInCrown(labels_sgts_arbo, links_arbo)
 
         if debug >= 3:
             print(cyan + "detecterHouppier() : " + bold + green + "Sauvegarde de la donnee houppiers" + endC)
-        sgts_c_arbo = np.copy(segments_arbo_matrix)
-        sgts_final_arbo = clustSgtInCrown(gp, sgts_c_arbo, pos_arbo)
-        writeImage1B(houppier_image_output, sgts_final_arbo, dataset_sgts_arbore, format_raster)
+        dataset_sgts_arbore = gdal.Open(segments_high_vegetation_mask_raster_output)
+        cols = dataset_sgts_arbore.RasterXSize
+        rows = dataset_sgts_arbore.RasterYSize
+        driver = gdal.GetDriverByName(format_raster)
+        dataset_out = driver.Create(houppier_image_output, cols, rows, 1, gdal.GDT_Int32)
+        dataset_out.SetProjection(dataset_sgts_arbore.GetProjection())
+        dataset_out.SetGeoTransform(dataset_sgts_arbore.GetGeoTransform())
         dataset_sgts_arbore = None
+        band = dataset_out.GetRasterBand(1)
+
+        strips_list = giveStripsImg(rows, cols)
+        with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+            futures_dico = {}
+            for yoff, nb_rows in strips_list:
+                future = executor.submit(relabelSgtsStrip, segments_high_vegetation_mask_raster_output, yoff, nb_rows, labels_sgts_arbo, final_labels_sgts_arbo)
+                futures_dico[future] = yoff
+            try:
+                for future in as_completed(futures_dico):
+                    band.WriteArray(future.result(), 0, futures_dico[future])
+            except Exception:
+                for future in futures_dico:
+                    future.cancel()
+                raise
+
+        band.FlushCache()
+        band.ComputeStatistics(False)
+        band = None
+        dataset_out = None
 
         ################ ETAPE 6 : VECTORISATION DES SEGMENTS ###############
         if debug >= 2:
@@ -647,6 +653,7 @@ def main(gui=False):
     parser.add_argument('-thrmnh','--threshold_mnh_value',default=2.0,help="Parameter value of threshold MNH file. By default : 2.0", type=float, required=False)
     parser.add_argument('-thrndvi','--threshold_ndvi_value',default=0.35,help="Parameter value of threshold  NDVI file. By default : 3.25", type=float, required=False)
     parser.add_argument('-ram','--ram_otb',default=0,help="Ram available for processing otb applications (in MB)", type=int, required=False)
+    parser.add_argument('-nbw','--nb_workers',default=0,help="Option : Number of processes for the segments processing, by default : 0 (number of CPU)", type=int, required=False)
     parser.add_argument('-raf','--format_raster', default="GTiff", help="Option : Format output image, by default : GTiff (GTiff, HFA...)", type=str, required=False)
     parser.add_argument('-vef','--format_vector', default="ESRI Shapefile",help="Format of the output file.", type=str, required=False)
     parser.add_argument('-rae','--extension_raster', default=".tif", help="Option : Extension file for image raster. By default : '.tif'", type=str, required=False)
@@ -691,6 +698,10 @@ def main(gui=False):
     if args.ram_otb != None:
         ram_otb = args.ram_otb
 
+    # Récupération du nombre de processus
+    if args.nb_workers != None:
+        nb_workers = args.nb_workers
+
     # Paramètre format des images de sortie
     if args.format_raster != None:
         format_raster = args.format_raster
@@ -731,6 +742,7 @@ def main(gui=False):
         print(cyan + "DetectionHouppier : " + endC + "threshold_mnh_value : " + str(threshold_mnh_value) + endC)
         print(cyan + "DetectionHouppier : " + endC + "threshold_ndvi_value : " + str(threshold_ndvi_value) + endC)
         print(cyan + "DetectionHouppier : " + endC + "ram_otb : " + str(ram_otb) + endC)
+        print(cyan + "DetectionHouppier : " + endC + "nb_workers : " + str(nb_workers) + endC)
         print(cyan + "DetectionHouppier : " + endC + "format_raster : " + str(format_raster) + endC)
         print(cyan + "DetectionHouppier : " + endC + "format_vector : " + str(format_vector) + endC)
         print(cyan + "DetectionHouppier : " + endC + "extension_raster : " + str(extension_raster) + endC)
@@ -747,7 +759,7 @@ def main(gui=False):
         os.makedirs(repertory_output)
 
     # execution de la fonction pour une image
-    detecterHouppier(image_input, image_mnh_input, image_output, vector_output, threshold_mnh_value, threshold_ndvi_value, path_time_log, ram_otb, format_raster, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite)
+    detecterHouppier(image_input, image_mnh_input, image_output, vector_output, threshold_mnh_value, threshold_ndvi_value, path_time_log, ram_otb, nb_workers, format_raster, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite)
 
 # ================================================
 
@@ -27,6 +27,7 @@ Origine : Réécriture d'un ancien script qui faisait la même chose, mais sous
 23/02/2017 : Tri des valeurs indicateurs suivant ID croissant
 16/04/2019 : Adaptation a la V9.2 du Logigramme ajout de info H_moy_Veg, H_max_Veg, Bati, Route, Eau, SolNu, Vegetation
 08/10/2020 : Finalisation de l'internationalisation, ajout nouvel indicateur 'HighVegetationRate' + gestion indicateurs "inutiles" + gestion sans code UA
+16/10/2026 : computeLCZ() évalue les arbres de décision compilés en table de noeuds pour tous les polygones à la fois (compileTree, runCompiledTree)
 
 28/06/2021 : Création d'un script ClassificationLczOperational en parallèle, pour la méthode opérationnelle (via SQL), développée et validée lors du projet SCO SatLCZ
 ----------------------------------------------------------------------------------------------------
@@ -53,6 +54,18 @@ from Lib_operator import *
 
 debug = 3
 
+# Indicateurs utilisés par les arbres de décision
+INDICATORS_LCZ_LIST = ['HRE', 'BSF', 'PSF', 'SVF', 'ISF', 'ARa', 'TRC', 'OCS', 'BUr', 'ROr', 'WAr', 'BSr', 'VEr', 'VEa', 'VEm', 'VHR']
+
+# Arbre de décision par code Urban Atlas
+UA_CODES_TREES_DICO = {11100:'tree_A', 11210:'tree_A', 11220:'tree_A', 11230:'tree_A', 11240:'tree_A', 11300:'tree_A', 12100:'tree_A',
+                       12300:'tree_B', 12400:'tree_B', 13100:'tree_B', 13300:'tree_B', 13400:'tree_B', 14200:'tree_B',
+                       14100:'tree_C', 21000:'tree_D', 22000:'tree_E', 23000:'tree_E', 24000:'tree_F', 32000:'tree_F',
+                       25000:'tree_G', 31000:'tree_H', 33000:'tree_I', 40000:'tree_J'}
+
+# Codes Urban Atlas reclassés directement en LCZ (routes et eau)
+UA_CODES_HISTORIC_DICO = {12210:'LCZ E_031', 12220:'LCZ E_031', 12230:'LCZ E_031', 50000:'LCZ G_041'}
+
 ####################################################################################################
 # FONCTION stackShapeLCZ()                                                                         #
 ####################################################################################################
@@ -348,54 +361,42 @@ def computeLCZ(import_tree, lcz_output, abbreviation_list, column_id_ua, column_
     addNewFieldVector(lcz_output, column_lcz_histo, ogr.OFTString, 0, 20, None, format_vector)
     addNewFieldVector(lcz_output, column_lcz, ogr.OFTString, 0, 2, None, format_vector)
 
-    # Calcul des LCZ
+    # Tableau des valeurs des indicateurs (0 pour un indicateur absent)
+    nb_polygons = len(res_indices_dico[column_id_ua])
+    values_array = np.zeros((nb_polygons, len(INDICATORS_LCZ_LIST)), dtype=np.float64)
+    for index in INDICATORS_LCZ_LIST:
+        if index in res_indices_dico:
+            values_array[:, INDICATORS_LCZ_LIST.index(index)] = np.array(res_indices_dico[index], dtype=np.float64)
+
+    # Arbre de décision de chaque polygone selon son code Urban Atlas
+    historic_array = np.full(nb_polygons, None, dtype=object)
+    if column_code_ua == "":
+        tree_names_list = ['tree_A']
+        compiled_tree = compileTree(import_tree, tree_names_list, correspondance_values_dico)
+        roots_array = np.full(nb_polygons, compiled_tree['roots']['tree_A'], dtype=np.int64)
+    else:
+        codes_ua_array = np.array([int(code_ua) for code_ua in res_indices_dico[column_code_ua]], dtype=np.int64)
+        unknown_codes_list = sorted(set(np.unique(codes_ua_array).tolist()) - set(UA_CODES_TREES_DICO) - set(UA_CODES_HISTORIC_DICO))
+        if unknown_codes_list != []:
+            raise NameError(cyan + "computeLCZ() : " + bold + red + "Code(s) Urban Atlas sans arbre de décision : " + str(unknown_codes_list) + endC)
+        tree_names_list = sorted(set(UA_CODES_TREES_DICO[code_ua] for code_ua in np.unique(codes_ua_array).tolist() if code_ua in UA_CODES_TREES_DICO))
+        compiled_tree = compileTree(import_tree, tree_names_list, correspondance_values_dico)
+        roots_array = np.full(nb_polygons, -1, dtype=np.int64)
+        for code_ua, tree_name in UA_CODES_TREES_DICO.items():
+            if tree_name in compiled_tree['roots']:
+                roots_array[codes_ua_array == code_ua] = compiled_tree['roots'][tree_name]
+        for code_ua, historic in UA_CODES_HISTORIC_DICO.items():
+            historic_array[codes_ua_array == code_ua] = historic
+
+    # Calcul des LCZ, pour tous les polygones à la fois
+    tree_mask = roots_array >= 0
+    historic_array[tree_mask] = runCompiledTree(values_array[tree_mask], roots_array[tree_mask], compiled_tree)
+    lcz_dico = {}
     field_new_values_dico = {}
-    for i in range(len(res_indices_dico[column_id_ua])) :
-        bsf, isf, psf, svf, hre, trc, ara, ocs, bur, ror, war, bsr, ver, vea, vem, vhr = 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
-        historic = "None"
-        lcz = "None"
-        id_polygon = res_indices_dico[column_id_ua][i]
-        if column_code_ua == "":
-            code_ua = None
-        else:
-            code_ua = res_indices_dico[column_code_ua][i]
-        if 'BSF' in res_indices_dico:
-            bsf = res_indices_dico['BSF'][i]
-        if 'ISF' in res_indices_dico:
-            isf = res_indices_dico['ISF'][i]
-        if 'PSF' in res_indices_dico:
-            psf = res_indices_dico['PSF'][i]
-        if 'SVF' in res_indices_dico:
-            svf = res_indices_dico['SVF'][i]
-        if 'HRE' in res_indices_dico:
-            hre = res_indices_dico['HRE'][i]
-        if 'TRC' in res_indices_dico:
-            trc = res_indices_dico['TRC'][i]
-        if 'ARa' in res_indices_dico:
-            ara = res_indices_dico['ARa'][i]
-        if 'OCS' in res_indices_dico:
-            ocs = res_indices_dico['OCS'][i]
-        if 'BUr' in res_indices_dico:
-            bur = res_indices_dico['BUr'][i]
-        if 'ROr' in res_indices_dico:
-            ror = res_indices_dico['ROr'][i]
-        if 'WAr' in res_indices_dico:
-            war = res_indices_dico['WAr'][i]
-        if 'BSr' in res_indices_dico:
-            bsr = res_indices_dico['BSr'][i]
-        if 'VEr' in res_indices_dico:
-            ver = res_indices_dico['VEr'][i]
-        if 'VEa' in res_indices_dico:
-            vea = res_indices_dico['VEa'][i]
-        if 'VEm' in res_indices_dico:
-            vem = res_indices_dico['VEm'][i]
-        if 'VHR' in res_indices_dico:
-            vhr = res_indices_dico['VHR'][i]
-
-        values_dico = {'HRE':hre, 'BSF':bsf, 'PSF':psf, 'SVF':svf, 'ISF':isf, 'ARa':ara, 'TRC':trc, 'OCS':ocs, 'BUr':bur, 'ROr':ror, 'WAr':war, 'BSr':bsr, 'VEr':ver, 'VEa':vea, 'VEm':vem, 'VHR':vhr}
-
-        lcz,lcz_historic = selectTree(code_ua, values_dico, import_tree, correspondance_values_dico)
-        field_new_values_dico[id_polygon] = {column_lcz_histo:lcz_historic, column_lcz:lcz}
+    for id_polygon, lcz_historic in zip(res_indices_dico[column_id_ua], historic_array.tolist()):
+        if lcz_historic not in lcz_dico:
+            lcz_dico[lcz_historic] = convertToLCZ(lcz_historic)
+        field_new_values_dico[id_polygon] = {column_lcz_histo:lcz_historic, column_lcz:lcz_dico[lcz_historic]}
 
     # Mise à jour des champs LCZ
     setAttributeIndexValuesList(lcz_output, column_id_ua, field_new_values_dico, format_vector)
@@ -544,6 +545,135 @@ def runTree(values_dico, tree, correspondance_values_dico):
 
     return historic
 
+####################################################################################################
+# FONCTION compileTree()                                                                           #
+####################################################################################################
+def compileTree(import_tree, tree_names_list, correspondance_values_dico={}):
+    """
+    # ROLE:
+    #     Compilation des arbres de décision LCZ en une table de noeuds à plat (tableaux numpy),
+    #     évaluable pour tous les polygones à la fois par runCompiledTree()
+    #     Les seuils nommés sont résolus une seule fois avec le dictionnaire de correspondance
+    #     Chaque noeud est un test d'intervalle sur un indicateur, avec :
+    #         child : le noeud à tester si la valeur est dans l'intervalle (>= 0), une feuille (-2 - indice dans leaves_list) ou -1 (sous-arbre vide)
+    #         next : le noeud suivant de la même liste si la valeur n'est pas dans l'intervalle, ou -1 (fin de liste, pas de LCZ)
+    #
+    # ENTREES DE LA FONCTION :
+    #     import_tree : l'arbre de decision (module contenant les arbres tree_A, tree_B...)
+    #     tree_names_list : liste des noms des arbres à compiler
+    #     correspondance_values_dico : dictionaire de correspondance variable et valeur
+    #
+    # SORTIES DE LA FONCTION :
+    #      le dictionnaire de l'arbre compilé : tableaux 'feature', 'low', 'high', 'child', 'next', liste 'leaves' et dictionnaire 'roots' (noeud racine par nom d'arbre)
+    """
+
+    feature_list, low_list, high_list, child_list, next_list = [], [], [], [], []
+    leaves_list = []
+    leaves_dico = {}
+    unknown_variables_list = []
+
+    def getThreshold(value):
+        if isinstance(value, int) or isinstance(value, float):
+            return value
+        if value in correspondance_values_dico.keys():
+            return float(correspondance_values_dico[value][0][0])
+        if value not in unknown_variables_list:
+            unknown_variables_list.append(value)
+            print(cyan + "compileTree() : " + bold + yellow + " Variable non trouver dans le dictionnaire de correspondance de valeur: " + value + endC)
+        return 0
+
+    def getLeaf(value):
+        if value not in leaves_dico:
+            leaves_dico[value] = len(leaves_list)
+            leaves_list.append(value)
+        return -2 - leaves_dico[value]
+
+    def compileList(tree):
+        # Les noeuds d'une même liste sont consécutifs, les sous-arbres sont compilés ensuite
+        first = len(feature_list)
+        if tree == []:
+            return -1
+        for elem_dico in tree:
+            index = list(elem_dico)[0]
+            info_list = elem_dico[index]
+            feature_list.append(INDICATORS_LCZ_LIST.index(index))
+            low_list.append(getThreshold(info_list[0]))
+            high_list.append(getThreshold(info_list[1]))
+            child_list.append(-1)
+            next_list.append(len(feature_list))
+        next_list[-1] = -1
+        for position in range(len(tree)):
+            index = list(tree[position])[0]
+            next_elem = tree[position][index][2]
+            if type(next_elem) == list:
+                child_list[first + position] = compileList(next_elem)
+            else:
+                child_list[first + position] = getLeaf(next_elem)
+        return first
+
+    roots_dico = {}
+    for tree_name in tree_names_list:
+        roots_dico[tree_name] = compileList(getattr(import_tree, tree_name))
+
+    compiled_tree = {'feature' : np.array(feature_list, dtype=np.int64),
+                     'low' : np.array(low_list, dtype=np.float64),
+                     'high' : np.array(high_list, dtype=np.float64),
+                     'child' : np.array(child_list, dtype=np.int64),
+                     'next' : np.array(next_list, dtype=np.int64),
+                     'leaves' : leaves_list,
+                     'roots' : roots_dico}
+
+    return compiled_tree
+
+####################################################################################################
+# FONCTION runCompiledTree()                                                                       #
+####################################################################################################
+def runCompiledTree(values_array, roots_array, compiled_tree):
+    """
+    # ROLE:
+    #     Parcours de l'arbre de décision LCZ compilé pour tous les polygones à la fois (masques numpy),
+    #     avec les mêmes règles que runTree() : la première branche de chaque liste dont l'intervalle contient la valeur est suivie
+    #
+    # ENTREES DE LA FONCTION :
+    #     values_array : tableau des valeurs des indicateurs (une ligne par polygone, colonnes dans l'ordre de INDICATORS_LCZ_LIST)
+    #     roots_array : noeud racine de l'arbre de chaque polygone (-1 pour aucun arbre)
+    #     compiled_tree : l'arbre compilé par compileTree()
+    #
+    # SORTIES DE LA FONCTION :
+    #      le tableau des valeurs LCZ brutes (historic), None si aucune branche ne correspond
+    """
+
+    historic_array = np.full(len(roots_array), None, dtype=object)
+    leaves_array = np.array(compiled_tree['leaves'], dtype=object)
+    feature = compiled_tree['feature']
+    low = compiled_tree['low']
+    high = compiled_tree['high']
+    child = compiled_tree['child']
+    next_node = compiled_tree['next']
+
+    rows = np.nonzero(roots_array >= 0)[0]
+    nodes = roots_array[rows]
+    while len(rows) > 0:
+        value = values_array[rows, feature[nodes]]
+        threshold_low = low[nodes]
+        threshold_high = high[nodes]
+
+        # Cas normal (un seul intervalle) et cas particulier où plusieurs intervalles pour une même branche (seuil max < seuil min)
+        find_normal = ((threshold_low < value) & (value <= threshold_high)) | ((threshold_low == threshold_high) & (value == threshold_high))
+        find_special = (value <= threshold_high) | (threshold_low < value)
+        find = np.where(threshold_high >= threshold_low, find_normal, find_special)
+
+        # Branche trouvée : descente dans le sous-arbre ou feuille atteinte, sinon noeud suivant de la liste
+        nodes = np.where(find, child[nodes], next_node[nodes])
+        finished = nodes < 0
+        leaf = finished & find & (nodes <= -2)
+        historic_array[rows[leaf]] = leaves_array[-2 - nodes[leaf]]
+
+        rows = rows[~finished]
+        nodes = nodes[~finished]
+
+    return historic_array
+
 ####################################################################################################
 # FONCTION convertToLCZ()                                                                          #
 ####################################################################################################
@@ -6,22 +6,67 @@
 #############################################################################################################################################
 
 from __future__ import print_function
-import os, sys, argparse, shutil, time
+import os, sys, argparse, shutil, time, math
+import numpy
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from osgeo import gdal
+from osgeo.gdalconst import GA_ReadOnly
 from Lib_log import timeLine
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displayIHM
 from Lib_raster import getPixelWidthXYImage, cutImageByVector, createVectorMask
-from Lib_vector import createGridVector, splitVector, bufferVector, cutVector, renameFieldsVector
-from Lib_file import removeVectorFile, cleanTempData, deleteDir
+from Lib_vector import renameFieldsVector
+from Lib_file import removeFile, removeVectorFile, cleanTempData, deleteDir
+from Lib_operator import getNumberCPU
 from Lib_saga import computeSkyViewFactor
-from ImagesAssembly import selectAssembyImagesByHold
 from CrossingVectorRaster import statisticsVectorRaster
 
 debug = 3
 
+####################################################################################################
+# FONCTION computeSkyViewFactorTile()                                                              #
+####################################################################################################
+def computeSkyViewFactorTile(mns_input, dem_vrt_file, svf_buf_tif_file, tile, halo_tile, svf_radius, svf_method, svf_dlevel, svf_ndirs, no_data_value, save_results_intermediate=False):
+    """
+    # ROLE :
+    #     Calcul du Sky View Factor sur une tuile du MNS avec sa marge (fonction lancée dans un processus du pool)
+    #     La tuile est découpée en image virtuelle (VRT) sur le MNS, sans copie des pixels
+    #
+    # ENTREES DE LA FONCTION :
+    #     mns_input : modèle numérique de surface en entrée
+    #     dem_vrt_file : fichier VRT de la tuile avec sa marge
+    #     svf_buf_tif_file : fichier raster du SVF de la tuile avec sa marge
+    #     tile : fenêtre de la tuile sans marge (xoff, yoff, largeur, hauteur) en pixels
+    #     halo_tile : fenêtre de la tuile avec sa marge (xoff, yoff, largeur, hauteur) en pixels
+    #     svf_radius, svf_method, svf_dlevel, svf_ndirs : paramètres du Sky View Factor sous SAGA
+    #     no_data_value : valeur des pixels sans données du MNS
+    #     save_results_intermediate : fichiers de sorties intermédiaires nettoyés, par défaut = False
+    #
+    # SORTIES DE LA FONCTION :
+    #     le fichier SVF de la tuile avec sa marge, ou None si la tuile ne contient que des pixels sans données
+    """
+
+    # Tuile sans donnée (hors de l'emprise du MNS) : pas de calcul
+    dataset = gdal.Open(mns_input, GA_ReadOnly)
+    band = dataset.GetRasterBand(1)
+    nodata_band = band.GetNoDataValue()
+    array_tile = band.ReadAsArray(*tile)
+    dataset = None
+    valid_tile = array_tile != no_data_value
+    if nodata_band is not None:
+        valid_tile &= array_tile != nodata_band
+    if not numpy.any(valid_tile):
+        return None
+
+    # Valeur nodata de la tuile (comme le découpage par cutImageByVector() : nodata du MNS, sinon no_data_value) pour que SAGA ignore les pixels sans données
+    gdal.Translate(dem_vrt_file, mns_input, format="VRT", srcWin=list(halo_tile), noData=nodata_band if nodata_band is not None else no_data_value)
+    computeSkyViewFactor(dem_vrt_file, svf_buf_tif_file, svf_radius, svf_method, svf_dlevel, svf_ndirs, save_results_intermediate)
+
+    return svf_buf_tif_file
+
 ####################################################################################################
 # FONCTION skyViewFactor()                                                                         #
 ####################################################################################################
-def skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build_list, dim_grid_x, dim_grid_y, svf_radius, svf_method, svf_dlevel, svf_ndirs, epsg, no_data_value, path_time_log, format_raster='GTiff', format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True):
+def skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build_list, dim_grid_x, dim_grid_y, svf_radius, svf_method, svf_dlevel, svf_ndirs, epsg, no_data_value, path_time_log, nb_workers=0, format_raster='GTiff', format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", save_results_intermediate=False, overwrite=True):
     """
     # ROLE :
     #     Calcul de l'indicateur LCZ facteur de vue du ciel
@@ -32,8 +77,8 @@ def skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build
     #     mns_input : modèle numérique de surface en entrée
     #     classif_input : classification de l'occupation du sol en entrée
     #     class_build_list : liste des classes choisis pour definir les zones baties
-    #     dim_grid_x : largeur des carreaux du quadrillage (en mètres)
-    #     dim_grid_y : hauteur des carreaux du quadrillage (en mètres)
+    #     dim_grid_x : largeur des tuiles de calcul du SVF (en mètres)
+    #     dim_grid_y : hauteur des tuiles de calcul du SVF (en mètres)
     #     svf_radius : paramètre 'radius' du Sky View Factor sous SAGA (en mètres)
     #     svf_method : paramètre 'method' du Sky View Factor sous SAGA
     #     svf_dlevel : paramètre 'dlevel' du Sky View Factor sous SAGA
@@ -41,6 +86,7 @@ def skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build
     #     epsg : EPSG code de projection
     #     no_data_value : Valeur des pixels sans données pour les rasters
     #     path_time_log : fichier log de sortie
+    #     nb_workers : nombre de calculs SAGA lancés en parallèle, par défaut 0 (nombre de CPU)
     #     format_raster : Format de l'image de sortie, par défaut : GTiff
     #     format_vector : format du fichier vecteur. Optionnel, par default : 'ESRI Shapefile'
     #     extension_raster : extension des fichiers raster de sortie, par defaut = '.tif'
@@ -71,6 +117,7 @@ def skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build
         print(cyan + "skyViewFactor() : " + endC + "epsg : " + str(epsg) + endC)
         print(cyan + "skyViewFactor() : " + endC + "no_data_value : " + str(no_data_value) + endC)
         print(cyan + "skyViewFactor() : " + endC + "path_time_log : " + str(path_time_log) + endC)
+        print(cyan + "skyViewFactor() : " + endC + "nb_workers : " + str(nb_workers) + endC)
         print(cyan + "skyViewFactor() : " + endC + "format_raster : " + str(format_raster) + endC)
         print(cyan + "skyViewFactor() : " + endC + "format_vector : " + str(format_vector) + endC)
         print(cyan + "skyViewFactor() : " + endC + "extension_raster : " + str(extension_raster) + endC)
@@ -82,13 +129,10 @@ def skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build
     SKY_VIEW_FIELD = 'SkyView'
 
     BASE_FILE_TILE = 'tile_'
-    BASE_FILE_POLY = 'poly_'
-    SUFFIX_VECTOR_BUFF = '_buff'
     SUFFIX_VECTOR_TEMP = '_temp'
+    EXT_VRT = '.vrt'
 
     # Constantes liées à l'arborescence
-    FOLDER_SHP = 'SHP'
-    FOLDER_SGRD = 'SGRD'
     FOLDER_TIF = 'TIF'
     SUB_FOLDER_DEM = 'DEM'
     SUB_FOLDER_SVF = 'SVF'
@@ -107,132 +151,117 @@ def skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build
         sky_view_factor_raster = temp_path + os.sep + "sky_view_factor" + extension_raster
 
         cleanTempData(temp_path)
-        os.makedirs(temp_path + os.sep + FOLDER_SHP)
-        os.makedirs(temp_path + os.sep + FOLDER_SGRD + os.sep + SUB_FOLDER_DEM)
-        os.makedirs(temp_path + os.sep + FOLDER_SGRD + os.sep + SUB_FOLDER_SVF)
         os.makedirs(temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_DEM)
-        os.makedirs(temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_SVF)
         os.makedirs(temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_SVF + os.sep + SUB_SUB_FOLDER_BUF)
 
+        if nb_workers <= 0:
+            nb_workers = getNumberCPU()
+
         # Récupération de la résolution du raster d'entrée
         pixel_size_x, pixel_size_y = getPixelWidthXYImage(mns_input)
         print(bold + "Taille de pixel du fichier '%s' :" % (mns_input) + endC)
         print("    pixel_size_x = " + str(pixel_size_x))
         print("    pixel_size_y = " + str(pixel_size_y) + "\n")
 
-        ###############################################
-        ### Création des fichiers emprise et grille ###
-        ###############################################
+        ###################################
+        ### Création du fichier emprise ###
+        ###################################
 
-        print(bold + cyan + "Création des fichiers emprise et grille :" + endC)
-        timeLine(path_time_log, "    Création des fichiers emprise et grille : ")
+        print(bold + cyan + "Création du fichier emprise :" + endC)
+        timeLine(path_time_log, "    Création du fichier emprise : ")
 
         emprise_file = temp_path + os.sep + "emprise" + extension_vector
-        quadrillage_file = temp_path + os.sep + "quadrillage" + extension_vector
 
         # Création du fichier d'emprise
         createVectorMask(mns_input, emprise_file, no_data_value, format_vector)
 
-        # Création du fichier grille
-        createGridVector(emprise_file, quadrillage_file, dim_grid_x, dim_grid_y, None, overwrite, epsg, format_vector)
-
-        #############################################################
-        ### Extraction des carreaux de découpage et bufferisation ###
-        #############################################################
-
-        print(bold + cyan + "Extraction des carreaux de découpage :" + endC)
-        timeLine(path_time_log, "    Extraction des carreaux de découpage : ")
-
-        split_tile_vector_list = splitVector(quadrillage_file, temp_path + os.sep + FOLDER_SHP, "", epsg, format_vector, extension_vector)
-
-        split_tile_vector_buff_list = []
-
-        # Boucle sur les fichiers polygones quadrillage
-        for split_tile_vector in split_tile_vector_list:
-            repertory_temp_output = os.path.dirname(split_tile_vector)
-            base_name = os.path.splitext(os.path.basename(split_tile_vector))[0]
-            split_tile_buff_vector = repertory_temp_output + os.sep + base_name + SUFFIX_VECTOR_BUFF + extension_vector
-            split_tile_buff_vector_temp = repertory_temp_output + os.sep + base_name + SUFFIX_VECTOR_BUFF + SUFFIX_VECTOR_TEMP + extension_vector
-
-            # Bufferisation
-            bufferVector(split_tile_vector, split_tile_buff_vector_temp, svf_radius, "", 1.0, 10, format_vector)
-
-            # Re-découpage avec l'emprise si la taille intersecte avec l'emprise
-            if cutVector(emprise_file, split_tile_buff_vector_temp, split_tile_buff_vector, overwrite, format_vector) :
-                split_tile_vector_buff_list.append(split_tile_buff_vector)
-
-        ##########################################################
-        ### Découpage du MNS/MNH à l'emprise de chaque carreau ###
-        ##########################################################
+        ########################################################
+        ### Découpage du MNS en tuiles avec marge (fenêtres) ###
+        ########################################################
 
         print(bold + cyan + "Découpage du raster en tuiles :" + endC)
         timeLine(path_time_log, "    Découpage du raster en tuiles : ")
 
-        # Boucle sur les fichiers polygones quadrillage bufferisés
-        for i in range(len(split_tile_vector_list)):
-            print("Traitement de la tuile " + str(int(i)+1) + str(len(split_tile_vector_list)) + "...")
-
-            split_tile_vector = split_tile_vector_list[i]
-            repertory_temp_output = os.path.dirname(split_tile_vector)
-            base_name = os.path.splitext(os.path.basename(split_tile_vector))[0]
-            split_tile_buff_vector = repertory_temp_output + os.sep + base_name + SUFFIX_VECTOR_BUFF + extension_vector
-            dem_tif_file = temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_DEM + os.sep + BASE_FILE_TILE + str(i) + extension_raster
-
-            if os.path.exists(split_tile_buff_vector):
-                cutImageByVector(split_tile_buff_vector, mns_input, dem_tif_file, pixel_size_x, pixel_size_y, False, no_data_value, epsg, format_raster, format_vector)
-
-        ##################################################
-        ### Calcul du SVF pour chaque dalle du MNS/MNH ###
-        ##################################################
-
-        print(bold + cyan + "Calcul du SVF pour chaque tuile via SAGA :" + endC)
-        timeLine(path_time_log, "    Calcul du SVF pour chaque tuile via SAGA : ")
-
-        svf_buf_tif_file_list = []
-
-        # Boucle sur les tuiles du raster d'entrée créées par chaque polygone quadrillage
-        for i in range(len(split_tile_vector_list)):
-            # Calcul de Sky View Factor par SAGA
-            dem_tif_file = temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_DEM + os.sep + BASE_FILE_TILE + str(i) + extension_raster
-            svf_buf_tif_file = temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_SVF + os.sep + SUB_SUB_FOLDER_BUF + os.sep + BASE_FILE_TILE + str(i) + extension_raster
-
-            if os.path.exists(dem_tif_file):
-                computeSkyViewFactor(dem_tif_file, svf_buf_tif_file, svf_radius, svf_method, svf_dlevel, svf_ndirs, save_results_intermediate)
-                svf_buf_tif_file_list.append(svf_buf_tif_file)
-
-        ###################################################################
-        ### Re-découpage des tuiles du SVF avec les tuilles sans tampon ###
-        ###################################################################
-
-        print(bold + cyan + "Re-découpage des tuiles du SVF avec les tuilles sans tampon :" + endC)
-        timeLine(path_time_log, "    Re-découpage des tuiles du SVF avec les tuilles sans tampon : ")
-
-        folder_output_svf = temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_SVF + os.sep
-
-        # Boucle sur les tuiles du SVF bufferisées
-        for i in range(len(split_tile_vector_list)):
-            print("Traitement de la tuile " + str(int(i)+1) + "/" + str(len(split_tile_vector_list)) + "...")
-
-            split_tile_vector = split_tile_vector_list[i]
-            svf_buf_tif_file = temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_SVF + os.sep + SUB_SUB_FOLDER_BUF + os.sep + BASE_FILE_TILE + str(i) + extension_raster
-            base_name = os.path.splitext(os.path.basename(svf_buf_tif_file))[0]
-            svf_tif_file = folder_output_svf + os.sep + base_name + extension_raster
-            if os.path.exists(svf_buf_tif_file):
-                cutImageByVector(split_tile_vector, svf_buf_tif_file, svf_tif_file, pixel_size_x, pixel_size_y, False, no_data_value, epsg, format_raster, format_vector)
-
-        ####################################################################
-        ### Assemblage des tuiles du SVF et calcul de l'indicateur final ###
-        ####################################################################
-
-        print(bold + cyan + "Assemblage des tuiles du SVF et calcul de l'indicateur final :" + endC)
-        timeLine(path_time_log, "    Assemblage des tuiles du SVF et calcul de l'indicateur final : ")
+        dataset = gdal.Open(mns_input, GA_ReadOnly)
+        cols = dataset.RasterXSize
+        rows = dataset.RasterYSize
+        geotransform = dataset.GetGeoTransform()
+        projection = dataset.GetProjection()
+        dataset = None
+
+        # Taille des tuiles et de la marge (rayon du SVF) en pixels
+        tile_size_x = max(1, int(round(dim_grid_x / abs(pixel_size_x))))
+        tile_size_y = max(1, int(round(dim_grid_y / abs(pixel_size_y))))
+        halo_x = int(math.ceil(svf_radius / abs(pixel_size_x)))
+        halo_y = int(math.ceil(svf_radius / abs(pixel_size_y)))
+
+        tiles_list = []
+        for yoff in range(0, rows, tile_size_y):
+            for xoff in range(0, cols, tile_size_x):
+                tile = (xoff, yoff, min(tile_size_x, cols - xoff), min(tile_size_y, rows - yoff))
+                halo_xoff = max(0, xoff - halo_x)
+                halo_yoff = max(0, yoff - halo_y)
+                halo_tile = (halo_xoff, halo_yoff, min(cols, xoff + tile[2] + halo_x) - halo_xoff, min(rows, yoff + tile[3] + halo_y) - halo_yoff)
+                tiles_list.append((tile, halo_tile))
+
+        print(bold + "    %s tuile(s) de %s x %s pixels, marge de %s x %s pixels, %s processus" % (len(tiles_list), tile_size_x, tile_size_y, halo_x, halo_y, nb_workers) + endC)
+
+        ################################################################################
+        ### Calcul du SVF pour chaque tuile du MNS/MNH et assemblage sans les marges ###
+        ################################################################################
+
+        print(bold + cyan + "Calcul du SVF pour chaque tuile via SAGA et assemblage :" + endC)
+        timeLine(path_time_log, "    Calcul du SVF pour chaque tuile via SAGA et assemblage : ")
 
         classif_input_temp = temp_path + os.sep + FOLDER_TIF + os.sep + "classif_input" + SUFFIX_VECTOR_TEMP + extension_raster
         sky_view_factor_temp = temp_path + os.sep + FOLDER_TIF + os.sep + "sky_view_factor" + SUFFIX_VECTOR_TEMP + extension_raster # Issu de l'assemblage des dalles
         sky_view_factor_temp_temp = temp_path + os.sep + FOLDER_TIF + os.sep + "sky_view_factor" + SUFFIX_VECTOR_TEMP + SUFFIX_VECTOR_TEMP + extension_raster # Issu du redécoupage pour entrer correctement dans le BandMath
 
-        # Assemblage des tuiles du SVF créées précédemment pour ne former qu'un seul raster SVF
-        selectAssembyImagesByHold(emprise_file, [folder_output_svf], sky_view_factor_temp, False, False, epsg, False, False, False, False, 1.0, pixel_size_x, pixel_size_y, no_data_value, "_", 2, 8, "", path_time_log, "_error", "_merge", "_clean", "_stack", format_raster, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite)
+        # Raster SVF assemblé, sur la grille du MNS, initialisé à la valeur no data
+        driver = gdal.GetDriverByName(format_raster)
+        dataset_output = driver.Create(sky_view_factor_temp, cols, rows, 1, gdal.GDT_Float32, ["TILED=YES", "BIGTIFF=IF_SAFER"] if format_raster == "GTiff" else [])
+        dataset_output.SetGeoTransform(geotransform)
+        dataset_output.SetProjection(projection)
+        band_output = dataset_output.GetRasterBand(1)
+        band_output.SetNoDataValue(no_data_value)
+        band_output.Fill(no_data_value)
+
+        with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+            futures_dico = {}
+            for i in range(len(tiles_list)):
+                tile, halo_tile = tiles_list[i]
+                dem_vrt_file = temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_DEM + os.sep + BASE_FILE_TILE + str(i) + EXT_VRT
+                svf_buf_tif_file = temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_SVF + os.sep + SUB_SUB_FOLDER_BUF + os.sep + BASE_FILE_TILE + str(i) + extension_raster
+                future = executor.submit(computeSkyViewFactorTile, mns_input, dem_vrt_file, svf_buf_tif_file, tile, halo_tile, svf_radius, svf_method, svf_dlevel, svf_ndirs, no_data_value, save_results_intermediate)
+                futures_dico[future] = i
+            try:
+                nb_tiles_done = 0
+                for future in as_completed(futures_dico):
+                    svf_buf_tif_file = future.result()
+                    nb_tiles_done += 1
+                    i = futures_dico[future]
+                    print("Tuile " + str(i+1) + " terminée (" + str(nb_tiles_done) + "/" + str(len(tiles_list)) + ")")
+                    if svf_buf_tif_file is None:
+                        continue
+
+                    # Ecriture de la partie centrale de la tuile (sans la marge) dans le raster assemblé
+                    tile, halo_tile = tiles_list[i]
+                    dataset_tile = gdal.Open(svf_buf_tif_file, GA_ReadOnly)
+                    array_tile = dataset_tile.GetRasterBand(1).ReadAsArray(tile[0] - halo_tile[0], tile[1] - halo_tile[1], tile[2], tile[3])
+                    dataset_tile = None
+                    band_output.WriteArray(array_tile, tile[0], tile[1])
+
+                    if not save_results_intermediate:
+                        removeFile(svf_buf_tif_file)
+                        removeFile(temp_path + os.sep + FOLDER_TIF + os.sep + SUB_FOLDER_DEM + os.sep + BASE_FILE_TILE + str(i) + EXT_VRT)
+            except Exception:
+                # Arret sur erreur : les tuiles non commencées sont abandonnées
+                for future in futures_dico:
+                    future.cancel()
+                raise
+
+        band_output = None
+        dataset_output = None
 
         # Redécoupage de l'OCS et du SVF pour la superposition nécessaire au BandMath
         cutImageByVector(emprise_file, classif_input, classif_input_temp, pixel_size_x, pixel_size_y, True, no_data_value, epsg, format_raster, format_vector)
@@ -292,8 +321,8 @@ def main(gui=False):
     parser.add_argument('-mns', '--mns_input', default="", type=str, required=True, help="Modele numerique de surface en entree (raster).")
     parser.add_argument('-cla', '--classif_input', default="", type=str, required=True, help="Classification de l'occupation du sol en entree (raster).")
     parser.add_argument('-cbl', '--class_build_list', nargs="+", default=[11100], type=int, required=False, help="Liste des indices de classe de type bati.")
-    parser.add_argument('-dx', '--dim_grid_x', default=1000, type=int, required=False, help="Largeur des carreaux du quadrillage (en metres), par defaut 1000.")
-    parser.add_argument('-dy', '--dim_grid_y', default=1000, type=int, required=False, help="Hauteur des carreaux du quadrillage (en metres), par defaut 1000.")
+    parser.add_argument('-dx', '--dim_grid_x', default=1000, type=int, required=False, help="Largeur des tuiles de calcul (en metres), par defaut 1000.")
+    parser.add_argument('-dy', '--dim_grid_y', default=1000, type=int, required=False, help="Hauteur des tuiles de calcul (en metres), par defaut 1000.")
     parser.add_argument('-rad', '--svf_radius', default=50.0, type=float, required=False, help="Parametre du Sky View Factor sous SAGA, par defaut 50.")
     parser.add_argument('-met', '--svf_method', default=1, type=int, required=False, help="Parametre du Sky View Factor sous SAGA, par defaut 1.")
     parser.add_argument('-sdl', '--svf_dlevel', default=3.0, type=float, required=False, help="Parametre du Sky View Factor sous SAGA, par defaut 3.")
@@ -304,6 +333,7 @@ def main(gui=False):
     parser.add_argument('-vef','--format_vector',default="ESRI Shapefile",help="Option : Vector format. By default : ESRI Shapefile", type=str, required=False)
     parser.add_argument('-rae','--extension_raster', default=".tif", help="Option : Extension file for image raster. By default : '.tif'", type=str, required=False)
     parser.add_argument('-vee','--extension_vector',default=".shp",help="Option : Extension file for vector. By default : '.shp'", type=str, required=False)
+    parser.add_argument('-nbw', '--nb_workers', default=0, type=int, required=False, help="Option : Number of SAGA computations launched in parallel, by default : 0 (number of CPU)")
     parser.add_argument('-log', '--path_time_log', default="", type=str, required=False, help="Name of log")
     parser.add_argument('-sav', '--save_results_intermediate', action='store_true', default=False, required=False, help="Save or delete intermediate result after the process. By default, False")
     parser.add_argument('-now', '--overwrite', action='store_false', default=True, required=False, help="Overwrite files with same names. By default, True")
@@ -369,6 +399,10 @@ def main(gui=False):
     if args.extension_vector != None:
         extension_vector = args.extension_vector
 
+    # Récupération du nombre de calculs en parallèle
+    if args.nb_workers != None:
+        nb_workers = args.nb_workers
+
     # Récupération du nom du fichier log
     if args.path_time_log!= None:
         path_time_log = args.path_time_log
@@ -405,6 +439,7 @@ def main(gui=False):
         print(cyan + "SkyViewFactor : " + endC + "format_vector : " + str(format_vector) + endC)
         print(cyan + "SkyViewFactor : " + endC + "extension_raster : " + str(extension_raster) + endC)
         print(cyan + "SkyViewFactor : " + endC + "extension_vector : " + str(extension_vector) + endC)
+        print(cyan + "SkyViewFactor : " + endC + "nb_workers : " + str(nb_workers) + endC)
         print(cyan + "SkyViewFactor : " + endC + "path_time_log : " + str(path_time_log) + endC)
         print(cyan + "SkyViewFactor : " + endC + "save_results_intermediate : " + str(save_results_intermediate) + endC)
         print(cyan + "SkyViewFactor : " + endC + "overwrite : " + str(overwrite) + endC)
@@ -414,7 +449,7 @@ def main(gui=False):
     if not os.path.exists(os.path.dirname(grid_output)):
         os.makedirs(os.path.dirname(grid_output))
 
-    skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build_list, dim_grid_x, dim_grid_y, svf_radius, svf_method, svf_dlevel, svf_ndirs, epsg, no_data_value, path_time_log, format_raster, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite)
+    skyViewFactor(grid_input, grid_output, mns_input, classif_input, class_build_list, dim_grid_x, dim_grid_y, svf_radius, svf_method, svf_dlevel, svf_ndirs, epsg, no_data_value, path_time_log, nb_workers, format_raster, format_vector, extension_raster, extension_vector, save_results_intermediate, overwrite)
 
 if __name__ == '__main__':
     main(gui=False)
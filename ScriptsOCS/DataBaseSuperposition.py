@@ -15,7 +15,7 @@ Nom de l'objet : DataBaseSuperposition.py
 Description :
 -------------
 Objectif : Permet d'enrichir le résultat de la classification avec une superposition d'element provement de BD Exogènes à fin d'améliorer le résultat final
-Rq : utilisation des OTB Applications :   otbcli_BandMath, otbcli_Rasterization
+Rq : utilisation des OTB Applications :   otbcli_Rasterization
 
 ----------
 Histoire :
@@ -23,6 +23,7 @@ Histoire :
 Date de creation : 14/10/2014
 -----------------------------------------------------------------------------------------------------
 Modifications :
+16/10/2026 : fusion par classe et assemblage final calculés en un seul passage (Lib_bandmath), les fusions par classe ne sont écrites que si les résultats intermédiaires sont conservés
 
 A Reflechir/A faire :
 
@@ -34,6 +35,7 @@ import os,sys,glob,shutil,string, argparse
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displayIHM
 from Lib_vector import simplifyVector, cutoutVectors, bufferVector, getAttributeNameList, filterSelectDataVector
 from Lib_raster import mergeListRaster, createVectorMask, rasterizeBinaryVector, getNodataValueImage, getGeometryImage
+from Lib_bandmath import writeRasterExpressions
 from Lib_log import timeLine
 from Lib_file import cleanTempData, deleteDir, removeFile
 from Lib_text import extractDico, cleanSpaceText
@@ -191,6 +193,7 @@ def addDataBaseExo(image_input, image_classif_add_output, class_file_dico, class
             print(cyan + "addDataBaseExo() : " + bold + green + "MISE EN PLACE DES TAMPONS..." + endC)
 
         image_combined_list = []
+        merged_expression_list = []
         # Parcours du dictionnaire associant les macroclasses aux noms de fichiers
         for macroclass_label in class_file_dico :
             vector_fusion_list = []
@@ -274,12 +277,15 @@ def addDataBaseExo(image_input, image_classif_add_output, class_file_dico, class
                 if debug >= 3:
                     print(cyan + "addDataBaseExo() : " + endC + "nombre d'images a combiner : " + str(len(raster_list)))
 
-                # Liste les images raster combined and sample
-                image_combined = repertory_output + os.sep + image_name + '_' + str(macroclass_label) + SUFFIX_FUSION + extension_raster
-                image_combined_list.append(image_combined)
+                # Fusion des images raster en une seule (expression raster calculée lors de l'assemblage final)
+                merged_expression = mergeListRaster(raster_list, None, CODAGE)
+                merged_expression_list.append(merged_expression)
 
-                # Fusion des images raster en une seule
-                mergeListRaster(raster_list, image_combined, CODAGE)
+                # Les images raster combined ne sont écrites que si les résultats intermédiaires sont conservés
+                if save_results_intermediate:
+                    image_combined = repertory_output + os.sep + image_name + '_' + str(macroclass_label) + SUFFIX_FUSION + extension_raster
+                    image_combined_list.append(image_combined)
+                    writeRasterExpressions([merged_expression], image_combined, CODAGE, image_reference=raster_list[0])
 
         if debug >= 2:
             print(cyan + "addDataBaseExo() : " + bold + green +  "FIN DE L AFFECTATION DES TAMPONS" + endC)
@@ -288,10 +294,8 @@ def addDataBaseExo(image_input, image_classif_add_output, class_file_dico, class
         if debug >= 2:
             print(cyan + "addDataBaseExo() : " + bold + green + "ASSEMBLAGE..." + endC)
 
-        # Ajout de l'image de classification a la liste des image bd conbinées
-        image_combined_list.append(image_input)
-        # Fusion les images avec la classification
-        mergeListRaster(image_combined_list, image_classif_add_output, CODAGE)
+        # Fusion en un seul passage des images bd combinées avec l'image de classification
+        mergeListRaster(merged_expression_list + [image_input], image_classif_add_output, CODAGE)
         if debug >= 2:
             print(cyan + "addDataBaseExo() : " + bold + green +  "FIN" + endC)
 
@@ -300,10 +304,6 @@ def addDataBaseExo(image_input, image_classif_add_output, class_file_dico, class
     # Suppression des données intermédiaires
     if not save_results_intermediate:
 
-        image_combined_list.remove(image_input)
-        for to_delete in image_combined_list :
-            removeFile(to_delete)
-
         # Suppression des repertoires temporaires
         deleteDir(repertory_mask_temp)
         deleteDir(repertory_samples_filtering_temp)
@@ -27,6 +27,7 @@ Origine : le script originel provient du fichier Chain4_MicroclassesComputation.
 Modifications :
 01/10/2014 : refonte du fichier harmonisation des régles de qualitées des niveaux de boucles et des paramétres dans args
 21/05/2015 : simplification des parametres en argument plus de liste d'image en emtrée à traiter uniquement une image
+16/10/2026 : Kmeans python en flux (échantillon d'apprentissage puis classification par bandes de lignes), taille d'échantillon issue de kmeans_param_minimum_training_set_size
 ------------------------------------------------------
 A Reflechir/A faire :
 
@@ -456,7 +457,11 @@ def computeKmeans(image_input, mask_sample_input, image_output, micro_samples_im
 
         else :
             if IS_VERSION_UPPER_OTB_7_0 :
-                classificationKmeans(image_input, mask_sample_input, image_output, number_of_classes, kmeans_param_maximum_iterations, rand_otb, no_data_value, format_raster)
+                # Kmeans par lecture en flux de l'image : appris sur un échantillon de training_set_size pixels du masque au plus (si la taille est imposée)
+                if kmeans_param_minimum_training_set_size == -1:
+                    classificationKmeans(image_input, mask_sample_input, image_output, number_of_classes, kmeans_param_maximum_iterations, rand_otb, no_data_value, format_raster)
+                else :
+                    classificationKmeans(image_input, mask_sample_input, image_output, number_of_classes, kmeans_param_maximum_iterations, rand_otb, no_data_value, format_raster, training_set_size)
 
             else :
                 command = "otbcli_KMeansClassification -in %s -out %s %s -vm %s -ts %s -nc %s -maxit %s" %(image_input, image_output, codage_8b, mask_sample_input, str(training_set_size), str(number_of_classes), str(kmeans_param_maximum_iterations))
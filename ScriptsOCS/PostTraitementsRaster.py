@@ -15,7 +15,8 @@ Nom de l'objet : PostTraitementsRaster.py
 Description :
 -------------
 Objectif : Permet d'enrichir le résultat de la classification avec une superposition d'element provement de BD Exogènes à fin d'améliorer le résultat final
-Rq : utilisation des OTB Applications :   otbcli_BandMath, otbcli_BinaryMorphologicalOperation
+Rq : utilisation des OTB Applications :   otbcli_BinaryMorphologicalOperation
+     les masques et les traitements enchainés sont calculés en un seul passage par la calculatrice raster Lib_bandmath
 
 Date de creation : 17/06/2015
 ----------
@@ -24,6 +25,7 @@ Histoire :
 Origine : nouveau
 -----------------------------------------------------------------------------------------------------
 Modifications :
+16/10/2026 : les masques et les traitements enchainés sont fusionnés dans une seule expression raster (Lib_bandmath), seul le résultat final est écrit
 
 ------------------------------------------------------
 A Reflechir/A faire :
@@ -37,6 +39,7 @@ from Lib_log import timeLine
 from Lib_file import cleanTempData, deleteDir, removeFile
 from Lib_text import extractDico
 from Lib_raster import getPixelWidthXYImage, roundPixelEmpriseSize, createBinaryMaskThreshold, bufferBinaryRaster, createBinaryMask, cutImageByVector
+from Lib_bandmath import bandExpression, whereExpression, writeRasterExpressions
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 1 : affichage intermédiaire de commentaires lors de l'execution du script
@@ -141,6 +144,8 @@ def postTraitementsRaster(image_input, image_output, vector_input, enable_cuttin
         idx = 0
         key_traitement_list = list(post_treatment_raster_dico.keys())
 
+        result_expression = bandExpression(image_input)
+        dilated_masks_list = []
         for key_traitement in sorted(key_traitement_list):
 
             # Noms des fichiers temporaires
@@ -164,19 +169,23 @@ def postTraitementsRaster(image_input, image_output, vector_input, enable_cuttin
             if debug >=2:
                 print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 1/4 : CREATION DU MASQUE BINAIRE POUR %s " %(str(idx+1), str(nb_treatments), image_to_use) + endC)
 
-            createBinaryMaskThreshold(image_to_use, binary_mask, threshold_min, threshold_max, CODAGE)
+            # Les masques sont des expressions raster calculées uniquement à l'écriture du résultat final
+            binary_mask_expression = createBinaryMaskThreshold(image_to_use, None, threshold_min, threshold_max, CODAGE)
 
             # ETAPE 2-2 CREATION DU MASQUE DILATE
-            if buffer_to_apply == 0: # Si le buffer est nul, alors on copie juste le masque binaire
+            if buffer_to_apply == 0: # Si le buffer est nul, alors le masque dilaté est le masque binaire
                 if debug >=2:
-                    print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 2/4 : CREATION PAR RENOMMAGE DU MASQUE DILATE POUR %s" %(str(idx+1), str(nb_treatments), image_to_use) + endC)
-                os.rename(binary_mask,dilated_binary_mask)
+                    print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 2/4 : MASQUE DILATE IDENTIQUE AU MASQUE BINAIRE POUR %s" %(str(idx+1), str(nb_treatments), image_to_use) + endC)
+                dilated_mask_expression = binary_mask_expression
             else :
                 if debug >=2:
                     print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 2/4 : CREATION DU MASQUE DILATE POUR %s " %(str(idx+1), str(nb_treatments), image_to_use) + endC)
 
-                # Creation d'un mask binaire bufferisé
+                # Creation d'un mask binaire bufferisé (la dilatation OTB nécessite le masque binaire en fichier)
+                writeRasterExpressions([binary_mask_expression], binary_mask, CODAGE, format_raster, image_reference=image_to_use)
                 bufferBinaryRaster(binary_mask, dilated_binary_mask, buffer_to_apply, CODAGE)
+                dilated_mask_expression = bandExpression(dilated_binary_mask)
+                dilated_masks_list.append(dilated_binary_mask)
 
                 if not save_results_intermediate:
                     if debug >=3:
@@ -187,60 +196,42 @@ def postTraitementsRaster(image_input, image_output, vector_input, enable_cuttin
             # ETAPE 2-3 CREATION DU MASQUE COMPLEMENTAIRE
             if in_or_out.lower() == "in":
                 if debug >=2:
-                    print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 3/4 : CREATION PAR RENOMMAGE DU MASQUE COMPLEMENTAIRE A APPLIQUER POUR %s" %(str(idx+1), str(nb_treatments), image_to_use) + endC)
-                os.rename(dilated_binary_mask,mask_to_apply)
+                    print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 3/4 : MASQUE A APPLIQUER IDENTIQUE AU MASQUE DILATE POUR %s" %(str(idx+1), str(nb_treatments), image_to_use) + endC)
+                mask_expression = dilated_mask_expression
 
             else:
                 if debug >=2:
                     print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 3/4 : CREATION DU MASQUE COMPLEMENTAIRE POUR %s" %(str(idx+1), str(nb_treatments), image_to_use) + endC)
 
                 # Creation d'un mask binaire negatif
-                createBinaryMask(dilated_binary_mask, mask_to_apply, 0.5, False, CODAGE)
+                mask_expression = createBinaryMask(dilated_mask_expression, None, 0.5, False, CODAGE)
 
-                if not save_results_intermediate:
-                    if debug >=3:
-                        print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 3/4 : SUPRESSION DE %s QUI NE SERVIRA PLUS" %(str(idx+1), str(nb_treatments),dilated_binary_mask) + endC)
-                    # Suppression du masque dilate
-                    removeFile(dilated_binary_mask)
+            # Sauvegarde du masque à appliquer si les résultats intermédiaires sont conservés
+            if save_results_intermediate:
+                writeRasterExpressions([mask_expression], mask_to_apply, CODAGE, format_raster, image_reference=image_to_use)
 
             # ETAPE 2-4 APPLICATION DU MASQUE
+            if debug >=2:
+                print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 4/4 : APPLICATION DU POST TRAITEMENT" %(str(idx+1), str(nb_treatments)) + endC)
+
+            # Expression : (im1b1 == 1 ? %d : im2b1) ou (im1b1 == 1 ? ( im2b1 == %d ? %d : im2b1) : im2b1) appliquée au résultat du traitement précédent
             if str(class_to_replace).lower() == "all" :
-                expression = "\"(im1b1 == 1 ? %d : im2b1)\""%(int(replacement_class))
+                result_expression = whereExpression(mask_expression == 1, replacement_class, result_expression)
             else :
-                expression = "\"(im1b1 == 1 ? ( im2b1 == %d ? %d : im2b1) : im2b1)\""%(class_to_replace,replacement_class)
-
-            if nb_treatments <= 1:
-                input_for_command = image_input
-                output_for_command = image_output_temp
-            elif idx == 0 :
-                input_for_command = image_input
-                output_for_command = repertory_temp + os.sep + basename_output + str(idx+1) + extension_raster
-            elif idx == nb_treatments-1:
-                input_for_command = repertory_temp + os.sep + basename_output + str(idx) + extension_raster
-                output_for_command = image_output_temp
-            else:
-                input_for_command = repertory_temp + os.sep + basename_output + str(idx) + extension_raster
-                output_for_command = repertory_temp + os.sep + basename_output + str(idx+1) + extension_raster
+                result_expression = whereExpression((mask_expression == 1) & (result_expression == class_to_replace), replacement_class, result_expression)
 
-            command = "otbcli_BandMath -il %s %s -exp %s -out %s %s" %(mask_to_apply, input_for_command, expression, output_for_command, CODAGE)
+            # mise a jour de l'index
+            idx+=1
 
+        # Calcul en un seul passage de tous les traitements enchainés, seul le résultat final est écrit
+        if nb_treatments > 0:
             if debug >=2:
-                print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 4/4 : APPLICATION DU POST TRAITEMENT AVEC %s" %(str(idx+1), str(nb_treatments), mask_to_apply) + endC)
-                print(command)
-
-            exitCode = os.system(command)
-            if exitCode != 0:
-                print(command)
-                raise NameError(bold + red + "postTraitementsRaster() : An error occured during otbcli_BandMath command. See error message above." + endC)
-
-            if not save_results_intermediate:
-                if debug >=3:
-                    print(cyan + "postTraitementsRaster() : " + bold + green + "TRAITEMENT %s/%s - Etape 4/4 : SUPRESSION DE %s QUI NE SERVIRA PLUS" %(str(idx+1), str(nb_treatments), mask_to_apply ) + endC)
-                # Suppression du masque à appliquer
-                removeFile(mask_to_apply)
+                print(cyan + "postTraitementsRaster() : " + bold + green + "CALCUL DES %s TRAITEMENT(S) VERS %s" %(str(nb_treatments), image_output_temp) + endC)
+            writeRasterExpressions([result_expression], image_output_temp, CODAGE, format_raster, image_reference=image_input)
 
-            # mise a jour de l'index
-            idx+=1
+        if not save_results_intermediate:
+            for dilated_binary_mask in dilated_masks_list:
+                removeFile(dilated_binary_mask)
 
     # ETAPE 5 : DECOUPAGE DU RASTER DE SORTIE
     if enable_cutting_ask :
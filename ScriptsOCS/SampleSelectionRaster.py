@@ -26,6 +26,7 @@ Origine : Nouveau
 16/03/2017 : Création
 -----------------------------------------------------------------------------------------------------
 Modifications :
+16/10/2026 : Sélection des points par lecture de l'image des échantillons par bandes de lignes (comptage puis tirage par classe en numpy) et écriture des points en masse
 
 ------------------------------------------------------
 A Reflechir/A faire :
@@ -34,10 +35,11 @@ A Reflechir/A faire :
 
 # Import des bibliothèques python
 from __future__ import print_function
-import os, sys, glob, argparse, copy, random, math, threading
+import os, sys, glob, argparse, copy, math, threading
+import numpy as np
 from osgeo import gdal, ogr
-from Lib_raster import identifyPixelValues, countPixelsOfValue, getRawDataImage, getGeometryImage, getEmpriseImage, getPixelWidthXYImage, getProjectionImage
-from Lib_vector import createPointsFromCoordList, getAttributeValues, getAttributeNameList, createEmpriseShapeReduced, fusionVectors
+from Lib_raster import getGeometryImage, getEmpriseImage, getPixelWidthXYImage, getProjectionImage
+from Lib_vector import createPointsFromCoordArrays, getAttributeValues, getAttributeNameList, createEmpriseShapeReduced, fusionVectors
 from Lib_text import writeTextFile, appendTextFileCR
 from Lib_file import removeVectorFile, removeFile
 from Lib_operator import switch, case
@@ -50,18 +52,60 @@ from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC,displ
 # debug = 2 : affichage supérieur de commentaires lors de l'execution du script etc...
 debug = 3
 
+# Nombre maximum de pixels d'une bande de lignes lue dans l'image des échantillons
+MAX_PIXELS_STRIP = 16777216
+
 ###########################################################################################################################################
 # STRUCTURE StructInfoMicoClass                                                                                                           #
 ###########################################################################################################################################
 class StructInfoMicoClass:
     """
-    # Structure contenant contenant les informations nombre de points, valeur du label microclass et liste de points associé à une micro classe
+    # Structure contenant contenant les informations nombre de points, valeur du label microclass et rangs des points tirés pour une micro classe
+    # (rang d'un point = numéro d'ordre du pixel de la micro classe dans l'image parcourue ligne par ligne)
     """
     def __init__(self):
         self.label_class = 0
         self.nb_points = 0
-        self.info_points_list = None
-        sample_points_list = None
+        self.select_all = False
+        self.ranks_array = None
+        self.ranks_complement = False
+        self.nb_points_read = 0
+        self.coord_x_list = []
+        self.coord_y_list = []
+
+###########################################################################################################################################
+# FONCTION selectRandomRanks                                                                                                              #
+###########################################################################################################################################
+def selectRandomRanks(random_generator, nb_points, nb_select):
+    """
+    # ROLE:
+    #     Tirage aléatoire uniforme sans remise de nb_select rangs parmi nb_points (équivalent de random.sample(range(nb_points), nb_select))
+    #     La mémoire utilisée est proportionnelle au plus petit des nombres de points tirés ou non tirés : au delà de la moitié des points
+    #     ce sont les rangs non tirés qui sont retournés
+    #
+    # ENTREES DE LA FONCTION :
+    #    random_generator : le générateur aléatoire numpy
+    #    nb_points : nombre de points de la population
+    #    nb_select : nombre de points à tirer
+    #
+    # SORTIES DE LA FONCTION :
+    #    le tableau trié des rangs et un booléen à True si ce sont les rangs des points non tirés
+    #
+    """
+
+    nb_select = min(max(nb_select, 0), nb_points)
+    complement = nb_select > nb_points // 2
+    nb_draw = nb_points - nb_select if complement else nb_select
+
+    # Tirages successifs d'entiers jusqu'à en avoir assez de distincts, puis sous-tirage uniforme de l'excédent
+    ranks_array = np.empty(0, dtype=np.int64)
+    while len(ranks_array) < nb_draw:
+        nb_missing = nb_draw - len(ranks_array)
+        ranks_array = np.unique(np.concatenate((ranks_array, random_generator.integers(0, nb_points, nb_missing + nb_missing // 4 + 16, dtype=np.int64))))
+    if len(ranks_array) > nb_draw:
+        ranks_array = np.sort(random_generator.choice(ranks_array, nb_draw, replace=False))
+
+    return ranks_array, complement
 
 ###########################################################################################################################################
 # FONCTION selectSamples                                                                                                                  #
@@ -174,7 +218,41 @@ def selectSamples(image_input_list, sample_image_input, vector_output, table_sta
         if debug >= 3:
             print(cyan + "selectSamples() : " + bold + green + "Start statistique sur l'image des echantillons rasteur..." + endC)
 
-        id_micro_list = identifyPixelValues(sample_image_input)
+        # Information image
+        cols, rows, bands = getGeometryImage(sample_image_input)
+        xmin, xmax, ymin, ymax = getEmpriseImage(sample_image_input)
+        pixel_width, pixel_height = getPixelWidthXYImage(sample_image_input)
+        projection_input, _ = getProjectionImage(sample_image_input)
+        if projection_input == None or projection_input == 0 :
+            projection_input = epsg
+        else :
+            projection_input = int(projection_input)
+
+        pixel_width = abs(pixel_width)
+        pixel_height = abs(pixel_height)
+
+        if debug >= 3:
+            print("projection = " + str(projection_input))
+            print("cols = " + str(cols))
+            print("rows = " + str(rows))
+
+        # Lecture de l'image des echantillons par bandes de lignes alignées sur les blocs
+        dataset = gdal.Open(sample_image_input, gdal.GA_ReadOnly)
+        if dataset is None:
+            raise NameError(cyan + "selectSamples() : " + bold + red + "Impossible to open file %s" %(sample_image_input) + endC)
+        band = dataset.GetRasterBand(1)
+        block_y = band.GetBlockSize()[1]
+        strip_rows = block_y * max(1, (MAX_PIXELS_STRIP // max(1, cols)) // block_y)
+        strips_list = [(yoff, min(strip_rows, rows - yoff)) for yoff in range(0, rows, strip_rows)]
+
+        # Comptage des pixels de chaque micro classe (lecture 1)
+        count_dico = {}
+        for yoff, nb_rows in strips_list :
+            values_array, counts_array = np.unique(band.ReadAsArray(0, yoff, cols, nb_rows), return_counts=True)
+            for value_class, nb_pixels in zip(values_array.tolist(), counts_array.tolist()) :
+                count_dico[value_class] = count_dico.get(value_class, 0) + nb_pixels
+
+        id_micro_list = sorted(count_dico)
 
         if 0 in id_micro_list :
             id_micro_list.remove(0)
@@ -190,7 +268,7 @@ def selectSamples(image_input_list, sample_image_input, vector_output, table_sta
         if debug >= 2:
             print("Nombre de points par micro classe :" + endC)
         for id_micro in id_micro_list :
-            nb_pixels = countPixelsOfValue(sample_image_input, id_micro)
+            nb_pixels = count_dico[id_micro]
 
             if debug >= 2:
                 print("MicroClass : " + str(id_micro) + ", nb_points = " + str(nb_pixels))
@@ -203,7 +281,6 @@ def selectSamples(image_input_list, sample_image_input, vector_output, table_sta
             infoStructPointSource_dico[id_micro] = StructInfoMicoClass()
             infoStructPointSource_dico[id_micro].label_class = id_micro
             infoStructPointSource_dico[id_micro].nb_points = nb_pixels
-            infoStructPointSource_dico[id_micro].info_points_list = []
             del nb_pixels
 
         if debug >= 2:
@@ -216,81 +293,28 @@ def selectSamples(image_input_list, sample_image_input, vector_output, table_sta
             print(pending_event)
         timeLine(path_time_log,pending_event)
 
-        # 2. CHARGEMENT DE L'IMAGE DES ECHANTILLONS
-        #------------------------------------------
-
-        if debug >= 3:
-            print(cyan + "selectSamples() : " + bold + green + "Start chargement de l'image des echantillons..." + endC)
-
-        # Information image
-        cols, rows, bands = getGeometryImage(sample_image_input)
-        xmin, xmax, ymin, ymax = getEmpriseImage(sample_image_input)
-        pixel_width, pixel_height = getPixelWidthXYImage(sample_image_input)
-        projection_input, _ = getProjectionImage(sample_image_input)
-        if projection_input == None or projection_input == 0 :
-            projection_input = epsg
-        else :
-            projection_input = int(projection_input)
-
-        pixel_width = abs(pixel_width)
-        pixel_height = abs(pixel_height)
-
-        # Lecture des données
-        raw_data = getRawDataImage(sample_image_input)
-
-        if debug >= 3:
-            print("projection = " + str(projection_input))
-            print("cols = " + str(cols))
-            print("rows = " + str(rows))
-
-        # Creation d'une structure dico contenent tous les points différents de zéro
-        progress = 0
-        pass_prog = False
-        for y_row in range(rows) :
-            for x_col in range(cols) :
-                value_class = raw_data[y_row][x_col]
-                if value_class != 0 :
-                    infoStructPointSource_dico[value_class].info_points_list.append(x_col + (y_row * cols))
-
-            # Barre de progression
-            if debug >= 4:
-                if  ((float(y_row) / rows) * 100.0 > progress) and not pass_prog :
-                    progress += 1
-                    pass_prog = True
-                    print("Progression => " + str(progress) + "%")
-                if ((float(y_row) / rows) * 100.0  > progress + 1) :
-                    pass_prog = False
-
-        del raw_data
-
-        pending_event = cyan + "selectSamples() : " + bold + green + "End chargement de l'image des echantillons. " + endC
-        if debug >= 3:
-            print(pending_event)
-        timeLine(path_time_log,pending_event)
-
-        # 3. SELECTION DES POINTS D'ECHANTILLON
-        #--------------------------------------
+        # 2. SELECTION DES RANGS DES POINTS D'ECHANTILLON
+        #------------------------------------------------
 
         if debug >= 3:
             print(cyan + "selectSamples() : " + bold + green + "Start selection des points d'echantillon..." + endC)
 
         appendTextFileCR(file_statistic_points, '    <Statistic name="pointsPerClassSelect">')
 
-        # Rendre deterministe la fonction aléatoire de random.sample
-        if rand_seed > 0:
-            random.seed( rand_seed )
+        # Rendre deterministe le tirage aléatoire
+        random_generator = np.random.default_rng(rand_seed if rand_seed > 0 else None)
 
         # Pour toute les micro classes
         for id_micro in id_micro_list :
+            micro_class_struct = infoStructPointSource_dico[id_micro]
 
             # Selon la stategie de selection
             nb_points_ratio = 0
             while switch(sampler_strategy.lower()):
                 if case('all'):
                     # Le mode de selection 'all' est choisi
-                    nb_points_ratio = infoStructPointSource_dico[id_micro].nb_points
-                    infoStructPointSource_dico[id_micro].sample_points_list = range(nb_points_ratio)
-
+                    nb_points_ratio = micro_class_struct.nb_points
+                    micro_class_struct.select_all = True
                     break
                 if case('percent'):
                     # Le mode de selection 'percent' est choisi
@@ -299,27 +323,24 @@ def selectSamples(image_input_list, sample_image_input, vector_output, table_sta
                     else :
                         id_macro_class = int(id_micro)
                     select_ratio_class = ratio_per_class_dico[id_macro_class]
-                    nb_points_ratio = int(infoStructPointSource_dico[id_micro].nb_points * select_ratio_class / 100)
-                    infoStructPointSource_dico[id_micro].sample_points_list = random.sample(range(infoStructPointSource_dico[id_micro].nb_points), nb_points_ratio)
+                    nb_points_ratio = int(micro_class_struct.nb_points * select_ratio_class / 100)
                     break
                 if case('mixte'):
                     # Le mode de selection 'mixte' est choisi
-                    nb_points_ratio = int(infoStructPointSource_dico[id_micro].nb_points * select_ratio_floor / 100)
+                    nb_points_ratio = int(micro_class_struct.nb_points * select_ratio_floor / 100)
                     if id_micro == min_micro_class_label :
                         # La plus petite micro classe est concervée intégralement
-                        infoStructPointSource_dico[id_micro].sample_points_list = range(infoStructPointSource_dico[id_micro].nb_points)
+                        micro_class_struct.select_all = True
                         nb_points_ratio = min_micro_class_nb_points
                     elif nb_points_ratio <= min_micro_class_nb_points :
                         # Les micro classes dont le ratio de selection est inferieur au nombre de points de la plus petite classe sont égement conservées intégralement
-                        infoStructPointSource_dico[id_micro].sample_points_list = random.sample(range(infoStructPointSource_dico[id_micro].nb_points), min_micro_class_nb_points)
                         nb_points_ratio = min_micro_class_nb_points
-                    else :
-                        # Pour toutes les autres micro classes tirage aleatoire d'un nombre de points correspondant au ratio
-                        infoStructPointSource_dico[id_micro].sample_points_list = random.sample(range(infoStructPointSource_dico[id_micro].nb_points), nb_points_ratio)
-
                     break
                 break
 
+            # Tirage aléatoire des rangs des points de la micro classe
+            if not micro_class_struct.select_all :
+                micro_class_struct.ranks_array, micro_class_struct.ranks_complement = selectRandomRanks(random_generator, micro_class_struct.nb_points, nb_points_ratio)
 
             if debug >= 2:
                 print("MicroClass = " + str(id_micro) + ", nb_points_ratio " + str(nb_points_ratio))
@@ -333,31 +354,78 @@ def selectSamples(image_input_list, sample_image_input, vector_output, table_sta
             print(pending_event)
         timeLine(path_time_log,pending_event)
 
+        # 3. EXTRACTION DES COORDONNEES DES POINTS D'ECHANTILLON
+        #-------------------------------------------------------
+
+        if debug >= 3:
+            print(cyan + "selectSamples() : " + bold + green + "Start extraction des coordonnees des points d'echantillon..." + endC)
+
+        # Lecture 2 : les pixels de chaque micro classe sont numérotés dans l'ordre de lecture, ceux dont le rang a été tiré sont conservés
+        for num_strip in range(len(strips_list)) :
+            yoff, nb_rows = strips_list[num_strip]
+            values_array = band.ReadAsArray(0, yoff, cols, nb_rows).ravel()
+            index_array = np.flatnonzero(values_array)
+            class_array = values_array[index_array]
+            order_array = np.argsort(class_array, kind='stable')
+            index_array = index_array[order_array]
+            class_array = class_array[order_array]
+            labels_array, starts_array, counts_array = np.unique(class_array, return_index=True, return_counts=True)
+
+            for value_class, start, nb_pixels in zip(labels_array.tolist(), starts_array.tolist(), counts_array.tolist()) :
+                micro_class_struct = infoStructPointSource_dico[value_class]
+                index_class_array = index_array[start:start + nb_pixels]
+                rank_start = micro_class_struct.nb_points_read
+                micro_class_struct.nb_points_read += nb_pixels
+
+                if not micro_class_struct.select_all :
+                    ranks_array = micro_class_struct.ranks_array
+                    positions_array = ranks_array[np.searchsorted(ranks_array, rank_start):np.searchsorted(ranks_array, rank_start + nb_pixels)] - rank_start
+                    if micro_class_struct.ranks_complement :
+                        keep_array = np.ones(nb_pixels, dtype=bool)
+                        keep_array[positions_array] = False
+                        index_class_array = index_class_array[keep_array]
+                    else :
+                        index_class_array = index_class_array[positions_array]
+                if len(index_class_array) == 0 :
+                    continue
+
+                # Coordonnees du centre des pixels
+                micro_class_struct.coord_x_list.append(xmin + ((index_class_array % cols) + 0.5) * pixel_width)
+                micro_class_struct.coord_y_list.append(ymax - ((index_class_array // cols) + yoff + 0.5) * pixel_height)
+
+            # Barre de progression
+            if debug >= 4:
+                print("Progression => " + str(int((num_strip + 1) * 100 / len(strips_list))) + "%")
+
+        band = None
+        dataset = None
+
+        pending_event = cyan + "selectSamples() : " + bold + green + "End extraction des coordonnees des points d'echantillon. " + endC
+        if debug >=3:
+            print(pending_event)
+        timeLine(path_time_log,pending_event)
+
         # 4. PREPARATION DES POINTS D'ECHANTILLON
         #----------------------------------------
 
         if debug >= 3:
             print(cyan + "selectSamples() : " + bold + green + "Start preparation des points d'echantillon..." + endC)
 
-        # Création du dico de points
-        points_random_value_dico = {}
-        index_dico_point = 0
-        for micro_class in infoStructPointSource_dico :
-            micro_class_struct = infoStructPointSource_dico[micro_class]
-            label_class = micro_class_struct.label_class
-            point_attr_dico = {name_column:int(label_class), COLUMN_CLASS:int(label_class), COLUMN_ORIGINFID:0}
-
-            for id_point in micro_class_struct.sample_points_list:
-
-                # Recuperer les valeurs des coordonnees des points
-                coor_x = float(xmin + (int(micro_class_struct.info_points_list[id_point] % cols) * pixel_width)) + (pixel_width / 2.0)
-                coor_y = float(ymax - (int(micro_class_struct.info_points_list[id_point] / cols) * pixel_height)) - (pixel_height / 2.0)
-                points_random_value_dico[index_dico_point] = [[coor_x, coor_y], point_attr_dico]
-                del coor_x
-                del coor_y
-                index_dico_point += 1
-            del point_attr_dico
+        # Concaténation des coordonnees et des labels des points par micro classe
+        coord_x_list = []
+        coord_y_list = []
+        label_list = []
+        for id_micro in id_micro_list :
+            micro_class_struct = infoStructPointSource_dico[id_micro]
+            for coord_x_array, coord_y_array in zip(micro_class_struct.coord_x_list, micro_class_struct.coord_y_list) :
+                coord_x_list.append(coord_x_array)
+                coord_y_list.append(coord_y_array)
+                label_list.append(np.full(len(coord_x_array), id_micro, dtype=np.int64))
         del infoStructPointSource_dico
+        coord_x_array = np.concatenate(coord_x_list) if coord_x_list != [] else np.empty(0)
+        coord_y_array = np.concatenate(coord_y_list) if coord_y_list != [] else np.empty(0)
+        label_array = np.concatenate(label_list) if label_list != [] else np.empty(0, dtype=np.int64)
+        del coord_x_list, coord_y_list, label_list
 
         pending_event = cyan + "selectSamples() : " + bold + green + "End preparation des points d'echantillon. " + endC
         if debug >=3:
@@ -374,9 +442,10 @@ def selectSamples(image_input_list, sample_image_input, vector_output, table_sta
         attribute_dico = {name_column:ogr.OFTInteger, COLUMN_CLASS:ogr.OFTInteger, COLUMN_ORIGINFID:ogr.OFTInteger}
 
         # Creation du fichier shape
-        createPointsFromCoordList(attribute_dico, points_random_value_dico, sample_points_output, projection_input, format_vector)
+        values_attr_dico = {name_column:label_array, COLUMN_CLASS:label_array, COLUMN_ORIGINFID:np.zeros(len(label_array), dtype=np.int64)}
+        createPointsFromCoordArrays(attribute_dico, coord_x_array, coord_y_array, values_attr_dico, sample_points_output, projection_input, format_vector)
         del attribute_dico
-        del points_random_value_dico
+        del values_attr_dico, coord_x_array, coord_y_array, label_array
 
         pending_event = cyan + "selectSamples() : " + bold + green + "End creation du fichier shape de points d'echantillon. " + endC
         if debug >=3:
@@ -25,6 +25,7 @@ Origine : Ce script a été réalisé par Levis Antonetti dans le cadre de son s
           Ce script est le résultat de la synthèse du développement effectué sur des notebooks disponibles dans le répertoire /mnt/Data2/30_Stages_Encours/2023/MorphologieUrbaine_Levis/03_scripts
 -----------------------------------------------------------------------------------------------------
 Modifications
+         le 16/10/2026 cutPolygonesByLines_Pandas et explodeMultiGdf vectorisés (shapely 2, STRtree), découpage en parallèle par bandes spatiales
 
 ------------------------------------------------------
 """
@@ -33,9 +34,12 @@ Modifications
 
 # System
 import os, sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from osgeo import ogr ,osr, gdal
 
 # Geomatique
+import shapely
 import geopandas as gpd
 import pandas as pd
 from shapely.geometry import MultiLineString, LineString, MultiPolygon, Polygon
@@ -46,12 +50,16 @@ from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
 from Lib_file import removeFile, removeVectorFile, deleteDir
 from Lib_vector import getEmpriseVector, cutVectorAll, createEmpriseVector, fusionVectors, getAttributeType, getAttributeValues, addNewFieldVector, setAttributeValuesList, deleteFieldsVector, renameFieldsVector, updateIndexVector
 from Lib_log import timeLine
+from Lib_operator import getNumberCPU
 from Lib_postgis import openConnection, closeConnection, dropDatabase, createDatabase, importVectorByOgr2ogr, exportVectorByOgr2ogr, cutPolygonesByLines
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 3 : affichage maximum de commentaires lors de l'execution du script. Intermédiaire : affichage intermédiaire
 debug = 2
 
+# Nombre de polygones par bande spatiale traitée par un processus lors du découpage des polygones
+NB_POLYGONS_CHUNK = 5000
+
 ###########################################################################################################################################
 #                                                                                                                                         #
 # UTILS                                                                                                                                   #
@@ -130,33 +138,12 @@ def explodeMultiGdf(gdf, field_fid):
     #     une GeoDataFrame sur les géométries transormés
     """
 
-    new_geometries = []
-    new_data = []  # List to store data from input DataFrame
-
-    index = 0
-    for _, row in gdf.iterrows():
-        geometry = row['geometry']
-          # Dictionary to store data from the input row
-
-        if geometry.geom_type == 'Polygon' or geometry.geom_type == 'LineString':
-            new_geometries.append(geometry)
-            row[field_fid] = index
-            data = {}
-            data.update(row.drop('geometry'))  # Add non-geometry fields to data
-            new_data.append(data)
-            index += 1
-        elif geometry.geom_type == 'MultiPolygon' or geometry.geom_type == 'MultiLineString':
-            for poly in geometry.geoms:
-                new_geometries.append(poly)
-                new_row = row.copy()
-                new_row[field_fid] = index
-                data = {}
-                data.update(new_row.drop('geometry'))  # Add non-geometry fields to data
-                new_data.append(data)
-                index += 1
-
-    # Create a GeoDataFrame from new_data and new_geometries
-    return gpd.GeoDataFrame(new_data, geometry=new_geometries, crs=gdf.crs)
+    # Seules les géométries polygones et lignes (simples ou multiples) sont conservées, l'id est renuméroté
+    gdf_simple = gdf[gdf.geometry.geom_type.isin(['Polygon', 'LineString', 'MultiPolygon', 'MultiLineString'])]
+    gdf_simple = gdf_simple.explode(index_parts=False).reset_index(drop=True)
+    gdf_simple[field_fid] = range(len(gdf_simple))
+
+    return gdf_simple
 
 ###########################################################################################################################################
 # FUNCTION removeRing()                                                                                                                   #
@@ -202,6 +189,29 @@ def computePolygonAreas(gdf, geometry_column="geometry", area_col_name="area"):
 
     return gdf
 
+###########################################################################################################################################
+# FUNCTION differencePolygonsChunk()                                                                                                      #
+###########################################################################################################################################
+def differencePolygonsChunk(geometries_list, neighbors_list):
+    """
+    # ROLE:
+    #     Retire de chaque polygone d'une bande spatiale les polygones qui le chevauchent et qui le précèdent.
+    #
+    # PARAMETERS:
+    #     geometries_list : liste des polygones à découper.
+    #     neighbors_list : pour chaque polygone, la liste des polygones précédents qui le chevauchent.
+    # RETURNS:
+    #     la liste des polygones découpés
+    """
+
+    result_list = []
+    for geometry, neighbors in zip(geometries_list, neighbors_list):
+        try :
+            result_list.append(shapely.difference(geometry, shapely.union_all(neighbors)))
+        except shapely.errors.GEOSException:
+            result_list.append(geometry) # TopologyException : la géometrie est conservée
+    return result_list
+
 ###########################################################################################################################################
 #                                                                                                                                         #
 # Post processing CONVEX CONSTRAINED MESH segmentation                                                                                    #
@@ -300,7 +310,7 @@ def cutPolygonesByLines_Postgis(vector_lines_input, vector_poly_input, vector_po
 ###########################################################################################################################################
 # FONCTION cutPolygonesByLines_Pandas()                                                                                                   #
 ###########################################################################################################################################
-def cutPolygonesByLines_Pandas(vector_lines_input, vector_poly_input, vector_poly_output, epsg, path_time_log, format_vector, save_results_intermediate=False, overwrite=True) :
+def cutPolygonesByLines_Pandas(vector_lines_input, vector_poly_input, vector_poly_output, epsg, path_time_log, format_vector, save_results_intermediate=False, overwrite=True, nb_workers=0) :
     """
     # ROLE:
     #     Découper des polygones ou multi-polygones par des lignes ou multi-lignes en traitement sous postgis
@@ -314,12 +324,12 @@ def cutPolygonesByLines_Pandas(vector_lines_input, vector_poly_input, vector_pol
     #     format_vector : format du fichier vecteur. Optionnel, par default : 'ESRI Shapefile'
     #     save_results_intermediate : fichiers de sorties intermediaires nettoyees, par defaut = False
     #     overwrite : écrase si un fichier existant a le même nom qu'un fichier de sortie, par defaut a True
+    #     nb_workers : nombre de processus pour le découpage par bandes spatiales (0 = nombre de CPU, 1 = sans parallélisme), par defaut = 0
     #
     # SORTIES DE LA FONCTION :
     #     na
     #
     """
-    SUFFIX_DIFF = "_diff"
 
     # Mise à jour du Log
     starting_event = "cutPolygonesByLines_Pandas() : Cuting polygons by lines  starting : "
@@ -337,37 +347,58 @@ def cutPolygonesByLines_Pandas(vector_lines_input, vector_poly_input, vector_pol
     gdf_seg_diff = gpd.overlay(gdf_segmentation, gdf_roads_line_filter_buf, how='difference', keep_geom_type=True)
 
     # Nettoyage des ring dans les polygones
-    gdf_seg_diff['geometry'] = gdf_seg_diff['geometry'].apply(removeRing)
-    gdf_seg_diff_explode = gdf_seg_diff.explode(index_parts=True)
-    gdf_seg_diff_explode['geometry'] = gdf_seg_diff_explode.buffer(distance=0.00002)
-    #gdf_seg_diff_explode['geometry'] = gdf_seg_diff_explode['geometry'].buffer(0)
-    gdf_seg_diff_explode_clean = gdf_seg_diff_explode[(gdf_seg_diff_explode["geometry"].geom_type == 'Polygon') | (gdf_seg_diff_explode["geometry"].geom_type == 'MultiPolygon')]
-
-    # Appliquer l'opération difference pour chaque paire de polygones qui se chevauchent
-    for i, polygon1 in gdf_seg_diff_explode_clean.iterrows():
-        polygon1['geometry'] = polygon1['geometry'].buffer(0)
-        for j, polygon2 in gdf_seg_diff_explode_clean.iterrows():
-            # Vérifier si les polygones se chevauchent et ne sont pas les mêmes
-            polygon2['geometry'] = polygon2['geometry'].buffer(0)
-            if polygon1['geometry'].is_valid and polygon2['geometry'].is_valid :
-                try :
-                    if i != j and polygon1['geometry'].intersects(polygon2['geometry']):
-                        # Obtenir la différence entre les polygones
-                        difference_geometry = polygon1['geometry'].difference(polygon2['geometry'])
-                        # Mettre à jour la géométrie du polygone d'origine
-                        gdf_seg_diff_explode_clean.at[i, 'geometry'] = difference_geometry
-                except Exception:
-                    pass # Pass car TopologyException : This can occur if the input geometry is invalid.
+    gdf_seg_diff_explode = gdf_seg_diff.explode(index_parts=False).reset_index(drop=True)
+    gdf_seg_diff_explode = gdf_seg_diff_explode[gdf_seg_diff_explode["geometry"].geom_type == 'Polygon']
+    gdf_seg_diff_explode['geometry'] = shapely.buffer(shapely.polygons(shapely.get_exterior_ring(gdf_seg_diff_explode.geometry.values)), 0.00002)
+    gdf_seg_diff_explode_clean = gdf_seg_diff_explode[(gdf_seg_diff_explode["geometry"].geom_type == 'Polygon') | (gdf_seg_diff_explode["geometry"].geom_type == 'MultiPolygon')].reset_index(drop=True)
+
+    # Paires de polygones qui se chevauchent (requête groupée sur un index STRtree), chaque polygone est découpé par les polygones qui le précèdent
+    geometries = np.array(shapely.buffer(gdf_seg_diff_explode_clean.geometry.values, 0), dtype=object)
+    valid_array = shapely.is_valid(geometries)
+    target_array, candidate_array = shapely.STRtree(geometries).query(geometries, predicate="intersects")
+    keep = (candidate_array < target_array) & valid_array[target_array] & valid_array[candidate_array]
+    target_array, candidate_array = target_array[keep], candidate_array[keep]
+    order = np.argsort(target_array, kind="stable")
+    target_array, candidate_array = target_array[order], candidate_array[order]
+    targets_array, starts_array = np.unique(target_array, return_index=True)
+    neighbors_dico = dict(zip(targets_array.tolist(), np.split(candidate_array, starts_array[1:])))
+
+    # Bandes spatiales : polygones chevauchés triés selon x de leur centre
+    targets_array = targets_array[np.argsort(shapely.get_x(shapely.centroid(geometries[targets_array])), kind="stable")]
+    chunks_list = [targets_array[index:index + NB_POLYGONS_CHUNK] for index in range(0, len(targets_array), NB_POLYGONS_CHUNK)]
+    if nb_workers <= 0:
+        nb_workers = getNumberCPU()
+    if debug >= 2:
+        print(cyan + "cutPolygonesByLines_Pandas() : " + endC + "%s polygones, %s polygones chevauchés, %s bandes spatiales, %s processus" %(len(geometries), len(targets_array), len(chunks_list), min(nb_workers, len(chunks_list))))
+
+    # Appliquer l'opération difference pour chaque polygone chevauché
+    result_geometries = geometries.copy()
+    if nb_workers == 1 or len(chunks_list) <= 1:
+        for chunk in chunks_list:
+            result_geometries[chunk] = differencePolygonsChunk(list(geometries[chunk]), [list(geometries[neighbors_dico[target]]) for target in chunk.tolist()])
+    else:
+        with ProcessPoolExecutor(max_workers=min(nb_workers, len(chunks_list))) as executor:
+            futures_dico = {}
+            for chunk in chunks_list:
+                future = executor.submit(differencePolygonsChunk, list(geometries[chunk]), [list(geometries[neighbors_dico[target]]) for target in chunk.tolist()])
+                futures_dico[future] = chunk
+            try:
+                for future in as_completed(futures_dico):
+                    result_list = future.result()
+                    chunk = futures_dico[future]
+                    for index in range(len(chunk)):
+                        result_geometries[chunk[index]] = result_list[index]
+            except Exception:
+                for future in futures_dico:
+                    future.cancel()
+                raise
+    gdf_seg_diff_explode_clean['geometry'] = gpd.GeoSeries(result_geometries, index=gdf_seg_diff_explode_clean.index, crs=gdf_seg_diff_explode_clean.crs)
 
     # Filtrer les geometries non-polygons
-    gdf_seg_diff_explode_clean = gdf_seg_diff_explode_clean[gdf_seg_diff_explode_clean['geometry'].apply(lambda geom: geom.geom_type in ['Polygon','MultiPolygon'])]
+    gdf_seg_diff_explode_clean = gdf_seg_diff_explode_clean[gdf_seg_diff_explode_clean['geometry'].geom_type.isin(['Polygon','MultiPolygon'])]
 
     # Sauvegarde vecteur polygones découpé
-    vector_seg_diff_explode_tmp = os.path.splitext(vector_poly_output)[0] + SUFFIX_DIFF + os.path.splitext(vector_poly_output)[1]
-    gdf_seg_diff_explode_clean.to_file(vector_seg_diff_explode_tmp, driver=format_vector, crs="EPSG:" + str(epsg))
-    deleteFieldsVector(vector_seg_diff_explode_tmp, vector_poly_output, ['level_0', 'level_1'], format_vector)
-    if os.path.isfile(vector_seg_diff_explode_tmp):
-        removeVectorFile(vector_seg_diff_explode_tmp, format_vector)
+    gdf_seg_diff_explode_clean.to_file(vector_poly_output, driver=format_vector, crs="EPSG:" + str(epsg))
     if debug >= 1:
         print(cyan + "cutPolygonesByLines_Pandas() : " + endC + "Découpage des polygones par les lignes fichier de sortie :", vector_poly_output)
 
@@ -380,7 +411,7 @@ def cutPolygonesByLines_Pandas(vector_lines_input, vector_poly_input, vector_pol
 ###########################################################################################################################################
 # FUNCTION unionSegRoads()                                                                                                                #
 ###########################################################################################################################################
-def unionSegRoads(path_folder_union_roads, vector_all_roads_input, vector_seg_input, vector_seg_roads_output, vector_line_skeleton_main_roads_output, field_fid, field_org_fid, road_importance_field="IMPORTANCE", road_importance_threshold=4, buffer_size=35.0, epsg=2154, server_postgis="localhost", port_number=5432, user_postgis="postgres", password_postgis="postgres", database_postgis="cutbylines", schema_postgis="public", format_vector='ESRI Shapefile', extension_vector=".shp", save_results_intermediate=False, overwrite=True):
+def unionSegRoads(path_folder_union_roads, vector_all_roads_input, vector_seg_input, vector_seg_roads_output, vector_line_skeleton_main_roads_output, field_fid, field_org_fid, road_importance_field="IMPORTANCE", road_importance_threshold=4, buffer_size=35.0, epsg=2154, server_postgis="localhost", port_number=5432, user_postgis="postgres", password_postgis="postgres", database_postgis="cutbylines", schema_postgis="public", format_vector='ESRI Shapefile', extension_vector=".shp", save_results_intermediate=False, overwrite=True, use_postgis=True, nb_workers=0):
     """
     # ROLE:
     #     Union des segmentations de route (vecteurs).
@@ -407,6 +438,8 @@ def unionSegRoads(path_folder_union_roads, vector_all_roads_input, vector_seg_in
     #     extension_vector : extension du fichier vecteur de sortie, par defaut = '.shp'
     #     save_results_intermediate : fichiers de sorties intermediaires non nettoyées, par defaut = False
     #     overwrite : supprime ou non les fichiers existants ayant le meme nom
+    #     use_postgis : découpage des polygones par les routes sous postgis, sinon avec geopandas/shapely (par défaut : True).
+    #     nb_workers : nombre de processus pour le découpage sans postgis (0 = nombre de CPU) (par défaut : 0).
     # RETURNS:
     #     NA
     """
@@ -507,8 +540,10 @@ def unionSegRoads(path_folder_union_roads, vector_all_roads_input, vector_seg_in
         print(cyan + "unionSegRoads() : " + endC + "Nettoyage du squelette route fichier de sortie : ", vector_line_skeleton_main_roads_output)
 
     # Decoupage des polygones de segmentation avec les routes principales
-    ##cutPolygonesByLines_Pandas(vector_line_skeleton_main_roads_output, vector_seg_input, vector_seg_roads_output, epsg, "", format_vector, save_results_intermediate, overwrite)
-    cutPolygonesByLines_Postgis(vector_line_skeleton_main_roads_output, vector_seg_input, vector_seg_roads_output, epsg, "UTF-8", server_postgis, port_number, user_postgis, password_postgis, database_postgis, schema_postgis, "", format_vector, save_results_intermediate=False, overwrite=True)
+    if not use_postgis :
+        cutPolygonesByLines_Pandas(vector_line_skeleton_main_roads_output, vector_seg_input, vector_seg_roads_output, epsg, "", format_vector, save_results_intermediate, overwrite, nb_workers)
+    else :
+        cutPolygonesByLines_Postgis(vector_line_skeleton_main_roads_output, vector_seg_input, vector_seg_roads_output, epsg, "UTF-8", server_postgis, port_number, user_postgis, password_postgis, database_postgis, schema_postgis, "", format_vector, save_results_intermediate=False, overwrite=True)
 
     # Pour les polygones découpés par les routes principales garder l'id du polygone d'origine
     attribute_fid_type = ogr.OFTInteger64
@@ -630,7 +665,7 @@ def removeWaterSurfacesSeg(vector_seg_input, vector_water_area_input, vector_seg
 ###########################################################################################################################################
 # FUNCTION segPostProcessing()                                                                                                            #
 ###########################################################################################################################################
-def segPostProcessing(path_base_folder,  emprise_vector, vector_seg_input, vector_roads_input, vector_water_area_input, vector_seg_output, road_importance_field="IMPORTANCE", road_importance_threshold=4, buffer_size=35.0, min_area_water_area=50000, no_data_value=0, epsg=2154, server_postgis="localhost", port_number=5432, user_postgis="postgres", password_postgis="postgres", database_postgis="cutbylines", schema_postgis="public", format_raster="GTiff", format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", path_time_log = "", save_results_intermediate=False, overwrite=True):
+def segPostProcessing(path_base_folder,  emprise_vector, vector_seg_input, vector_roads_input, vector_water_area_input, vector_seg_output, road_importance_field="IMPORTANCE", road_importance_threshold=4, buffer_size=35.0, min_area_water_area=50000, no_data_value=0, epsg=2154, server_postgis="localhost", port_number=5432, user_postgis="postgres", password_postgis="postgres", database_postgis="cutbylines", schema_postgis="public", format_raster="GTiff", format_vector='ESRI Shapefile', extension_raster=".tif", extension_vector=".shp", path_time_log = "", save_results_intermediate=False, overwrite=True, use_postgis=True, nb_workers=0):
     """
     # ROLE:
     #     Post Processing de la segmentation.
@@ -661,6 +696,8 @@ def segPostProcessing(path_base_folder,  emprise_vector, vector_seg_input, vecto
     #     path_time_log : le fichier de log de sortie (par défaut : "").
     #     save_results_intermediate : fichiers de sorties intermediaires non nettoyées, par defaut = False
     #     overwrite : supprime ou non les fichiers existants ayant le meme nom
+    #     use_postgis : découpage des polygones par les routes sous postgis, sinon avec geopandas/shapely (par défaut : True).
+    #     nb_workers : nombre de processus pour le découpage sans postgis (0 = nombre de CPU) (par défaut : 0).
     # RETURNS:
     #     none
     """
@@ -692,6 +729,8 @@ def segPostProcessing(path_base_folder,  emprise_vector, vector_seg_input, vecto
         print(cyan + "segPostProcessing() : " + endC + "path_time_log : " + str(path_time_log))
         print(cyan + "segPostProcessing() : " + endC + "save_results_intermediate : "+ str(save_results_intermediate))
         print(cyan + "segPostProcessing() : " + endC + "overwrite : "+ str(overwrite))
+        print(cyan + "segPostProcessing() : " + endC + "use_postgis : "+ str(use_postgis))
+        print(cyan + "segPostProcessing() : " + endC + "nb_workers : "+ str(nb_workers))
 
     # Constantes pour la création automatique des repertoires temporaires
     FOLDER_POSTPROCESSING = "seg_post_processing"
@@ -776,7 +815,7 @@ def segPostProcessing(path_base_folder,  emprise_vector, vector_seg_input, vecto
     vector_seg_road = path_folder_union_roads + os.sep + os.path.splitext(os.path.basename(vector_seg_input))[0] + SUFFIX_CUT + SUFFIX_ROADS + extension_vector
     vector_line_skeleton_main_roads_output = path_folder_union_roads + os.sep + os.path.splitext(os.path.basename(vector_roads_input))[0] + "_" + road_importance_field[:3] + SUFFIX_LINE + SUFFIX_FILTER +  extension_vector
 
-    unionSegRoads(path_folder_union_roads, vector_roads_cut, vector_seg_input, vector_seg_road, vector_line_skeleton_main_roads_output, FIELD_FID, FIELD_ORG_FID, road_importance_field, road_importance_threshold, buffer_size, epsg, server_postgis, port_number, user_postgis, password_postgis, database_postgis, schema_postgis, format_vector, extension_vector, save_results_intermediate, overwrite)
+    unionSegRoads(path_folder_union_roads, vector_roads_cut, vector_seg_input, vector_seg_road, vector_line_skeleton_main_roads_output, FIELD_FID, FIELD_ORG_FID, road_importance_field, road_importance_threshold, buffer_size, epsg, server_postgis, port_number, user_postgis, password_postgis, database_postgis, schema_postgis, format_vector, extension_vector, save_results_intermediate, overwrite, use_postgis, nb_workers)
 
     # Decoupage de la donnée eau sur l'emprise de l'étude
     vector_water_area_cut = path_folder_water + os.sep + os.path.splitext(os.path.basename(vector_water_area_input))[0] + SUFFIX_CUT + extension_vector
@@ -849,5 +888,7 @@ if __name__ == '__main__':
         extension_vector=".shp",
         path_time_log="",
         save_results_intermediate=False,
-        overwrite=True
+        overwrite=True,
+        use_postgis=False,
+        nb_workers=0
         )
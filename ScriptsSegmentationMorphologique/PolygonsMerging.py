@@ -24,6 +24,7 @@ Origine : Ce script a été réalisé par Levis Antonetti dans le cadre de son s
           Ce script est le résultat de la synthèse du développement effectué sur des notebooks disponibles dans le répertoire /mnt/Data2/30_Stages_Encours/2023/MorphologieUrbaine_Levis/03_scripts
 -----------------------------------------------------------------------------------------------------
 Modifications
+         le 16/10/2026 graphe d'adjacence des polygones (PolygonsAdjacencyGraph) et file de priorité par surface pour mergeSmallPolygons et mergePolygonsWithConds
 
 ------------------------------------------------------
 """
@@ -32,7 +33,7 @@ Modifications
 
 # system
 import warnings
-import os, sys
+import os, sys, heapq
 
 # data processing
 import numpy as np
@@ -95,6 +96,7 @@ THRESHOLD_EUCLIDIAN_DIST = 0.7
 MAX_ADJACENT_NEIGHBOR = 4
 BUILT_WEIGHT = 2
 BUFF_TOLERANCE_SUPERPOSITION = 0.001
+THRESHOLD_CONTACT_AREA = 0.00001
 
 # Cas OCS OSO :
 URBAN_CLASS_OCS_LIST = ["1", "2", "3", "4"]
@@ -139,7 +141,7 @@ def findAdjacentPolygons(gdf, target_polygon, fid_column='FID', org_id_list_colu
         test_fid = gdf.loc[idx, fid_column]
         if (fid != gdf.loc[idx, fid_column]) and (set(test_org_id_list).isdisjoint(set(org_id_l))) and (polygon != target_geometry) and (polygon.intersects(buffered_target_geometry)) :
             intersection = polygon.intersection(buffered_target_geometry)
-            if not intersection.is_empty and intersection.area > 0.00001:
+            if not intersection.is_empty and intersection.area > THRESHOLD_CONTACT_AREA:
                 adjacent_polygons_dico[gdf.loc[idx, fid_column]] = intersection.area
 
     # Ordonnée les valeurs du dictionaire
@@ -148,6 +150,135 @@ def findAdjacentPolygons(gdf, target_polygon, fid_column='FID', org_id_list_colu
 
     return adjacent_polygons_list
 
+###########################################################################################################################################
+# CLASS PolygonsAdjacencyGraph()                                                                                                          #
+###########################################################################################################################################
+class PolygonsAdjacencyGraph:
+    """
+    # ROLE:
+    #   Graphe d'adjacence des polygones d'un dataframe pour les fusions successives.
+    #   Les voisins de chaque polygone et leur linéaire de contact (surface d'intersection du voisin avec le polygone bufferisé,
+    #   comme pour findAdjacentPolygons) sont calculés une seule fois avec un index STRtree, après chaque fusion
+    #   seul le voisinage du polygone fusionné est recalculé. Les polygones à traiter sont dans une file de priorité par surface.
+    #   Les polygones sont identifiés par leur index dans le dataframe (qui doit être unique).
+    #
+    # PARAMETERS:
+    #     gdf : dataframe des polygones d'entrée.
+    #     fid_column : nom de la colonne contenant l'identifant du polygones (default : 'FID').
+    #     org_id_list_column : nom de a colonne contenant la liste des valeur d'id d'origine (default : 'org_id_l').
+    #     buffer_tolerance : la valeur de tolérance du buffer (default is BUFF_TOLERANCE_SUPERPOSITION).
+    """
+
+    def __init__(self, gdf, fid_column='FID', org_id_list_column='org_id_l', buffer_tolerance=BUFF_TOLERANCE_SUPERPOSITION):
+        self.buffer_tolerance = buffer_tolerance
+        index_list = gdf.index.tolist()
+        geometries = np.array(gdf.geometry.tolist(), dtype=object)
+        buffers = shapely.buffer(geometries, buffer_tolerance)
+
+        self.fid_dico = dict(zip(index_list, gdf[fid_column].tolist()))
+        self.org_id_dico = dict(zip(index_list, [set(org_id_list) for org_id_list in gdf[org_id_list_column]]))
+        self.geometry_dico = dict(zip(index_list, geometries))
+        self.buffer_dico = dict(zip(index_list, buffers))
+        self.removed_index_list = []
+
+        # File de priorité : (surface, numéro d'ajout, index), seule la dernière entrée ajoutée pour un polygone est valide
+        self.heap = []
+        self.push_count = 0
+        self.queued_dico = {}
+
+        # Paires de polygones proches (le polygone intersecte le buffer de l'autre), conservées dans les deux sens
+        target_array, candidate_array = shapely.STRtree(geometries).query(buffers, predicate="intersects")
+        keep = target_array != candidate_array
+        target_array, candidate_array = target_array[keep], candidate_array[keep]
+        pairs_array = np.unique(np.concatenate([np.stack([target_array, candidate_array], axis=1), np.stack([candidate_array, target_array], axis=1)]), axis=0).reshape(-1, 2)
+        contact_array = shapely.area(shapely.intersection(geometries[pairs_array[:, 1]], buffers[pairs_array[:, 0]]))
+
+        self.neighbors_dico = {index : {} for index in index_list}
+        for target, candidate, contact in zip(pairs_array[:, 0].tolist(), pairs_array[:, 1].tolist(), contact_array.tolist()):
+            self.neighbors_dico[index_list[target]][index_list[candidate]] = contact
+
+        if debug >= 2:
+            print(cyan + "PolygonsAdjacencyGraph() : " + endC + "%s polygones, %s paires de polygones voisins" %(len(index_list), len(pairs_array) // 2))
+
+    def push(self, index, area):
+        """
+        # ROLE:
+        #   Ajoute (ou replace avec sa nouvelle surface) un polygone dans la file de priorité.
+        """
+        self.push_count += 1
+        self.queued_dico[index] = self.push_count
+        heapq.heappush(self.heap, (area, self.push_count, index))
+        return
+
+    def pop(self):
+        """
+        # ROLE:
+        #   Retire de la file de priorité le polygone de plus petite surface.
+        # RETURNS:
+        #     l'index du polygone ou None si la file est vide.
+        """
+        while self.heap:
+            area, push_number, index = heapq.heappop(self.heap)
+            if self.queued_dico.get(index) == push_number:
+                del self.queued_dico[index]
+                return index
+        return None
+
+    def findAdjacent(self, index):
+        """
+        # ROLE:
+        #   Recherche des polygones adjacents (hors polygones de même FID, de même id d'origine ou de géometrie identique).
+        # RETURNS:
+        #     la liste des index des polygones adjacents par ordre de lineaire de contact
+        """
+        fid = self.fid_dico[index]
+        org_id_set = self.org_id_dico[index]
+        geometry = self.geometry_dico[index]
+        adjacent_list = []
+        for adjacent_index, contact in self.neighbors_dico[index].items():
+            if contact > THRESHOLD_CONTACT_AREA and self.fid_dico[adjacent_index] != fid and org_id_set.isdisjoint(self.org_id_dico[adjacent_index]) and self.geometry_dico[adjacent_index] != geometry :
+                adjacent_list.append((contact, adjacent_index))
+        adjacent_list.sort(key=lambda item: item[0], reverse=True)
+        return [adjacent_index for contact, adjacent_index in adjacent_list]
+
+    def merge(self, index_keep, index_removed, new_geometry, new_org_id_list):
+        """
+        # ROLE:
+        #   Met à jour le graphe après la fusion d'un polygone dans un polygone voisin : le polygone fusionné est retiré
+        #   et les contacts du polygone conservé avec les voisins des deux polygones sont recalculés.
+        #
+        # PARAMETERS:
+        #     index_keep : index du polygone conservé.
+        #     index_removed : index du polygone fusionné (supprimé).
+        #     new_geometry : la géometrie issue de la fusion.
+        #     new_org_id_list : la liste des id d'origine issue de la fusion.
+        """
+        neighbors_removed_dico = self.neighbors_dico.pop(index_removed)
+        for index in neighbors_removed_dico:
+            self.neighbors_dico[index].pop(index_removed, None)
+        for dico in (self.fid_dico, self.org_id_dico, self.geometry_dico, self.buffer_dico, self.queued_dico):
+            dico.pop(index_removed, None)
+        self.removed_index_list.append(index_removed)
+
+        new_buffer = new_geometry.buffer(self.buffer_tolerance)
+        self.geometry_dico[index_keep] = new_geometry
+        self.buffer_dico[index_keep] = new_buffer
+        self.org_id_dico[index_keep] = set(new_org_id_list)
+
+        # Voisinage local : voisins du polygone conservé et du polygone fusionné
+        neighbors_index_list = sorted((set(self.neighbors_dico[index_keep]) | set(neighbors_removed_dico)) - set([index_keep, index_removed]))
+        neighbors_keep_dico = {}
+        if neighbors_index_list:
+            geometries = np.array([self.geometry_dico[index] for index in neighbors_index_list], dtype=object)
+            buffers = np.array([self.buffer_dico[index] for index in neighbors_index_list], dtype=object)
+            contact_keep_array = shapely.area(shapely.intersection(geometries, new_buffer))
+            contact_neighbor_array = shapely.area(shapely.intersection(new_geometry, buffers))
+            for index, contact_keep, contact_neighbor in zip(neighbors_index_list, contact_keep_array.tolist(), contact_neighbor_array.tolist()):
+                neighbors_keep_dico[index] = contact_keep
+                self.neighbors_dico[index][index_keep] = contact_neighbor
+        self.neighbors_dico[index_keep] = neighbors_keep_dico
+        return
+
 ###########################################################################################################################################
 # FUNCTION computeMillerCompactnessIndex()                                                                                                #
 ###########################################################################################################################################
@@ -430,82 +561,77 @@ def mergeSmallPolygons(gdf, threshold_small_area_poly=THRESHOLD_SMALL_AREA_POLY,
 
     # Récupère les petits polygones en fonction d'un seuil
     gdf['geometry'] = gdf['geometry'].buffer(0)
+    gdf = gdf.reset_index(drop=True)
     gdf_small_area = gdf[gdf[area_column] < threshold_small_area_poly]
-    gdf_small_area = gdf_small_area.sort_values(by=area_column, ascending=True)
 
     if debug >= 1:
         print(cyan + "mergeSmallPolygons() : " + endC +"length small polygon list:", len(gdf_small_area))
         print(cyan + "mergeSmallPolygons() : " + endC +"length polygons list:", len(gdf))
 
-    # List of small polygons FID
-    l_small_poly = gdf_small_area[fid_column].tolist()
+    # Graphe d'adjacence et file de priorité des petits polygones par surface
+    adjacency_graph = PolygonsAdjacencyGraph(gdf, fid_column, org_id_list_column)
+    for idx_small_poly, area_small_poly in zip(gdf_small_area.index.tolist(), gdf_small_area[area_column].tolist()):
+        adjacency_graph.push(idx_small_poly, area_small_poly)
 
     # Iterate over small polygons
-    while len(l_small_poly) > 0:
+    while True:
 
         # Get small polygon fields
-        FID_small_poly = l_small_poly.pop(0)
-        row_small_poly = gdf.loc[gdf[fid_column] == FID_small_poly]
-        geom_small_poly = row_small_poly["geometry"].values[0]
-        area_small_poly = row_small_poly[area_column].values[0]
-        orig_id_l_small_poly = row_small_poly[org_id_list_column].values[0]
+        idx_small_poly = adjacency_graph.pop()
+        if idx_small_poly is None:
+            break
+        FID_small_poly = gdf.at[idx_small_poly, fid_column]
+        geom_small_poly = gdf.at[idx_small_poly, "geometry"]
+        area_small_poly = gdf.at[idx_small_poly, area_column]
+        orig_id_l_small_poly = gdf.at[idx_small_poly, org_id_list_column]
 
         # Get adjacent polygons
-        adj_fid_list = findAdjacentPolygons(gdf, row_small_poly, fid_column, org_id_list_column)
+        adj_idx_list = adjacency_graph.findAdjacent(idx_small_poly)
 
         # Case when polygon is isolated (no neighbors)
-        if not adj_fid_list:
+        if not adj_idx_list:
             if debug >= 2:
                 print(cyan + "mergeSmallPolygons() : " + endC + "fid: %s, no adjacent polygons" %(FID_small_poly))
             continue
 
-        adj_fid = adj_fid_list[0]
+        idx_adj_poly = adj_idx_list[0]
+        best_fid_geom = gdf.at[idx_adj_poly, fid_column]
         if debug >= 3:
-            print(cyan + "mergeSmallPolygons() : " + endC + "fid: %s, adjacent %s "%(FID_small_poly, adj_fid))
-        gdf_adj_select_poly = gdf[gdf[fid_column].isin([adj_fid])].copy()
+            print(cyan + "mergeSmallPolygons() : " + endC + "fid: %s, adjacent %s "%(FID_small_poly, best_fid_geom))
 
-        # Merge polygons with every of its adjacent polygons
-        gdf_adj_select_poly = gdf_adj_select_poly.copy()
-        merged_geometries = []
-        for geom in gdf_adj_select_poly["geometry"]:
-            merged_geometry = geom.union(geom_small_poly)
-            merged_geometries.append(merged_geometry)
-        gdf_adj_select_poly['geom_merged'] = merged_geometries
+        # Merge polygon with its adjacent polygon
+        new_geom = gdf.at[idx_adj_poly, "geometry"].union(geom_small_poly)
         if clean_ring :
-            gdf_adj_select_poly['geom_merged'] = gdf_adj_select_poly['geom_merged'].apply(removeRing)
+            new_geom = removeRing(new_geom)
 
         # Fusionner les multi-polygons (ne marche pas!!)
-        gdf_adj_select_poly = gdf_adj_select_poly[gdf_adj_select_poly['geom_merged'].apply(lambda geom: geom.geom_type in ['Polygon','MultiPolygon'])]
-
-        if gdf_adj_select_poly.empty :
+        if new_geom.geom_type not in ['Polygon','MultiPolygon'] :
             if debug >= 1:
                 print(cyan + "mergeSmallPolygons() : " + endC + "fid: %s, EMPTY_CASE" %(FID_small_poly))
             continue
 
-        new_geom = gdf_adj_select_poly["geom_merged"].values[0]
-        new_area = gdf_adj_select_poly[area_column].values[0] + area_small_poly
-        new_org_id_list = gdf_adj_select_poly[org_id_list_column].values[0] + orig_id_l_small_poly
+        new_area = gdf.at[idx_adj_poly, area_column] + area_small_poly
+        new_org_id_list = gdf.at[idx_adj_poly, org_id_list_column] + orig_id_l_small_poly
         new_org_id_list = list(set(new_org_id_list))
 
-        # Récupère le FID du polygone merged et updates des champs de la nouvelle geometrie
-        best_fid_geom = gdf_adj_select_poly[fid_column].values[0]
-
         # Maj fields
-        idx_row_to_change = gdf.loc[gdf[fid_column] == best_fid_geom].index[0]
-        gdf.at[idx_row_to_change, "geometry"] = new_geom
-        gdf.at[idx_row_to_change, area_column] = new_area
-        gdf.at[idx_row_to_change, org_id_list_column] = new_org_id_list
+        gdf.at[idx_adj_poly, "geometry"] = new_geom
+        gdf.at[idx_adj_poly, area_column] = new_area
+        gdf.at[idx_adj_poly, org_id_list_column] = new_org_id_list
 
-        # Remove the small polygon that have been merged
-        gdf = gdf.drop(gdf.loc[gdf[fid_column] == FID_small_poly].index[0])
-        gdf.reset_index(drop=True, inplace=True)
+        # Remove the small polygon that have been merged (mise à jour locale du graphe d'adjacence)
+        adjacency_graph.merge(idx_adj_poly, idx_small_poly, new_geom, new_org_id_list)
 
-        # Add FID of merged polygon to the list of polygons if the geometry area < threshold
-        if new_area <= threshold_small_area_poly and not best_fid_geom in l_small_poly :
-            l_small_poly.append(best_fid_geom)
+        # Add merged polygon to the queue of polygons if the geometry area < threshold
+        if new_area <= threshold_small_area_poly :
+            adjacency_graph.push(idx_adj_poly, new_area)
             if debug >= 1:
                 print(cyan + "mergeSmallPolygons() : " + endC + 'ajout FID {} to dataframe small poly'.format(best_fid_geom))
 
+    # Suppression des polygones fusionnés
+    gdf = gdf.drop(adjacency_graph.removed_index_list)
+    gdf.reset_index(drop=True, inplace=True)
+
     if debug >= 1:
         print(cyan + "mergeSmallPolygons() : " + endC +"Fin des traitements des petits polygones nouveaux polygons list:", len(gdf))
 
@@ -539,6 +665,7 @@ def mergePolygonsWithConds(gdf, threshold_medium_area_poly, threshold_area_poly_
     # Constantes
 
     # Calcul surface polygons
+    gdf = gdf.reset_index(drop=True)
     gdf[area_column] = gdf.geometry.area
     # Récupère les petits polygones en fonction d'un seuil
     gdf_poly_urban = gdf[(gdf["maj_ocs"].isin(urban_class_list)) & (gdf[area_column] <= threshold_area_poly_urban)].copy()
@@ -546,25 +673,29 @@ def mergePolygonsWithConds(gdf, threshold_medium_area_poly, threshold_area_poly_
     gdf_poly_rural = gdf[(~gdf["maj_ocs"].isin(urban_class_list)) & (gdf[area_column] <= threshold_area_poly_rural)].copy()
     gdf_poly_rural["threshold_area"] = threshold_area_poly_rural
     # Fusion
-    gdf_poly = gpd.GeoDataFrame(pd.concat([gdf_poly_urban, gdf_poly_rural], ignore_index=True), crs=gdf.crs)
+    gdf_poly = gpd.GeoDataFrame(pd.concat([gdf_poly_urban, gdf_poly_rural]), crs=gdf.crs)
 
     if debug >= 1:
         print(cyan + "mergePolygonsWithConds() : " + endC + "length polygons medium list:", len(gdf_poly))
         print(cyan + "mergePolygonsWithConds() : " + endC + "length polygons list:", len(gdf))
 
-    # Sort polygons by size
-    gdf_poly = gdf_poly.sort_values(by=area_column, ascending=True)
-    l_poly = gdf_poly[fid_column].tolist()
+    # Graphe d'adjacence et file de priorité des polygones par surface
+    adjacency_graph = PolygonsAdjacencyGraph(gdf, fid_column, org_id_list_column)
+    for idx_poly, area_poly in zip(gdf_poly.index.tolist(), gdf_poly[area_column].tolist()):
+        adjacency_graph.push(idx_poly, area_poly)
 
     # Iterate over polygons
-    while len(l_poly) > 0:
+    while True:
 
         # Get polygon fields
-        FID_poly = l_poly.pop(0)
+        idx_poly = adjacency_graph.pop()
+        if idx_poly is None:
+            break
+        FID_poly = gdf.at[idx_poly, fid_column]
         if debug >= 3:
             print(cyan + "mergePolygonsWithConds() : " + endC +"FID", FID_poly)
 
-        row_medium_poly = gdf.loc[gdf[fid_column] == FID_poly]
+        row_medium_poly = gdf.loc[[idx_poly]]
         geom_poly = row_medium_poly["geometry"].values[0]
         area_poly = row_medium_poly[area_column].values[0]
         mean_haut_poly = row_medium_poly["mean_haut"].values[0]
@@ -578,16 +709,16 @@ def mergePolygonsWithConds(gdf, threshold_medium_area_poly, threshold_area_poly_
             threshold_area = threshold_area_poly_rural
 
         # Get Adjacent Polygons
-        adj_fid_list = findAdjacentPolygons(gdf, row_medium_poly, fid_column, org_id_list_column)
+        adj_idx_list = adjacency_graph.findAdjacent(idx_poly)
 
         # Case when polygon is isolated (no neighbors)
-        if not adj_fid_list:
+        if not adj_idx_list:
             if debug >= 2:
                 print(cyan + "mergePolygonsWithConds() : " + endC + "fid: %s, no adjacent polygons" %(FID_poly))
             continue
 
-        adj_fid_list = adj_fid_list[:max_adjacent_neighbor]
-        gdf_adj_poly = gdf[gdf[fid_column].isin(adj_fid_list)].copy()
+        adj_idx_list = sorted(adj_idx_list[:max_adjacent_neighbor])
+        gdf_adj_poly = gdf.loc[adj_idx_list].copy()
 
         # Merge polygons with every of its adjacent polygons
         merged_geometries = []
@@ -692,7 +823,7 @@ def mergePolygonsWithConds(gdf, threshold_medium_area_poly, threshold_area_poly_
                 new_stat_maj = ((gdf_adj_poly["geometry"].values[0].area * (gdf_adj_poly["stat_maj"].values[0] / 100)) / (area_poly + gdf_adj_poly["geometry"].values[0].area )) * 100
 
         # Maj fields
-        idx_row_to_change = gdf.loc[gdf[fid_column] == fid_best_dist_eucl].index[0]
+        idx_row_to_change = gdf_adj_poly.index[0]
         gdf.at[idx_row_to_change, "geometry"] = new_geom
         gdf.at[idx_row_to_change, "mean_haut"] = new_mean_haut
         gdf.at[idx_row_to_change, "maj_ocs"] = new_maj_ocs
@@ -700,16 +831,19 @@ def mergePolygonsWithConds(gdf, threshold_medium_area_poly, threshold_area_poly_
         gdf.at[idx_row_to_change, area_column] = new_geom.area
         gdf.at[idx_row_to_change, org_id_list_column] = new_org_id_list
 
-        # Remove the polygon that have been merged
-        gdf = gdf.drop(gdf.loc[gdf[fid_column] == FID_poly].index[0])
-        gdf.reset_index(drop=True, inplace=True)
+        # Remove the polygon that have been merged (mise à jour locale du graphe d'adjacence)
+        adjacency_graph.merge(idx_row_to_change, idx_poly, new_geom, new_org_id_list)
 
-        # Add FID of merged polygon to the list of polygons if the geometry area <= (factor_area_max x threshold_area)
-        if new_geom.area <= (factor_area_max * threshold_area) and not fid_best_dist_eucl in l_poly:
-            l_poly.append(fid_best_dist_eucl)
+        # Add merged polygon to the queue of polygons if the geometry area <= (factor_area_max x threshold_area)
+        if new_geom.area <= (factor_area_max * threshold_area) :
+            adjacency_graph.push(idx_row_to_change, new_geom.area)
             if debug >= 2:
                 print(cyan + "mergePolygonsWithConds() : " + endC + 'ajout FID {} to dataframe medium poly'.format(fid_best_dist_eucl))
 
+    # Suppression des polygones fusionnés
+    gdf = gdf.drop(adjacency_graph.removed_index_list)
+    gdf.reset_index(drop=True, inplace=True)
+
     if debug >= 1:
         print(cyan + "mergePolygonsWithConds() : " + endC +"Fin des traitements des polygones moyens nouveaux polygons list: ", len(gdf))
     return gdf
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python
+
+#############################################################################################################################################
+# Copyright (©) CEREMA/DTerOCC/DT/OSECC  All rights reserved.                                                                               #
+#############################################################################################################################################
+
+#############################################################################################################################################
+#                                                                                                                                           #
+# CACHE DES COMMANDES DU SEQUENCEUR : EXECUTION INCREMENTALE DES COMMANDES DONT LES RESULTATS SONT A JOUR                                   #
+#                                                                                                                                           #
+#############################################################################################################################################
+"""
+ Ce module contient le cache des commandes du séquenceur.
+ Chaque commande terminée sans erreur est enregistrée avec une empreinte calculée sur le texte de la commande
+ et sur les dates de modification et tailles (ou le contenu) de ses fichiers d'entrée, ainsi que l'etat de ses fichiers de sortie.
+ Les fichiers d'entrée et de sortie sont déduits des chemins de fichiers présents dans la commande :
+ un fichier créé ou modifié pendant l'execution est une sortie, un fichier existant et inchangé est une entrée.
+ Lors d'une nouvelle execution, une commande dont l'empreinte est identique et dont les sorties sont intactes est marquée terminée sans être relancée.
+"""
+
+# IMPORTS UTILES
+from __future__ import print_function
+import os, sys, re, time, threading, sqlite3, hashlib, json, shlex
+from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+
+EXT_CACHE = "_cache.db"
+OPTION_LOG = "-log"
+# Taille des blocs de lecture pour le calcul du hash du contenu des fichiers
+BLOCK_SIZE_HASH = 1024 * 1024
+
+#############################################################################################
+# FONCTION getCacheFile()                                                                   #
+#############################################################################################
+def getCacheFile(command_doc):
+    """
+    # ROLE :
+    #   La fonction retourne le nom du fichier cache associé au fichier de commandes
+    #   (le cache est conservé d'une execution à l'autre, contrairement au journal)
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #
+    # SORTIES :
+    #   le nom du fichier cache
+    """
+
+    return os.path.splitext(command_doc)[0] + EXT_CACHE
+
+#############################################################################################
+# FONCTION extractFilesCommand()                                                            #
+#############################################################################################
+def extractFilesCommand(command):
+    """
+    # ROLE :
+    #   La fonction extrait de la commande les chemins des fichiers existants (les repertoires sont ignorés)
+    #   Le fichier log commun à toutes les commandes (option -log) n'est ni une entrée ni une sortie et est ignoré
+    #
+    # ENTREES :
+    #   command : le texte de la commande
+    #
+    # SORTIES :
+    #   la liste triée des chemins de fichiers
+    """
+
+    try:
+        token_list = shlex.split(command)
+    except ValueError:
+        token_list = command.split()
+
+    file_set = set()
+    for index_token in range(len(token_list)):
+        if index_token > 0 and token_list[index_token - 1] == OPTION_LOG:
+            continue
+        for path in re.split(r'[,;\s]+', token_list[index_token]):
+            if os.sep in path and os.path.isfile(path):
+                file_set.add(os.path.abspath(path))
+
+    return sorted(file_set)
+
+#############################################################################################
+# FONCTION snapshotFiles()                                                                  #
+#############################################################################################
+def snapshotFiles(path_list, use_hash=False):
+    """
+    # ROLE :
+    #   La fonction relève l'etat (date de modification, taille et éventuellement hash du contenu) d'une liste de fichiers
+    #
+    # ENTREES :
+    #   path_list : la liste des fichiers
+    #   use_hash : calcul du hash du contenu des fichiers, par defaut False
+    #
+    # SORTIES :
+    #   dictionnaire chemin -> [mtime_ns, taille, hash], les fichiers absents sont ignorés
+    """
+
+    snapshot_dico = {}
+    for path in path_list:
+        try:
+            stat_file = os.stat(path)
+        except OSError:
+            continue
+        hash_file = ''
+        if use_hash:
+            sha = hashlib.sha1()
+            with open(path, 'rb') as file_work:
+                for block in iter(lambda: file_work.read(BLOCK_SIZE_HASH), b''):
+                    sha.update(block)
+            hash_file = sha.hexdigest()
+        snapshot_dico[path] = [stat_file.st_mtime_ns, stat_file.st_size, hash_file]
+
+    return snapshot_dico
+
+#############################################################################################
+# CLASSE CommandsCache()                                                                    #
+#############################################################################################
+class CommandsCache:
+    """
+    # ROLE :
+    #   Cache des commandes : enregistre l'empreinte des commandes terminées et teste si une commande est à jour
+    """
+
+    def __init__(self, cache_file, use_hash=False, debug=0):
+        self.cache_file = cache_file
+        self.use_hash = use_hash
+        self.debug = debug
+        self.lock = threading.Lock()
+        self.start_snapshot_dico = {}
+        self.connection = sqlite3.connect(cache_file, timeout=60, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, command TEXT, inputs TEXT, fingerprint TEXT, outputs TEXT, date TEXT)")
+
+    def getKey(self, command):
+        """
+        # ROLE :
+        #   Retourne la clé du cache d'une commande (hash du texte de la commande)
+        """
+
+        return hashlib.sha256(command.strip().encode('utf-8')).hexdigest()
+
+    def getFingerprint(self, command, inputs_snapshot_dico):
+        """
+        # ROLE :
+        #   Calcule l'empreinte d'une commande a partir de son texte et de l'etat de ses fichiers d'entrée
+        """
+
+        sha = hashlib.sha256(command.strip().encode('utf-8'))
+        for path in sorted(inputs_snapshot_dico):
+            mtime, size, hash_file = inputs_snapshot_dico[path]
+            if self.use_hash:
+                sha.update((path + '|' + str(size) + '|' + hash_file + '\n').encode('utf-8'))
+            else:
+                sha.update((path + '|' + str(mtime) + '|' + str(size) + '\n').encode('utf-8'))
+        return sha.hexdigest()
+
+    def isUpToDate(self, command):
+        """
+        # ROLE :
+        #   Teste si une commande est à jour : même empreinte (texte et entrées) que lors de sa derniere execution correcte
+        #   et fichiers de sortie présents et inchangés depuis
+        #
+        # ENTREES :
+        #   command : le texte de la commande
+        #
+        # SORTIES :
+        #   True si la commande peut etre marquée terminée sans être relancée, False sinon
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT inputs, fingerprint, outputs FROM cache WHERE key = ?", (self.getKey(command),)).fetchone()
+        if row is None:
+            return False
+
+        inputs_list = json.loads(row[0])
+        outputs_dico = json.loads(row[2])
+
+        # Une commande sans sortie identifiée est toujours relancée
+        if outputs_dico == {}:
+            return False
+
+        inputs_snapshot_dico = snapshotFiles(inputs_list, self.use_hash)
+        if len(inputs_snapshot_dico) != len(inputs_list):
+            return False
+        if self.getFingerprint(command, inputs_snapshot_dico) != row[1]:
+            return False
+
+        outputs_snapshot_dico = snapshotFiles(list(outputs_dico), False)
+        for path in outputs_dico:
+            if path not in outputs_snapshot_dico or outputs_snapshot_dico[path][0:2] != outputs_dico[path][0:2]:
+                return False
+
+        return True
+
+    def startCommand(self, id_command, command):
+        """
+        # ROLE :
+        #   Releve l'etat des fichiers de la commande avant son execution
+        """
+
+        snapshot_dico = snapshotFiles(extractFilesCommand(command), False)
+        with self.lock:
+            self.start_snapshot_dico[id_command] = snapshot_dico
+        return
+
+    def endCommand(self, id_command, command, ok):
+        """
+        # ROLE :
+        #   Enregistre dans le cache une commande terminée correctement : les fichiers créés ou modifiés pendant l'execution sont ses sorties,
+        #   les fichiers existants et inchangés sont ses entrées
+        #
+        # ENTREES :
+        #   id_command : l'identifiant de la commande
+        #   command : le texte de la commande
+        #   ok : True si la commande est terminée sans erreur
+        """
+
+        with self.lock:
+            start_snapshot_dico = self.start_snapshot_dico.pop(id_command, None)
+        if start_snapshot_dico is None or not ok:
+            return
+
+        end_snapshot_dico = snapshotFiles(extractFilesCommand(command), False)
+        inputs_list = []
+        outputs_dico = {}
+        for path in end_snapshot_dico:
+            if path in start_snapshot_dico and start_snapshot_dico[path][0:2] == end_snapshot_dico[path][0:2]:
+                inputs_list.append(path)
+            else:
+                outputs_dico[path] = end_snapshot_dico[path]
+
+        fingerprint = self.getFingerprint(command, snapshotFiles(inputs_list, self.use_hash))
+        with self.lock:
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?,?,?)", (self.getKey(command), command.strip(), json.dumps(inputs_list), fingerprint, json.dumps(outputs_dico), time.strftime('%d/%m/%y %H:%M:%S',time.localtime())))
+
+        if self.debug >= 3:
+            print(cyan + "CommandsCache.endCommand : " + endC + "commande " + str(id_command) + " enregistrée : " + str(len(inputs_list)) + " entrées, " + str(len(outputs_dico)) + " sorties" + endC)
+        return
+
+    def close(self):
+        """
+        # ROLE :
+        #   Ferme le cache
+        """
+
+        self.connection.close()
+        return
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python
+
+#############################################################################################################################################
+# Copyright (©) CEREMA/DTerOCC/DT/OSECC  All rights reserved.                                                                               #
+#############################################################################################################################################
+
+#############################################################################################################################################
+#                                                                                                                                           #
+# FONCTIONS DE GESTION DU JOURNAL (BASE SQLITE) DES ETATS DES COMMANDES DU SEQUENCEUR                                                       #
+#                                                                                                                                           #
+#############################################################################################################################################
+"""
+ Ce module contient les fonctions de gestion du journal des commandes du séquenceur.
+ Le journal est une base SQLite (mode WAL) placée à côté du fichier de commandes (Commands.txt -> Commands.db),
+ indexée par id de commande, qui contient l'état de chaque commande et la table d'adjacence de leurs dépendances.
+ Les changements d'état ne mettent à jour que les lignes concernées au lieu de réécrire tout le fichier texte,
+ le fichier texte est regénéré à partir du journal en fin d'exécution et lors des reprises.
+"""
+
+# IMPORTS UTILES
+from __future__ import print_function
+import os, sqlite3
+from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+from Lib_file import removeFile
+from Settings import *
+
+EXT_JOURNAL = ".db"
+
+# Structure d'une commande
+class StructCommand:
+    def __init__(self):
+        self.idCommand = 0
+        self.state = ''
+        self.dependency = ''
+        self.dependencyList = []
+        self.successorList = []
+        self.nbDependencyWaiting = 0
+        self.nameTask = ''
+        self.action = ''
+        self.errorManagement = ''
+        self.computerExecution = ''
+        self.login = ''
+        self.password = ''
+        self.startDate = ''
+        self.endDate = ''
+        self.commandToExecute = ''
+        self.cpu = 1
+        self.ram = 0
+
+#############################################################################################
+# FONCTION getJournalFile()                                                                 #
+#############################################################################################
+def getJournalFile(command_doc):
+    """
+    # ROLE :
+    #   La fonction retourne le nom du fichier journal associé au fichier de commandes
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #
+    # SORTIES :
+    #   le nom du fichier journal
+    """
+
+    return os.path.splitext(command_doc)[0] + EXT_JOURNAL
+
+#############################################################################################
+# FONCTION existJournal()                                                                   #
+#############################################################################################
+def existJournal(command_doc):
+    """
+    # ROLE :
+    #   La fonction teste si le journal associé au fichier de commandes existe
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #
+    # SORTIES :
+    #   True si le journal existe, False sinon
+    """
+
+    return os.path.isfile(getJournalFile(command_doc))
+
+#############################################################################################
+# FONCTION openJournal()                                                                    #
+#############################################################################################
+def openJournal(command_doc):
+    """
+    # ROLE :
+    #   La fonction ouvre une connexion sur le journal, chaque thread doit utiliser sa propre connexion
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #
+    # SORTIES :
+    #   la connexion sqlite3
+    """
+
+    connection = sqlite3.connect(getJournalFile(command_doc), timeout=60)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+#############################################################################################
+# FONCTION parseCommandLine()                                                               #
+#############################################################################################
+def parseCommandLine(command_line):
+    """
+    # ROLE :
+    #   La fonction convertit une ligne du fichier de commandes en structure commande
+    #
+    # ENTREES :
+    #   command_line : la ligne de commande
+    #
+    # SORTIES :
+    #   la commande (StructCommand)
+    """
+
+    element_command_list = command_line.replace('\n','').split(SEPARATOR)
+    command_struct = StructCommand()
+    command_struct.state = element_command_list[0]
+    command_struct.idCommand = int(element_command_list[1])
+    command_struct.dependency = element_command_list[2]
+    if element_command_list[2] != '':
+        command_struct.dependencyList = [int(id_depend) for id_depend in element_command_list[2].split(',') if id_depend.strip().isdigit()]
+    command_struct.nameTask = element_command_list[3]
+    command_struct.action = element_command_list[4]
+    command_struct.errorManagement = element_command_list[5]
+    command_struct.computerExecution = element_command_list[6]
+    command_struct.login = element_command_list[7]
+    command_struct.password = element_command_list[8]
+    command_struct.startDate = element_command_list[9]
+    command_struct.endDate = element_command_list[10]
+    command_struct.commandToExecute = SEPARATOR.join(element_command_list[11:])
+
+    return command_struct
+
+#############################################################################################
+# FONCTION formatCommandLine()                                                              #
+#############################################################################################
+def formatCommandLine(command_struct):
+    """
+    # ROLE :
+    #   La fonction convertit une commande en ligne du fichier de commandes
+    #
+    # ENTREES :
+    #   command_struct : la commande (StructCommand)
+    #
+    # SORTIES :
+    #   la ligne de commande (terminée par un retour chariot)
+    """
+
+    return command_struct.state + SEPARATOR + str(command_struct.idCommand) + SEPARATOR + command_struct.dependency + SEPARATOR + command_struct.nameTask + SEPARATOR + command_struct.action + SEPARATOR + command_struct.errorManagement + SEPARATOR + command_struct.computerExecution + SEPARATOR + command_struct.login + SEPARATOR + command_struct.password + SEPARATOR + command_struct.startDate + SEPARATOR + command_struct.endDate + SEPARATOR + command_struct.commandToExecute + '\n'
+
+#############################################################################################
+# FONCTION createJournal()                                                                  #
+#############################################################################################
+def createJournal(command_doc, debug):
+    """
+    # ROLE :
+    #   La fonction crée (ou recrée) le journal à partir du fichier de commandes texte
+    #   et précalcule la table d'adjacence des dépendances (les dépendances inconnues du fichier sont ignorées)
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #   debug : niveau de trace log
+    #
+    # SORTIES :
+    #   le nombre de commandes du journal
+    """
+
+    try:
+        # Ouverture du fichier de commande et chargement de toutes les lignes
+        command_doc_work = open(command_doc,'r')
+        commands_list = command_doc_work.readlines()
+        command_doc_work.close()
+    except:
+        raise NameError(cyan + "createJournal : " + endC + bold + red + "Can't open file: \"" + command_doc + '\n' + endC)
+
+    journal_file = getJournalFile(command_doc)
+    for ext in ["", "-wal", "-shm"]:
+        if os.path.isfile(journal_file + ext):
+            removeFile(journal_file + ext)
+
+    command_struct_list = [parseCommandLine(command_line) for command_line in commands_list if command_line.strip() != '']
+    id_commands_set = set([command_struct.idCommand for command_struct in command_struct_list])
+
+    connection = openJournal(command_doc)
+    with connection:
+        connection.execute("CREATE TABLE commands (id_command INTEGER PRIMARY KEY, position INTEGER, state TEXT, dependency TEXT, name_task TEXT, action TEXT, error_management TEXT, computer TEXT, login TEXT, password TEXT, start_date TEXT, end_date TEXT, command TEXT)")
+        connection.execute("CREATE TABLE dependencies (id_command INTEGER, id_depend INTEGER)")
+        connection.executemany("INSERT INTO commands VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", [(command_struct.idCommand, position, command_struct.state, command_struct.dependency, command_struct.nameTask, command_struct.action, command_struct.errorManagement, command_struct.computerExecution, command_struct.login, command_struct.password, command_struct.startDate, command_struct.endDate, command_struct.commandToExecute) for position, command_struct in enumerate(command_struct_list)])
+        connection.executemany("INSERT INTO dependencies VALUES (?,?)", [(command_struct.idCommand, id_depend) for command_struct in command_struct_list for id_depend in command_struct.dependencyList if id_depend in id_commands_set])
+        connection.execute("CREATE INDEX idx_commands_state ON commands (state)")
+        connection.execute("CREATE INDEX idx_dependencies_command ON dependencies (id_command)")
+        connection.execute("CREATE INDEX idx_dependencies_depend ON dependencies (id_depend)")
+    connection.close()
+
+    if debug >= 3:
+        print(cyan + "createJournal : " + endC + "Journal " + journal_file + " : " + str(len(command_struct_list)) + " commandes" + endC)
+
+    return len(command_struct_list)
+
+#############################################################################################
+# FONCTION readJournal()                                                                    #
+#############################################################################################
+def readJournal(command_doc, debug):
+    """
+    # ROLE :
+    #   La fonction lit toutes les commandes du journal avec leurs dépendances et leurs successeurs
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #   debug : niveau de trace log
+    #
+    # SORTIES :
+    #   commands_dico : dictionnaire des commandes (StructCommand) par id de commande
+    #   id_commands_list : liste des id de commandes dans l'ordre du fichier
+    """
+
+    commands_dico = {}
+    id_commands_list = []
+
+    connection = openJournal(command_doc)
+    for row in connection.execute("SELECT id_command, state, dependency, name_task, action, error_management, computer, login, password, start_date, end_date, command FROM commands ORDER BY position"):
+        command_struct = StructCommand()
+        command_struct.idCommand, command_struct.state, command_struct.dependency, command_struct.nameTask, command_struct.action, command_struct.errorManagement, command_struct.computerExecution, command_struct.login, command_struct.password, command_struct.startDate, command_struct.endDate, command_struct.commandToExecute = row
+        command_struct.dependencyList = []
+        command_struct.successorList = []
+        commands_dico[command_struct.idCommand] = command_struct
+        id_commands_list.append(command_struct.idCommand)
+
+    for id_command, id_depend in connection.execute("SELECT id_command, id_depend FROM dependencies"):
+        commands_dico[id_command].dependencyList.append(id_depend)
+        commands_dico[id_depend].successorList.append(id_command)
+    connection.close()
+
+    if debug >= 4:
+        print(cyan + "readJournal : " + endC + "Nombre de commandes du journal : " + str(len(id_commands_list)) + endC)
+
+    return commands_dico, id_commands_list
+
+#############################################################################################
+# FONCTION updateJournalStates()                                                            #
+#############################################################################################
+def updateJournalStates(command_doc, update_list, debug):
+    """
+    # ROLE :
+    #   La fonction met à jour l'etat d'une liste de commandes du journal en une seule transaction
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #   update_list : liste de tuples (id_command, state, computer, start_date, end_date), une valeur None laisse le champ inchangé
+    #   debug : niveau de trace log
+    #
+    # SORTIES :
+    #   N.A.
+    """
+
+    if update_list == []:
+        return
+
+    connection = openJournal(command_doc)
+    with connection:
+        connection.executemany("UPDATE commands SET state = ?, computer = COALESCE(?, computer), start_date = COALESCE(?, start_date), end_date = COALESCE(?, end_date) WHERE id_command = ?", [(state, computer, start_date, end_date, id_command) for id_command, state, computer, start_date, end_date in update_list])
+    connection.close()
+
+    if debug >= 4:
+        print(cyan + "updateJournalStates : " + endC + "commandes mises à jour : " + str(update_list) + endC)
+
+    return
+
+#############################################################################################
+# FONCTION selectReadyCommandJournal()                                                      #
+#############################################################################################
+def selectReadyCommandJournal(command_doc, debug):
+    """
+    # ROLE :
+    #   La fonction met à jour les commandes en attente ou bloquées selon l'etat de leurs dépendances
+    #   et retourne la première commande (dans l'ordre du fichier) dont toutes les dépendances sont terminées
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #   debug : niveau de trace log
+    #
+    # SORTIES :
+    #   la commande prête (StructCommand) ou None
+    """
+
+    command_struct = None
+
+    connection = openJournal(command_doc)
+    with connection:
+        # Les commandes dependantes d'une commande en erreur ou bloquée sont bloquées (propagation jusqu'à stabilité)
+        while connection.execute("UPDATE commands SET state = ? WHERE state IN (?, ?) AND id_command IN (SELECT d.id_command FROM dependencies d JOIN commands c ON c.id_command = d.id_depend WHERE c.state IN (?, ?))", (TAG_STATE_LOCK, TAG_STATE_MAKE, TAG_STATE_WAIT, TAG_STATE_ERROR, TAG_STATE_LOCK)).rowcount > 0:
+            pass
+
+        # Les commandes dont une dépendance n'est pas terminée sont en attente
+        connection.execute("UPDATE commands SET state = ? WHERE state = ? AND id_command IN (SELECT d.id_command FROM dependencies d JOIN commands c ON c.id_command = d.id_depend WHERE c.state != ?)", (TAG_STATE_WAIT, TAG_STATE_MAKE, TAG_STATE_END))
+
+        row = connection.execute("SELECT id_command, state, dependency, name_task, action, error_management, computer, login, password, start_date, end_date, command FROM commands WHERE state IN (?, ?) AND id_command NOT IN (SELECT d.id_command FROM dependencies d JOIN commands c ON c.id_command = d.id_depend WHERE c.state != ?) ORDER BY position LIMIT 1", (TAG_STATE_MAKE, TAG_STATE_WAIT, TAG_STATE_END)).fetchone()
+        if row is not None:
+            command_struct = StructCommand()
+            command_struct.idCommand, command_struct.state, command_struct.dependency, command_struct.nameTask, command_struct.action, command_struct.errorManagement, command_struct.computerExecution, command_struct.login, command_struct.password, command_struct.startDate, command_struct.endDate, command_struct.commandToExecute = row
+    connection.close()
+
+    if debug >= 4 and command_struct is not None:
+        print(cyan + "selectReadyCommandJournal : " + endC + "commande prête : " + str(command_struct.idCommand) + endC)
+
+    return command_struct
+
+#############################################################################################
+# FONCTION existCommandToProcessJournal()                                                   #
+#############################################################################################
+def existCommandToProcessJournal(command_doc):
+    """
+    # ROLE :
+    #   La fonction teste s'il reste des commandes à faire, en attente ou en cours dans le journal
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #
+    # SORTIES :
+    #   True s'il reste des commandes à traiter, False si toutes les commandes sont terminées, en erreur ou bloquées
+    """
+
+    connection = openJournal(command_doc)
+    row = connection.execute("SELECT COUNT(*) FROM commands WHERE state NOT IN (?, ?, ?)", (TAG_STATE_END, TAG_STATE_ERROR, TAG_STATE_LOCK)).fetchone()
+    connection.close()
+
+    return row[0] > 0
+
+#############################################################################################
+# FONCTION resetJournalErrors()                                                             #
+#############################################################################################
+def resetJournalErrors(command_doc, debug):
+    """
+    # ROLE :
+    #   La fonction passe toutes les commandes en erreur, bloquées ou en cours du journal à l'etat à faire (reprise apres bug)
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #   debug : niveau de trace log
+    #
+    # SORTIES :
+    #   N.A.
+    """
+
+    connection = openJournal(command_doc)
+    with connection:
+        nb_reset = connection.execute("UPDATE commands SET state = ?, start_date = '', end_date = '' WHERE state IN (?, ?, ?)", (TAG_STATE_MAKE, TAG_STATE_ERROR, TAG_STATE_LOCK, TAG_STATE_RUN)).rowcount
+    connection.close()
+
+    if debug >= 2:
+        print(cyan + "resetJournalErrors : " + endC + str(nb_reset) + " commandes remises à l'etat " + TAG_STATE_MAKE + endC)
+
+    return
+
+#############################################################################################
+# FONCTION exportJournal()                                                                  #
+#############################################################################################
+def exportJournal(command_doc, debug):
+    """
+    # ROLE :
+    #   La fonction regénère le fichier de commandes texte à partir de l'etat des commandes du journal
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #   debug : niveau de trace log
+    #
+    # SORTIES :
+    #   N.A.
+    """
+
+    commands_dico, id_commands_list = readJournal(command_doc, debug)
+    command_doc_work = open(command_doc,'w')
+    command_doc_work.writelines([formatCommandLine(commands_dico[id_command]) for id_command in id_commands_list])
+    command_doc_work.close()
+
+    if debug >= 3:
+        print(cyan + "exportJournal : " + endC + "Fichier de commandes regénéré : " + command_doc + endC)
+
+    return
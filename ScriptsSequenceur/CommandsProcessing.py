@@ -16,37 +16,38 @@
 
 # IMPORTS UTILES
 from __future__ import print_function
-import os, sys, stat, time, threading, socket, subprocess, psutil
+import os, sys, stat, time, threading, socket, selectors, subprocess, psutil
 import six
 from pexpect import pxssh
 from Lib_operator import ping, getLocalIp, switch, case
 from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
 from Lib_text import writeTextFile,appendTextFileCR, cleanSpaceText
+from CommandsJournal import existJournal, createJournal, readJournal, updateJournalStates, selectReadyCommandJournal, existCommandToProcessJournal, exportJournal
+from CommandsTelemetry import CommandsTelemetry, getReportFile
 from Settings import *
 
-lock_commands_file = False
+# Evenement de fin de commandes signalé par le serveur d'écoute pour réveiller la boucle d'execution des commandes
+end_commands_event = threading.Event()
 
 #############################################################################################
 # FONCTION executeCommands()                                                                #
 #############################################################################################
-def executeCommands(command_doc, debug, link, port):
+def executeCommands(command_doc, debug, link, port, telemetry=False):
     """
     # ROLE :
-    #   La fonction lit des commandes dans un fichier texte et execute ces commandes en local-direct ou en local-background ou en distant-background
+    #   La fonction lit des commandes dans le journal du fichier de commandes et execute ces commandes en local-direct ou en local-background ou en distant-background
     #
     # ENTREES :
     #   command_doc : fichier dont on lit et execute les commandes
     #   debug : niveau de trace log
     #   link : le lien etenet utilisé
     #   port : le port utiliser pour le serveur gestion des commandes
+    #   telemetry : mesure des ressources de chaque commande et rapport de fin d'execution, par defaut False
     #
     # SORTIES :
     #   N.A.
     """
 
-    # Variable de lock (semaphore) d'acces sur le fichier de commande : command_doc
-    global lock_commands_file
-    lock_commands_file = False
     SERV_PROC_NAME = "TaskSequencer"
 
     print(endC)
@@ -71,160 +72,77 @@ def executeCommands(command_doc, debug, link, port):
     # Prepation d'un nom de base de fichier shell pour l'execution
     base_name_shell_command = os.path.splitext(command_doc)[0]
 
+    # Creation du journal des etats des commandes s'il n'existe pas
+    if not existJournal(command_doc):
+        createJournal(command_doc, debug)
+
+    # Télémétrie des commandes
+    commands_telemetry = None
+    end_commands_callback = None
+    if telemetry:
+        commands_telemetry = CommandsTelemetry(debug)
+        def end_commands_callback(end_commands_list):
+            commands_telemetry.endCommands(end_commands_list)
+            return managementEndCommands(command_doc, end_commands_list, 3)
+
     # Lancer le thead d'ecoute du retour fin de la commande
-    thread = threading.Thread(target=listenReturnCommand, args=(port, command_doc))
+    thread = threading.Thread(target=listenReturnCommand, args=(port, command_doc, end_commands_callback))
     thread.start()
 
     # Boucler tanqu'il a des commandes a traiter
     while exist_command:
-        exist_command = False   # On met exist_command à False. Si exist_command ne repasse pas à True, la boucle d'exécution des commandes va s'arreter
-
-        # Attente du semaphore
-        getSemaphoreLockCommands()
-        try:
-            # Ouverture du fichier de commande et chargement de toutes les lignes
-            command_doc_work = open(command_doc,'r+')
-        except:
-            raise NameError(cyan + "exectuteCommands : " + endC + bold + red + "Can't open file: \"" + command_doc + '\n' + endC)
-
-        # Identification de commands_list comme une liste dont chaque ligne correspond à une commande
-        commands_list = command_doc_work.readlines()
-
-        if debug >= 4:
-            print(cyan + "exectuteCommands : " + endC + "commands_list : " + str (commands_list) + endC)
-
-        for l in range(len(commands_list)):  # Parcours des différentes lignes de commande
-            if debug >= 4:
-                print(cyan + "exectuteCommands : " + endC + "l (numero de la ligne de commande) : " + str (l) + endC)
-
-            # Identification de la premiere commande à faire (non vide et commencant par "A Faire : "
-            # Mise à jour de exist_command (Il reste une commande à faire, la boucle ne s'arrète pas)
-            execute_command = False
-            action = ''
-            if commands_list[l] != "\n" :
-                # gestion des parametres du fichier de commande
-                element_command_list = commands_list[l].split(SEPARATOR)
-                state = element_command_list[0]
-                action = element_command_list[4]
-                id_command = element_command_list[1]
-
-                # Gestion du computeur sur lequel sera executé la commande
-                error_management = element_command_list[5].lower() == 'true'
-                computer_execution = element_command_list[6]
-                if computer_execution == '':
-                    computer_execution = computer_ip
-                login =  element_command_list[7]
-                password =  element_command_list[8]
-
-                # Liste des commandes dependantes
-                dependency_list = []
-                if element_command_list[2] != '':
-                    dependency_list = element_command_list[2].split(',')
-
-                # Récupération de la commande à exécuter
-                command_to_execute = element_command_list[11]
-
-                if state == TAG_STATE_MAKE or state == TAG_STATE_WAIT:
-                    exist_command = True
-                    execute_command = True
-                    shell_command = ''
-                    error_file = ''
-
-                    # Gestion des dependences
-                    if  dependency_list != [] :
-
-                        # On test si toutes les commandes dont dépende la commande a traiter, sont à l'état terminé
-                        command_depend_on_error = False
-                        for id_command_depend in dependency_list:
-                            for c in range(len(commands_list)):
-                                if commands_list[c] != "\n" :
-                                    element_command_c_list = commands_list[c].split(SEPARATOR)
-                                    id_command_c = element_command_c_list[1]
-                                    state_c = element_command_c_list[0]
-                                    if id_command_depend == id_command_c :
-                                        if state_c != TAG_STATE_END:
-                                            execute_command = False
-                                            if state_c == TAG_STATE_ERROR or state_c == TAG_STATE_LOCK :
-                                                command_depend_on_error = True
-                                                exist_command = False
-                                        break
-                            # Optimisation temps pour sortie plus vite de la boucle liste des commandes dependantes
-                            if not execute_command:
-                                break
-
-                        # Si la commande est en attente d'autre commande ou dependant de commande en erreur alors mettre a jour l'etat de la commande
-                        if not execute_command:
-                            if command_depend_on_error :
-                                new_state = TAG_STATE_LOCK
-                            else :
-                                new_state = TAG_STATE_WAIT
-
-                            # Mise a jour de l'etat de la commande
-                            commands_list[l] = new_state + SEPARATOR + str(id_command) + SEPARATOR + element_command_list[2] + SEPARATOR + element_command_list[3] + SEPARATOR + action + SEPARATOR + element_command_list[5] + SEPARATOR + computer_execution + SEPARATOR + login + SEPARATOR + password + SEPARATOR + SEPARATOR + SEPARATOR + command_to_execute
-
-                            if debug >= 4:
-                                print("\n" + cyan + "exectuteCommands : " + blue + "commande en attente : " + endC + str (commands_list[l]))
-
-                            # Mise a jour du fichier de commandes
-                            command_doc_work.seek(0)                     # On se place a partir du debut du document
-                            command_doc_work.truncate()                  # Redimensionne la taille du fichier à vide
-                            command_doc_work.writelines(commands_list)   # Réécriture du fichier de commande avec la ligne modifiée
-                            command_doc_work.flush()                     # Force l'ecriture sur le fichier
-
-            # Execution d'une nouvelle commande
-            if execute_command :
-
-                if debug >= 1:
-                    print(cyan + "exectuteCommands : " + endC + "command_to_execute : " + str (command_to_execute) + endC)
-
-                # Ajout d'infos dans la ligne : ordinateur, date...
-                commands_list[l] = TAG_STATE_RUN + SEPARATOR + str(id_command) + SEPARATOR + element_command_list[2] + SEPARATOR + element_command_list[3] + SEPARATOR + action + SEPARATOR + element_command_list[5] + SEPARATOR + computer_execution + SEPARATOR + login + SEPARATOR + password + SEPARATOR + time.strftime('%d/%m/%y %H:%M:%S',time.localtime()) +  SEPARATOR + SEPARATOR + command_to_execute
-                if debug >= 3:
-                    print(cyan + "exectuteCommands : " + endC + "Nouvelle commande : " + str (commands_list[l]))
-
-                # Mise a jour du fichier de commandes
-                command_doc_work.seek(0)                     # On se place a partir du debut du document
-                command_doc_work.truncate()                  # Redimensionne la taille du fichier à vide
-                command_doc_work.writelines(commands_list)   # Réécriture du fichier de commande avec la ligne modifiée
-                command_doc_work.flush()                     # Force l'ecriture sur le fichier
-
-                # Execution de la commande
-                print(cyan + "exectuteCommands : " + endC + bold + green + "EXECUTION DE LA COMMANDE : " + str (command_to_execute) + endC)
-                new_state = executeCommand(computer_ip, port, id_command, command_to_execute, action, error_management, base_name_shell_command, computer_execution, login, password)
-                if new_state != '':
-                    commands_list = updateEndCommand(commands_list, int(id_command), new_state, debug)
-                    # Mise a jour du fichier de commandes
-                    # On se place à partir du debut du document
-                    command_doc_work.seek(0)
-                    # Redimensionne la taille du fichier à vide
-                    command_doc_work.truncate()
-                    # Réécriture du fichier de commande avec la ligne modifiée
-                    command_doc_work.writelines(commands_list)
-                    # Force l'ecriture sur le fichier
-                    command_doc_work.flush()
-
-                # Arret de la boucle sur les lignes pour reprendre la lecture des commandes depuis le début (d'autres scripts peuvent l'avoir modifié)
-                break
 
-        # Boucle while
+        end_commands_event.clear()
+
+        # Recherche de la premiere commande prête (les commandes en attente ou bloquées sont mises à jour dans le journal)
+        command_struct = selectReadyCommandJournal(command_doc, debug)
 
-        # Fermeture du fichier de commandes
-        command_doc_work.close()                     # Force l'ecriture sur le fichier et fermeture de command_doc_work
-        command_doc_work = None
-        lock_commands_file = False                   # Libere le semaphore sur le fichier
+        # Execution d'une nouvelle commande
+        if command_struct is not None :
+            id_command = command_struct.idCommand
+            action = command_struct.action
+            error_management = command_struct.errorManagement.lower() == 'true'
+            command_to_execute = command_struct.commandToExecute
 
-        # Attente 1s fermeture du fichier et evite de boucler trop rapidement (attente fin execution de la commande)
-        time.sleep(1)
+            # Gestion du computeur sur lequel sera executé la commande
+            computer_execution = command_struct.computerExecution
+            if computer_execution == '':
+                computer_execution = computer_ip
+
+            if debug >= 1:
+                print(cyan + "exectuteCommands : " + endC + "command_to_execute : " + str (command_to_execute) + endC)
+
+            # Mise a jour de l'etat de la commande dans le journal : ordinateur, date...
+            updateJournalStates(command_doc, [(id_command, TAG_STATE_RUN, computer_execution, time.strftime('%d/%m/%y %H:%M:%S',time.localtime()), '')], debug)
+
+            # Execution de la commande
+            print(cyan + "exectuteCommands : " + endC + bold + green + "EXECUTION DE LA COMMANDE : " + str (command_to_execute) + endC)
+            new_state = executeCommand(computer_ip, port, id_command, command_to_execute, action, error_management, base_name_shell_command, computer_execution, command_struct.login, command_struct.password, None, commands_telemetry)
+            if new_state != '':
+                if commands_telemetry is not None:
+                    commands_telemetry.endCommands([(id_command, new_state)])
+                updateEndCommand(command_doc, id_command, new_state, debug)
+
+        else :
+            # Attente de la fin d'une commande en cours (1s maximum, evite de boucler trop rapidement)
+            end_commands_event.wait(1)
 
         # Test si toutes les commandes sont terminés
-        retContinu = testEndAllCommands(commands_list)
-        if not retContinu :
+        exist_command = testEndAllCommands(command_doc)
+        if not exist_command :
             # Send socket End all commends to stop serveur
             stopServer(computer_ip, port)
 
     # Fin du thead serveur
     thread.join()
 
+    # Regeneration du fichier de commandes texte a partir du journal
+    exportJournal(command_doc, debug)
+
+    # Rapport de télémétrie
+    if commands_telemetry is not None:
+        commands_telemetry.writeReport(getReportFile(command_doc), readJournal(command_doc, debug)[0])
+
     print(bold + green + "# TOUTES LES COMMANDES ONT ETE TRAITEES" + endC)
     print(endC)
     print(bold + green + "#########################################################################" + endC)
@@ -237,7 +155,7 @@ def executeCommands(command_doc, debug, link, port):
 #############################################################################################
 # FONCTION executeCommand()                                                                 #
 #############################################################################################
-def executeCommand(ip_serveur, port, id_command, command_to_execute, type_execution, error_management, base_name_shell_command, ip_remote="", login="", password=""):
+def executeCommand(ip_serveur, port, id_command, command_to_execute, type_execution, error_management, base_name_shell_command, ip_remote="", login="", password="", remote_workers_pool=None, commands_telemetry=None):
     """
     # ROLE :
     #   La fonction lance l'execution d'une commande
@@ -253,6 +171,8 @@ def executeCommand(ip_serveur, port, id_command, command_to_execute, type_execut
     #   ip_remote : en mode d'execution remote, contien l'ip de la machine  sur lequel sera executer la commande
     #   login  : mode de passe pour le mode d'execution remote
     #   password : mode de passe pour le mode d'execution remote
+    #   remote_workers_pool : pool de machines distantes à sessions persistantes (RemoteWorkersPool), en mode remote la machine est alors choisie par le pool, par defaut None
+    #   commands_telemetry : télémétrie des commandes (CommandsTelemetry), le processus de la commande est alors échantillonné, par defaut None
     #
     # SORTIES :
     #   new_state : info sur l'etat de l'execution (correcte ou en erreur)
@@ -291,7 +211,10 @@ def executeCommand(ip_serveur, port, id_command, command_to_execute, type_execut
         if case(TAG_ACTION_TO_MAKE_NOW):
 
             # Execution en direct (local)
-            exitCode = subprocess.call(command_to_execute, shell=True)
+            process = subprocess.Popen(command_to_execute, shell=True)
+            if commands_telemetry is not None:
+                commands_telemetry.startCommand(id_command, process.pid)
+            exitCode = process.wait()
             new_state = TAG_STATE_END
             if exitCode != 0: # Si la commande command_to_execute a eu un probleme
                 new_state = TAG_STATE_ERROR
@@ -308,10 +231,23 @@ def executeCommand(ip_serveur, port, id_command, command_to_execute, type_execut
                 print(cyan + "executeCommand : " + endC +  bold + red + "ERREUR EXECUTION DE LA COMMANDE EN BACKGROUND : " + str (command_to_execute) + endC, file=sys.stderr)
             else :
                 print(cyan + "executeCommand : " + endC + " background pid = " + str(process.pid))
+                if commands_telemetry is not None:
+                    commands_telemetry.startCommand(id_command, process.pid)
             break
 
         if case(TAG_ACTION_TO_MAKE_RE):
 
+            # Les commandes remote ne sont mesurées qu'en durée
+            if commands_telemetry is not None:
+                commands_telemetry.startCommand(id_command)
+
+            # Execution sur la machine la moins chargée du pool (session persistante)
+            if remote_workers_pool is not None :
+                if remote_workers_pool.startCommand(id_command, shell_command) == '' :
+                    new_state = TAG_STATE_ERROR
+                    print(cyan + "executeCommand : " + endC +  bold + red +  "ERREUR EXECUTION DE LA COMMANDE EN REMOTE (aucun computeur disponible) : " + str (command_to_execute) + endC, file=sys.stderr)
+                break
+
             # Test si la machine Remote est accesible
             if ping(ip_remote) :
 
@@ -354,7 +290,7 @@ def listenReturnCommand(port, command_doc):
                 info_list = data.split('=')
                 id_command = int(info_list[1])
                 new_state = info_list[0]
-                runServeur = managementEndCommand(command_doc, id_command, new_state, 0)
+                runServeur = managementEndCommands(command_doc, [(id_command, new_state)], 0)
 
     print(cyan + "listenReturnCommand : " + endC +"End serveur close connection socket")
     socket_serveur.close()
@@ -362,174 +298,169 @@ def listenReturnCommand(port, command_doc):
 
 '''
 
-def listenReturnCommand(port, command_doc):
+def listenReturnCommand(port, command_doc, end_commands_callback=None):
     """
     # ROLE :
     #   La fonction gére la fin des commandes par écoute de socket
+    #   Le serveur est evenementiel (selectors) : il accepte simultanement de nombreuses connexions ReplyEndCommand,
+    #   les messages reçus lors d'un même passage sont traités en un seul lot puis l'ordonnanceur est réveillé
     #
     # ENTREES :
     #   port : numero du port d'écoute du serveur
     #   command_doc : fichier dont on lit et execute les commandes
+    #   end_commands_callback : fonction appelée avec la liste des (id_command, new_state) terminées à la place de managementEndCommands (mode scheduler), par defaut None
     #
     # SORTIES :
     #   N.A.
     """
 
+    selector = selectors.DefaultSelector()
     socket_serveur = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # connection en mode TCP
+    socket_serveur.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     socket_serveur.bind(('', port))
+    socket_serveur.listen(socket.SOMAXCONN)
+    socket_serveur.setblocking(False)
+    selector.register(socket_serveur, selectors.EVENT_READ, None)
     print(cyan + "listenReturnCommand : " + endC + "Start serveur on port : " +str(port))
+
+    # Message en cours de reception par socket client
+    messages_dico = {}
     runServeur = True
     while runServeur:
 
-            socket_serveur.listen(100)
-            socket_client, addr = socket_serveur.accept()
-            data = socket_client.recv(255)
-            if six.PY3:
-                data = str(data, 'utf-8')
+        end_commands_list = []
+        stop_serveur = False
+        for key, mask in selector.select():
 
-            if data == STOP_SERVEUR or data == '':
-                runServeur = False
-            else :
+            # Nouvelle connexion client
+            if key.data is None:
+                try:
+                    socket_client, addr = socket_serveur.accept()
+                except socket.error:
+                    continue
+                socket_client.setblocking(False)
+                selector.register(socket_client, selectors.EVENT_READ, addr)
+                messages_dico[socket_client] = b''
+                continue
+
+            # Reception des données d'un client, le message est complet à la fermeture de la connexion par le client
+            socket_client = key.fileobj
+            try:
+                data = socket_client.recv(1024)
+            except socket.error:
+                data = b''
+            if data:
+                messages_dico[socket_client] += data
+                continue
+
+            message = messages_dico.pop(socket_client)
+            selector.unregister(socket_client)
+            socket_client.close()
+
+            for info in message.decode('utf-8').split('\n'):
+                info = info.strip()
+                if info == '':
+                    continue
+                if info == STOP_SERVEUR:
+                    stop_serveur = True
+                    continue
                 # Recuperation de id de la chache et de son nouvel etat
-                info_list = data.split('=')
-                id_command = int(info_list[1])
-                new_state = info_list[0]
+                info_list = info.split('=')
+                end_commands_list.append((int(info_list[1]), info_list[0]))
+
+        # Traitement en lot des commandes terminées
+        if end_commands_list != []:
+            if end_commands_callback is not None :
+                runServeur = end_commands_callback(end_commands_list)
+            else :
+                runServeur = managementEndCommands(command_doc, end_commands_list, 3)
+            # Reveil de la boucle d'execution des commandes
+            end_commands_event.set()
 
-                runServeur = managementEndCommand(command_doc, id_command, new_state, 3)
+        if stop_serveur:
+            runServeur = False
 
     print(cyan + "listenReturnCommand : " + endC +"End serveur close connection socket")
-    socket_client.close()
+    for socket_client in list(messages_dico):
+        selector.unregister(socket_client)
+        socket_client.close()
+    selector.unregister(socket_serveur)
+    selector.close()
     socket_serveur.close()
 
     return
 
 #############################################################################################
-# FONCTION managementEndCommand()                                                           #
+# FONCTION managementEndCommands()                                                          #
 #############################################################################################
-def managementEndCommand(command_doc, id_command, new_state, debug) :
+def managementEndCommands(command_doc, end_commands_list, debug) :
     """
     # ROLE :
-    #   La fonction gére le retour de commande terminer (ok ou en erreur)
+    #   La fonction gére le retour d'un lot de commandes terminées (ok ou en erreur)
     #
     # ENTREES :
     #   command_doc : fichier dont on lit et execute les commandes
-    #   id_command : l'identifiant de la commande
-    #   new_state : nouvel etat de la commande
+    #   end_commands_list : liste des (id_command, new_state) des commandes terminées
     #   debug : niveau de trace log
     #
     # SORTIES :
     #   Return "True" pour continuer ou "False" pour arreter le serveur
     """
 
-    # Variable de lock (semaphore) d'acces sur le fichier de commande : command_doc
-    global lock_commands_file
-
     if debug >= 3:
-        print(cyan + "managementEndCommand : " + endC + bold + green + "FIN D EXECUTION DE LA COMMANDE id  : " + str (id_command) + endC)
-
-    # Attente du semaphore
-    getSemaphoreLockCommands()
+        print(cyan + "managementEndCommands : " + endC + bold + green + "FIN D EXECUTION DES COMMANDES id  : " + str ([id_command for id_command, new_state in end_commands_list]) + endC)
 
-    try:
-        # Ouverture du fichier de commande et chargement de toutes les lignes
-        command_doc_work = open(command_doc,'r+')
-    except:
-        raise NameError(cyan + "managementEndCommand : " + endC + bold + red + "Can't open file: \"" + command_doc + '\n' + endC)
-
-    # Identification de commands_list comme une liste de textes, chaque ligne correspondant à un élément de la liste
-    commands_list = command_doc_work.readlines()
-
-    # Mise a jour de la commande
-    commands_list = updateEndCommand(commands_list, id_command, new_state, debug)
-
-    # On se place à partir du debut du document
-    command_doc_work.seek(0)
-    # Redimensionne la taille du fichier à vide
-    command_doc_work.truncate()
-    # Réécriture du fichier de commande avec la ligne modifiée
-    command_doc_work.writelines(commands_list)
-    # Force l'ecriture sur le fichier
-    command_doc_work.flush()
-    # Fermeture du fichier command_doc_work
-    command_doc_work.close()
-    command_doc_work = None
-    # Libere le semaphore sur le fichier
-    lock_commands_file = False
+    # Mise a jour des commandes en une seule transaction
+    end_date = time.strftime('%d/%m/%y %H:%M:%S',time.localtime())
+    updateJournalStates(command_doc, [(int(id_command), new_state, None, None, end_date) for id_command, new_state in end_commands_list], debug)
 
     # Test si toutes les commandes sont terminés
-    retContinu = testEndAllCommands(commands_list)
+    retContinu = testEndAllCommands(command_doc)
 
     return retContinu
 
 #############################################################################################
 # FONCTION updateEndCommand()                                                               #
 #############################################################################################
-def updateEndCommand(commands_list, id_command, new_state, debug) :
+def updateEndCommand(command_doc, id_command, new_state, debug) :
     """
     # ROLE :
     #   La fonction gére le retour de commande terminer (ok ou en erreur)
     #
     # ENTREES :
-    #   commands_list : la liste des commandes
+    #   command_doc : fichier de commandes dont on met à jour le journal
     #   id_command : l'identifiant de la commande
     #   new_state : nouvel etat de la commande
     #   debug : niveau de trace log
     #
     # SORTIES :
-    #   Return commands_list modifié
+    #   N.A.
     """
 
     if debug >= 3:
         print(cyan + "updateEndCommand : " + endC + bold + green + "FIN D EXECUTION DE LA COMMANDE id  : " + str (id_command) + endC)
 
-    if debug >= 4:
-        print(cyan + "updateEndCommand : " + endC + "commands_list : " + str (commands_list))
-
-    # Mise à jour du fichier de commande
-    for l in range(len(commands_list)):  # Parcours des différentes lignes de commande
-
-        # Recherche de la commande dans le fichier
-        if commands_list[l] != "\n" :
-            element_command_list = commands_list[l].split(SEPARATOR)
-            state = element_command_list[0]
-            id_find = int(element_command_list[1])
-
-            if id_find == id_command:
+    # Mise à jour de la commande terminee dans le journal
+    updateJournalStates(command_doc, [(int(id_command), new_state, None, None, time.strftime('%d/%m/%y %H:%M:%S',time.localtime()))], debug)
 
-                # Mise à jour de la commande terminee
-                commands_list[l] = new_state + SEPARATOR + str(id_command) + SEPARATOR + element_command_list[2] + SEPARATOR + element_command_list[3] + SEPARATOR + element_command_list[4] + SEPARATOR + element_command_list[5] + SEPARATOR + element_command_list[6] + SEPARATOR + element_command_list[7] + SEPARATOR + element_command_list[8] + SEPARATOR + element_command_list[9] +  SEPARATOR + time.strftime('%d/%m/%y %H:%M:%S',time.localtime()) + SEPARATOR + element_command_list[11]
-                if debug >= 4:
-                    print(cyan + "updateEndCommand : " + endC + "command completed : "  + str(commands_list[l]))
-
-                # Arret de la boucle sur les lignes
-                break
-
-    return commands_list
+    return
 
 #############################################################################################
 # FONCTION testEndAllCommands()                                                             #
 #############################################################################################
-def testEndAllCommands(commands_list):
+def testEndAllCommands(command_doc):
     """
     # ROLE :
     #   La fonction permet de tester si toutes les commandes sont soient termininées normalement ou en erreur ou bloqué
     #
     # ENTREES :
-    #   commands_list : la liste des commandes
+    #   command_doc : fichier de commandes dont on lit le journal
     #
     # SORTIES :
     #   return True si ce n'est pas terminer False si toutes les commandes sont finies
     """
 
-    # Test si toutes les commandes sont terminés
-    for l in range(len(commands_list)):  # Parcours des différentes lignes de commande
-        if commands_list[l] != "\n":
-            element_command_list = commands_list[l].split(SEPARATOR)
-            state = element_command_list[0]
-            if state != TAG_STATE_END and state != TAG_STATE_ERROR and state != TAG_STATE_LOCK:
-                return True
-
-    return False
+    return existCommandToProcessJournal(command_doc)
 
 #############################################################################################
 # FONCTION stopServer()                                                                     #
@@ -551,7 +482,7 @@ def stopServer(ip_serveur, port):
     socket_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # connection en mode TCP
     try:
         socket_client.connect((ip_serveur, port))
-        socket_client.send(STOP_SERVEUR)
+        socket_client.send(STOP_SERVEUR.encode())
     except:
         pass
     '''
@@ -562,27 +493,3 @@ def stopServer(ip_serveur, port):
     socket_client.close()
 
     return
-
-#############################################################################################
-# FONCTION getSemaphoreLockCommands()                                                       #
-#############################################################################################
-def getSemaphoreLockCommands():
-    """
-    # ROLE :
-    #   La fonction permet de recuperer le semaphore "lock_commands_file" pour securiser l'acces au fichier command_doc.txt
-    #   si il n'est pas disponible on reste en boucle d'attente de 0.1s jusqu'a ce qu'il soit disponible
-    #
-    # ENTREES :
-    #   N.A.
-    #
-    # SORTIES :
-    #   N.A.
-    """
-
-    # Variable de lock (semaphore) d'acces sur le fichier de commande : command_doc
-    global lock_commands_file
-    while lock_commands_file:
-        time.sleep(0.1)
-
-    lock_commands_file = True
-    return
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python
+
+#############################################################################################################################################
+# Copyright (©) CEREMA/DTerOCC/DT/OSECC  All rights reserved.                                                                               #
+#############################################################################################################################################
+
+#############################################################################################################################################
+#                                                                                                                                           #
+# ORDONNANCEUR (SCHEDULER) QUI EXECUTE EN PARALLELE LES COMMANDES D'UN FICHIER DE LISTE DE COMMANDES SELON LEUR GRAPHE DE DEPENDANCES      #
+#                                                                                                                                           #
+#############################################################################################################################################
+"""
+ Ce module contient l'ordonnanceur du séquenceur : le graphe de dépendances des commandes est construit une seule fois
+ et les commandes prêtes sont lancées en parallèle, dans la limite des ressources (CPU/RAM) disponibles,
+ dès la fin des commandes dont elles dépendent.
+"""
+
+# IMPORTS UTILES
+from __future__ import print_function
+import os, sys, time, threading
+from Lib_operator import getLocalIp, getNumberCPU
+from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+from CommandsProcessing import executeCommand, listenReturnCommand, stopServer
+from RemoteWorkersPool import RemoteWorkersPool
+from CommandsCache import CommandsCache, getCacheFile
+from CommandsTelemetry import CommandsTelemetry, getReportFile
+from CommandsJournal import existJournal, createJournal, readJournal, updateJournalStates, exportJournal
+from Settings import *
+
+#############################################################################################
+# FONCTION readCommandsGraph()                                                              #
+#############################################################################################
+def readCommandsGraph(command_doc, weights_dico, debug):
+    """
+    # ROLE :
+    #   La fonction lit le graphe de dépendances (prédécesseurs et successeurs) des commandes dans le journal
+    #   et affecte à chaque commande le poids en ressources de sa tache
+    #
+    # ENTREES :
+    #   command_doc : fichier dont on lit les commandes
+    #   weights_dico : dictionnaire des poids [cpu, ram] par nom de tache ("setting.label.position")
+    #   debug : niveau de trace log
+    #
+    # SORTIES :
+    #   commands_dico : dictionnaire des commandes (StructCommand) par id de commande
+    #   id_commands_list : liste des id des commandes dans l'ordre du fichier
+    """
+
+    # Creation du journal des etats des commandes s'il n'existe pas
+    if not existJournal(command_doc):
+        createJournal(command_doc, debug)
+
+    commands_dico, id_commands_list = readJournal(command_doc, debug)
+
+    # Poids des commandes en ressources
+    if weights_dico is not None:
+        for id_command in id_commands_list:
+            command_struct = commands_dico[id_command]
+            if command_struct.nameTask in weights_dico:
+                command_struct.cpu = weights_dico[command_struct.nameTask][0]
+                command_struct.ram = weights_dico[command_struct.nameTask][1]
+
+    if debug >= 3:
+        print(cyan + "readCommandsGraph : " + endC + "Nombre de commandes du graphe : " + str(len(id_commands_list)) + endC)
+
+    return commands_dico, id_commands_list
+
+#############################################################################################
+# CLASSE CommandsScheduler()                                                                #
+#############################################################################################
+class CommandsScheduler:
+    """
+    # ROLE :
+    #   Ordonnanceur des commandes : gere les commandes prêtes, les ressources reservées et la mise à jour du journal des commandes
+    """
+
+    def __init__(self, command_doc, debug, computer_ip, port, max_parallel_commands, cpu_capacity, ram_capacity, weights_dico, remote_workers_pool=None, commands_cache=None, commands_telemetry=None):
+        self.command_doc = command_doc
+        self.debug = debug
+        self.computer_ip = computer_ip
+        self.port = port
+        self.max_parallel_commands = max_parallel_commands
+        self.cpu_capacity = cpu_capacity
+        self.ram_capacity = ram_capacity
+        self.remote_workers_pool = remote_workers_pool
+        self.commands_cache = commands_cache
+        self.commands_telemetry = commands_telemetry
+        self.base_name_shell_command = os.path.splitext(command_doc)[0]
+        self.condition = threading.Condition()
+        self.ready_list = []
+        self.running_list = []
+        self.cpu_used = 0
+        self.ram_used = 0
+        self.commands_dico, self.id_commands_list = readCommandsGraph(command_doc, weights_dico, debug)
+
+    def initStates(self):
+        """
+        # ROLE :
+        #   Initialise l'etat des commandes a partir du journal : les commandes dont toutes les dépendances sont terminées sont prêtes,
+        #   les autres sont en attente, et celles qui dépendent d'une commande en erreur sont bloquées
+        """
+
+        for id_command in self.id_commands_list:
+            command_struct = self.commands_dico[id_command]
+            if command_struct.state == TAG_STATE_RUN:
+                # Commande lancée par une execution précédente, on attend son retour
+                command_struct.cpu = 0
+                command_struct.ram = 0
+                self.running_list.append(id_command)
+            elif command_struct.state == TAG_STATE_ERROR or command_struct.state == TAG_STATE_LOCK:
+                self.lockSuccessors(id_command)
+
+        for id_command in self.id_commands_list:
+            command_struct = self.commands_dico[id_command]
+            if command_struct.state != TAG_STATE_MAKE and command_struct.state != TAG_STATE_WAIT:
+                continue
+            command_struct.nbDependencyWaiting = 0
+            for id_depend in command_struct.dependencyList:
+                if self.commands_dico[id_depend].state != TAG_STATE_END:
+                    command_struct.nbDependencyWaiting += 1
+            if command_struct.nbDependencyWaiting == 0:
+                self.ready_list.append(id_command)
+            else:
+                command_struct.state = TAG_STATE_WAIT
+
+        return
+
+    def lockSuccessors(self, id_command):
+        """
+        # ROLE :
+        #   Passe à l'etat bloqué toutes les commandes qui dépendent (directement ou non) d'une commande en erreur
+        #
+        # SORTIES :
+        #   la liste des id des commandes bloquées
+        """
+
+        locked_list = []
+        id_to_lock_list = list(self.commands_dico[id_command].successorList)
+        while id_to_lock_list != []:
+            id_successor = id_to_lock_list.pop()
+            successor_struct = self.commands_dico[id_successor]
+            if successor_struct.state == TAG_STATE_MAKE or successor_struct.state == TAG_STATE_WAIT:
+                successor_struct.state = TAG_STATE_LOCK
+                locked_list.append(id_successor)
+                if id_successor in self.ready_list:
+                    self.ready_list.remove(id_successor)
+                id_to_lock_list.extend(successor_struct.successorList)
+        return locked_list
+
+    def saveStates(self, id_command_list):
+        """
+        # ROLE :
+        #   Enregistre dans le journal l'etat courant des commandes modifiées (pour la supervision et la reprise apres bug)
+        """
+
+        update_list = []
+        for id_command in id_command_list:
+            command_struct = self.commands_dico[id_command]
+            update_list.append((id_command, command_struct.state, command_struct.computerExecution, command_struct.startDate, command_struct.endDate))
+        updateJournalStates(self.command_doc, update_list, self.debug)
+        return
+
+    def selectCommandsToRun(self):
+        """
+        # ROLE :
+        #   Selectionne dans l'ordre des id les commandes prêtes qui peuvent etre lancées avec les ressources disponibles
+        #   et reserve leurs ressources. Une commande seule est toujours lancée même si son poids dépasse la capacité.
+        #
+        # SORTIES :
+        #   la liste des id de commandes à lancer
+        """
+
+        selected_list = []
+        for id_command in sorted(self.ready_list):
+            if len(self.running_list) >= self.max_parallel_commands:
+                break
+            command_struct = self.commands_dico[id_command]
+            if self.running_list != []:
+                if self.cpu_used + command_struct.cpu > self.cpu_capacity:
+                    continue
+                if self.ram_capacity > 0 and self.ram_used + command_struct.ram > self.ram_capacity:
+                    continue
+            self.ready_list.remove(id_command)
+            self.running_list.append(id_command)
+            self.cpu_used += command_struct.cpu
+            self.ram_used += command_struct.ram
+            command_struct.state = TAG_STATE_RUN
+            if command_struct.computerExecution == '':
+                command_struct.computerExecution = self.computer_ip
+            command_struct.startDate = time.strftime('%d/%m/%y %H:%M:%S',time.localtime())
+            selected_list.append(id_command)
+        return selected_list
+
+    def endCommands(self, end_commands_list):
+        """
+        # ROLE :
+        #   Gere la fin d'un lot de commandes (ok ou en erreur) : libere leurs ressources, met à jour leurs successeurs,
+        #   enregistre les changements dans le journal en une seule transaction et réveille l'ordonnanceur
+        #
+        # ENTREES :
+        #   end_commands_list : liste des (id_command, new_state) des commandes terminées
+        #
+        # SORTIES :
+        #   Return "True" pour que le serveur d'écoute continue
+        """
+
+        if self.commands_telemetry is not None:
+            self.commands_telemetry.endCommands(end_commands_list)
+
+        # Enregistrement dans le cache des commandes terminées sans erreur (hors verrou, releve des fichiers)
+        if self.commands_cache is not None:
+            for id_command, new_state in end_commands_list:
+                if id_command in self.commands_dico:
+                    self.commands_cache.endCommand(id_command, self.commands_dico[id_command].commandToExecute, new_state == TAG_STATE_END)
+
+        with self.condition:
+            end_date = time.strftime('%d/%m/%y %H:%M:%S',time.localtime())
+            changed_list = []
+            for id_command, new_state in end_commands_list:
+                if id_command not in self.running_list:
+                    continue
+
+                if self.debug >= 3:
+                    print(cyan + "CommandsScheduler.endCommands : " + endC + bold + green + "FIN D EXECUTION DE LA COMMANDE id  : " + str(id_command) + " (" + new_state + ")" + endC)
+
+                if self.remote_workers_pool is not None:
+                    self.remote_workers_pool.endCommand(id_command)
+
+                command_struct = self.commands_dico[id_command]
+                command_struct.state = new_state
+                command_struct.endDate = end_date
+                self.running_list.remove(id_command)
+                self.cpu_used -= command_struct.cpu
+                self.ram_used -= command_struct.ram
+
+                changed_list.append(id_command)
+                if new_state == TAG_STATE_END:
+                    for id_successor in command_struct.successorList:
+                        successor_struct = self.commands_dico[id_successor]
+                        if successor_struct.state != TAG_STATE_WAIT and successor_struct.state != TAG_STATE_MAKE:
+                            continue
+                        successor_struct.nbDependencyWaiting -= 1
+                        if successor_struct.nbDependencyWaiting <= 0:
+                            successor_struct.state = TAG_STATE_MAKE
+                            self.ready_list.append(id_successor)
+                            changed_list.append(id_successor)
+                else:
+                    changed_list.extend(self.lockSuccessors(id_command))
+
+            if changed_list != []:
+                self.saveStates(changed_list)
+                self.condition.notify_all()
+
+        return True
+
+    def endCommand(self, id_command, new_state):
+        """
+        # ROLE :
+        #   Gere la fin d'une seule commande (commande immediate ou erreur de lancement)
+        """
+
+        return self.endCommands([(id_command, new_state)])
+
+    def runCommand(self, id_command):
+        """
+        # ROLE :
+        #   Lance une commande. Les commandes immediates sont executées dans un thread pour ne pas bloquer l'ordonnanceur,
+        #   les commandes en background ou remote signalent leur fin par ReplyEndCommand
+        """
+
+        command_struct = self.commands_dico[id_command]
+
+        # Commande dont les resultats sont à jour : marquée terminée sans être relancée
+        if self.commands_cache is not None:
+            if self.commands_cache.isUpToDate(command_struct.commandToExecute):
+                print(cyan + "CommandsScheduler : " + endC + bold + green + "COMMANDE A JOUR, NON RELANCEE : " + str(command_struct.commandToExecute) + endC)
+                self.endCommand(id_command, TAG_STATE_END)
+                return
+            self.commands_cache.startCommand(id_command, command_struct.commandToExecute)
+
+        print(cyan + "CommandsScheduler : " + endC + bold + green + "EXECUTION DE LA COMMANDE : " + str(command_struct.commandToExecute) + endC)
+        error_management = command_struct.errorManagement.lower() == 'true'
+
+        if command_struct.action == TAG_ACTION_TO_MAKE_NOW:
+            def runCommandNow():
+                new_state = executeCommand(self.computer_ip, self.port, id_command, command_struct.commandToExecute, command_struct.action, error_management, self.base_name_shell_command, command_struct.computerExecution, command_struct.login, command_struct.password, None, self.commands_telemetry)
+                self.endCommand(id_command, new_state)
+            thread = threading.Thread(target=runCommandNow)
+            thread.start()
+        else:
+            new_state = executeCommand(self.computer_ip, self.port, id_command, command_struct.commandToExecute, command_struct.action, error_management, self.base_name_shell_command, command_struct.computerExecution, command_struct.login, command_struct.password, self.remote_workers_pool, self.commands_telemetry)
+            if command_struct.action == TAG_ACTION_TO_MAKE_RE and self.remote_workers_pool is not None:
+                # Machine choisie par le pool
+                with self.condition:
+                    ip_remote = self.remote_workers_pool.getHostCommand(id_command)
+                    if ip_remote != '':
+                        command_struct.computerExecution = ip_remote
+                        self.saveStates([id_command])
+            if new_state != '':
+                self.endCommand(id_command, new_state)
+        return
+
+    def run(self):
+        """
+        # ROLE :
+        #   Boucle de l'ordonnanceur : lance les commandes prêtes puis attend qu'une commande se termine
+        """
+
+        with self.condition:
+            self.initStates()
+            self.saveStates(self.id_commands_list)
+
+        while True:
+            with self.condition:
+                selected_list = self.selectCommandsToRun()
+                while selected_list == [] and self.running_list != [] :
+                    self.condition.wait()
+                    selected_list = self.selectCommandsToRun()
+                if selected_list == [] and self.running_list == []:
+                    break
+                self.saveStates(selected_list)
+
+            if self.debug >= 2:
+                print(cyan + "CommandsScheduler : " + endC + "commandes lancées : " + str(selected_list) + ", cpu utilisés : " + str(self.cpu_used) + "/" + str(self.cpu_capacity) + ", ram utilisée : " + str(self.ram_used) + endC)
+
+            for id_command in selected_list:
+                self.runCommand(id_command)
+
+        return
+
+#############################################################################################
+# FONCTION executeCommandsScheduler()                                                       #
+#############################################################################################
+def executeCommandsScheduler(command_doc, debug, link, port, max_parallel_commands=0, cpu_capacity=0, ram_capacity=0, weights_dico=None, remote_computeur_list=None, task_cache=False, task_cache_hash=False, telemetry=False):
+    """
+    # ROLE :
+    #   La fonction execute les commandes du fichier de commandes en parallele selon leur graphe de dépendances,
+    #   une commande est lancée dès que toutes les commandes dont elle dépend sont terminées et que les ressources le permettent
+    #
+    # ENTREES :
+    #   command_doc : fichier dont on lit et execute les commandes
+    #   debug : niveau de trace log
+    #   link : le lien etenet utilisé
+    #   port : le port utiliser pour le serveur gestion des commandes
+    #   max_parallel_commands : nombre maximum de commandes simultanées (0 = nombre de CPU), par defaut 0
+    #   cpu_capacity : nombre de CPU disponibles pour les commandes (0 = nombre de CPU), par defaut 0
+    #   ram_capacity : RAM disponible pour les commandes en MB (0 = pas de limite), par defaut 0
+    #   weights_dico : dictionnaire des poids [cpu, ram] par nom de tache, par defaut None
+    #   remote_computeur_list : liste des machines distantes (StructRemote), les commandes remote sont placées sur la moins chargée, par defaut None
+    #   task_cache : les commandes dont les resultats sont à jour ne sont pas relancées (cache des commandes), par defaut False
+    #   task_cache_hash : l'empreinte des fichiers d'entrée est calculée sur leur contenu et non leur date de modification, par defaut False
+    #   telemetry : mesure des ressources de chaque commande et rapport de fin d'execution (chemin critique), par defaut False
+    #
+    # SORTIES :
+    #   N.A.
+    """
+
+    print(endC)
+    print(bold + green + "####################################################################" + endC)
+    print(bold + green + "# DEBUT DE L'EXECUTION DES COMMANDES (ORDONNANCEUR)                #" + endC)
+    print(bold + green + "####################################################################" + endC)
+    print(endC)
+
+    if max_parallel_commands <= 0:
+        max_parallel_commands = getNumberCPU()
+    if cpu_capacity <= 0:
+        cpu_capacity = getNumberCPU()
+
+    # Identification de l'IP du PC
+    computer_ip = getLocalIp(IP_VERSION, link)
+
+    # Pool de machines distantes à sessions persistantes
+    remote_workers_pool = None
+    if remote_computeur_list is not None and remote_computeur_list != []:
+        remote_workers_pool = RemoteWorkersPool(remote_computeur_list, debug)
+        remote_workers_pool.connect()
+
+    # Cache des commandes pour l'execution incrementale
+    commands_cache = None
+    if task_cache:
+        commands_cache = CommandsCache(getCacheFile(command_doc), task_cache_hash, debug)
+
+    # Télémétrie des commandes
+    commands_telemetry = None
+    if telemetry:
+        commands_telemetry = CommandsTelemetry(debug)
+
+    scheduler = CommandsScheduler(command_doc, debug, computer_ip, port, max_parallel_commands, cpu_capacity, ram_capacity, weights_dico, remote_workers_pool, commands_cache, commands_telemetry)
+
+    if debug >= 1:
+        print(cyan + "executeCommandsScheduler : " + endC + "max_parallel_commands : " + str(max_parallel_commands) + ", cpu_capacity : " + str(cpu_capacity) + ", ram_capacity : " + str(ram_capacity) + endC)
+
+    # Lancer le thead d'ecoute du retour fin des commandes background et remote
+    thread = threading.Thread(target=listenReturnCommand, args=(port, command_doc, scheduler.endCommands))
+    thread.start()
+
+    try:
+        scheduler.run()
+    finally:
+        # Arret du serveur d'ecoute
+        stopServer(computer_ip, port)
+        thread.join()
+        if remote_workers_pool is not None:
+            remote_workers_pool.close()
+        if commands_cache is not None:
+            commands_cache.close()
+
+    # Regeneration du fichier de commandes texte a partir du journal
+    exportJournal(command_doc, debug)
+
+    # Rapport de télémétrie
+    if commands_telemetry is not None:
+        commands_telemetry.writeReport(getReportFile(command_doc), scheduler.commands_dico)
+
+    print(bold + green + "# TOUTES LES COMMANDES ONT ETE TRAITEES" + endC)
+    print(endC)
+    print(bold + green + "#########################################################################" + endC)
+    print(bold + green + "# FIN DE L'EXECUTION DE LA CHAINE                                       #" + endC)
+    print(bold + green + "#########################################################################" + endC)
+    print(endC)
+
+    return
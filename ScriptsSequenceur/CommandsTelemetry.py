@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python
+
+#############################################################################################################################################
+# Copyright (©) CEREMA/DTerOCC/DT/OSECC  All rights reserved.                                                                               #
+#############################################################################################################################################
+
+#############################################################################################################################################
+#                                                                                                                                           #
+# TELEMETRIE DES COMMANDES DU SEQUENCEUR : DUREE, MEMOIRE, CPU ET E/S PAR COMMANDE, RAPPORT ET CHEMIN CRITIQUE                              #
+#                                                                                                                                           #
+#############################################################################################################################################
+"""
+ Ce module contient la télémétrie des commandes du séquenceur.
+ Chaque commande lancée en local (Immediat ou Background) est suivie par un thread qui échantillonne avec psutil
+ l'arbre de ses processus : pic de mémoire (RSS), temps CPU et octets lus/écrits. Les commandes Remote ne sont suivies qu'en durée.
+ En fin d'execution un rapport JSON (<CommandFile>_report.json) est écrit avec les mesures par commande, le cumul par tache
+ et le chemin critique du graphe des commandes (la suite de commandes dépendantes la plus longue), qui est aussi affiché.
+"""
+
+# IMPORTS UTILES
+from __future__ import print_function
+import os, sys, time, threading, json, psutil
+from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+
+EXT_REPORT = "_report.json"
+# Intervalle d'échantillonnage des processus (en secondes)
+SAMPLE_DELAY = 0.5
+# Nombre de taches affichées dans le résumé
+NB_TASKS_SUMMARY = 10
+
+#############################################################################################
+# FONCTION getReportFile()                                                                  #
+#############################################################################################
+def getReportFile(command_doc):
+    """
+    # ROLE :
+    #   La fonction retourne le nom du fichier rapport de télémétrie associé au fichier de commandes
+    #
+    # ENTREES :
+    #   command_doc : fichier de commandes
+    #
+    # SORTIES :
+    #   le nom du fichier rapport
+    """
+
+    return os.path.splitext(command_doc)[0] + EXT_REPORT
+
+#############################################################################################
+# CLASSE ProcessMonitor()                                                                   #
+#############################################################################################
+class ProcessMonitor(threading.Thread):
+    """
+    # ROLE :
+    #   Thread d'échantillonnage d'un processus et de ses descendants jusqu'à la fin du processus
+    """
+
+    def __init__(self, pid):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.pid = pid
+        self.peak_rss = 0
+        # Derniers compteurs relevés par pid : [cpu (s), octets lus, octets ecrits]
+        self.counters_dico = {}
+
+    def sample(self, process_list):
+        rss = 0
+        for process in process_list:
+            try:
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    cpu_times = process.cpu_times()
+                    counters = [cpu_times.user + cpu_times.system, 0, 0]
+                    try:
+                        io_counters = process.io_counters()
+                        counters[1] = io_counters.read_bytes
+                        counters[2] = io_counters.write_bytes
+                    except (psutil.AccessDenied, AttributeError):
+                        pass
+                self.counters_dico[process.pid] = counters
+            except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                continue
+        self.peak_rss = max(self.peak_rss, rss)
+        return
+
+    def run(self):
+        try:
+            root = psutil.Process(self.pid)
+        except psutil.NoSuchProcess:
+            return
+        while True:
+            try:
+                if root.status() == psutil.STATUS_ZOMBIE:
+                    break
+                process_list = [root] + root.children(recursive=True)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                break
+            self.sample(process_list)
+            time.sleep(SAMPLE_DELAY)
+        return
+
+    def getCounters(self):
+        """
+        # ROLE :
+        #   Retourne le cumul des compteurs de l'arbre de processus : [cpu (s), octets lus, octets ecrits]
+        """
+
+        counters_list = list(self.counters_dico.values())
+        return [sum(counters[index] for counters in counters_list) for index in range(3)]
+
+#############################################################################################
+# CLASSE CommandsTelemetry()                                                                #
+#############################################################################################
+class CommandsTelemetry:
+    """
+    # ROLE :
+    #   Télémétrie des commandes : mesures par commande, rapport JSON et chemin critique
+    """
+
+    def __init__(self, debug=0):
+        self.debug = debug
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        # Mesures par commande : {id_command : {'start', 'end', 'state', 'monitor'}}
+        self.measures_dico = {}
+
+    def startCommand(self, id_command, pid=None):
+        """
+        # ROLE :
+        #   Debut de la mesure d'une commande, le processus local de pid donné est échantillonné
+        #
+        # ENTREES :
+        #   id_command : l'identifiant de la commande
+        #   pid : pid du processus de la commande (None pour une commande remote)
+        """
+
+        monitor = None
+        if pid is not None:
+            monitor = ProcessMonitor(pid)
+            monitor.start()
+        with self.lock:
+            self.measures_dico[id_command] = {'start' : time.time(), 'end' : None, 'state' : '', 'monitor' : monitor}
+        return
+
+    def endCommands(self, end_commands_list):
+        """
+        # ROLE :
+        #   Fin de la mesure d'un lot de commandes
+        #
+        # ENTREES :
+        #   end_commands_list : liste des (id_command, new_state) des commandes terminées
+        """
+
+        end_time = time.time()
+        with self.lock:
+            for id_command, new_state in end_commands_list:
+                measure = self.measures_dico.get(int(id_command))
+                if measure is not None and measure['end'] is None:
+                    measure['end'] = end_time
+                    measure['state'] = new_state
+        return
+
+    def getCriticalPath(self, commands_dico, duration_dico):
+        """
+        # ROLE :
+        #   Calcule le chemin critique du graphe des commandes : la suite de commandes dépendantes de durée cumulée maximale
+        #
+        # ENTREES :
+        #   commands_dico : dictionnaire des commandes (StructCommand) par identifiant
+        #   duration_dico : durée mesurée par identifiant de commande
+        #
+        # SORTIES :
+        #   la liste des identifiants du chemin critique et sa durée
+        """
+
+        # Parcours topologique (les dépendances inconnues sont ignorées)
+        nb_waiting_dico = {}
+        for id_command, command_struct in commands_dico.items():
+            nb_waiting_dico[id_command] = len([id_depend for id_depend in command_struct.dependencyList if id_depend in commands_dico])
+        ready_list = [id_command for id_command in commands_dico if nb_waiting_dico[id_command] == 0]
+        finish_dico = {}
+        previous_dico = {}
+        while ready_list != []:
+            id_command = ready_list.pop()
+            command_struct = commands_dico[id_command]
+            previous = None
+            finish = 0.0
+            for id_depend in command_struct.dependencyList:
+                if id_depend in finish_dico and finish_dico[id_depend] > finish:
+                    finish = finish_dico[id_depend]
+                    previous = id_depend
+            finish_dico[id_command] = finish + duration_dico.get(id_command, 0.0)
+            previous_dico[id_command] = previous
+            for id_successor in command_struct.successorList:
+                nb_waiting_dico[id_successor] -= 1
+                if nb_waiting_dico[id_successor] == 0:
+                    ready_list.append(id_successor)
+
+        if finish_dico == {}:
+            return [], 0.0
+
+        id_command = max(finish_dico, key=lambda id_finish: finish_dico[id_finish])
+        critical_duration = finish_dico[id_command]
+        critical_path_list = []
+        while id_command is not None:
+            critical_path_list.insert(0, id_command)
+            id_command = previous_dico[id_command]
+        return critical_path_list, critical_duration
+
+    def writeReport(self, report_file, commands_dico):
+        """
+        # ROLE :
+        #   Ecrit le rapport JSON des mesures et affiche le résumé : cumul par tache et chemin critique
+        #
+        # ENTREES :
+        #   report_file : fichier rapport JSON
+        #   commands_dico : dictionnaire des commandes (StructCommand) par identifiant, lu dans le journal
+        """
+
+        wall_time = time.time() - self.start_time
+
+        # Mesures par commande
+        commands_report_list = []
+        duration_dico = {}
+        with self.lock:
+            for id_command in sorted(self.measures_dico):
+                measure = self.measures_dico[id_command]
+                if measure['end'] is None:
+                    continue
+                cpu_time, read_bytes, write_bytes, peak_rss = None, None, None, None
+                monitor = measure['monitor']
+                if monitor is not None:
+                    monitor.join(SAMPLE_DELAY * 2)
+                    cpu_time, read_bytes, write_bytes = monitor.getCounters()
+                    peak_rss = monitor.peak_rss
+                duration_dico[id_command] = measure['end'] - measure['start']
+                command_struct = commands_dico.get(id_command)
+                commands_report_list.append({
+                    'id' : id_command,
+                    'task' : command_struct.nameTask if command_struct is not None else '',
+                    'state' : measure['state'],
+                    'duration' : round(duration_dico[id_command], 3),
+                    'cpu_time' : None if cpu_time is None else round(cpu_time, 3),
+                    'peak_rss' : peak_rss,
+                    'read_bytes' : read_bytes,
+                    'write_bytes' : write_bytes,
+                    'command' : command_struct.commandToExecute if command_struct is not None else ''})
+
+        # Cumul par tache
+        tasks_dico = {}
+        for command_report in commands_report_list:
+            task_report = tasks_dico.setdefault(command_report['task'], {'task' : command_report['task'], 'nb_commands' : 0, 'duration' : 0.0, 'cpu_time' : 0.0, 'peak_rss' : 0, 'critical_duration' : 0.0})
+            task_report['nb_commands'] += 1
+            task_report['duration'] += command_report['duration']
+            task_report['cpu_time'] += command_report['cpu_time'] or 0.0
+            task_report['peak_rss'] = max(task_report['peak_rss'], command_report['peak_rss'] or 0)
+
+        # Chemin critique
+        critical_path_list, critical_duration = self.getCriticalPath(commands_dico, duration_dico)
+        for id_command in critical_path_list:
+            if id_command in duration_dico:
+                tasks_dico[commands_dico[id_command].nameTask]['critical_duration'] += duration_dico[id_command]
+
+        tasks_report_list = sorted(tasks_dico.values(), key=lambda task_report: (task_report['critical_duration'], task_report['duration']), reverse=True)
+        for task_report in tasks_report_list:
+            for key in ('duration', 'cpu_time', 'critical_duration'):
+                task_report[key] = round(task_report[key], 3)
+
+        report_dico = {
+            'date' : time.strftime('%d/%m/%y %H:%M:%S',time.localtime()),
+            'wall_time' : round(wall_time, 3),
+            'sum_duration' : round(sum(duration_dico.values()), 3),
+            'critical_path' : critical_path_list,
+            'critical_duration' : round(critical_duration, 3),
+            'tasks' : tasks_report_list,
+            'commands' : commands_report_list}
+
+        with open(report_file, 'w') as file_report:
+            json.dump(report_dico, file_report, indent=2)
+
+        # Résumé
+        print(cyan + "CommandsTelemetry : " + endC + bold + green + "durée totale : " + str(round(wall_time, 1)) + " s, somme des durées des commandes : " + str(report_dico['sum_duration']) + " s, chemin critique : " + str(report_dico['critical_duration']) + " s" + endC)
+        print(cyan + "CommandsTelemetry : " + endC + "chemin critique : " + " -> ".join([str(id_command) + " (" + commands_dico[id_command].nameTask + ", " + str(round(duration_dico.get(id_command, 0.0), 1)) + " s)" for id_command in critical_path_list]) + endC)
+        for task_report in tasks_report_list[:NB_TASKS_SUMMARY]:
+            print(cyan + "CommandsTelemetry : " + endC + "tache " + task_report['task'] + " : " + str(task_report['nb_commands']) + " commande(s), durée " + str(task_report['duration']) + " s dont " + str(task_report['critical_duration']) + " s sur le chemin critique, cpu " + str(task_report['cpu_time']) + " s, pic memoire " + str(round(task_report['peak_rss'] / (1024.0 * 1024.0), 1)) + " MB" + endC)
+        print(cyan + "CommandsTelemetry : " + endC + "rapport : " + report_file + endC)
+        return
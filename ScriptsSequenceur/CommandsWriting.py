@@ -19,6 +19,7 @@ from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
 from Lib_operator import *
 from Lib_text import appendTextFile, appendTextFileCR, cleanSpaceText
 from Lib_file import removeFile
+from CommandsJournal import existJournal, resetJournalErrors, exportJournal
 from Settings import *
 
 #################################################################################
@@ -193,12 +194,19 @@ def updateCommandsError(command_doc, debug):
     """
     # ROLE :
     #   Mettre à jour le fichier de commande, passer toutes les commande en erreur en cours et bloqué à faire
+    #   Si le journal des commandes existe (etat le plus récent, même apres un crash), la reprise se fait à partir du journal
     #
     # ENTREES :
     #   command_doc : le fichier contenant les commandes
     #   debug : niveau de trace log
     """
 
+    if existJournal(command_doc):
+        # Reprise à partir du journal puis regeneration du fichier de commandes texte
+        resetJournalErrors(command_doc, debug)
+        exportJournal(command_doc, debug)
+        return
+
     try:
         # Ouverture du fichier de commande et chargement de toutes les lignes
         command_doc_work = open(command_doc,'r+')
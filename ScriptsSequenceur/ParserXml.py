@@ -59,6 +59,8 @@ def xmlSettingsParser(settings_file) :
     tasks_execution_list = getListValueAttributeDom(xmldoc, 'TasksList', 'Task', 'execution', 'Processing')
     tasks_position_list = getListValueAttributeDom(xmldoc, 'TasksList', 'Task', 'position', 'Processing')
     tasks_error_management_list = getListValueAttributeDom(xmldoc, 'TasksList', 'Task', 'error_management', 'Processing')
+    tasks_cpu_list = getListValueAttributeDom(xmldoc, 'TasksList', 'Task', 'cpu', 'Processing')
+    tasks_ram_list = getListValueAttributeDom(xmldoc, 'TasksList', 'Task', 'ram', 'Processing')
     settings_struct.general.processing.taskList = []
     for index in range (len(tasks_list)) :
         task_struct = StructTask()
@@ -80,6 +82,10 @@ def xmlSettingsParser(settings_file) :
             task_struct.errorManagement = tasks_error_management.lower() == 'true'
         else :
             task_struct.errorManagement = True
+        if tasks_cpu_list[index] != "" and tasks_cpu_list[index] is not None:
+            task_struct.cpu = int(tasks_cpu_list[index])
+        if tasks_ram_list[index] != "" and tasks_ram_list[index] is not None:
+            task_struct.ram = int(tasks_ram_list[index])
         task_struct.settings = name_setting
         dependency_list_string = str(tasks_dependency_list[index])
         dependency_list = dependency_list_string.split(',')
@@ -120,6 +126,23 @@ def xmlSettingsParser(settings_file) :
     value = getValueNodeDataDom(xmldoc, 'Ram')
     if value != "" and value is not None:
         settings_struct.general.processing.ram = int(value)
+    if getValueNodeDataDom(xmldoc, 'Scheduler') != "" :
+        settings_struct.general.processing.scheduler = getValueNodeDataDom(xmldoc, 'Scheduler').lower() == 'true'
+    value = getValueNodeDataDom(xmldoc, 'MaxParallelCommands')
+    if value != "" and value is not None:
+        settings_struct.general.processing.maxParallelCommands = int(value)
+    value = getValueNodeDataDom(xmldoc, 'CpuCapacity')
+    if value != "" and value is not None:
+        settings_struct.general.processing.cpuCapacity = int(value)
+    value = getValueNodeDataDom(xmldoc, 'RamCapacity')
+    if value != "" and value is not None:
+        settings_struct.general.processing.ramCapacity = int(value)
+    if getValueNodeDataDom(xmldoc, 'TaskCache') != "" :
+        settings_struct.general.processing.taskCache = getValueNodeDataDom(xmldoc, 'TaskCache').lower() == 'true'
+    if getValueNodeDataDom(xmldoc, 'TaskCacheHash') != "" :
+        settings_struct.general.processing.taskCacheHash = getValueNodeDataDom(xmldoc, 'TaskCacheHash').lower() == 'true'
+    if getValueNodeDataDom(xmldoc, 'Telemetry') != "" :
+        settings_struct.general.processing.telemetry = getValueNodeDataDom(xmldoc, 'Telemetry').lower() == 'true'
 
     # General-Image
     settings_struct.general.image.channelOrderList = getListNodeDataDom(xmldoc, 'ChannelsOrderList', 'Channel', 'Image')
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python
+
+#############################################################################################################################################
+# Copyright (©) CEREMA/DTerOCC/DT/OSECC  All rights reserved.                                                                               #
+#############################################################################################################################################
+
+#############################################################################################################################################
+#                                                                                                                                           #
+# POOL DE MACHINES DISTANTES AVEC SESSIONS SSH PERSISTANTES ET PLACEMENT DES COMMANDES SELON LA CHARGE                                      #
+#                                                                                                                                           #
+#############################################################################################################################################
+"""
+ Ce module contient le pool de machines distantes du séquenceur pour les commandes en mode "Remote" :
+ une session ssh persistante est ouverte par machine, le nombre de commandes en cours et la charge de chaque machine sont suivis
+ et chaque commande est placée sur la machine éligible la moins chargée.
+ Les machines dont l'adresse commence par "local" (ex : local1, local2) sont simulées par un shell local persistant,
+ ce qui permet de tester le mode distant sans machine réelle.
+"""
+
+# IMPORTS UTILES
+from __future__ import print_function
+import os, sys, time, threading, subprocess, multiprocessing
+from pexpect import pxssh
+from Lib_operator import ping
+from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC
+
+# Prefixe des adresses des machines simulées en local
+PREFIX_LOCAL_WORKER = "local"
+# Delai de rafraichissement de la charge d'une machine (en secondes)
+LOAD_REFRESH_DELAY = 10.0
+
+#############################################################################################
+# CLASSE RemoteWorker()                                                                     #
+#############################################################################################
+class RemoteWorker:
+    """
+    # ROLE :
+    #   Machine distante accédée par une session ssh persistante
+    """
+
+    def __init__(self, ip_adress, login, password, debug=0):
+        self.ip_adress = ip_adress
+        self.login = login
+        self.password = password
+        self.debug = debug
+        self.session = None
+        self.lock = threading.Lock()
+        self.running_list = []
+        self.nb_cpu = 1
+        self.load = 0.0
+        self.load_date = 0.0
+        self.available = False
+
+    def connect(self):
+        """
+        # ROLE :
+        #   Ouvre la session ssh sur la machine et recupere son nombre de CPU
+        #
+        # SORTIES :
+        #   True si la machine est disponible, False sinon
+        """
+
+        self.available = False
+        if not ping(self.ip_adress):
+            print(cyan + "RemoteWorker.connect : " + endC + bold + red + "Computeur : " + self.ip_adress + " non disponible" + endC, file=sys.stderr)
+            return False
+        try:
+            self.session = pxssh.pxssh()
+            self.session.login(self.ip_adress, self.login, self.password)
+            self.nb_cpu = max(1, int(self.execute("nproc")))
+        except (pxssh.ExceptionPxssh, ValueError) as e:
+            print(cyan + "RemoteWorker.connect : " + endC + bold + red + "Login failed on computeur : " + self.ip_adress + endC, file=sys.stderr)
+            print(e, file=sys.stderr)
+            self.session = None
+            return False
+        self.available = True
+        if self.debug >= 2:
+            print(cyan + "RemoteWorker.connect : " + endC + "Session ouverte sur " + self.ip_adress + " (" + str(self.nb_cpu) + " cpu)" + endC)
+        return True
+
+    def execute(self, command):
+        """
+        # ROLE :
+        #   Execute une commande courte dans la session et retourne sa sortie
+        """
+
+        self.session.sendline(command)
+        self.session.prompt()
+        output = self.session.before
+        if not isinstance(output, str):
+            output = output.decode('utf-8', 'ignore')
+        output_list = output.replace('\r','').split('\n')
+        # La premiere ligne est l'echo de la commande
+        return '\n'.join(output_list[1:]).strip()
+
+    def refreshLoad(self):
+        """
+        # ROLE :
+        #   Met à jour la charge moyenne (1 min) de la machine, au plus toutes les LOAD_REFRESH_DELAY secondes
+        """
+
+        if time.time() - self.load_date < LOAD_REFRESH_DELAY:
+            return
+        with self.lock:
+            try:
+                self.load = float(self.execute("cat /proc/loadavg").split()[0])
+            except (pxssh.ExceptionPxssh, ValueError, IndexError, OSError, AttributeError):
+                pass
+        self.load_date = time.time()
+        return
+
+    def submit(self, shell_command):
+        """
+        # ROLE :
+        #   Lance en arriere plan le fichier shell d'une commande dans la session persistante
+        """
+
+        self.session.sendline(shell_command + ' &')
+        self.session.prompt()
+        return
+
+    def close(self):
+        """
+        # ROLE :
+        #   Ferme la session ssh
+        """
+
+        if self.session is not None:
+            try:
+                self.session.logout()
+            except (pxssh.ExceptionPxssh, OSError):
+                pass
+        self.session = None
+        self.available = False
+        return
+
+#############################################################################################
+# CLASSE LocalWorker()                                                                      #
+#############################################################################################
+class LocalWorker(RemoteWorker):
+    """
+    # ROLE :
+    #   Machine distante simulée par un shell local persistant (tests sans machine réelle)
+    """
+
+    def connect(self):
+        self.session = subprocess.Popen(["/bin/sh"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, universal_newlines=True)
+        self.nb_cpu = multiprocessing.cpu_count()
+        self.available = True
+        if self.debug >= 2:
+            print(cyan + "LocalWorker.connect : " + endC + "Shell local ouvert pour " + self.ip_adress + " (" + str(self.nb_cpu) + " cpu)" + endC)
+        return True
+
+    def refreshLoad(self):
+        if time.time() - self.load_date < LOAD_REFRESH_DELAY:
+            return
+        self.load = os.getloadavg()[0]
+        self.load_date = time.time()
+        return
+
+    def submit(self, shell_command):
+        self.session.stdin.write(shell_command + ' &\n')
+        self.session.stdin.flush()
+        return
+
+    def close(self):
+        if self.session is not None:
+            try:
+                self.session.stdin.close()
+                self.session.wait()
+            except (OSError, ValueError):
+                pass
+        self.session = None
+        self.available = False
+        return
+
+#############################################################################################
+# CLASSE RemoteWorkersPool()                                                                #
+#############################################################################################
+class RemoteWorkersPool:
+    """
+    # ROLE :
+    #   Pool des machines distantes : place chaque commande sur la machine éligible la moins chargée
+    #   et suit les commandes en cours par machine
+    """
+
+    def __init__(self, remote_computeur_list, debug=0):
+        self.debug = debug
+        self.lock = threading.Lock()
+        self.workers_dico = {}
+        self.host_commands_dico = {}
+        self.placement_dico = {}
+        for remote_struct in remote_computeur_list:
+            if remote_struct.ip_adress.startswith(PREFIX_LOCAL_WORKER):
+                worker = LocalWorker(remote_struct.ip_adress, remote_struct.login, remote_struct.password, debug)
+            else:
+                worker = RemoteWorker(remote_struct.ip_adress, remote_struct.login, remote_struct.password, debug)
+            self.workers_dico[remote_struct.ip_adress] = worker
+
+    def connect(self):
+        """
+        # ROLE :
+        #   Ouvre une session persistante sur chaque machine du pool
+        #
+        # SORTIES :
+        #   le nombre de machines disponibles
+        """
+
+        nb_available = 0
+        for worker in self.workers_dico.values():
+            if worker.connect():
+                nb_available += 1
+        if self.debug >= 1:
+            print(cyan + "RemoteWorkersPool.connect : " + endC + str(nb_available) + "/" + str(len(self.workers_dico)) + " machines distantes disponibles" + endC)
+        return nb_available
+
+    def getScoreWorker(self, worker):
+        """
+        # ROLE :
+        #   Calcule le score de charge d'une machine : (commandes en cours + charge moyenne) / nombre de CPU
+        """
+
+        worker.refreshLoad()
+        return (len(worker.running_list) + worker.load) / float(worker.nb_cpu)
+
+    def getHostCommand(self, id_command):
+        """
+        # ROLE :
+        #   Retourne l'adresse de la machine sur laquelle une commande a été lancée ('' si inconnue)
+        """
+
+        return self.placement_dico.get(id_command, '')
+
+    def selectWorker(self, exclude_list=[]):
+        """
+        # ROLE :
+        #   Selectionne la machine disponible la moins chargée, en priorité parmi celles qui ont un CPU libre
+        #
+        # SORTIES :
+        #   la machine (RemoteWorker) ou None si aucune machine n'est disponible
+        """
+
+        eligible_list = [worker for worker in self.workers_dico.values() if worker.available and worker.ip_adress not in exclude_list]
+        if eligible_list == []:
+            return None
+        free_list = [worker for worker in eligible_list if len(worker.running_list) < worker.nb_cpu]
+        if free_list != []:
+            eligible_list = free_list
+        return min(eligible_list, key=lambda worker: (self.getScoreWorker(worker), len(worker.running_list)))
+
+    def startCommand(self, id_command, shell_command):
+        """
+        # ROLE :
+        #   Lance une commande sur la machine la moins chargée, une machine dont la session est perdue est reconnectée une fois
+        #   sinon la commande est placée sur une autre machine
+        #
+        # ENTREES :
+        #   id_command : l'identifiant de la commande
+        #   shell_command : le fichier shell de la commande (sur un espace partagé)
+        #
+        # SORTIES :
+        #   l'adresse de la machine sur laquelle la commande est lancée ou '' en cas d'erreur
+        """
+
+        exclude_list = []
+        while True:
+            with self.lock:
+                worker = self.selectWorker(exclude_list)
+                if worker is None:
+                    return ''
+                worker.running_list.append(id_command)
+                self.host_commands_dico[id_command] = worker.ip_adress
+
+            with worker.lock:
+                try:
+                    worker.submit(shell_command)
+                    submitted = True
+                except (pxssh.ExceptionPxssh, OSError, ValueError):
+                    # Session perdue : une tentative de reconnexion
+                    worker.close()
+                    submitted = False
+                    if worker.connect():
+                        try:
+                            worker.submit(shell_command)
+                            submitted = True
+                        except (pxssh.ExceptionPxssh, OSError, ValueError):
+                            worker.close()
+
+            if submitted:
+                self.placement_dico[id_command] = worker.ip_adress
+                if self.debug >= 2:
+                    print(cyan + "RemoteWorkersPool.startCommand : " + endC + "commande " + str(id_command) + " lancée sur " + worker.ip_adress + " (" + str(len(worker.running_list)) + " en cours)" + endC)
+                return worker.ip_adress
+
+            print(cyan + "RemoteWorkersPool.startCommand : " + endC + bold + red + "ERREUR de lancement sur " + worker.ip_adress + ", essai sur une autre machine" + endC, file=sys.stderr)
+            self.endCommand(id_command)
+            exclude_list.append(worker.ip_adress)
+
+    def endCommand(self, id_command):
+        """
+        # ROLE :
+        #   Libere la place d'une commande terminée sur sa machine
+        """
+
+        with self.lock:
+            ip_adress = self.host_commands_dico.pop(id_command, None)
+            if ip_adress is not None and id_command in self.workers_dico[ip_adress].running_list:
+                self.workers_dico[ip_adress].running_list.remove(id_command)
+        return
+
+    def close(self):
+        """
+        # ROLE :
+        #   Ferme les sessions de toutes les machines du pool
+        """
+
+        for worker in self.workers_dico.values():
+            worker.close()
+        return
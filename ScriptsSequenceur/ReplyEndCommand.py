@@ -14,7 +14,7 @@
  Ce module contient le script qui informe au serveur la fin de la commande par communication socket pour le séquenceur.
 """
 
-import os,argparse,socket
+import os,argparse,socket,time
 
 # debug = 0 : affichage minimum de commentaires lors de l'execution du script
 # debug = 2 : affichage maximum de commentaires lors de l'execution du script. Intermédiaire : affichage intermédiaire
@@ -25,6 +25,7 @@ INFO_WARNING = "warning"
 INFO_DEPRECATED = "deprecated"
 INFO_FALSE_ERROR = "Error MachineLearningModel Factory did not return an MachineLearningModel"
 INFO_PROJ_CREATE_ERROR = "proj_create_from_database"
+NB_CONNECTION_ATTEMPTS = 50
 bold = "\033[1m"
 green = "\033[32m"
 cyan = "\033[36m"
@@ -94,9 +95,18 @@ if __name__ == '__main__':
 
     # Send socket
 
-    socket_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # connection en mode TCP
-    socket_client.connect((ip_serveur, port))
-    socket_client.send((state + "="+ str(id_command)).encode())
+    # Nouvelle tentative de connexion si la file d'attente du serveur est pleine (nombreuses commandes terminées simultanément)
+    for attempt in range(NB_CONNECTION_ATTEMPTS):
+        socket_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # connection en mode TCP
+        try:
+            socket_client.connect((ip_serveur, port))
+            break
+        except socket.error:
+            socket_client.close()
+            if attempt == NB_CONNECTION_ATTEMPTS - 1:
+                raise
+            time.sleep(min(0.1 * (attempt + 1), 2.0))
+    socket_client.sendall((state + "="+ str(id_command) + "\n").encode())
     '''
     socket_client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # en UDP
     socket_client.sendto(state + "="+ str(id_command),(ip_serveur, port))
@@ -53,6 +53,8 @@ class StructTask:
         self.position = 0
         self.errorManagement = True
         self.settings = ''
+        self.cpu = 1
+        self.ram = 0
 
 class StructRemote:
     def __init__(self):
@@ -72,6 +74,13 @@ class StructProcessing:
         self.link = 'eth0'
         self.port = 0
         self.ram = 0
+        self.scheduler = False
+        self.maxParallelCommands = 0
+        self.cpuCapacity = 0
+        self.ramCapacity = 0
+        self.taskCache = False
+        self.taskCacheHash = False
+        self.telemetry = False
         self.taskList = []
         self.remoteComputeurList = []
 
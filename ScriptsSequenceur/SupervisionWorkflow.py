@@ -25,6 +25,7 @@ from Lib_display import bold,black,red,green,yellow,blue,magenta,cyan,endC, disp
 from Lib_text import writeTextFile,appendTextFileCR, cleanSpaceText
 from Lib_file import removeFile
 from Lib_operator import switch, case
+from CommandsJournal import existJournal, readJournal
 from Settings import *
 
 #############################################################################################
@@ -33,7 +34,7 @@ from Settings import *
 def readCommands(command_doc, debug):
     """
     # ROLE :
-    #   La fonction lit des commandes dans un fichier texte et convertie en dico
+    #   La fonction lit des commandes dans le journal du fichier de commandes et convertie en dico
     #
     # ENTREES :
     #   command_doc : fichier dont on lit et execute les commandes
@@ -44,33 +45,29 @@ def readCommands(command_doc, debug):
     """
 
     struct_cmd_dico = {}
+    if not existJournal(command_doc):
+        return None
     try:
-        # Ouverture du fichier de commande et chargement de toutes les lignes
-        command_doc_work = open(command_doc,'r')
-        commands_list = command_doc_work.readlines()
+        # Lecture des commandes et de leurs dépendances dans le journal
+        commands_dico, id_commands_list = readJournal(command_doc, debug)
     except:
         return None
-        #raise NameError(cyan + "readCommands : " + endC + bold + red + "Can't open file: \"" + command_doc + '\n' + endC)
-
-    # Identification de commands_list comme une liste dont chaque ligne correspond à une commande
-    for command in commands_list :
+        #raise NameError(cyan + "readCommands : " + endC + bold + red + "Can't open journal of file: \"" + command_doc + '\n' + endC)
 
-        element_command_list = command.split(SEPARATOR)
-        if len(element_command_list) < 11 :
-            return None
+    # Identification de commands_dico comme un dictionnaire dont chaque element correspond à une commande
+    for id_command_int in id_commands_list :
 
-        state = element_command_list[0]
-        name_task = element_command_list[3]
-        action = element_command_list[4]
-        id_command = element_command_list[1]
+        command_struct = commands_dico[id_command_int]
+        state = command_struct.state
+        name_task = command_struct.nameTask
+        action = command_struct.action
+        id_command = str(id_command_int)
 
         # Liste des commandes dependantes
-        dependency_list = []
-        if element_command_list[2] != '':
-            dependency_list = element_command_list[2].split(',')
+        dependency_list = [str(id_depend) for id_depend in command_struct.dependencyList]
 
         # Récupération de la commande à exécuter
-        command_to_execute = element_command_list[11]
+        command_to_execute = command_struct.commandToExecute
         if six.PY2:
             if FUNCTION_PYTHON in command_to_execute:
                 command_to_execute =  command_to_execute.replace(FUNCTION_PYTHON,'')
@@ -80,8 +77,8 @@ def readCommands(command_doc, debug):
         name_cmd = command_to_execute.split(' ')[0]
 
         # Récupération de l'heure de début et de fin
-        start_date = element_command_list[9]
-        end_date = element_command_list[10]
+        start_date = command_struct.startDate
+        end_date = command_struct.endDate
 
 
         # Creation d'une structure contenant les données des commandes
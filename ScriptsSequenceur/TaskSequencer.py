@@ -41,6 +41,8 @@ from Settings import StructSettings, setEndDisplay
 from ParserXml import xmlSettingsParser
 from CommandsWriting  import writeCommands, updateCommandsError
 from CommandsProcessing  import executeCommands
+from CommandsScheduler  import executeCommandsScheduler
+from CommandsJournal  import createJournal
 from SupervisionWorkflow  import supervisionCommands
 
 # le compteur de commandes et selection du remote valeurs initiales
@@ -206,6 +208,9 @@ def main(gui=False):
     # Definition du niveau de debug pour toute la chaine
     debug = settings_struct_dico[list(settings_struct_dico)[0]].general.processing.debug
 
+    # Creation du journal des etats des commandes (base indexée par id de commande) a partir du fichier command_doc
+    createJournal(command_doc, debug)
+
     # Lancement de la supervison du fichier commande
     setEndDisplay(False)
     threadSupervision = supervisionCommands(command_doc, debug)
@@ -214,8 +219,16 @@ def main(gui=False):
     # Execution des commandes
     link = settings_struct_dico[list(settings_struct_dico)[0]].general.processing.link
     port = settings_struct_dico[list(settings_struct_dico)[0]].general.processing.port
-    if settings_struct_dico[list(settings_struct_dico)[0]].general.processing.running :
-        executeCommands(command_doc, debug, link, port)
+    processing = settings_struct_dico[list(settings_struct_dico)[0]].general.processing
+    if processing.running and processing.scheduler :
+        # Poids en ressources de chaque tache de tous les settings
+        weights_dico = {}
+        for name_setting in settings_struct_dico :
+            for task in settings_struct_dico[name_setting].general.processing.taskList :
+                weights_dico[name_setting + "." + str(task.taskLabel) + "." + str(task.position)] = [task.cpu, task.ram]
+        executeCommandsScheduler(command_doc, debug, link, port, processing.maxParallelCommands, processing.cpuCapacity, processing.ramCapacity, weights_dico, processing.remoteComputeurList, processing.taskCache, processing.taskCacheHash, processing.telemetry)
+    elif processing.running :
+        executeCommands(command_doc, debug, link, port, processing.telemetry)
     else :
         time.sleep(5)
 